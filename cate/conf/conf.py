@@ -28,7 +28,8 @@ from typing import Any, Dict, Optional, Sequence, Union
 
 from .defaults import GLOBAL_CONF_FILE, LOCAL_CONF_FILE, LOCATION_FILE, VERSION_CONF_FILE, \
     VARIABLE_DISPLAY_SETTINGS, DEFAULT_DATA_PATH, DEFAULT_VERSION_DATA_PATH, DEFAULT_COLOR_MAP, DEFAULT_RES_PATTERN, \
-    WEBAPI_USE_WORKSPACE_IMAGERY_CACHE, DEFAULT_VARIABLES
+    WEBAPI_USE_WORKSPACE_IMAGERY_CACHE, DEFAULT_VARIABLES, WORKSPACE_WORKFLOW_WORKERS, \
+    WORKSPACE_RESOURCE_FORMAT, DATASET_CHUNK_SIZE
 
 _CONFIG = None
 
@@ -76,6 +77,36 @@ def get_use_workspace_imagery_cache() -> bool:
     return get_config_value('use_workspace_imagery_cache', WEBAPI_USE_WORKSPACE_IMAGERY_CACHE)
 
 
+def get_workspace_workflow_workers() -> int:
+    """
+    Get the maximum number of threads that execute independent steps of a workspace's workflow in parallel.
+
+    :return: Effectively reads the value of the configuration parameter ``workflow_workers``, if any.
+             Otherwise return the default value.
+    """
+    return get_config_value('workflow_workers', WORKSPACE_WORKFLOW_WORKERS)
+
+
+def get_workspace_resource_format() -> str:
+    """
+    Get the format used to write persistent workspace resources.
+
+    :return: Effectively reads the value of the configuration parameter ``workspace_resource_format``, if any.
+             Otherwise return the default value ``'zarr'``.
+    """
+    return get_config_value('workspace_resource_format', WORKSPACE_RESOURCE_FORMAT)
+
+
+def get_dataset_chunk_size() -> int:
+    """
+    Get the target size in bytes of the dask chunks of datasets opened from multiple files.
+
+    :return: Effectively reads the value of the configuration parameter ``dataset_chunk_size``, if any.
+             Otherwise return the default value.
+    """
+    return get_config_value('dataset_chunk_size', DATASET_CHUNK_SIZE)
+
+
 def get_default_res_pattern() -> str:
     """
     Get the default prefix for names generated for new workspace resources originating from opening data sources
@@ -41,8 +41,51 @@ WORKSPACE_CACHE_DIR_NAME = '.cate-cache'
 WORKSPACE_DATA_DIR_NAME = '.cate-workspace'
 WORKSPACE_WORKFLOW_FILE_NAME = 'workflow.json'
 
+#: The format of persistent workspace resource files, either 'zarr' or 'netcdf'
+WORKSPACE_RESOURCE_FORMAT = 'zarr'
+
+#: Use a persistent cache for the results of operations, see :py:mod:`cate.core.opcache`
+USE_OP_RESULT_CACHE = False
+
+#: Directory of the persistent operation result cache
+OP_RESULT_CACHE_PATH = os.path.join(DEFAULT_VERSION_DATA_PATH, 'op_cache')
+
+#: The maximum number of bytes in the persistent operation result cache
+OP_RESULT_CACHE_CAPACITY = 4 * 1024 * 1024 * 1024
+
+#: The maximum number of independent workflow steps of a workspace executed in parallel
+WORKSPACE_WORKFLOW_WORKERS = 4
+
+#: The target size in bytes of the dask chunks of datasets opened from multiple files,
+#: see :py:func:`cate.core.ds.open_xarray_dataset`
+DATASET_CHUNK_SIZE = 128 * 1024 * 1024
+
+#: Use a persistent cache for the metadata of the files of datasets opened from multiple files,
+#: see :py:mod:`cate.core.dsmetacache`
+USE_DATASET_METADATA_CACHE = True
+
+#: Directory of the persistent dataset metadata cache
+DATASET_METADATA_CACHE_PATH = os.path.join(DEFAULT_VERSION_DATA_PATH, 'dataset_metadata_cache')
+
+#: Use a persistent cache for the chunks of remote datasets, see :py:mod:`cate.core.dschunkcache`
+USE_DATASET_CHUNK_CACHE = True
+
+#: Directory of the persistent dataset chunk cache
+DATASET_CHUNK_CACHE_PATH = os.path.join(DEFAULT_VERSION_DATA_PATH, 'dataset_chunk_cache')
+
+#: The maximum number of bytes in the persistent dataset chunk cache
+DATASET_CHUNK_CACHE_CAPACITY = 2 * 1024 * 1024 * 1024
+
+#: The number of chunks of remote datasets read ahead along the time dimension
+DATASET_CHUNK_CACHE_READ_AHEAD = 4
+
+#: The maximum number of files downloaded or subsets read in parallel when a data source is made local
+DOWNLOAD_WORKERS = 4
+
 DEFAULT_RES_PATTERN = 'res_{index}'
 
+#: The maximum zlib compression level of subsets written when a data source is made local, 0 means no compression.
+#: The level actually used is chosen per variable, see cate.ds.local.choose_compression_encoding().
 NETCDF_COMPRESSION_LEVEL = 9
 
 _ONE_MIB = 1024 * 1024
@@ -51,12 +94,25 @@ _ONE_GIB = 1024 * _ONE_MIB
 #: Use a per-workspace file imagery cache, see REST "/res/tile/" API
 WEBAPI_USE_WORKSPACE_IMAGERY_CACHE = False
 
+#: Use a per-workspace store of precomputed overview levels for the lower resolution levels of
+#: image pyramids, see REST "/res/tile/" API
+WEBAPI_USE_WORKSPACE_OVERVIEW_CACHE = True
+
+#: The maximum number of threads computing image tiles, see REST "/res/tile/" API
+WEBAPI_TILE_WORKERS = 4
+
+#: Compute neighbouring, parent, and child tiles of requested image tiles in advance, see REST "/res/tile/" API
+WEBAPI_USE_TILE_PREFETCHING = False
+
 # The number of bytes in a workspace's image file cache
 WEBAPI_WORKSPACE_FILE_TILE_CACHE_CAPACITY = 1 * _ONE_GIB
 
 # The number of bytes in a workspace's image in-memory cache
 WEBAPI_WORKSPACE_MEM_TILE_CACHE_CAPACITY = 256 * _ONE_MIB
 
+#: The maximum number of image pyramids kept per workspace, see REST "/res/tile/" API
+WEBAPI_WORKSPACE_MAX_NUM_PYRAMIDS = 32
+
 #: where the information about a running WebAPI service is stored
 WEBAPI_INFO_FILE = os.path.join(DEFAULT_VERSION_DATA_PATH, 'webapi.json')
 
@@ -18,12 +18,93 @@
 # data_stores_path = '~/.cate/data_stores'
 
 
+# 'workspace_resource_format' is the format used to write persistent workspace resources when a workspace is saved.
+# 'zarr' writes chunked Zarr directories in parallel and reopens them lazily, 'netcdf' writes single NetCDF files.
+#
+# workspace_resource_format = 'zarr'
+
+# 'download_workers' is the maximum number of files that are downloaded in parallel if a data source
+# is made local, e.g. from the ESA CCI Open Data Portal. Interrupted downloads are resumed next time.
+# If only a region or some variables are made local, it is the number of subsets read in parallel.
+# It is also the number of files copied in parallel if a local data source is copied as a whole.
+#
+# download_workers = 4
+
+# 'NETCDF_COMPRESSION_LEVEL' is the maximum zlib compression level (1 to 9) of the NetCDF files written if only
+# a region or some variables of a data source are made local. For every variable, the fastest level and shuffle
+# filter setting are chosen that compress a data sample almost as well as the best one. 0 disables compression.
+#
+# NETCDF_COMPRESSION_LEVEL = 9
+
+# 'dataset_chunk_size' is the size in bytes that dask chunks of datasets opened from multiple files shall not exceed.
+# Chunks are aligned to the chunks of the files' storage. Smaller chunks reduce memory usage,
+# larger chunks reduce the overhead of processing many chunks.
+#
+# dataset_chunk_size = 128 * 1024 * 1024
+
+# If 'use_dataset_metadata_cache' is True, Cate will store the dimensions, coordinates, and variable
+# descriptions of every file of a dataset opened from multiple files in the directory given by
+# 'dataset_metadata_cache_path'. When the dataset is opened again, the files are combined from this
+# metadata and only opened when their data is read. Entries of files whose size or modification time
+# has changed are renewed.
+#
+# use_dataset_metadata_cache = True
+# dataset_metadata_cache_path = '~/.cate/<version>/dataset_metadata_cache'
+
+# If 'use_dataset_chunk_cache' is True, Cate will store every chunk of data read from remote datasets,
+# e.g. from the ESA CCI Open Data Portal via OPeNDAP, in the directory given by 'dataset_chunk_cache_path'.
+# Reading the same chunk again, also in other workspaces or sessions, will not access the network.
+# Whenever a chunk is read, the next 'dataset_chunk_cache_read_ahead' chunks along the time dimension are
+# read in the background. If the cached chunks exceed 'dataset_chunk_cache_capacity' bytes, the least
+# recently used ones are removed.
+#
+# use_dataset_chunk_cache = True
+# dataset_chunk_cache_path = '~/.cate/<version>/dataset_chunk_cache'
+# dataset_chunk_cache_capacity = 2 * 1024 * 1024 * 1024
+# dataset_chunk_cache_read_ahead = 4
+
+# If 'use_op_result_cache' is True, Cate will store the results of expensive operations
+# such as 'coregister' or 'long_term_average' in the directory given by 'op_result_cache_path'.
+# Identical invocations of such operations, also in other workspaces or sessions, will read their
+# results from there instead of computing them again. If the cached results exceed
+# 'op_result_cache_capacity' bytes, the least recently used ones are removed.
+#
+# use_op_result_cache = False
+# op_result_cache_path = '~/.cate/<version>/op_cache'
+# op_result_cache_capacity = 4 * 1024 * 1024 * 1024
+
 # If 'use_workspace_imagery_cache' is True, Cate will maintain a per-workspace
 # cache for imagery generated from dataset variables. Such cache can accelerate
 # image display, however at the cost of disk space.
 #
 # use_workspace_imagery_cache = False
 
+# 'workflow_workers' is the maximum number of threads that execute independent steps of a workspace's
+# workflow in parallel. Set it to 1 to execute steps one after the other.
+#
+# workflow_workers = 4
+
+# If 'use_workspace_overview_cache' is True, Cate will compute down-sampled overviews of dataset
+# variables once and store them in the workspace's cache directory. Overviews make the display of
+# zoomed-out imagery fast even for very large variables, however at the cost of disk space.
+#
+# use_workspace_overview_cache = True
+
+# 'tile_workers' is the maximum number of threads that compute image tiles for display in parallel.
+#
+# tile_workers = 4
+
+# If 'use_tile_prefetching' is True, Cate will compute the neighbouring, parent, and child tiles
+# of any displayed image tile in advance. This makes panning and zooming smoother,
+# however at the cost of extra CPU and memory usage.
+#
+# use_tile_prefetching = False
+
+# 'max_num_workspace_pyramids' is the maximum number of image pyramids, i.e. displayed variables
+# and color mappings, that Cate keeps in memory for each open workspace.
+#
+# max_num_workspace_pyramids = 32
+
 # Default prefix for names generated for new workspace resources originating from opening data sources
 # or executing workflow steps.
 # This prefix is used only if no specific prefix is defined for a given operation.
@@ -81,13 +81,16 @@ Components
 import glob
 from abc import ABCMeta, abstractmethod
 from enum import Enum
-from math import ceil, sqrt
-from typing import Sequence, Optional, Union, Any
+from typing import Sequence, Optional, Union, Any, Dict
 
+import numpy as np
 import xarray as xr
 
-from .cdm import Schema, get_lon_dim_name, get_lat_dim_name
+from .cdm import Schema
+from .dschunkcache import get_dataset_chunk_cache, is_remote_path
+from .dsmetacache import DatasetMetadataStore, get_dataset_metadata_cache, open_mfdataset_from_metadata
 from .types import PolygonLike, TimeRange, TimeRangeLike, VarNamesLike
+from ..conf import conf
 from ..util.monitor import Monitor
 
 __author__ = "Norman Fomferra (Brockmann Consult GmbH), " \
@@ -528,48 +531,47 @@ def open_dataset(data_source: Union[DataSource, str],
 
 
 # noinspection PyUnresolvedReferences,PyProtectedMember
-def open_xarray_dataset(paths, concat_dim='time', **kwargs) -> xr.Dataset:
+def open_xarray_dataset(paths,
+                        concat_dim='time',
+                        chunk_size: int = None,
+                        metadata_store: DatasetMetadataStore = None,
+                        **kwargs) -> xr.Dataset:
     """
     Open multiple files as a single dataset. This uses dask. If each individual file
-    of the dataset is small, one dask chunk will coincide with one temporal slice,
+    of the dataset is small, one dask chunk will coincide with one file,
     e.g. the whole array in the file. Otherwise smaller dask chunks will be used
     to split the dataset.
 
     :param paths: Either a string glob in the form "path/to/my/files/\*.nc" or an explicit
-        list of files to open.
+        list of files or OPeNDAP URLs to open.
     :param concat_dim: Dimension to concatenate files along. You only
         need to provide this argument if the dimension along which you want to
         concatenate is not a dimension in the original datasets, e.g., if you
         want to stack a collection of 2D arrays along a third dimension.
-    :param kwargs: Keyword arguments directly passed to ``xarray.open_mfdataset()``
+    :param chunk_size: The size in bytes a dask chunk should not exceed. If not given,
+        the value of the configuration parameter ``dataset_chunk_size`` is used.
+    :param metadata_store: The store providing the metadata of the files. If not given,
+        the global dataset metadata cache is used, if enabled.
+    :param kwargs: Keyword arguments directly passed to ``xarray.open_mfdataset()``, or to ``xarray.open_dataset()``,
+        if the files are combined from cached metadata.
     """
-    # By default the dask chunk size of xr.open_mfdataset is (lat,lon,1). E.g.,
-    # the whole array is one dask slice irrespective of chunking on disk.
+    # By default the dask chunk size of xr.open_mfdataset is the whole array
+    # in a file irrespective of chunking on disk.
     #
     # netCDF files can also feature a significant level of compression rendering
     # the known file size on disk useless to determine if the default dask chunk
     # will be small enough that a few of them could comfortably fit in memory for
     # parallel processing.
     #
-    # Hence we open the first file of the dataset, find out its uncompressed size
-    # and use that, together with an empirically determined threshold, to find out
-    # the smallest amount of chunks such that each chunk is smaller than the
-    # threshold and the number of chunks is a squared number so that both axes,
-    # lat and lon could be divided evenly. We use a squared number to avoid
-    # in addition to all of this finding the best way how to split the number of
-    # chunks into two coefficients that would produce sane chunk shapes.
+    # Hence we open the first file of the dataset and plan chunks from the uncompressed
+    # size of its variables and their chunking on disk, see get_dataset_chunks().
     #
-    # When the number of chunks has been found, we use its root as the divisor
-    # to construct the dask chunks dictionary to use when actually opening
-    # the dataset.
+    # If the dataset metadata cache is used, the files' metadata is read only once, and
+    # subsequent opens of the same files don't open them at all, see cate.core.dsmetacache.
     #
-    # If the number of chunks is one, we use the default chunking.
-    #
-    # Check if the uncompressed file (the default dask Chunk) is too large to
-    # comfortably fit in memory
-    threshold = 250 * (2 ** 20)  # 250 MB
+    # Chunks read from remote datasets, e.g. OPeNDAP URLs, are cached and read ahead along the time
+    # dimension, see cate.core.dschunkcache.
 
-    ds = None
     # paths could be a string or a list
     files = []
     if type(paths) is str:
@@ -577,60 +579,118 @@ def open_xarray_dataset(paths, concat_dim='time', **kwargs) -> xr.Dataset:
     else:
         files.extend(paths)
 
-    # should be a file or a glob
+    # should be a file, a glob, or a URL
     # unroll glob list into list of files
-    files = [i for path in files for i in glob.glob(path)]
+    files = [i for path in files for i in ([path] if is_remote_path(path) else glob.glob(path))]
 
     if not files:
         raise IOError('File {} not found'.format(paths))
 
-    # Find number of chunks as the closest larger squared number (1,4,9,..
-    temp_ds = xr.open_dataset(files[0], **kwargs)
-
-    n_chunks = ceil(sqrt(temp_ds.nbytes / threshold)) ** 2
+    if chunk_size is None:
+        chunk_size = conf.get_dataset_chunk_size()
+
+    if metadata_store is None:
+        metadata_store = get_dataset_metadata_cache()
+    if metadata_store is not None and metadata_store.can_open(**kwargs):
+        # Combine the files from their cached metadata, so that they are only opened when their data is read
+        metadata_list = metadata_store.get_metadata_list(files, **kwargs)
+        first_variables = metadata_list[0]['variables']
+        chunks = _plan_chunks([(var['dims'], var['shape'], var['dtype'], var['encoding'])
+                               for var_name, var in first_variables.items()
+                               if var_name not in metadata_list[0]['coord_names']],
+                              chunk_size)
+        chunk_cache = get_dataset_chunk_cache() if all(is_remote_path(file) for file in files) else None
+        ds = open_mfdataset_from_metadata(files, metadata_list, concat_dim=concat_dim, chunks=chunks,
+                                          chunk_cache=chunk_cache, **kwargs)
+        if ds is not None:
+            return ds
 
-    if n_chunks == 1:
+    temp_ds = xr.open_dataset(files[0], **kwargs)
+    try:
+        chunks = get_dataset_chunks(temp_ds, chunk_size)
+    finally:
         temp_ds.close()
-        # The file size is fine
-        # autoclose ensures that we can open datasets consisting of a number of
-        # files that exceeds OS open file limit.
+
+    # autoclose ensures that we can open datasets consisting of a number of
+    # files that exceeds OS open file limit.
+    if chunks:
         ds = xr.open_mfdataset(files,
                                concat_dim=concat_dim,
+                               chunks=chunks,
                                autoclose=True,
                                **kwargs)
     else:
-        # lat/lon names are not yet known
-        lat = get_lat_dim_name(temp_ds)
-        lon = get_lon_dim_name(temp_ds)
-        n_lat = len(temp_ds[lat])
-        n_lon = len(temp_ds[lon])
-
-        # temp_ds is no longer used
-        temp_ds.close()
-
-        divisor = sqrt(n_chunks)
-
-        # Chunking will pretty much 'always' be 2x2, very rarely 3x3 or 4x4. 5x5
-        # would imply an uncompressed single file of ~6GB! All expected grids
-        # should be divisible by 2,3 and 4.
-        if not (n_lat % divisor == 0) or not (n_lon % divisor == 0):
-            raise ValueError("Can't find a good chunking strategy for the given"
-                             "data source. Are lat/lon coordinates divisible by "
-                             "{}?".format(divisor))
-
-        chunks = {lat: n_lat // divisor, lon: n_lon // divisor}
-
+        # The file size is fine
         ds = xr.open_mfdataset(files,
                                concat_dim=concat_dim,
-                               chunks=chunks,
                                autoclose=True,
                                **kwargs)
+
     if concat_dim not in ds.dims:
         ds.expand_dims(concat_dim)
 
     return ds
 
 
+def get_dataset_chunks(dataset: xr.Dataset, chunk_size: int) -> Optional[Dict[str, int]]:
+    """
+    Plan the dask chunks for the variables of a *dataset* opened from a single file so that
+    the uncompressed size of a chunk doesn't exceed *chunk_size* bytes, if possible.
+
+    The planned chunks are multiples of the chunks the variables are stored with on disk, as found in
+    the variables' encoding, so that any stored chunk is read by a single dask task. Chunks are split
+    starting with the outermost dimension, usually time, then e.g. lat and lon, which preserves
+    contiguous reads for unchunked variables. Grids whose sizes are not multiples of the chunk sizes
+    have a smaller last chunk.
+
+    :param dataset: The dataset, which should not yet be chunked.
+    :param chunk_size: The size in bytes a chunk should not exceed.
+    :return: A mapping from dimension names to chunk sizes or ``None``, if no variable must be split.
+    """
+    return _plan_chunks([(var.dims, var.shape, var.dtype, var.encoding) for var in dataset.data_vars.values()],
+                        chunk_size)
+
+
+def _plan_chunks(variables: Sequence[tuple], chunk_size: int) -> Optional[Dict[str, int]]:
+    """
+    Plan the dask chunks for *variables* given as tuples (dims, shape, dtype, encoding),
+    see :py:func:`get_dataset_chunks`.
+    """
+    # Plan the chunks for the variable with the largest size in the dataset.
+    # Other variables usually share its dimensions or are smaller.
+    variables = [var for var in variables if len(var[1]) > 0]
+    if not variables:
+        return None
+    dims, shape, dtype, encoding = max(variables, key=lambda v: int(np.prod(v[1])) * np.dtype(v[2]).itemsize)
+    ndim = len(shape)
+    itemsize = np.dtype(dtype).itemsize
+    if int(np.prod(shape)) * itemsize <= chunk_size:
+        return None
+
+    storage_chunks = encoding.get('chunksizes') or encoding.get('chunks')
+    if not storage_chunks or len(storage_chunks) != ndim:
+        # Contiguous storage
+        storage_chunks = (1,) * ndim
+    storage_chunks = tuple(min(max(int(c), 1), n) for c, n in zip(storage_chunks, shape))
+
+    chunk_shape = list(shape)
+    for i in range(ndim):
+        # Size in bytes of a chunk with extent 1 along dimension i
+        slice_size = itemsize
+        for j, n in enumerate(chunk_shape):
+            if j != i:
+                slice_size *= n
+        max_extent = chunk_size // slice_size
+        if max_extent >= shape[i]:
+            break
+        chunk_shape[i] = max((max_extent // storage_chunks[i]) * storage_chunks[i], storage_chunks[i])
+        if slice_size * chunk_shape[i] <= chunk_size:
+            break
+
+    chunks = {dim: extent for dim, extent, n in zip(dims, chunk_shape, shape) if extent < n}
+    return chunks or None
+
+
 def format_variables_info_string(variables: dict):
     """
     Return some textual information about the variables contained in this data source.
@@ -0,0 +1,306 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+A persistent cache for the chunks of variables of remote datasets, e.g. datasets accessed via OPeNDAP.
+
+Datasets combined from multiple remote files by :py:func:`cate.core.dsmetacache.open_mfdataset_from_metadata`
+read their data chunk by chunk. With a :py:class:`DatasetChunkCache`, every chunk read is written to a cache
+directory, identified by the file's URL, the variable name, and the chunk's index ranges. Reading the same chunk
+again, also from other workspaces and sessions, is served from the cache directory instead of the network.
+
+When a chunk is read, the chunks that follow it along the time dimension are read ahead in background threads,
+so that time series and animations over remote data wait for the network only once.
+
+If the size of all cached chunks exceeds the cache's capacity, the least recently used chunks are removed.
+
+Components
+==========
+"""
+
+import hashlib
+import json
+import logging
+import os
+import os.path
+import threading
+import urllib.parse
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..conf import get_config_value
+from ..conf.defaults import DATASET_CHUNK_CACHE_CAPACITY, DATASET_CHUNK_CACHE_PATH, DATASET_CHUNK_CACHE_READ_AHEAD, \
+    USE_DATASET_CHUNK_CACHE
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+_LOG = logging.getLogger('cate')
+
+_CHUNK_FILE_EXT = '.npy'
+
+#: The number of threads reading chunks ahead
+_READ_AHEAD_WORKERS = 2
+
+#: The index ranges of a chunk, a tuple of (start, stop) pairs, one per dimension
+ChunkIndex = Tuple[Tuple[int, int], ...]
+
+#: A request to read a chunk, a tuple (file, var_name, chunk_index, open_kwargs, read_chunk)
+ChunkRequest = Tuple[str, str, ChunkIndex, Dict[str, Any], Callable[[], np.ndarray]]
+
+
+def is_remote_path(path: str) -> bool:
+    """Test whether *path* is the URL of a remote dataset rather than a local file path."""
+    return urllib.parse.urlparse(path).scheme in ('http', 'https')
+
+
+class DatasetChunkCache:
+    """
+    A persistent cache for the chunks of variables of remote datasets.
+
+    :param cache_dir: the cache directory
+    :param capacity: the capacity of the cache in bytes
+    :param read_ahead: the number of chunks read ahead along the time dimension whenever a chunk is read
+    :param threshold: if *capacity* is exceeded, least recently used chunks are removed until the
+           size of all cached chunks falls below *threshold* times *capacity*
+    """
+
+    def __init__(self, cache_dir: str, capacity: int, read_ahead: int = 4, threshold: float = 0.75):
+        self._cache_dir = cache_dir
+        self._capacity = capacity
+        self._read_ahead = read_ahead
+        self._threshold = threshold
+        self._lock = threading.RLock()
+        # Size of all cached chunks, scanned on first store
+        self._size = None
+        # Chunks currently being read, so that every chunk is read once
+        self._pending = dict()  # type: Dict[str, Future]
+        self._executor = None  # type: Optional[ThreadPoolExecutor]
+
+    @property
+    def cache_dir(self) -> str:
+        return self._cache_dir
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def read_ahead(self) -> int:
+        return self._read_ahead
+
+    @property
+    def size(self) -> int:
+        """The size of all cached chunks in bytes."""
+        return sum(entry_size for _, _, entry_size in self._scan_entries())
+
+    def read(self,
+             file: str,
+             var_name: str,
+             chunk_index: ChunkIndex,
+             open_kwargs: Dict[str, Any],
+             read_chunk: Callable[[], np.ndarray]) -> np.ndarray:
+        """
+        Get a chunk of a variable. If the chunk is not cached, it is read by *read_chunk* and stored.
+
+        :param file: the URL of the dataset
+        :param var_name: the variable name
+        :param chunk_index: the chunk's index ranges
+        :param open_kwargs: the keyword arguments used to open the dataset
+        :param read_chunk: a function that reads the chunk
+        :return: the chunk's data
+        """
+        key = self.get_chunk_key(file, var_name, chunk_index, open_kwargs)
+        chunk = self.load(key)
+        if chunk is not None:
+            return chunk
+        with self._lock:
+            future = self._pending.get(key)
+        if future is not None:
+            # Being read ahead
+            chunk = future.result()
+            if chunk is not None:
+                return chunk
+        chunk = read_chunk()
+        self.store(key, chunk)
+        return chunk
+
+    def read_ahead_chunks(self, requests: Sequence[ChunkRequest]) -> None:
+        """
+        Read the chunks given by *requests* in background threads, unless they are cached or being read.
+
+        :param requests: requests to read chunks
+        """
+        for file, var_name, chunk_index, open_kwargs, read_chunk in requests:
+            key = self.get_chunk_key(file, var_name, chunk_index, open_kwargs)
+            with self._lock:
+                if key in self._pending or os.path.exists(self._get_entry_file(key)):
+                    continue
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=_READ_AHEAD_WORKERS)
+                self._pending[key] = self._executor.submit(self._read_ahead_chunk, key, read_chunk)
+
+    def load(self, key: str) -> Optional[np.ndarray]:
+        """
+        Load the chunk for the given *key*.
+
+        :param key: the chunk key
+        :return: the chunk's data, or ``None`` if the chunk is not cached
+        """
+        entry_file = self._get_entry_file(key)
+        # noinspection PyBroadException
+        try:
+            chunk = np.load(entry_file)
+            # Mark the chunk as recently used
+            os.utime(entry_file)
+            return chunk
+        except FileNotFoundError:
+            return None
+        except Exception:
+            _LOG.exception('loading cached chunk "%s" failed' % key)
+            return None
+
+    def store(self, key: str, chunk: np.ndarray) -> None:
+        """
+        Store the *chunk* for the given *key*.
+
+        :param key: the chunk key
+        :param chunk: the chunk's data
+        """
+        chunk = np.asarray(chunk)
+        if chunk.dtype.hasobject:
+            return
+        entry_file = self._get_entry_file(key)
+        temp_file = '%s.%s.incomplete' % (entry_file, uuid.uuid4().hex)
+        try:
+            os.makedirs(os.path.dirname(entry_file), exist_ok=True)
+            with open(temp_file, 'wb') as fp:
+                np.save(fp, chunk, allow_pickle=False)
+            entry_size = os.path.getsize(temp_file)
+            os.replace(temp_file, entry_file)
+        except Exception:
+            _LOG.exception('caching chunk "%s" failed' % key)
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = self.size
+            else:
+                self._size += entry_size
+            if self._size > self._capacity:
+                self.trim()
+
+    def trim(self) -> None:
+        """Remove least recently used chunks, if the size of all cached chunks exceeds the capacity."""
+        with self._lock:
+            entries = list(self._scan_entries())
+            size = sum(entry_size for _, _, entry_size in entries)
+            if size > self._capacity:
+                max_size = self._threshold * self._capacity
+                for _, entry_file, entry_size in sorted(entries):
+                    if size <= max_size:
+                        break
+                    try:
+                        os.remove(entry_file)
+                        size -= entry_size
+                    except OSError:
+                        pass
+            self._size = size
+
+    def clear(self) -> None:
+        """Remove all cached chunks."""
+        with self._lock:
+            for _, entry_file, _ in self._scan_entries():
+                try:
+                    os.remove(entry_file)
+                except OSError:
+                    pass
+            self._size = 0
+
+    @staticmethod
+    def get_chunk_key(file: str, var_name: str, chunk_index: ChunkIndex, open_kwargs: Dict[str, Any]) -> str:
+        """Get the key of a chunk of a variable of a dataset opened with the keyword arguments *open_kwargs*."""
+        key_json = json.dumps(dict(file=file, var_name=var_name, index=chunk_index, kwargs=open_kwargs),
+                              sort_keys=True, default=str)
+        return hashlib.sha1(key_json.encode('utf-8')).hexdigest()
+
+    def _read_ahead_chunk(self, key: str, read_chunk: Callable[[], np.ndarray]) -> Optional[np.ndarray]:
+        # noinspection PyBroadException
+        try:
+            chunk = read_chunk()
+            self.store(key, chunk)
+            return chunk
+        except Exception:
+            # The chunk is read again when it is actually needed
+            _LOG.exception('reading chunk "%s" ahead failed' % key)
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _get_entry_file(self, key: str) -> str:
+        return os.path.join(self._cache_dir, key[0:2], key + _CHUNK_FILE_EXT)
+
+    def _scan_entries(self):
+        """Generate (access time, entry file, size) for all cached chunks."""
+        if not os.path.isdir(self._cache_dir):
+            return
+        for group_entry in os.scandir(self._cache_dir):
+            if not group_entry.is_dir():
+                continue
+            for entry in os.scandir(group_entry.path):
+                if not entry.name.endswith(_CHUNK_FILE_EXT):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    # Removed by another process
+                    continue
+                yield stat.st_mtime, entry.path, stat.st_size
+
+
+_DATASET_CHUNK_CACHE = None
+_DATASET_CHUNK_CACHE_LOCK = threading.Lock()
+
+
+def get_dataset_chunk_cache() -> Optional[DatasetChunkCache]:
+    """
+    Get the global chunk cache as configured by the configuration parameters ``use_dataset_chunk_cache``,
+    ``dataset_chunk_cache_path``, ``dataset_chunk_cache_capacity``, and ``dataset_chunk_cache_read_ahead``.
+
+    :return: the chunk cache, or ``None`` if it is not used
+    """
+    global _DATASET_CHUNK_CACHE
+    if not get_config_value('use_dataset_chunk_cache', USE_DATASET_CHUNK_CACHE):
+        return None
+    with _DATASET_CHUNK_CACHE_LOCK:
+        if _DATASET_CHUNK_CACHE is None:
+            cache_dir = os.path.expanduser(get_config_value('dataset_chunk_cache_path', DATASET_CHUNK_CACHE_PATH))
+            capacity = get_config_value('dataset_chunk_cache_capacity', DATASET_CHUNK_CACHE_CAPACITY)
+            read_ahead = get_config_value('dataset_chunk_cache_read_ahead', DATASET_CHUNK_CACHE_READ_AHEAD)
+            _DATASET_CHUNK_CACHE = DatasetChunkCache(cache_dir, capacity, read_ahead=read_ahead)
+        return _DATASET_CHUNK_CACHE
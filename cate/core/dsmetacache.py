@@ -0,0 +1,545 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+A persistent cache for the metadata of the files of multi-file datasets.
+
+For every file opened by :py:func:`cate.core.ds.open_xarray_dataset`, the cache holds one entry with the file's
+dimensions, global attributes, and the dimensions, shape, data type, attributes, and encoding of its variables,
+together with the values of its one-dimensional coordinate variables. Entries are identified by the file's path
+and the arguments used to decode it, and are valid as long as the file's size and modification time do not change.
+Entries of remote datasets, e.g. OPeNDAP URLs, are identified by their URL and are always valid.
+
+Given the entries of all files, :py:func:`open_mfdataset_from_metadata` combines the files into a single
+lazy dataset without opening them. A file is only opened when chunks of its variables are computed.
+
+While :py:class:`DatasetMetadataCache` holds one entry file per file, a :py:class:`DatasetMetadataIndex`
+holds the entries of all files of a data source in a single index file, so that opening the data source takes
+a single read. It is updated incrementally as files are added or removed.
+
+The chunks of remote datasets may be cached too, see :py:mod:`cate.core.dschunkcache`.
+
+Components
+==========
+"""
+
+import hashlib
+import json
+import logging
+import os
+import os.path
+import pickle
+import threading
+import uuid
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import dask.array as da
+import numpy as np
+import xarray as xr
+from dask.base import tokenize
+
+from .dschunkcache import DatasetChunkCache, is_remote_path
+from ..conf import get_config_value
+from ..conf.defaults import DATASET_METADATA_CACHE_PATH, USE_DATASET_METADATA_CACHE
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+_LOG = logging.getLogger('cate')
+
+#: Bump this, if the structure of the cached metadata changes
+_METADATA_VERSION = 1
+
+#: Keyword arguments of ``xarray.open_dataset()`` that can be used with cached metadata
+_SUPPORTED_OPEN_KWARGS = {'decode_cf', 'mask_and_scale', 'decode_times', 'concat_characters',
+                          'decode_coords', 'drop_variables', 'engine'}
+
+#: File metadata as returned by :py:meth:`DatasetMetadataStore.get_metadata_list`
+FileMetadata = Dict[str, Any]
+
+
+class DatasetMetadataStore(metaclass=ABCMeta):
+    """
+    A store for the metadata of the files of multi-file datasets.
+    """
+
+    @classmethod
+    def can_open(cls, **open_kwargs) -> bool:
+        """
+        Test whether datasets opened with the keyword arguments *open_kwargs* can be combined from stored metadata.
+        """
+        return all(name in _SUPPORTED_OPEN_KWARGS for name in open_kwargs.keys())
+
+    @abstractmethod
+    def get_metadata_list(self, files: Sequence[str], **open_kwargs) -> List[FileMetadata]:
+        """
+        Get the metadata of *files* opened with the keyword arguments *open_kwargs*.
+        Metadata not yet stored is read from the files.
+
+        :param files: paths of NetCDF files
+        :param open_kwargs: keyword arguments passed to ``xarray.open_dataset()``
+        :return: the metadata of each of the *files*
+        """
+
+
+class DatasetMetadataCache(DatasetMetadataStore):
+    """
+    A persistent cache for the metadata of the files of multi-file datasets.
+
+    :param cache_dir: the cache directory
+    """
+
+    def __init__(self, cache_dir: str):
+        self._cache_dir = cache_dir
+
+    @property
+    def cache_dir(self) -> str:
+        return self._cache_dir
+
+    def get_metadata_list(self, files: Sequence[str], **open_kwargs) -> List[FileMetadata]:
+        return [self.get_metadata(file, **open_kwargs) for file in files]
+
+    def get_metadata(self, file: str, **open_kwargs) -> FileMetadata:
+        """
+        Get the metadata of *file* opened with the keyword arguments *open_kwargs*.
+        If there is no valid cache entry for *file*, the file is opened and a new entry is written.
+
+        :param file: path of a NetCDF file or URL of a remote dataset
+        :param open_kwargs: keyword arguments passed to ``xarray.open_dataset()``
+        :return: the file's metadata
+        """
+        if is_remote_path(file):
+            size, mtime = None, None
+        else:
+            file = os.path.abspath(file)
+            stat = os.stat(file)
+            size, mtime = stat.st_size, stat.st_mtime
+        entry_file = self._get_entry_file(file, open_kwargs)
+        # noinspection PyBroadException
+        try:
+            with open(entry_file, 'rb') as fp:
+                entry = pickle.load(fp)
+            if entry.get('version') == _METADATA_VERSION \
+                    and entry.get('size') == size \
+                    and entry.get('mtime') == mtime:
+                return entry['metadata']
+        except FileNotFoundError:
+            pass
+        except Exception:
+            _LOG.exception('reading cached metadata of "%s" failed' % file)
+
+        metadata = read_metadata(file, **open_kwargs)
+
+        entry = dict(version=_METADATA_VERSION, path=file, size=size, mtime=mtime, metadata=metadata)
+        temp_file = '%s.%s.incomplete' % (entry_file, uuid.uuid4().hex)
+        try:
+            os.makedirs(os.path.dirname(entry_file), exist_ok=True)
+            with open(temp_file, 'wb') as fp:
+                pickle.dump(entry, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, entry_file)
+        except Exception:
+            _LOG.exception('caching metadata of "%s" failed' % file)
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        return metadata
+
+    def _get_entry_file(self, file: str, open_kwargs: Dict[str, Any]) -> str:
+        key_json = json.dumps(dict(path=file, kwargs=open_kwargs), sort_keys=True, default=str)
+        key = hashlib.sha1(key_json.encode('utf-8')).hexdigest()
+        return os.path.join(self._cache_dir, key[0:2], key + '.pickle')
+
+
+class DatasetMetadataIndex(DatasetMetadataStore):
+    """
+    A persistent index of the metadata of all files of a data source, held in a single index file.
+    The index file is read when the index is first used, and only written by :py:meth:`save`. Files that
+    are not yet indexed when their metadata is requested are indexed in memory only.
+
+    Entries hold the metadata of files opened without keyword arguments, so only ``drop_variables``
+    is supported when getting metadata.
+
+    :param path: path of the index file
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._entries = None
+        self._is_modified = False
+        self._lock = threading.RLock()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def files(self) -> List[str]:
+        """The paths of the indexed files."""
+        with self._lock:
+            return list(self._get_entries().keys())
+
+    @classmethod
+    def can_open(cls, **open_kwargs) -> bool:
+        return all(name == 'drop_variables' for name in open_kwargs.keys())
+
+    def get_metadata_list(self, files: Sequence[str], **open_kwargs) -> List[FileMetadata]:
+        drop_variables = open_kwargs.get('drop_variables')
+        with self._lock:
+            metadata_list = [self._get_metadata(file) for file in files]
+        if drop_variables:
+            metadata_list = [_drop_variables(metadata, drop_variables) for metadata in metadata_list]
+        return metadata_list
+
+    def add(self, file: str) -> None:
+        """
+        Add the metadata of *file* to this index, if it is not yet indexed or has changed.
+
+        :param file: path of a NetCDF file
+        """
+        with self._lock:
+            self._get_metadata(file)
+
+    def remove(self, file: str) -> None:
+        """
+        Remove the metadata of *file* from this index.
+
+        :param file: path of a NetCDF file
+        """
+        with self._lock:
+            if self._get_entries().pop(os.path.abspath(file), None) is not None:
+                self._is_modified = True
+
+    def save(self) -> None:
+        """Write the index file, if this index has been modified."""
+        with self._lock:
+            if not self._is_modified:
+                return
+            temp_file = '%s.%s.incomplete' % (self._path, uuid.uuid4().hex)
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+                with open(temp_file, 'wb') as fp:
+                    pickle.dump(dict(version=_METADATA_VERSION, entries=self._entries), fp,
+                                protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_file, self._path)
+                self._is_modified = False
+            except Exception:
+                _LOG.exception('writing metadata index "%s" failed' % self._path)
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+
+    def _get_entries(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            self._entries = OrderedDict()
+            # noinspection PyBroadException
+            try:
+                with open(self._path, 'rb') as fp:
+                    index = pickle.load(fp)
+                if index.get('version') == _METADATA_VERSION:
+                    self._entries = index['entries']
+            except FileNotFoundError:
+                pass
+            except Exception:
+                _LOG.exception('reading metadata index "%s" failed' % self._path)
+        return self._entries
+
+    def _get_metadata(self, file: str) -> FileMetadata:
+        file = os.path.abspath(file)
+        stat = os.stat(file)
+        entries = self._get_entries()
+        entry = entries.get(file)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return entry['metadata']
+        metadata = read_metadata(file)
+        if entries:
+            # Let files share equal coordinate values, so that they are written to the index file once
+            _share_coord_values(metadata, next(reversed(entries.values()))['metadata'])
+        entries[file] = dict(size=stat.st_size, mtime=stat.st_mtime, metadata=metadata)
+        self._is_modified = True
+        return metadata
+
+
+_DATASET_METADATA_CACHE = None
+_DATASET_METADATA_CACHE_LOCK = threading.Lock()
+
+
+def get_dataset_metadata_cache() -> Optional[DatasetMetadataCache]:
+    """
+    Get the global metadata cache as configured by the configuration parameters ``use_dataset_metadata_cache``
+    and ``dataset_metadata_cache_path``.
+
+    :return: the metadata cache, or ``None`` if it is not used
+    """
+    global _DATASET_METADATA_CACHE
+    if not get_config_value('use_dataset_metadata_cache', USE_DATASET_METADATA_CACHE):
+        return None
+    with _DATASET_METADATA_CACHE_LOCK:
+        if _DATASET_METADATA_CACHE is None:
+            cache_dir = os.path.expanduser(get_config_value('dataset_metadata_cache_path',
+                                                            DATASET_METADATA_CACHE_PATH))
+            _DATASET_METADATA_CACHE = DatasetMetadataCache(cache_dir)
+        return _DATASET_METADATA_CACHE
+
+
+def read_metadata(file: str, **open_kwargs) -> FileMetadata:
+    """
+    Read the metadata of *file* opened with the keyword arguments *open_kwargs*.
+
+    :param file: path of a NetCDF file
+    :param open_kwargs: keyword arguments passed to ``xarray.open_dataset()``
+    :return: the file's metadata
+    """
+    with xr.open_dataset(file, **open_kwargs) as dataset:
+        variables = OrderedDict()
+        for var_name, var in dataset.variables.items():
+            var_metadata = dict(dims=tuple(var.dims),
+                                shape=tuple(var.shape),
+                                dtype=var.dtype,
+                                attrs=OrderedDict(var.attrs),
+                                encoding=dict(var.encoding))
+            if var_name in dataset.coords and var.ndim <= 1:
+                var_metadata['values'] = var.values
+            variables[var_name] = var_metadata
+        return dict(dims=OrderedDict(dataset.sizes),
+                    attrs=OrderedDict(dataset.attrs),
+                    coord_names=[name for name in dataset.variables.keys() if name in dataset.coords],
+                    variables=variables)
+
+
+def open_mfdataset_from_metadata(files: Sequence[str],
+                                 metadata_list: Sequence[FileMetadata],
+                                 concat_dim: str = 'time',
+                                 chunks: Dict[str, int] = None,
+                                 chunk_cache: DatasetChunkCache = None,
+                                 **open_kwargs) -> Optional[xr.Dataset]:
+    """
+    Combine *files* into a single lazy dataset, given their metadata.
+    The result equals that of ``xarray.open_mfdataset(files, concat_dim=concat_dim, chunks=chunks, **open_kwargs)``.
+
+    All data variables are concatenated along *concat_dim*. Coordinate variables are concatenated, if they have
+    the dimension *concat_dim*, otherwise they must be equal in all files. Attributes and encodings are
+    those of the first file.
+
+    :param files: paths of the files
+    :param metadata_list: metadata of each of the *files*
+    :param concat_dim: dimension to concatenate files along
+    :param chunks: mapping from dimension names to dask chunk sizes, dimensions not given are not split
+    :param chunk_cache: an optional cache for the chunks read from the files
+    :param open_kwargs: keyword arguments passed to ``xarray.open_dataset()``, when a file's data is read
+    :return: the dataset, or ``None`` if the files cannot be combined from their metadata alone
+    """
+    if not files or len(files) != len(metadata_list):
+        return None
+    first_metadata = metadata_list[0]
+    coord_names = first_metadata['coord_names']
+    for metadata in metadata_list[1:]:
+        if not _have_same_schema(first_metadata, metadata, concat_dim):
+            return None
+
+    data_var_names = [name for name in first_metadata['variables'].keys() if name not in coord_names]
+    chunks = chunks or dict()
+    file_tokens = [tokenize(file, None if is_remote_path(file) else os.path.getmtime(file), open_kwargs)
+                   for file in files]
+
+    variables = OrderedDict()
+    for var_name, var_metadata in first_metadata['variables'].items():
+        dims = var_metadata['dims']
+        if var_name in coord_names:
+            if 'values' not in var_metadata:
+                # Multi-dimensional coordinate variables are not cached
+                return None
+            if concat_dim in dims:
+                values = np.concatenate([metadata['variables'][var_name]['values'] for metadata in metadata_list])
+            else:
+                values = var_metadata['values']
+                if any(not _array_equal(values, metadata['variables'][var_name]['values'])
+                       for metadata in metadata_list[1:]):
+                    return None
+            variable = xr.Variable(dims, values, attrs=var_metadata['attrs'])
+        else:
+            other_var_names = [name for name in data_var_names if name != var_name]
+            arrays = []
+            previous_file_array = None
+            for file, file_token, metadata in zip(files, file_tokens, metadata_list):
+                array, file_array = _new_file_array(file, file_token, var_name, metadata, other_var_names,
+                                                    concat_dim, chunks, chunk_cache, open_kwargs)
+                if previous_file_array is not None:
+                    previous_file_array.next_array = file_array
+                previous_file_array = file_array
+                if concat_dim not in dims:
+                    concat_dim_size = metadata['dims'].get(concat_dim, 1)
+                    array = da.broadcast_to(array[np.newaxis, ...], (concat_dim_size,) + array.shape)
+                arrays.append(array)
+            if concat_dim not in dims:
+                dims = (concat_dim,) + dims
+            variable = xr.Variable(dims, da.concatenate(arrays, axis=dims.index(concat_dim)),
+                                   attrs=var_metadata['attrs'])
+        variable.encoding = dict(var_metadata['encoding'])
+        variables[var_name] = variable
+
+    dataset = xr.Dataset(OrderedDict((name, variables[name]) for name in data_var_names),
+                         coords=OrderedDict((name, variables[name]) for name in coord_names),
+                         attrs=first_metadata['attrs'])
+    return dataset
+
+
+def _new_file_array(file: str,
+                    file_token: str,
+                    var_name: str,
+                    metadata: FileMetadata,
+                    other_var_names: List[str],
+                    concat_dim: str,
+                    chunks: Dict[str, int],
+                    chunk_cache: Optional[DatasetChunkCache],
+                    open_kwargs: Dict[str, Any]) -> Tuple[da.Array, '_FileVariableArray']:
+    var_metadata = metadata['variables'][var_name]
+    dims = var_metadata['dims']
+    shape = var_metadata['shape']
+    var_chunks = tuple(min(chunks.get(dim, size), size) or 1 for dim, size in zip(dims, shape))
+    # Other data variables are not needed to decode the variable
+    drop_variables = list(open_kwargs.get('drop_variables') or []) + other_var_names
+    read_kwargs = dict(open_kwargs, drop_variables=drop_variables)
+    concat_axis = dims.index(concat_dim) if concat_dim in dims else None
+    file_array = _FileVariableArray(file, var_name, shape, var_metadata['dtype'], read_kwargs,
+                                    chunk_shape=var_chunks, concat_axis=concat_axis, chunk_cache=chunk_cache)
+    name = '%s-%s' % (var_name, tokenize(file_token, var_name, var_chunks))
+    return da.from_array(file_array, chunks=var_chunks, name=name, lock=False), file_array
+
+
+class _FileVariableArray:
+    """
+    An array-like object that opens its file whenever data is read.
+
+    If a chunk cache is given, chunks are read through the cache, and the chunks following a chunk
+    along *concat_axis*, in this file and then in *next_array*, are read ahead.
+    """
+
+    def __init__(self, file: str, var_name: str, shape: tuple, dtype: np.dtype, open_kwargs: Dict[str, Any],
+                 chunk_shape: tuple = None, concat_axis: int = None, chunk_cache: DatasetChunkCache = None):
+        self._file = file
+        self._var_name = var_name
+        self.shape = shape
+        self.dtype = dtype
+        self.ndim = len(shape)
+        self._open_kwargs = open_kwargs
+        self._chunk_shape = chunk_shape or shape
+        self._concat_axis = concat_axis
+        self._chunk_cache = chunk_cache
+        self.next_array = None  # type: Optional[_FileVariableArray]
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple) and len(key) == self.ndim and all(isinstance(k, slice) for k in key):
+            ranges = [k.indices(n) for k, n in zip(key, self.shape)]
+            shape = tuple(len(range(*r)) for r in ranges)
+            if 0 in shape:
+                # Empty selections, e.g. by dask probing the array's type, need no data
+                return np.empty(shape, dtype=self.dtype)
+            if self._chunk_cache is not None and all(step == 1 for _, _, step in ranges):
+                chunk_index = tuple((start, stop) for start, stop, _ in ranges)
+                self._chunk_cache.read_ahead_chunks(self._get_read_ahead_requests(chunk_index))
+                return self._chunk_cache.read(*self._get_chunk_request(chunk_index))
+        return self._read(key)
+
+    def _read(self, key):
+        with xr.open_dataset(self._file, **self._open_kwargs) as dataset:
+            return dataset.variables[self._var_name][key].values
+
+    def _get_chunk_request(self, chunk_index):
+        key = tuple(slice(start, stop) for start, stop in chunk_index)
+        return self._file, self._var_name, chunk_index, self._open_kwargs, lambda: self._read(key)
+
+    def _get_read_ahead_requests(self, chunk_index):
+        requests = []
+        array = self
+        for _ in range(self._chunk_cache.read_ahead):
+            array, chunk_index = array._get_next_chunk(chunk_index)
+            if array is None:
+                break
+            requests.append(array._get_chunk_request(chunk_index))
+        return requests
+
+    def _get_next_chunk(self, chunk_index):
+        """Get the array and index of the chunk following the chunk at *chunk_index* along the time dimension."""
+        axis = self._concat_axis
+        if axis is not None:
+            start = chunk_index[axis][1]
+            array = self
+            if start >= self.shape[axis]:
+                start = 0
+                array = self.next_array
+            if array is None:
+                return None, None
+            stop = min(start + array._chunk_shape[axis], array.shape[axis])
+            next_chunk_index = chunk_index[:axis] + ((start, stop),) + chunk_index[axis + 1:]
+        else:
+            array = self.next_array
+            next_chunk_index = chunk_index
+        if array is None or any(stop > size for (_, stop), size in zip(next_chunk_index, array.shape)):
+            return None, None
+        return array, next_chunk_index
+
+
+def _have_same_schema(metadata_1: FileMetadata, metadata_2: FileMetadata, concat_dim: str) -> bool:
+    if metadata_1['coord_names'] != metadata_2['coord_names']:
+        return False
+    dims_1 = {dim: size for dim, size in metadata_1['dims'].items() if dim != concat_dim}
+    dims_2 = {dim: size for dim, size in metadata_2['dims'].items() if dim != concat_dim}
+    if dims_1 != dims_2:
+        return False
+    variables_1 = metadata_1['variables']
+    variables_2 = metadata_2['variables']
+    if list(variables_1.keys()) != list(variables_2.keys()):
+        return False
+    for var_name, var_metadata_1 in variables_1.items():
+        var_metadata_2 = variables_2[var_name]
+        if var_metadata_1['dims'] != var_metadata_2['dims'] or var_metadata_1['dtype'] != var_metadata_2['dtype']:
+            return False
+    return True
+
+
+def _drop_variables(metadata: FileMetadata, drop_variables: Sequence[str]) -> FileMetadata:
+    variables = OrderedDict((var_name, var_metadata) for var_name, var_metadata in metadata['variables'].items()
+                            if var_name not in drop_variables)
+    used_dims = {dim for var_metadata in variables.values() for dim in var_metadata['dims']}
+    return dict(metadata,
+                dims=OrderedDict((dim, size) for dim, size in metadata['dims'].items() if dim in used_dims),
+                coord_names=[name for name in metadata['coord_names'] if name in variables],
+                variables=variables)
+
+
+def _share_coord_values(metadata: FileMetadata, other_metadata: FileMetadata) -> None:
+    other_variables = other_metadata['variables']
+    for var_name, var_metadata in metadata['variables'].items():
+        values = var_metadata.get('values')
+        other_values = other_variables[var_name].get('values') if var_name in other_variables else None
+        if values is not None and other_values is not None \
+                and values.dtype == other_values.dtype and _array_equal(values, other_values):
+            var_metadata['values'] = other_values
+
+
+def _array_equal(values_1: np.ndarray, values_2: np.ndarray) -> bool:
+    if values_1.shape != values_2.shape:
+        return False
+    if values_1.dtype.kind in 'fc':
+        return bool(np.all((values_1 == values_2) | (np.isnan(values_1) & np.isnan(values_2))))
+    return bool(np.all(values_1 == values_2))
@@ -0,0 +1,297 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+A persistent, content-addressed cache for the results of workflow steps.
+
+The results of steps whose operation declares the ``disk_cache`` header property, e.g. by ``@op(disk_cache=True)``,
+are written to a cache directory. They are identified by a key which is a hash of the operation's name and version,
+the step's constant input values, and the keys of the steps that provide the other input values. Identical step
+invocations, also across sessions and workspaces, are therefore served from the cache directory.
+
+Currently, only results of type ``xarray.Dataset`` and ``xarray.DataArray`` are cached. They are stored as chunked
+NetCDF files. If the size of all cached results exceeds the cache's capacity, the least recently used results
+are removed.
+
+Components
+==========
+"""
+
+import hashlib
+import json
+import logging
+import os
+import os.path
+import shutil
+import threading
+import uuid
+from typing import Any, Dict, Optional
+
+import xarray as xr
+
+from .workflow import OpStep
+from ..conf import get_config_value
+from ..conf.defaults import OP_RESULT_CACHE_CAPACITY, OP_RESULT_CACHE_PATH, USE_OP_RESULT_CACHE
+from ..util.undefined import UNDEFINED
+from ..version import __version__
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+_LOG = logging.getLogger('cate')
+
+_RESULT_FILE_NAME = 'result.nc'
+_INFO_FILE_NAME = 'result.json'
+_DATA_ARRAY_VAR_NAME = '__xarray_dataarray_variable__'
+
+
+class OpResultCache:
+    """
+    A persistent, content-addressed cache for the results of workflow steps.
+
+    :param cache_dir: the cache directory
+    :param capacity: the capacity of the cache in bytes
+    :param threshold: if *capacity* is exceeded, least recently used results are removed until the
+           size of all cached results falls below *threshold* times *capacity*
+    """
+
+    def __init__(self, cache_dir: str, capacity: int, threshold: float = 0.75):
+        self._cache_dir = cache_dir
+        self._capacity = capacity
+        self._threshold = threshold
+        self._lock = threading.RLock()
+
+    @property
+    def cache_dir(self) -> str:
+        return self._cache_dir
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def size(self) -> int:
+        """The size of all cached results in bytes."""
+        return sum(entry_size for _, _, entry_size in self._scan_entries())
+
+    def get_step_key(self, step) -> Optional[str]:
+        """
+        Get the key for the result of the given *step*.
+
+        :param step: a workflow step
+        :return: the key, or ``None`` if the step's result cannot be cached
+        """
+        if not isinstance(step, OpStep) or not step.op_meta_info.can_disk_cache:
+            return None
+        if step.op_meta_info.has_named_outputs:
+            return None
+        return _get_step_key(step, dict())
+
+    def load(self, key: str) -> Any:
+        """
+        Load the result for the given *key*.
+
+        :param key: the result key
+        :return: the result, or ``UNDEFINED`` if there is no result for *key*
+        """
+        entry_dir = self._get_entry_dir(key)
+        info_file = os.path.join(entry_dir, _INFO_FILE_NAME)
+        if not os.path.isfile(info_file):
+            return UNDEFINED
+        # noinspection PyBroadException
+        try:
+            with open(info_file) as fp:
+                info = json.load(fp)
+            value = xr.open_dataset(os.path.join(entry_dir, _RESULT_FILE_NAME), chunks=info.get('chunks') or None)
+            if info.get('type') == 'DataArray':
+                value = value[_DATA_ARRAY_VAR_NAME].rename(info.get('name'))
+            # Mark the result as recently used
+            os.utime(info_file)
+            return value
+        except Exception:
+            _LOG.exception('loading cached result "%s" failed' % key)
+            return UNDEFINED
+
+    def store(self, key: str, value: Any) -> Any:
+        """
+        Store the *value* for the given *key*.
+
+        Writing the *value* computes it, if it is a lazy, dask-backed value. To avoid a computation next time
+        the value is used, the stored value is opened and returned.
+
+        :param key: the result key
+        :param value: the result
+        :return: the stored value, or *value* itself if it cannot be stored
+        """
+        if isinstance(value, xr.DataArray):
+            info = dict(type='DataArray', name=value.name)
+            dataset = value.to_dataset(name=_DATA_ARRAY_VAR_NAME)
+        elif isinstance(value, xr.Dataset):
+            info = dict(type='Dataset')
+            dataset = value
+        else:
+            return value
+
+        chunks = dict()
+        encoding = dict()
+        for var_name, var in dataset.variables.items():
+            if var.chunks and var.ndim > 0:
+                chunk_sizes = tuple(max(sizes) for sizes in var.chunks)
+                for dim, chunk_size in zip(var.dims, chunk_sizes):
+                    chunks.setdefault(dim, chunk_size)
+            else:
+                chunk_sizes = None
+            if var_name in dataset.data_vars:
+                # Reset encodings from the original sources, write dask chunks as NetCDF chunks
+                encoding[var_name] = dict(chunksizes=chunk_sizes) if chunk_sizes else dict()
+        info['chunks'] = chunks or None
+
+        entry_dir = self._get_entry_dir(key)
+        temp_dir = '%s.%s.incomplete' % (entry_dir, uuid.uuid4().hex)
+        try:
+            os.makedirs(temp_dir)
+            dataset.to_netcdf(os.path.join(temp_dir, _RESULT_FILE_NAME), encoding=encoding)
+            with open(os.path.join(temp_dir, _INFO_FILE_NAME), 'w') as fp:
+                json.dump(info, fp)
+            with self._lock:
+                if os.path.exists(entry_dir):
+                    # Another process has been faster
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+                else:
+                    os.replace(temp_dir, entry_dir)
+        except Exception:
+            _LOG.exception('caching result "%s" failed' % key)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            return value
+
+        self.trim()
+
+        stored_value = self.load(key)
+        return value if stored_value is UNDEFINED else stored_value
+
+    def trim(self) -> None:
+        """Remove least recently used results, if the size of all cached results exceeds the capacity."""
+        with self._lock:
+            entries = list(self._scan_entries())
+            size = sum(entry_size for _, _, entry_size in entries)
+            if size <= self._capacity:
+                return
+            max_size = self._threshold * self._capacity
+            for _, entry_dir, entry_size in sorted(entries):
+                if size <= max_size:
+                    break
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                size -= entry_size
+
+    def clear(self) -> None:
+        """Remove all cached results."""
+        with self._lock:
+            for _, entry_dir, _ in self._scan_entries():
+                shutil.rmtree(entry_dir, ignore_errors=True)
+
+    def _get_entry_dir(self, key: str) -> str:
+        return os.path.join(self._cache_dir, key[0:2], key)
+
+    def _scan_entries(self):
+        """Generate (access time, entry directory, size) for all cached results."""
+        if not os.path.isdir(self._cache_dir):
+            return
+        for group_entry in os.scandir(self._cache_dir):
+            if not group_entry.is_dir():
+                continue
+            for entry in os.scandir(group_entry.path):
+                if not entry.is_dir() or entry.name.endswith('.incomplete'):
+                    continue
+                try:
+                    access_time = os.stat(os.path.join(entry.path, _INFO_FILE_NAME)).st_mtime
+                    size = sum(file_entry.stat().st_size for file_entry in os.scandir(entry.path))
+                except OSError:
+                    # Being written or removed by another process
+                    continue
+                yield access_time, entry.path, size
+
+
+_OP_RESULT_CACHE = None
+_OP_RESULT_CACHE_LOCK = threading.Lock()
+
+
+def get_op_result_cache() -> Optional[OpResultCache]:
+    """
+    Get the global result cache as configured by the configuration parameters ``use_op_result_cache``,
+    ``op_result_cache_path``, and ``op_result_cache_capacity``.
+
+    :return: the result cache, or ``None`` if it is not used
+    """
+    global _OP_RESULT_CACHE
+    if not get_config_value('use_op_result_cache', USE_OP_RESULT_CACHE):
+        return None
+    with _OP_RESULT_CACHE_LOCK:
+        if _OP_RESULT_CACHE is None:
+            cache_dir = os.path.expanduser(get_config_value('op_result_cache_path', OP_RESULT_CACHE_PATH))
+            capacity = get_config_value('op_result_cache_capacity', OP_RESULT_CACHE_CAPACITY)
+            _OP_RESULT_CACHE = OpResultCache(cache_dir, capacity)
+        return _OP_RESULT_CACHE
+
+
+def _get_step_key(step, step_keys: Dict[Any, Optional[str]]) -> Optional[str]:
+    if step in step_keys:
+        return step_keys[step]
+    # Guard against cyclic dependencies
+    step_keys[step] = None
+
+    step_key = None
+    if isinstance(step, OpStep) and step.op_meta_info.can_cache:
+        input_keys = _get_input_keys(step, step_keys)
+        if input_keys is not None:
+            op_meta_info = step.op_meta_info
+            key_json = json.dumps(dict(cate=__version__,
+                                       op=op_meta_info.qualified_name,
+                                       version=op_meta_info.header.get('version'),
+                                       inputs=input_keys),
+                                  sort_keys=True)
+            step_key = hashlib.sha256(key_json.encode('utf-8')).hexdigest()
+
+    step_keys[step] = step_key
+    return step_key
+
+
+def _get_input_keys(step, step_keys: Dict[Any, Optional[str]]) -> Optional[Dict[str, Any]]:
+    input_keys = dict()
+    for port in step.inputs[:]:
+        if step.op_meta_info.inputs[port.name].get('context'):
+            # Input values depend on the execution context
+            return None
+        source = port.source
+        if source is not None and source.node is not step.parent_node:
+            source_key = _get_step_key(source.node, step_keys)
+            if source_key is None:
+                return None
+            input_keys[port.name] = dict(source=source_key, port=source.name)
+        elif port.has_value:
+            value = port.value
+            try:
+                json.dumps(value)
+            except (TypeError, ValueError):
+                return None
+            input_keys[port.name] = dict(value=value)
+    return input_keys
@@ -22,19 +22,26 @@
 __author__ = "Janis Gailis (S[&]T Norway)" \
              "Norman Fomferra (Brockmann Consult GmbH)"
 
+import functools
 from datetime import datetime
 from typing import Optional, Sequence, Union, Tuple, Any
 
 import numpy as np
 import xarray as xr
 from jdcal import jd2gcal
-from matplotlib import path
-from shapely.geometry import box, LineString, Polygon
+import shapely.wkb
+from shapely.geometry import box, LineString, MultiPolygon, Polygon
 
 from .types import PolygonLike, ValidationError
 from ..util.misc import to_list
 from ..util.monitor import Monitor
 
+#: The maximum number of polygon masks kept by ``get_polygon_mask()``
+_POLYGON_MASK_CACHE_SIZE = 16
+
+#: The maximum number of (row, edge) pairs tested at once when rasterizing a polygon
+_RASTERIZE_CHUNK_SIZE = 1024 * 1024
+
 
 def normalize_impl(ds: xr.Dataset) -> xr.Dataset:
     """
@@ -640,18 +647,12 @@ def subset_spatial_impl(ds: xr.Dataset,
 
     # Create the mask array. The result of this is a lon/lat DataArray where
     # all pixels falling in the region or on its boundary are denoted with True
-    # and all the rest with False. Works on polygon exterior
-
-    polypath = path.Path(np.column_stack([polygon.exterior.coords.xy[0],
-                                          polygon.exterior.coords.xy[1]]))
+    # and all the rest with False. Holes of the polygon are respected.
 
     # Handle also a single pixel and 1D edge cases
     if len(retset.lat) == 1 or len(retset.lon) == 1:
         # Create a mask directly on pixel centers
-        lonm, latm = np.meshgrid(retset.lon.values, retset.lat.values)
-        grid_points = [(lon, lat) for lon, lat in zip(lonm.ravel(), latm.ravel())]
-        mask = polypath.contains_points(grid_points)
-        mask = mask.reshape(lonm.shape)
+        mask = get_polygon_mask(polygon, retset.lon.values, retset.lat.values)
         mask = xr.DataArray(mask,
                             coords={'lon': retset.lon.values, 'lat': retset.lat.values},
                             dims=['lat', 'lon'])
@@ -674,19 +675,13 @@ def subset_spatial_impl(ds: xr.Dataset,
     lat_grid = np.linspace(lat_min, lat_max, len(retset.lat.values) + 1)
     lon_grid = np.linspace(lon_min, lon_max, len(retset.lon.values) + 1)
 
-    lonm, latm = np.meshgrid(lon_grid, lat_grid)
-
-    # Mark all grid points falling within the polygon as True
-
     monitor.progress(1)
-    grid_points = [(lon, lat) for lon, lat in zip(lonm.ravel(), latm.ravel())]
 
-    monitor.progress(1)
-    mask = polypath.contains_points(grid_points)
+    # Mark all grid points falling within the polygon as True
+    mask = get_polygon_mask(polygon, lon_grid, lat_grid)
 
-    monitor.progress(1)
+    monitor.progress(2)
 
-    mask = mask.reshape(lonm.shape)
     # Vectorized 'rolling window' numpy magic to go from pixel vertices to pixel centers
     mask = mask[1:, 1:] + mask[1:, :-1] + mask[:-1, 1:] + mask[:-1, :-1]
 
@@ -702,6 +697,90 @@ def subset_spatial_impl(ds: xr.Dataset,
     return retset
 
 
+def get_polygon_mask(polygon: Union[Polygon, MultiPolygon], x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Get the mask of the points of a grid falling within a polygon.
+
+    Masks are cached by the polygon's WKB and the grid coordinates, so that repeatedly
+    subsetting datasets of the same grid by the same region rasterizes the polygon once.
+
+    :param polygon: A polygon or multi-polygon, possibly with holes
+    :param x: The x-coordinates (longitudes) of the grid
+    :param y: The y-coordinates (latitudes) of the grid
+    :return: A read-only boolean array of shape (len(y), len(x))
+    """
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    return _get_polygon_mask_cached(polygon.wkb, x.tobytes(), y.tobytes())
+
+
+@functools.lru_cache(maxsize=_POLYGON_MASK_CACHE_SIZE)
+def _get_polygon_mask_cached(polygon_wkb: bytes, x_bytes: bytes, y_bytes: bytes) -> np.ndarray:
+    mask = rasterize_polygon(shapely.wkb.loads(polygon_wkb),
+                             np.frombuffer(x_bytes, dtype=np.float64),
+                             np.frombuffer(y_bytes, dtype=np.float64))
+    # Masks are shared by all callers
+    mask.setflags(write=False)
+    return mask
+
+
+def rasterize_polygon(polygon: Union[Polygon, MultiPolygon], x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Rasterize a polygon on a grid using the even-odd rule: a grid point falls within
+    the polygon, if a ray from the point crosses the polygon's rings an odd number of times.
+
+    All rings of the polygon, exteriors and interiors, are tested for crossings at once,
+    for as many grid rows as fit into chunks of a bounded size.
+
+    :param polygon: A polygon or multi-polygon, possibly with holes
+    :param x: The x-coordinates (longitudes) of the grid
+    :param y: The y-coordinates (latitudes) of the grid
+    :return: A boolean array of shape (len(y), len(x))
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    width = x.size
+
+    x0, y0, x1, y1 = _get_polygon_edges(polygon)
+    # Horizontal edges are never crossed
+    sloped = y0 != y1
+    x0, y0, x1, y1 = x0[sloped], y0[sloped], x1[sloped], y1[sloped]
+    slope = (x1 - x0) / (y1 - y0)
+
+    x_order = np.argsort(x, kind='stable')
+    x_sorted = x[x_order]
+
+    mask = np.zeros((y.size, width), dtype=np.bool_)
+    num_rows = max(1, _RASTERIZE_CHUNK_SIZE // max(1, x0.size))
+    for row_start in range(0, y.size, num_rows):
+        rows_y = y[row_start: row_start + num_rows]
+        # Find the edges crossed by every row
+        rows, edges = np.nonzero((y0 <= rows_y[:, np.newaxis]) != (y1 <= rows_y[:, np.newaxis]))
+        x_cross = x0[edges] + (rows_y[rows] - y0[edges]) * slope[edges]
+        # Every crossing toggles the points of its row to the right of it
+        cols = np.searchsorted(x_sorted, x_cross, side='right')
+        toggles = np.bincount(rows * (width + 1) + cols, minlength=rows_y.size * (width + 1))
+        toggles = toggles.reshape((rows_y.size, width + 1))[:, :width]
+        mask[row_start: row_start + rows_y.size, x_order] = np.cumsum(toggles, axis=1) % 2 == 1
+
+    return mask
+
+
+def _get_polygon_edges(polygon: Union[Polygon, MultiPolygon]) -> Tuple[np.ndarray, ...]:
+    polygons = polygon.geoms if isinstance(polygon, MultiPolygon) else [polygon]
+    rings = [ring for p in polygons for ring in [p.exterior, *p.interiors]]
+    if not rings:
+        return tuple(np.empty(0, dtype=np.float64) for _ in range(4))
+    x0, y0, x1, y1 = [], [], [], []
+    for ring in rings:
+        coords = np.asarray(ring.coords, dtype=np.float64)[:, :2]
+        x0.append(coords[:-1, 0])
+        y0.append(coords[:-1, 1])
+        x1.append(coords[1:, 0])
+        y1.append(coords[1:, 1])
+    return np.concatenate(x0), np.concatenate(y0), np.concatenate(x1), np.concatenate(y1)
+
+
 def _crosses_antimeridian(region: Polygon) -> bool:
     """
     Determine if the given region crosses the Antimeridian line, by converting
@@ -113,11 +113,14 @@ Components
 ==========
 """
 
+import threading
 from abc import ABCMeta, abstractmethod
-from collections import OrderedDict, namedtuple
+from collections import OrderedDict, namedtuple, deque
+from collections.abc import ItemsView, ValuesView
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from io import IOBase
 from itertools import chain
-from typing import Optional, Union, List, Dict
+from typing import Optional, Union, List, Dict, Iterable, Callable, Any
 
 from .op import OP_REGISTRY, Operation, Monitor, new_expression_op, new_subprocess_op
 from ..util.namespace import Namespace
@@ -390,6 +393,12 @@ class Node(metaclass=ABCMeta):
             if port.source is not None and port.source.node is orphaned_node:
                 port.value = None
 
+    def _on_sources_changed(self) -> None:
+        """Called if the sources of this node's ports or of any contained node's ports have changed."""
+        parent_node = self.parent_node
+        if parent_node is not None:
+            parent_node._on_sources_changed()
+
     def find_port(self, name) -> Optional['NodePort']:
         """
         Find port with given name. Output ports are searched first, then input ports.
@@ -471,6 +480,8 @@ class Workflow(Node):
         # The list of steps
         self._steps = []
         self._steps_dict = {}
+        # The step dependency graph, created on demand and dropped if steps or sources change
+        self._step_graph = None
 
     @property
     def steps(self) -> List['Step']:
@@ -480,31 +491,28 @@ class Workflow(Node):
     @property
     def sorted_steps(self):
         """The workflow steps in the order they they can be executed."""
-        return Workflow.sort_steps(self.steps)
+        return list(self._get_step_graph().sorted_nodes)
 
     @classmethod
     def sort_steps(cls, steps: List['Step']):
         """Sorts the list of workflow steps in the order they they can be executed."""
-        # Note: Try find a replacement for this brute-force sorting algorithm.
-        #       It is ok for a small number of steps only.
-        #       order(sort_steps, N, Ni) = order(sorted, N) + N^2 * Ni^2
-        #       where N is the number of steps and Ni is the number of inputs per step
-        n = len(steps)
-        if n < 2:
+        if len(steps) < 2:
             return steps
-        dist_and_step_list = []
-        for i1 in range(n):
-            max_dist = 0
-            step = steps[i1]
-            for i2 in range(n):
-                if i1 != i2:
-                    dist = step.max_distance_to(steps[i2])
-                    if dist > 0:
-                        max_dist = max(max_dist, dist)
-            dist_and_step_list.append((max_dist, step))
-        sorted_d_and_step_list = sorted(dist_and_step_list, key=lambda dist_and_step: dist_and_step[0])
-        sorted_steps = [dist_and_step[1] for dist_and_step in sorted_d_and_step_list]
-        return sorted_steps
+        # Include all nodes the given steps depend on, so that indirect dependencies are respected too
+        nodes = []
+        visited = set()
+        stack = list(steps)
+        while stack:
+            node = stack.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+            nodes.append(node)
+            for port in node.inputs[:]:
+                if port.source is not None:
+                    stack.append(port.source.node)
+        levels = _StepGraph(nodes).levels
+        return sorted(steps, key=lambda step: levels[step])
 
     def find_steps_to_compute(self, step_id: str) -> List['Step']:
         """
@@ -517,9 +525,35 @@ class Workflow(Node):
         step = self._steps_dict.get(step_id)
         if not step:
             raise ValueError('step_id argument does not identify a step: %s' % step_id)
-        steps = []
-        step.collect_predecessors(steps, [self])
-        return steps
+        step_graph = self._get_step_graph()
+        return step_graph.sort(step_graph.collect(step, step_graph.sources))
+
+    def find_dependent_steps(self, step_id: str) -> List['Step']:
+        """
+        Compute the list of steps that directly or indirectly use the outputs of the step with the given *step_id*.
+        The order of the returned list is its execution order. The step given by *step_id* is not included.
+
+        :param step_id: The step whose dependent steps are requested.
+        :return: a list of steps, which may be empty
+        """
+        step = self._steps_dict.get(step_id)
+        if not step:
+            raise ValueError('step_id argument does not identify a step: %s' % step_id)
+        step_graph = self._get_step_graph()
+        dependent_steps = step_graph.collect(step, step_graph.targets)
+        dependent_steps.discard(step)
+        return step_graph.sort(dependent_steps)
+
+    def _get_step_graph(self) -> '_StepGraph':
+        step_graph = self._step_graph
+        if step_graph is None:
+            step_graph = _StepGraph(self._steps)
+            self._step_graph = step_graph
+        return step_graph
+
+    def _on_sources_changed(self) -> None:
+        self._step_graph = None
+        super(Workflow, self)._on_sources_changed()
 
     def find_node(self, step_id: str) -> Optional['Step']:
         # is it the ID of one of the direct children?
@@ -551,6 +585,7 @@ class Workflow(Node):
         self._steps_dict[new_step.id] = new_step
 
         new_step._parent_node = self
+        self._on_sources_changed()
 
         if old_step and old_step is not new_step:
             # If the step already existed before, we must resolve source references again
@@ -571,6 +606,7 @@ class Workflow(Node):
         assert old_step is not None
         self._steps.remove(old_step)
         old_step._parent_node = None
+        self._on_sources_changed()
         # After removing old_step, remove ports whose source is still old_step.
         self.remove_orphaned_sources(old_step)
         return old_step
@@ -612,14 +648,25 @@ class Workflow(Node):
                      steps: List['Step'],
                      context: Dict = None,
                      monitor_label: str = None,
-                     monitor=Monitor.NONE) -> None:
+                     monitor=Monitor.NONE,
+                     max_workers: int = 1) -> None:
         """
         Invoke just the given steps.
 
-        :param steps: Selected steps of this workflow.
+        If *max_workers* is greater than one, steps that do not depend on each other are invoked concurrently
+        by a pool of at most *max_workers* threads. A step is invoked as soon as all the steps among *steps*
+        that are sources of its inputs have been invoked. Sources that are not in *steps* are assumed to
+        provide their values already.
+
+        If a step fails, no further steps are started, running steps are awaited, and the error of the failed
+        step is raised. Likewise, no further steps are started once *monitor* is cancelled and a
+        :py:class:`cate.util.monitor.Cancellation` is raised after running steps have finished.
+
+        :param steps: Selected steps of this workflow, usually sorted as returned by :py:meth:`sort_steps`.
         :param context: An optional execution context
         :param monitor_label: An optional label for the progress monitor.
         :param monitor: The progress monitor.
+        :param max_workers: The maximum number of steps invoked concurrently.
         """
         context = _new_context(context, workflow=self)
         step_count = len(steps)
@@ -628,8 +675,57 @@ class Workflow(Node):
         elif step_count > 1:
             monitor_label = monitor_label or "Executing {step_count} workflow step(s)"
             with monitor.starting(monitor_label.format(step_count=step_count), step_count):
-                for step in steps:
-                    step.invoke(context=context, monitor=monitor.child(work=1))
+                if max_workers is not None and max_workers > 1:
+                    self._invoke_steps_concurrently(steps, context, monitor, max_workers)
+                else:
+                    for step in steps:
+                        monitor.check_for_cancellation()
+                        step.invoke(context=context, monitor=monitor.child(work=1))
+
+    @classmethod
+    def _invoke_steps_concurrently(cls,
+                                   steps: List['Step'],
+                                   context: Dict,
+                                   monitor: Monitor,
+                                   max_workers: int) -> None:
+        # Steps are invoked by pool threads, so progress reported by them is serialized
+        step_monitor = monitor if monitor is Monitor.NONE else _SynchronizedMonitor(monitor)
+
+        step_indexes = {step: index for index, step in enumerate(steps)}
+        step_graph = _StepGraph(steps)
+        targets = step_graph.targets
+        # Maps a step to the number of its not yet invoked source steps
+        num_sources = {step: len(source_steps) for step, source_steps in step_graph.sources.items()}
+
+        ready_steps = [step for step in steps if num_sources[step] == 0]
+        running = dict()
+        error = None
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cate-workflow') as executor:
+            while ready_steps or running:
+                if error is None and not monitor.is_cancelled():
+                    for step in ready_steps:
+                        future = executor.submit(step.invoke, context=context, monitor=step_monitor.child(work=1))
+                        running[future] = step
+                ready_steps = []
+                if not running:
+                    break
+                done_futures, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done_futures:
+                    step = running.pop(future)
+                    step_error = future.exception()
+                    if step_error is not None:
+                        if error is None:
+                            error = step_error
+                        continue
+                    for target_step in targets[step]:
+                        num_sources[target_step] -= 1
+                        if num_sources[target_step] == 0:
+                            ready_steps.append(target_step)
+                # Start steps that became ready at the same time in the given order
+                ready_steps.sort(key=step_indexes.get)
+        if error is not None:
+            raise error
+        monitor.check_for_cancellation()
 
     @classmethod
     def load(cls, file_path_or_fp: Union[str, IOBase], registry=OP_REGISTRY) -> 'Workflow':
@@ -977,7 +1073,14 @@ class OpStepBase(Step, metaclass=ABCMeta):
         if value_cache is not None and self.id in value_cache and value_cache[self.id] is not UNDEFINED:
             return_value = value_cache[self.id]
         else:
-            return_value = self._op(monitor=monitor, **input_values)
+            # The persistent result cache, see cate.core.opcache.OpResultCache
+            op_result_cache = context.get('op_result_cache')
+            op_result_key = op_result_cache.get_step_key(self) if op_result_cache is not None else None
+            return_value = op_result_cache.load(op_result_key) if op_result_key else UNDEFINED
+            if return_value is UNDEFINED:
+                return_value = self._op(monitor=monitor, **input_values)
+                if op_result_key:
+                    return_value = op_result_cache.store(op_result_key, return_value)
             if value_cache is not None:
                 value_cache[self.id] = return_value
 
@@ -1299,9 +1402,12 @@ class NodePort:
 
     @value.setter
     def value(self, new_value):
+        had_source = self._source is not None
         self._value = new_value
         self._source = None
         self._source_ref = None
+        if had_source:
+            self._node._on_sources_changed()
 
     @property
     def source_ref(self) -> SourceRef:
@@ -1322,6 +1428,7 @@ class NodePort:
         self._source = new_source
         self._source_ref = SourceRef(new_source.node_id, new_source.name) if new_source else None
         self._value = UNDEFINED
+        self._node._on_sources_changed()
 
     def update_source_node_id(self, node: Node, old_node_id: str) -> None:
         """
@@ -1527,12 +1634,16 @@ class ValueCache(dict):
     ``ValueCache`` is a closable dictionary that maintains unique IDs for it's keys.
     If a ``ValueCache`` is closed, all closable values are also closed.
     A value is closeable if it has a ``close`` attribute whose value is a callable.
+
+    Values may be set lazily using :py:meth:`set_lazy`. Lazy values are loaded on first access.
     """
 
     def __init__(self):
         super(ValueCache, self).__init__()
         self._id_infos = dict()
         self._last_id = 0
+        # Steps of a workflow may be invoked concurrently and set their values from different threads
+        self._lock = threading.RLock()
 
     def __del__(self):
         """Override the ``dict`` method to close any old values."""
@@ -1546,24 +1657,72 @@ class ValueCache(dict):
         Override the ``dict`` method to close any old value and generate a new ID,
         if *key* didn't exist before.
         """
-        old_value = self.get(key)
-        id_info = self._id_infos.get(key)
-        self._set(key, value)
-        if id_info:
-            self._id_infos[key] = id_info[0], id_info[1] + 1
-        else:
-            self._id_infos[key] = self._gen_id(), 0
+        with self._lock:
+            old_value = super(ValueCache, self).get(key)
+            id_info = self._id_infos.get(key)
+            self._set(key, value)
+            if id_info:
+                self._id_infos[key] = id_info[0], id_info[1] + 1
+            else:
+                self._id_infos[key] = self._gen_id(), 0
         if old_value is not value:
             self._close_value(old_value)
 
+    def __getitem__(self, key):
+        """Override the ``dict`` method to load lazy values."""
+        value = super(ValueCache, self).__getitem__(key)
+        if isinstance(value, _LazyValue):
+            value = self._load_lazy_value(key, value)
+        return value
+
+    def get(self, key, default=None):
+        """Override the ``dict`` method to load lazy values."""
+        return self[key] if key in self else default
+
+    def values(self):
+        """Override the ``dict`` method to load lazy values."""
+        return ValuesView(self)
+
+    def items(self):
+        """Override the ``dict`` method to load lazy values."""
+        return ItemsView(self)
+
+    def set_lazy(self, key, loader: Callable[[], Any]) -> None:
+        """
+        Set a value for *key* which is loaded by calling *loader* on first access.
+        Loading the value doesn't change the ID and update count of *key*.
+
+        :param key: The key.
+        :param loader: A function without arguments that returns the value.
+        """
+        self[key] = _LazyValue(loader)
+
+    def is_lazy(self, key) -> bool:
+        """Return whether the value for *key* is a lazy value that has not yet been loaded."""
+        return isinstance(super(ValueCache, self).get(key), _LazyValue)
+
+    def _load_lazy_value(self, key, lazy_value: '_LazyValue'):
+        # Concurrent accesses wait for the same value to be loaded once
+        with lazy_value.lock:
+            current_value = super(ValueCache, self).get(key, UNDEFINED)
+            if current_value is not lazy_value:
+                # Loaded or replaced in the meantime
+                return self[key] if current_value is not UNDEFINED else UNDEFINED
+            value = lazy_value.loader()
+            with self._lock:
+                if super(ValueCache, self).get(key, UNDEFINED) is lazy_value:
+                    self._set(key, value)
+            return value
+
     def _del(self, key):
         super(ValueCache, self).__delitem__(key)
 
     def __delitem__(self, key):
         """Override the ``dict`` method to close the value and remove its ID."""
-        old_value = self.get(key)
-        self._del(key)
-        del self._id_infos[key]
+        with self._lock:
+            old_value = super(ValueCache, self).get(key)
+            self._del(key)
+            del self._id_infos[key]
         if old_value is not None:
             self._close_value(old_value)
 
@@ -1592,9 +1751,10 @@ class ValueCache(dict):
     def child(self, key: str) -> 'ValueCache':
         """Return the child ``ValueCache`` for given *key*."""
         child_key = key + '._child'
-        if child_key not in self:
-            self._set(child_key, ValueCache())
-        return self[child_key]
+        with self._lock:
+            if child_key not in self:
+                self._set(child_key, ValueCache())
+            return self[child_key]
 
     def rename_key(self, key: str, new_key: str) -> None:
         """
@@ -1606,7 +1766,7 @@ class ValueCache(dict):
         if key == new_key:
             return
 
-        value = self[key]
+        value = super(ValueCache, self).__getitem__(key)
         self._del(key)
         self._set(new_key, value)
 
@@ -1622,12 +1782,14 @@ class ValueCache(dict):
 
     def pop(self, key, default=None):
         """Override the ``dict`` method to close the value and remove its ID."""
-        existed_before = key in self
-        value = super(ValueCache, self).pop(key, default=default)
+        with self._lock:
+            existed_before = key in self
+            value = super(ValueCache, self).pop(key, default)
+            if existed_before:
+                del self._id_infos[key]
         if existed_before:
             self._close_value(value)
-            del self._id_infos[key]
-        return value
+        return default if isinstance(value, _LazyValue) else value
 
     def clear(self) -> None:
         """Override the ``dict`` method to closes values and remove all IDs."""
@@ -1640,13 +1802,13 @@ class ValueCache(dict):
         self.clear()
 
     def _close_values(self) -> None:
-        values = list(self.values())
+        values = list(super(ValueCache, self).values())
         for value in values:
             self._close_value(value)
 
     @classmethod
     def _close_value(cls, value):
-        if value is not None and hasattr(value, 'close'):
+        if value is not None and not isinstance(value, _LazyValue) and hasattr(value, 'close'):
             # noinspection PyBroadException
             try:
                 value.close()
@@ -1659,6 +1821,112 @@ class ValueCache(dict):
         return new_id
 
 
+class _LazyValue:
+    """A value of a :py:class:`ValueCache` that is loaded on first access."""
+
+    def __init__(self, loader: Callable[[], Any]):
+        self.loader = loader
+        self.lock = threading.Lock()
+
+
+class _StepGraph:
+    """
+    The dependency graph of the given *nodes*.
+
+    Edges are given by the sources of the nodes' inputs. Sources of nodes not contained in *nodes* are ignored.
+    Creation takes O(N + E) time, where N is the number of nodes and E is the number of edges.
+
+    :param nodes: the nodes, usually the steps of a workflow
+    """
+
+    def __init__(self, nodes: Iterable[Node]):
+        nodes = list(nodes)
+        #: Maps a node to the nodes that provide its inputs
+        self.sources = OrderedDict((node, []) for node in nodes)
+        #: Maps a node to the nodes that use its outputs
+        self.targets = OrderedDict((node, []) for node in nodes)
+        for node in nodes:
+            node_sources = self.sources[node]
+            for port in node._inputs[:]:
+                source = port.source
+                if source is None:
+                    continue
+                source_node = source.node
+                if source_node is not node and source_node in self.sources and source_node not in node_sources:
+                    node_sources.append(source_node)
+                    self.targets[source_node].append(node)
+
+        # Kahn's algorithm, also computing each node's level, i.e. its maximum distance to any source node
+        levels = dict.fromkeys(nodes, 0)
+        num_sources = {node: len(node_sources) for node, node_sources in self.sources.items()}
+        queue = deque(node for node in nodes if num_sources[node] == 0)
+        num_sorted = 0
+        while queue:
+            node = queue.popleft()
+            num_sorted += 1
+            level = levels[node] + 1
+            for target_node in self.targets[node]:
+                if levels[target_node] < level:
+                    levels[target_node] = level
+                num_sources[target_node] -= 1
+                if num_sources[target_node] == 0:
+                    queue.append(target_node)
+        # Nodes in cycles, if any, keep the level computed so far
+
+        #: Maps a node to its level
+        self.levels = levels
+        #: The nodes sorted by level, nodes of same level keep their given order
+        self.sorted_nodes = sorted(nodes, key=lambda n: levels[n])
+        self._positions = {node: index for index, node in enumerate(self.sorted_nodes)}
+
+    @classmethod
+    def collect(cls, node: Node, adjacency: Dict[Node, List[Node]]) -> set:
+        """Collect *node* and all nodes transitively reachable from it in the given *adjacency* map."""
+        collected = {node}
+        stack = [node]
+        while stack:
+            for other_node in adjacency[stack.pop()]:
+                if other_node not in collected:
+                    collected.add(other_node)
+                    stack.append(other_node)
+        return collected
+
+    def sort(self, nodes: Iterable[Node]) -> List[Node]:
+        """Sort the given *nodes* in the order they can be executed."""
+        return sorted(nodes, key=self._positions.get)
+
+
+# noinspection PyAbstractClass
+class _SynchronizedMonitor(Monitor):
+    """
+    Serializes the calls into a *monitor* that is used from multiple threads.
+
+    :param monitor: the monitor to be synchronized
+    """
+
+    def __init__(self, monitor: Monitor):
+        self._monitor = monitor
+        self._lock = threading.Lock()
+
+    def start(self, label: str, total_work: float = None):
+        with self._lock:
+            self._monitor.start(label, total_work=total_work)
+
+    def progress(self, work: float = None, msg: str = None):
+        with self._lock:
+            self._monitor.progress(work=work, msg=msg)
+
+    def done(self):
+        with self._lock:
+            self._monitor.done()
+
+    def cancel(self):
+        self._monitor.cancel()
+
+    def is_cancelled(self) -> bool:
+        return self._monitor.is_cancelled()
+
+
 def _new_context(context: Optional[Dict], **kwargs) -> Dict:
     new_context = dict() if context is None else dict(context)
     new_context.update(kwargs)
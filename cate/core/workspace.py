@@ -27,13 +27,16 @@ import logging
 import os
 import shutil
 from collections import OrderedDict
-from threading import RLock
+from concurrent.futures import Future
+from contextlib import contextmanager
+from threading import RLock, Thread, current_thread
 from typing import List, Any, Dict, Optional
 
 import fiona
 import pandas as pd
 import xarray as xr
 
+from .opcache import get_op_result_cache
 from .workflow import Workflow, OpStep, NodePort, ValueCache
 from ..conf import conf
 from ..conf.defaults import WORKSPACE_DATA_DIR_NAME, WORKSPACE_WORKFLOW_FILE_NAME, SCRATCH_WORKSPACES_PATH
@@ -42,7 +45,7 @@ from ..core.op import OP_REGISTRY
 from ..core.types import GeoDataFrame, ValidationError
 from ..util.im import get_chunk_size
 from ..util.misc import object_to_qualified_name, to_json, new_indexed_name
-from ..util.monitor import Monitor
+from ..util.monitor import Cancellation, Monitor
 from ..util.namespace import Namespace
 from ..util.opmetainf import OpMetaInfo
 from ..util.safe import safe_eval
@@ -52,6 +55,10 @@ __author__ = "Norman Fomferra (Brockmann Consult GmbH)"
 
 _LOG = logging.getLogger('cate')
 
+_ZARR_FILE_EXT = '.zarr'
+_NETCDF_FILE_EXT = '.nc'
+_RESOURCE_FILE_EXTS = (_ZARR_FILE_EXT, _NETCDF_FILE_EXT)
+
 #: An JSON-serializable operation argument is a one-element dictionary taking two possible forms:
 #: 1. dict(value=Any):  a value which may be any constant Python object which must JSON-serializable
 #: 2. dict(source=str): a reference to a step port name
@@ -102,6 +109,9 @@ class Workspace:
         self._is_modified = is_modified
         self._is_closed = False
         self._resource_cache = ValueCache()
+        # Maps names of resources written to or read from resource files to (resource ID, update count)
+        self._saved_resource_versions = dict()
+        self._background_execution = None
         self._user_data = dict()
         self._lock = RLock()
 
@@ -174,33 +184,46 @@ class Workspace:
         workflow = Workflow.load(workflow_file)
         workspace = Workspace(base_dir, workflow)
 
-        # Read resources for persistent steps
+        # Register lazy readers for the resources of persistent steps
         persistent_steps = [step for step in workflow.steps if step.persistent]
         if persistent_steps:
             with monitor.starting('Reading resources', len(persistent_steps)):
                 for step in persistent_steps:
                     workspace._read_resource_from_file(step.id)
-                monitor.progress(1)
+                    monitor.progress(1)
 
         return workspace
 
     def close(self):
         if self._is_closed:
             return
+        # The background execution must not access the resources disposed below
+        self._stop_background_execution()
         with self._lock:
             self._resource_cache.close()
+            self._close_user_data()
             # Remove all resource files that are no longer required
             if os.path.isdir(self.workspace_dir):
                 persistent_ids = {step.id for step in self.workflow.steps if step.persistent}
                 for filename in os.listdir(self.workspace_dir):
                     res_file = os.path.join(self.workspace_dir, filename)
-                    if os.path.isfile(res_file) and filename.endswith('.nc'):
-                        res_name = filename[0: -3]
-                        if res_name not in persistent_ids:
-                            try:
-                                os.remove(res_file)
-                            except OSError:
-                                _LOG.exception('closing workspace failed')
+                    res_name, ext = os.path.splitext(filename)
+                    if ext in _RESOURCE_FILE_EXTS and res_name not in persistent_ids:
+                        try:
+                            _remove_resource_file(res_file)
+                        except OSError:
+                            _LOG.exception('closing workspace failed')
+
+    def _close_user_data(self):
+        """Close all values in user_data that have a ``close`` attribute whose value is a callable."""
+        for value in list(self._user_data.values()):
+            if hasattr(value, 'close') and callable(value.close):
+                # noinspection PyBroadException
+                try:
+                    value.close()
+                except Exception:
+                    _LOG.exception('closing workspace user data failed')
+        self._user_data.clear()
 
     def save(self, monitor: Monitor = Monitor.NONE):
         self._assert_open()
@@ -213,8 +236,9 @@ class Workspace:
                 os.mkdir(workspace_dir)
             self.workflow.store(self.workflow_file)
 
-            # Write resources for all persistent steps
-            persistent_steps = [step for step in self.workflow.steps if step.persistent]
+            # Write resources for all persistent steps, skip resources that didn't change since they have been saved
+            persistent_steps = [step for step in self.workflow.steps
+                                if step.persistent and not self._is_resource_file_up_to_date(step.id)]
             if persistent_steps:
                 with monitor.starting('Writing resources', len(persistent_steps)):
                     for step in persistent_steps:
@@ -223,27 +247,72 @@ class Workspace:
 
             self._is_modified = False
 
+    def _get_resource_version(self, res_name):
+        return self._resource_cache.get_id(res_name), self._resource_cache.get_update_count(res_name)
+
+    def _is_resource_file_up_to_date(self, res_name) -> bool:
+        saved_version = self._saved_resource_versions.get(res_name)
+        return (saved_version is not None
+                and saved_version == self._get_resource_version(res_name)
+                and self._find_resource_file(res_name) is not None)
+
+    def _find_resource_file(self, res_name) -> Optional[str]:
+        for ext in _RESOURCE_FILE_EXTS:
+            res_file = os.path.join(self.workspace_dir, res_name + ext)
+            if os.path.exists(res_file):
+                return res_file
+        return None
+
     def _write_resource_to_file(self, res_name):
         res_value = self._resource_cache.get(res_name)
-        if res_value is not None:
-            resource_file = os.path.join(self.workspace_dir, res_name + '.nc')
-            # noinspection PyBroadException
-            try:
+        if res_value is None:
+            return
+        if isinstance(res_value, xr.DataArray):
+            res_value = res_value.to_dataset(name=res_value.name or res_name)
+        resource_format = conf.get_workspace_resource_format()
+        # noinspection PyBroadException
+        try:
+            if resource_format == 'zarr' and isinstance(res_value, xr.Dataset):
+                resource_file = os.path.join(self.workspace_dir, res_name + _ZARR_FILE_EXT)
+                _write_zarr_resource(res_value, resource_file)
+            else:
+                resource_file = os.path.join(self.workspace_dir, res_name + _NETCDF_FILE_EXT)
                 res_value.to_netcdf(resource_file)
-            except AttributeError:
-                pass
-            except Exception:
-                _LOG.exception('writing resource "%s" to file failed' % res_name)
+        except AttributeError:
+            return
+        except Exception:
+            _LOG.exception('writing resource "%s" to file failed' % res_name)
+            return
+        # Remove files of the same resource in other formats
+        for ext in _RESOURCE_FILE_EXTS:
+            other_resource_file = os.path.join(self.workspace_dir, res_name + ext)
+            if other_resource_file != resource_file and os.path.exists(other_resource_file):
+                _remove_resource_file(other_resource_file)
+        self._saved_resource_versions[res_name] = self._get_resource_version(res_name)
 
     def _read_resource_from_file(self, res_name):
-        res_file = os.path.join(self.workspace_dir, res_name + '.nc')
-        if os.path.isfile(res_file):
+        """
+        Register a loader for the resource *res_name* that lazily reopens the resource's file
+        on first access, so that opening a workspace doesn't have to wait for its data.
+        """
+        res_file = self._find_resource_file(res_name)
+        if res_file is None:
+            return
+
+        def load_resource():
             # noinspection PyBroadException
             try:
-                res_value = xr.open_dataset(res_file)
-                self._resource_cache[res_name] = res_value
+                if res_file.endswith(_ZARR_FILE_EXT):
+                    return xr.open_zarr(res_file)
+                else:
+                    return xr.open_dataset(res_file)
             except Exception:
                 _LOG.exception('reading resource "%s" from file failed' % res_name)
+                # Let the resource's step compute it again
+                return UNDEFINED
+
+        self._resource_cache.set_lazy(res_name, load_resource)
+        self._saved_resource_versions[res_name] = self._get_resource_version(res_name)
 
     def set_resource_persistence(self, res_name: str, persistent: bool):
         with self._lock:
@@ -276,7 +345,9 @@ class Workspace:
 
     def _resources_to_json_list(self):
         resource_descriptors = []
-        resource_cache = dict(self._resource_cache)
+        # Resources not yet loaded are described once they have been loaded
+        resource_cache = {res_name: resource for res_name, resource in dict.items(self._resource_cache)
+                          if not self._resource_cache.is_lazy(res_name)}
         for res_step in self.workflow.steps:
             res_name = res_step.id
             if res_name in resource_cache:
@@ -410,20 +481,17 @@ class Workspace:
         return variable_info
 
     def delete(self):
+        self.close()
         with self._lock:
-            self.close()
             shutil.rmtree(self.workspace_dir)
 
     def delete_resource(self, res_name: str):
-        with self._lock:
+        with self._background_execution_paused(), self._lock:
             res_step = self.workflow.find_node(res_name)
             if res_step is None:
                 raise ValidationError('Resource "%s" not found' % res_name)
 
-            dependent_steps = []
-            for step in self.workflow.steps:
-                if step is not res_step and step.requires(res_step):
-                    dependent_steps.append(step.id)
+            dependent_steps = [step.id for step in self.workflow.find_dependent_steps(res_step.id)]
 
             if dependent_steps:
                 raise ValidationError('Cannot delete resource "%s" because the following resource(s) '
@@ -435,7 +503,7 @@ class Workspace:
 
     def rename_resource(self, res_name: str, new_res_name: str) -> None:
         Workspace._validate_res_name(new_res_name)
-        with self._lock:
+        with self._background_execution_paused(), self._lock:
             res_step = self.workflow.find_node(res_name)
             if res_step is None:
                 raise ValidationError('Resource "%s" not found' % res_name)
@@ -477,7 +545,7 @@ class Workspace:
         if not op:
             raise ValidationError('Unknown operation "%s"' % op_name)
 
-        with self._lock:
+        with self._background_execution_paused(), self._lock:
             if not res_name:
                 default_res_pattern = conf.get_default_res_pattern()
                 res_pattern = op.op_meta_info.header.get('res_pattern', default_res_pattern)
@@ -542,10 +610,7 @@ class Workspace:
             ids_of_invalidated_steps = {res_name}
             if old_step is not None:
                 # Collect all IDs of steps that depend on old_step, if any
-                for step in workflow.steps:
-                    requires = step.requires(old_step)
-                    if requires:
-                        ids_of_invalidated_steps.add(step.id)
+                ids_of_invalidated_steps.update(step.id for step in workflow.find_dependent_steps(old_step.id))
 
             workflow = self._workflow
             # noinspection PyUnusedLocal
@@ -602,13 +667,86 @@ class Workspace:
 
         # Allow executing self.workflow.invoke_steps() out of the locked context so we can run tasks in parallel
         if steps and len(steps):
-            self.workflow.invoke_steps(steps, context=self._new_context(), monitor=monitor)
+            self.workflow.invoke_steps(steps,
+                                       context=self._new_context(),
+                                       monitor=monitor,
+                                       max_workers=conf.get_workspace_workflow_workers())
             return steps[-1].get_output_value()
         else:
             return None
 
+    def execute_workflow_in_background(self, monitor: Monitor = Monitor.NONE) -> Future:
+        """
+        Execute the workspace's workflow in a background thread so that the workspace can be used,
+        while resources not yet computed are computed. Resources that are accessed earlier,
+        are computed on demand.
+
+        Changing resources pauses the background execution: it is cancelled once its running steps
+        have finished, and resumed without *monitor* after the change. Closing the workspace cancels it.
+
+        :param monitor: A progress monitor for the background execution.
+        :return: A future whose result is the value of the last step.
+        """
+        self._assert_open()
+        self._stop_background_execution()
+
+        future = Future()
+        # Cancelled by the workspace, without cancelling the caller's monitor
+        background_monitor = _CancellableMonitor(monitor)
+
+        def execute():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(self.execute_workflow(monitor=background_monitor))
+            except BaseException as error:
+                if not isinstance(error, Cancellation) and not self._is_closed:
+                    _LOG.exception('executing workflow of workspace "%s" failed' % self._base_dir)
+                future.set_exception(error)
+
+        thread = Thread(target=execute, name='cate-workspace-workflow', daemon=True)
+        with self._lock:
+            self._background_execution = future, thread, background_monitor
+        thread.start()
+        return future
+
+    @property
+    def background_execution(self) -> Optional[Future]:
+        """The future of the last background execution of the workflow, if any."""
+        background_execution = self._background_execution
+        return background_execution[0] if background_execution is not None else None
+
+    def _stop_background_execution(self) -> bool:
+        """
+        Cancel the background execution of the workflow, if any, and wait until its running steps have finished.
+
+        :return: whether the background execution has been cancelled before it was complete
+        """
+        with self._lock:
+            background_execution = self._background_execution
+        if background_execution is None:
+            return False
+        future, thread, background_monitor = background_execution
+        if thread is current_thread():
+            # Called by a step of the background execution itself
+            return False
+        background_monitor.cancel()
+        if not future.cancel():
+            thread.join()
+        return future.cancelled() or isinstance(future.exception(), Cancellation)
+
+    @contextmanager
+    def _background_execution_paused(self):
+        """A context manager that stops the background execution of the workflow and resumes it on exit."""
+        resume = self._stop_background_execution()
+        try:
+            yield
+        finally:
+            if resume and not self._is_closed:
+                self.execute_workflow_in_background()
+
     def _new_context(self):
-        return dict(value_cache=self._resource_cache, workspace=self)
+        return dict(value_cache=self._resource_cache, workspace=self, op_result_cache=get_op_result_cache())
 
     def _assert_open(self):
         if self._is_closed:
@@ -624,3 +762,69 @@ class Workspace:
                 "Resource name '%s' is not valid. "
                 "The name must only contain the uppercase and lowercase letters A through Z, the underscore _ and, "
                 "except for the first character, the digits 0 through 9." % res_name)
+
+
+def _write_zarr_resource(dataset: xr.Dataset, resource_file: str) -> None:
+    """
+    Write *dataset* into the Zarr directory store *resource_file*.
+    Dask-backed variables are written chunk by chunk in parallel.
+    The store is first written to a temporary directory which then replaces any existing store.
+    """
+    dataset = dataset.copy()
+    chunks = dict()
+    for var in dataset.variables.values():
+        # Encodings from other formats, e.g. NetCDF, are not valid here
+        var.encoding = dict()
+        if var.chunks:
+            for dim, dim_chunks in zip(var.dims, var.chunks):
+                # Zarr requires regular chunks, except for the last one
+                if len(dim_chunks) > 1 and (len(set(dim_chunks[:-1])) > 1 or dim_chunks[-1] > dim_chunks[0]):
+                    chunks[dim] = max(max(dim_chunks), chunks.get(dim, 0))
+    if chunks:
+        dataset = dataset.chunk(chunks)
+
+    temp_file = resource_file + '.incomplete'
+    if os.path.exists(temp_file):
+        shutil.rmtree(temp_file)
+    dataset.to_zarr(temp_file, mode='w')
+    if os.path.exists(resource_file):
+        old_file = resource_file + '.old'
+        os.replace(resource_file, old_file)
+        os.replace(temp_file, resource_file)
+        shutil.rmtree(old_file, ignore_errors=True)
+    else:
+        os.replace(temp_file, resource_file)
+
+
+def _remove_resource_file(resource_file: str) -> None:
+    if os.path.isdir(resource_file):
+        shutil.rmtree(resource_file)
+    else:
+        os.remove(resource_file)
+
+
+class _CancellableMonitor(Monitor):
+    """
+    Forwards progress to *monitor*, but can be cancelled without cancelling *monitor*.
+
+    :param monitor: the monitor to forward to
+    """
+
+    def __init__(self, monitor: Monitor):
+        self._monitor = monitor
+        self._cancelled = False
+
+    def start(self, label: str, total_work: float = None):
+        self._monitor.start(label, total_work=total_work)
+
+    def progress(self, work: float = None, msg: str = None):
+        self._monitor.progress(work=work, msg=msg)
+
+    def done(self):
+        self._monitor.done()
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled or self._monitor.is_cancelled()
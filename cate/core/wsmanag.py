@@ -194,11 +194,18 @@ class FSWorkspaceManager(WorkspaceManager):
             assert not workspace.is_closed
             # noinspection PyTypeChecker
             return workspace
-        with monitor.starting("Opening workspace", 100):
-            workspace = Workspace.open(base_dir, monitor=monitor.child(50))
-            assert base_dir not in self._open_workspaces
-            workspace.execute_workflow(monitor=monitor.child(50))
+        monitor.start("Opening workspace", 100)
+        try:
+            workspace = Workspace.open(base_dir, monitor=monitor.child(10))
+        except BaseException:
+            monitor.done()
+            raise
+        assert base_dir not in self._open_workspaces
         self._open_workspaces[base_dir] = workspace
+        # Resources are computed in the background or on demand, when they are accessed first.
+        # The background execution reports the remaining progress and finishes the monitor.
+        future = workspace.execute_workflow_in_background(monitor=monitor.child(90))
+        future.add_done_callback(lambda _: monitor.done())
         return workspace
 
     def close_workspace(self, base_dir: str) -> None:
@@ -283,7 +290,7 @@ class FSWorkspaceManager(WorkspaceManager):
             os.remove(workflow_file)
         old_workspace = self._open_workspaces.get(base_dir)
         if old_workspace:
-            old_workspace.resource_cache.close()
+            old_workspace.close()
         # Create new workflow but keep old header info
         workflow = Workspace.new_workflow(header=old_workflow.op_meta_info.header if old_workflow else None)
         workspace = Workspace(base_dir, workflow)
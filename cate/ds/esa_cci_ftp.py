@@ -39,18 +39,26 @@ Components
 ==========
 """
 
+import calendar
 import ftplib
 import json
 import os
 import os.path
 import pkgutil
+import threading
+import time
+import urllib.parse
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from enum import Enum
 from io import StringIO, IOBase
-from typing import Sequence, Union, List, Tuple, Mapping, Any
+from typing import Sequence, Union, List, Tuple, Mapping, Any, Optional
 
+from cate.conf import get_config_value
 from cate.conf.conf import get_data_stores_path
+from cate.conf.defaults import DOWNLOAD_WORKERS
 from cate.core.cdm import Schema
 from cate.core.ds import DataStore, DataSource, open_xarray_dataset, DATA_STORE_REGISTRY
 from cate.core.types import PolygonLike, TimeRangeLike, VarNamesLike
@@ -216,64 +224,112 @@ class FileSetDataSource(DataSource):
         resolved_path = resolved_path.replace('{DD}', '%02d' % the_date.day)
         return self._base_dir + '/' + resolved_path
 
-    def _sync_files(self, ftp, ftp_base_dir, expected_remote_files, num_of_expected_remote_files,
-                    monitor: Monitor) -> int:
-        sync_files_number = 0
-        checked_files_number = 0
-
+    def sync(self,
+             time_range: TimeRangeLike.TYPE = None,
+             num_connections: int = None,
+             monitor: Monitor = Monitor.NONE) -> Tuple[int, int]:
+        """
+        Mirror the files of this data source from the data store's remote FTP server into the data store's
+        root directory. Files are downloaded concurrently using a pool of FTP connections. Local files whose
+        size and modification time equal those of the remote files are skipped, incomplete downloads are resumed.
+
+        :param time_range: Optional time range limiting the files to be mirrored.
+        :param num_connections: The maximum number of FTP connections. If not given, the value of the
+               configuration parameter ``download_workers`` is used.
+        :param monitor: A progress monitor.
+        :return: A tuple (number of files downloaded, number of files expected)
+        """
+        remote_url = urllib.parse.urlparse(self.data_store.remote_url)
+        if remote_url.scheme != 'ftp' or not remote_url.hostname:
+            raise ValueError('data store "%s" has no remote FTP URL' % self.data_store.id)
+        time_range = TimeRangeLike.convert(time_range) if time_range else (None, None)
+        expected_remote_files = self._get_expected_remote_files(time_range)
+        num_of_expected_remote_files = sum(len(file_names) for file_names in expected_remote_files.values())
+        if num_connections is None:
+            num_connections = get_config_value('download_workers', DOWNLOAD_WORKERS)
+        ftp_pool = _FtpConnectionPool(remote_url.hostname,
+                                      port=remote_url.port or 0,
+                                      user=remote_url.username or 'anonymous',
+                                      passwd=remote_url.password or '',
+                                      max_connections=num_connections)
+        try:
+            total_work = len(expected_remote_files) + num_of_expected_remote_files
+            with monitor.starting('Sync ' + self.id, total_work=total_work):
+                sync_files_number = self._sync_files(ftp_pool, remote_url.path.rstrip('/'), expected_remote_files,
+                                                     num_of_expected_remote_files, monitor)
+        finally:
+            ftp_pool.close()
+        return sync_files_number, num_of_expected_remote_files
+
+    def _sync_files(self, ftp_pool: '_FtpConnectionPool', ftp_base_dir, expected_remote_files,
+                    num_of_expected_remote_files, monitor: Monitor) -> int:
         files_to_download = OrderedDict()
         file_set_size = 0
-        for expected_dir_path, expected_filename_dict in expected_remote_files.items():
-            if monitor.is_cancelled():
-                raise Cancellation()
-            ftp_dir = ftp_base_dir + '/' + expected_dir_path
-            try:
-                ftp.cwd(ftp_dir)
-            except ftplib.Error:
-                # Note: If we can't CWD to ftp_dir, this usually means,
-                # expected_dir_path may refer to a time range that is not covered remotely.
+        with ftp_pool.connection() as ftp:
+            for expected_dir_path, expected_filename_dict in expected_remote_files.items():
+                if monitor.is_cancelled():
+                    raise Cancellation()
+                ftp_dir = ftp_base_dir + '/' + expected_dir_path
+                try:
+                    ftp.cwd(ftp_dir)
+                except ftplib.Error:
+                    # Note: If we can't CWD to ftp_dir, this usually means,
+                    # expected_dir_path may refer to a time range that is not covered remotely.
+                    monitor.progress(work=1)
+                    continue
+
+                try:
+                    remote_dir_content = ftp.mlsd(facts=['type', 'size', 'modify'])
+                except ftplib.Error:
+                    # Note: If we can't MLSD the CWD ftp_dir, we have a problem.
+                    monitor.progress(work=1)
+                    continue
+
+                for existing_filename, facts in remote_dir_content:
+                    if monitor.is_cancelled():
+                        raise Cancellation()
+                    if facts.get('type', None) == 'file' and existing_filename in expected_filename_dict:
+                        # update expected_filename_dict with facts of existing_filename
+                        expected_filename_dict[existing_filename] = facts
+                        file_size = int(facts.get('size', '-1'))
+                        if file_size > 0:
+                            file_set_size += file_size
+                        existing_file_info = dict(size=file_size, path=expected_dir_path,
+                                                  modify=facts.get('modify', None))
+                        files_to_download[existing_filename] = existing_file_info
                 monitor.progress(work=1)
-                continue
 
-            try:
-                remote_dir_content = ftp.mlsd(facts=['type', 'size', 'modify'])
-            except ftplib.Error:
-                # Note: If we can't MLSD the CWD ftp_dir, we have a problem.
-                monitor.progress(work=1)
-                continue
+        if not files_to_download:
+            return 0
 
-            for existing_filename, facts in remote_dir_content:
-                if monitor.is_cancelled():
-                    raise Cancellation()
-                if facts.get('type', None) == 'file' and existing_filename in expected_filename_dict:
-                    # update expected_filename_dict with facts of existing_filename
-                    expected_filename_dict[existing_filename] = facts
-                    file_size = int(facts.get('size', '-1'))
-                    if file_size > 0:
-                        file_set_size += file_size
-                    # TODO (forman, 20160619): put also 'modify' in file_info, to update outdated local files
-                    existing_file_info = dict(size=file_size, path=expected_dir_path)
-                    files_to_download[existing_filename] = existing_file_info
-
-        last_cwd = None
-        if files_to_download:
-            dl_stat = _DownloadStatistics(file_set_size)
-            for existing_filename, existing_file_info in files_to_download.items():
-                checked_files_number += 1
-                child_monitor = monitor.child(work=1.)
-                if monitor.is_cancelled():
-                    raise Cancellation()
-                if last_cwd is not existing_file_info['path']:
-                    ftp.cwd(ftp_base_dir + '/' + existing_file_info['path'])
-                    last_cwd = existing_file_info['path']
+        dl_stat = _DownloadStatistics(file_set_size)
+        # Downloads report progress from multiple threads
+        locked_monitor = _LockedMonitor(monitor)
+
+        def download(file_number: int, filename: str, file_info: dict) -> DownloadStatus:
+            child_monitor = locked_monitor.child(work=1.)
+            if locked_monitor.is_cancelled():
+                raise Cancellation()
+            with ftp_pool.connection() as ftp:
+                ftp.cwd(ftp_base_dir + '/' + file_info['path'])
                 downloader = FtpDownloader(ftp,
-                                           existing_filename, existing_file_info, self._file_set_data_store.root_dir,
-                                           (checked_files_number, num_of_expected_remote_files), child_monitor,
+                                           filename, file_info, self._file_set_data_store.root_dir,
+                                           (file_number, num_of_expected_remote_files), child_monitor,
                                            dl_stat)
-                result = downloader.start()
-                if DownloadStatus.SUCCESS is result:
-                    sync_files_number += 1
-        return sync_files_number
+                return downloader.start()
+
+        with ThreadPoolExecutor(max_workers=ftp_pool.max_connections) as executor:
+            futures = [executor.submit(download, file_number, filename, file_info)
+                       for file_number, (filename, file_info) in enumerate(files_to_download.items(), start=1)]
+            try:
+                results = [future.result() for future in futures]
+            except BaseException:
+                # Stop pending downloads, running ones stop with their next block
+                locked_monitor.cancel()
+                for future in futures:
+                    future.cancel()
+                raise
+        return sum(1 for result in results if result is DownloadStatus.SUCCESS)
 
     def _get_expected_remote_files(self, time_range: TimeRange = (None, None)) -> Mapping[str, Mapping[str, Any]]:
         expected_remote_files = OrderedDict()
@@ -341,7 +397,113 @@ class _DownloadStatistics:
                (self.as_mb(self.bytes_done), self.as_mb(self.bytes_total), mb_per_sec)
 
 
+class _LockedMonitor(Monitor):
+    """A monitor that serializes the calls of multiple threads to a wrapped monitor."""
+
+    def __init__(self, monitor: Monitor):
+        self._monitor = monitor
+        self._lock = threading.Lock()
+        self._cancelled = False
+
+    def start(self, label: str, total_work: float = None):
+        with self._lock:
+            self._monitor.start(label, total_work=total_work)
+
+    def progress(self, work: float = None, msg: str = None):
+        with self._lock:
+            self._monitor.progress(work=work, msg=msg)
+
+    def done(self):
+        with self._lock:
+            self._monitor.done()
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self) -> bool:
+        if self._cancelled:
+            return True
+        with self._lock:
+            return self._monitor.is_cancelled()
+
+
+class _FtpConnectionPool:
+    """
+    A pool of up to *max_connections* logged-in connections to the FTP server at *host*.
+    Connections are opened on demand and reused. A connection is closed, if an error occurs while it is used.
+    """
+
+    def __init__(self,
+                 host: str,
+                 port: int = 0,
+                 user: str = 'anonymous',
+                 passwd: str = '',
+                 max_connections: int = 4,
+                 timeout: float = 60.):
+        self._host = host
+        self._port = port
+        self._user = user
+        self._passwd = passwd
+        self._max_connections = max(max_connections, 1)
+        self._timeout = timeout
+        self._semaphore = threading.BoundedSemaphore(self._max_connections)
+        self._lock = threading.Lock()
+        self._idle_connections = []
+
+    @property
+    def max_connections(self) -> int:
+        return self._max_connections
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, blocks while all connections are in use."""
+        with self._semaphore:
+            with self._lock:
+                ftp = self._idle_connections.pop() if self._idle_connections else None
+            if ftp is None:
+                ftp = ftplib.FTP(timeout=self._timeout)
+                ftp.connect(self._host, self._port)
+                ftp.login(self._user, self._passwd)
+            try:
+                yield ftp
+            except BaseException:
+                _close_ftp(ftp)
+                raise
+            with self._lock:
+                self._idle_connections.append(ftp)
+
+    def close(self):
+        with self._lock:
+            idle_connections = self._idle_connections
+            self._idle_connections = []
+        for ftp in idle_connections:
+            _close_ftp(ftp)
+
+
+def _close_ftp(ftp: ftplib.FTP):
+    try:
+        ftp.quit()
+    except (OSError, EOFError, ftplib.Error):
+        ftp.close()
+
+
+def _parse_modify_fact(modify: str = None) -> Optional[float]:
+    """Parse the "modify" fact of a MLSD entry, a UTC time of the form YYYYMMDDHHMMSS[.sss], into a timestamp."""
+    if not modify:
+        return None
+    try:
+        modify_time = datetime.strptime(modify[:14], '%Y%m%d%H%M%S')
+    except ValueError:
+        return None
+    return calendar.timegm(modify_time.timetuple())
+
+
 class FtpDownloader:
+    #: Block sizes are adapted to the transfer rate, so that a block is received about every BLOCK_INTERVAL seconds
+    MIN_BLOCK_SIZE = 64 * 1024
+    MAX_BLOCK_SIZE = 4 * 1024 * 1024
+    BLOCK_INTERVAL = 0.25
+
     def __init__(self,
                  ftp: ftplib.FTP,
                  filename: str,
@@ -350,7 +512,7 @@ class FtpDownloader:
                  file_index: Tuple[int, int],
                  monitor: Monitor,
                  dl_stat: _DownloadStatistics = None,
-                 block_size: int = 10 * 1024):
+                 block_size: int = MIN_BLOCK_SIZE):
         self._ftp = ftp
         self._filename = filename
         self._file_index = file_index
@@ -359,6 +521,7 @@ class FtpDownloader:
         self._block_size = block_size
         self._file_size = file_info.get('size', 0)
         self._path = file_info.get('path')
+        self._modify_time = _parse_modify_fact(file_info.get('modify', None))
         self._bytes_written = 0
         self._fp = None
         self._message = None
@@ -376,8 +539,7 @@ class FtpDownloader:
         local_file = os.path.join(local_dir, self._filename)
         if os.path.exists(local_file):
             local_size = os.path.getsize(local_file)
-            # TODO (forman, 20160619): use 'modify' from file_info, to update outdated local files
-            if local_size > 0 and local_size == self._file_size:
+            if local_size > 0 and local_size == self._file_size and self._is_up_to_date(local_file):
                 self._monitor.progress(work=self._file_size, msg='local file is up-to-date')
                 return DownloadStatus.SKIPPED
             else:
@@ -387,29 +549,62 @@ class FtpDownloader:
         filename_incomplete = self._filename + '.incomplete'
         local_file_incomplete = os.path.join(local_dir, filename_incomplete)
         if os.path.exists(local_file_incomplete):
-            # TODO (forman, 20160619): reuse what has already been downloaded, then set variable 'rest' accordingly.
-            # Brute force approach here: delete what has already been downloaded
-            os.remove(local_file_incomplete)
+            # An incomplete file carries the modification time of the remote file it has been downloaded from
+            incomplete_size = os.path.getsize(local_file_incomplete)
+            if 0 < incomplete_size < self._file_size and self._is_up_to_date(local_file_incomplete):
+                rest = incomplete_size
+            else:
+                os.remove(local_file_incomplete)
         error_msg = None
-        with open(local_file_incomplete, 'wb') as fp:
+        with open(local_file_incomplete, 'ab' if rest else 'wb') as fp:
             self._fp = fp
+            if rest:
+                self.on_new_block(b'', num_bytes=rest)
             try:
-                self._ftp.retrbinary('RETR ' + self._filename, self.on_new_block, blocksize=self._block_size, rest=rest)
-            except KeyboardInterrupt:
-                error_msg = 'download cancelled'
+                self._retrieve(rest)
             except ftplib.Error as ftp_err:
                 error_msg = 'download error: ' + str(ftp_err)
-        # sys.stdout.write('\n')
+            finally:
+                fp.close()
+                # Keep what has been downloaded so far, so that the download can be resumed
+                self._set_modify_time(local_file_incomplete)
         if error_msg is None:
-            os.rename(local_file_incomplete, local_file)
+            os.replace(local_file_incomplete, local_file)
         else:
             self._monitor.progress(msg=error_msg)
-            os.remove(local_file_incomplete)
         return DownloadStatus.SUCCESS if error_msg is None else DownloadStatus.FAILURE
 
-    def on_new_block(self, bytes_block):
+    def _retrieve(self, rest: Optional[int]):
+        # Same as ftplib.FTP.retrbinary(), but adapts the block size to the transfer rate
+        block_size = min(max(self._block_size, self.MIN_BLOCK_SIZE), self.MAX_BLOCK_SIZE)
+        self._ftp.voidcmd('TYPE I')
+        with self._ftp.transfercmd('RETR ' + self._filename, rest) as conn:
+            while True:
+                t0 = time.perf_counter()
+                bytes_block = conn.recv(block_size)
+                if not bytes_block:
+                    break
+                elapsed = time.perf_counter() - t0
+                self.on_new_block(bytes_block)
+                if len(bytes_block) == block_size and elapsed < self.BLOCK_INTERVAL / 2:
+                    block_size = min(2 * block_size, self.MAX_BLOCK_SIZE)
+                elif elapsed > 2 * self.BLOCK_INTERVAL:
+                    block_size = max(block_size // 2, self.MIN_BLOCK_SIZE)
+        self._ftp.voidresp()
+
+    def _is_up_to_date(self, local_file: str) -> bool:
+        # Without remote modification time, only file sizes are compared
+        return self._modify_time is None or abs(os.path.getmtime(local_file) - self._modify_time) < 1.
+
+    def _set_modify_time(self, local_file: str):
+        if self._modify_time is not None:
+            os.utime(local_file, (self._modify_time, self._modify_time))
+
+    def on_new_block(self, bytes_block, num_bytes: int = None):
+        if self._monitor.is_cancelled():
+            raise Cancellation()
         self._fp.write(bytes_block)
-        block_size = len(bytes_block)
+        block_size = len(bytes_block) if num_bytes is None else num_bytes
         self._bytes_written += block_size
         if self._dl_stat:
             self._dl_stat.handle_chunk(block_size)
@@ -41,24 +41,28 @@ import json
 import os
 import re
 import socket
+import threading
 import urllib.error
 import urllib.parse
 import urllib.request
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from math import ceil
 from typing import Sequence, Tuple, Optional, Any
 
-import xarray as xr
 from owslib.csw import CatalogueServiceWeb
 from owslib.namespaces import Namespaces
 
 from cate.conf import get_config_value, get_data_stores_path
-from cate.conf.defaults import NETCDF_COMPRESSION_LEVEL
+from cate.conf.defaults import DOWNLOAD_WORKERS
 from cate.core.ds import DATA_STORE_REGISTRY, DataAccessError, DataStore, DataSource, Schema, open_xarray_dataset
-from cate.core.opimpl import subset_spatial_impl, normalize_impl, adjust_spatial_attrs_impl
+from cate.core.opimpl import subset_spatial_impl, normalize_impl
 from cate.core.types import PolygonLike, TimeLike, TimeRange, TimeRangeLike, VarNamesLike
-from cate.ds.local import add_to_data_store_registry, LocalDataSource, LocalDataStore
+from cate.ds.esa_cci_odp_index import EsaCciOdpMetadataIndex
+from cate.ds.local import add_to_data_store_registry, make_local_subsets, LocalDataSource, LocalDataStore
+from cate.util.download import download_file, verify_file
+from cate.util.intervalindex import IntervalIndex
 from cate.util.monitor import Cancellation, Monitor
 
 ESA_CCI_ODP_DATA_STORE_ID = 'esa_cci_odp'
@@ -102,6 +106,8 @@ _CSW_MAX_RESULTS = 1000
 _CSW_METADATA_CACHE_FILE = 'catalogue_metadata.xml'
 _CSW_CACHE_FILE = 'catalogue.xml'
 
+_METADATA_INDEX_FILE = 'metadata-index.sqlite'
+
 # by default there is no timeout
 socket.setdefaulttimeout(10)
 
@@ -261,10 +267,18 @@ def _load_or_fetch_json(fetch_json_function,
     return json_obj
 
 
+def _get_solr_field_value(doc: dict, name: str):
+    value = doc.get(name, None)
+    # Multi-valued Solr fields are returned as lists
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value
+
+
 def _fetch_file_list_json(dataset_id: str, dataset_query_id: str, monitor: Monitor = Monitor.NONE):
     file_index_json_dict = _fetch_solr_json(_ESGF_CEDA_URL,
                                             dict(type='File',
-                                                 fields='url,title,size',
+                                                 fields='url,title,size,checksum,checksum_type',
                                                  dataset_id=dataset_query_id,
                                                  replica='false',
                                                  latest='True',
@@ -286,6 +300,8 @@ def _fetch_file_list_json(dataset_id: str, dataset_query_id: str, monitor: Monit
 
         filename = doc.get('title', None)
         file_size = doc.get('size', -1)
+        checksum = _get_solr_field_value(doc, 'checksum')
+        checksum_type = _get_solr_field_value(doc, 'checksum_type')
         if not filename:
             filename = os.path.basename(urllib.parse.urlparse(urls[_ODP_PROTOCOL_HTTP])[2])
         if filename in file_list:
@@ -303,7 +319,7 @@ def _fetch_file_list_json(dataset_id: str, dataset_query_id: str, monitor: Monit
                 start_time = datetime.strptime(filename[p1:p2], time_format)
                 # Convert back to text, so we can JSON-encode it
                 start_time = datetime.strftime(start_time, _TIMESTAMP_FORMAT)
-        file_list.append([filename, start_time, end_time, file_size, urls])
+        file_list.append([filename, start_time, end_time, file_size, urls, checksum, checksum_type])
 
     def pick_start_time(file_info_rec):
         return file_info_rec[1] if file_info_rec[1] else datetime.max
@@ -322,9 +338,9 @@ class EsaCciOdpDataStore(DataStore):
         self._index_cache_used = index_cache_used
         self._index_cache_expiration_days = index_cache_expiration_days
         self._esgf_data = index_cache_json_dict
-        self._data_sources = []
-
         self._csw_data = None
+        self._metadata_index = None
+        self._data_sources = dict()
 
     @property
     def index_cache_used(self):
@@ -339,16 +355,23 @@ class EsaCciOdpDataStore(DataStore):
         return get_metadata_store_path()
 
     def query(self, ds_id: str = None, query_expr: str = None, monitor: Monitor = Monitor.NONE) -> Sequence['DataSource']:
-        self._init_data_sources()
-        if ds_id or query_expr:
-            return [ds for ds in self._data_sources if ds.matches(ds_id=ds_id, query_expr=query_expr)]
-        return self._data_sources
+        self._init_metadata_index()
+        if self._metadata_index is None:
+            return []
+        data_sources = []
+        for instance_id, doc, catalogue_item in self._metadata_index.query(ds_id=ds_id, query_expr=query_expr):
+            # Keep data sources, as they cache their file lists
+            data_source = self._data_sources.get(instance_id)
+            if data_source is None:
+                data_source = EsaCciOdpDataSource(self, doc, catalogue_item)
+                self._data_sources[instance_id] = data_source
+            data_sources.append(data_source)
+        return data_sources
 
     def _repr_html_(self) -> str:
-        self._init_data_sources()
         rows = []
         row_count = 0
-        for data_source in self._data_sources:
+        for data_source in self.query():
             row_count += 1
             # noinspection PyProtectedMember
             rows.append('<tr><td><strong>%s</strong></td><td>%s</td></tr>' % (row_count, data_source._repr_html_()))
@@ -357,31 +380,45 @@ class EsaCciOdpDataStore(DataStore):
     def __repr__(self) -> str:
         return "EsaCciOdpDataStore (%s)" % self.id
 
-    def _init_data_sources(self):
-        if self._data_sources:
+    def _init_metadata_index(self):
+        if self._metadata_index is not None:
             return
-        if self._esgf_data is None:
-            self._load_index()
-        if self._esgf_data is None:
+        if self._esgf_data is not None:
+            # Data store created from a given index, e.g. for testing
+            metadata_index = EsaCciOdpMetadataIndex()
+            metadata_index.update(self._esgf_data.get('response', {}).get('docs', []), self._csw_data)
+            self._metadata_index = metadata_index
             return
 
-        docs = self._esgf_data.get('response', {}).get('docs', [])
-        data_sources = []
-        if self._csw_data:
-            for catalogue_data in self._csw_data.values():
-                catalogue_item = catalogue_data.copy()
-                catalogue_item.pop('data_sources')
-                for ds_name in catalogue_data.get('data_sources'):
-                    for idx, doc in enumerate(docs):
-                        instance_id = doc.get('instance_id', None)
-                        if ds_name == instance_id:
-                            data_sources.append(EsaCciOdpDataSource(self, doc, catalogue_item))
-                            del docs[idx]
-                            break
+        if self._index_cache_used:
+            metadata_index = EsaCciOdpMetadataIndex(os.path.join(get_metadata_store_path(), _METADATA_INDEX_FILE))
         else:
-            for doc in docs:
-                data_sources.append(EsaCciOdpDataSource(self, doc))
-        self._data_sources = data_sources
+            metadata_index = EsaCciOdpMetadataIndex()
+        timestamp = metadata_index.timestamp
+        if timestamp is not None:
+            time_diff = datetime.utcnow() - timestamp
+            time_diff_days = time_diff.days + time_diff.seconds / 3600. / 24.
+            if time_diff_days < self._index_cache_expiration_days:
+                self._metadata_index = metadata_index
+                return
+
+        try:
+            self._load_index()
+        except DataAccessError:
+            if not metadata_index.size:
+                metadata_index.close()
+                raise
+            # Use the outdated index
+            self._metadata_index = metadata_index
+            return
+        if self._esgf_data is None:
+            metadata_index.close()
+            return
+        metadata_index.update(self._esgf_data.get('response', {}).get('docs', []), self._csw_data)
+        # The index is all we need from now on
+        self._esgf_data = None
+        self._csw_data = None
+        self._metadata_index = metadata_index
 
     def _load_index(self):
         try:
@@ -465,6 +502,7 @@ class EsaCciOdpDataSource(DataSource):
         self._catalogue_data = cci_catalogue_data
 
         self._file_list = None
+        self._file_index = None
 
         self._temporal_coverage = None
         self._protocol_list = None
@@ -555,8 +593,7 @@ class EsaCciOdpDataSource(DataSource):
         selected_file_list = self._find_files(None)
         if selected_file_list:
             dataset_dir = self.local_dataset_dir()
-            for filename, date_from, date_to, none, none \
-                    in selected_file_list:
+            for filename, date_from, date_to in (file_rec[:3] for file_rec in selected_file_list):
                 if os.path.exists(os.path.join(dataset_dir, filename)):
                     if date_from in coverage.values():
                         for temp_date_from, temp_date_to in coverage.items():
@@ -613,19 +650,9 @@ class EsaCciOdpDataSource(DataSource):
         requested_start_date, requested_end_date = time_range if time_range else (None, None)
         self._init_file_list()
         if requested_start_date or requested_end_date:
-            selected_file_list = []
-            for file_rec in self._file_list:
-                start_time = file_rec[1]
-                ok = False
-                if start_time:
-                    if requested_start_date and requested_end_date:
-                        ok = requested_start_date <= start_time <= requested_end_date
-                    elif requested_start_date:
-                        ok = requested_start_date <= start_time
-                    elif requested_end_date:
-                        ok = start_time <= requested_end_date
-                if ok:
-                    selected_file_list.append(file_rec)
+            selected_file_list = [self._file_list[index] for index in
+                                  self._file_index.find_starting_within(requested_start_date or None,
+                                                                        requested_end_date or None)]
         else:
             selected_file_list = self._file_list
         return selected_file_list
@@ -695,17 +722,9 @@ class EsaCciOdpDataSource(DataSource):
 
         excluded_variables = get_exclude_variables_fix_known_issues(self.id)
 
-        compression_level = get_config_value('NETCDF_COMPRESSION_LEVEL', NETCDF_COMPRESSION_LEVEL)
-        compression_enabled = True if compression_level > 0 else False
-
-        do_update_of_verified_time_coverage_start_once = True
         verified_time_coverage_start = None
         verified_time_coverage_end = None
 
-        encoding_update = dict()
-        if compression_enabled:
-            encoding_update.update({'zlib': True, 'complevel': compression_level})
-
         if region or var_names:
             protocol = _ODP_PROTOCOL_OPENDAP
         else:
@@ -724,102 +743,30 @@ class EsaCciOdpDataSource(DataSource):
         try:
             if protocol == _ODP_PROTOCOL_OPENDAP:
 
-                do_update_of_variables_meta_info_once = True
-                do_update_of_region_meta_info_once = True
-
                 files = self._get_urls_list(selected_file_list, protocol)
-                monitor.start('Sync ' + self.id, total_work=len(files))
-                for idx, dataset_uri in enumerate(files):
-                    child_monitor = monitor.child(work=1)
-
-                    file_name = os.path.basename(dataset_uri)
-                    local_filepath = os.path.join(local_path, file_name)
-
-                    time_coverage_start = selected_file_list[idx][1]
-                    time_coverage_end = selected_file_list[idx][2]
-
-                    child_monitor.start(label=file_name, total_work=1)
-
-                    remote_dataset = xr.open_dataset(dataset_uri, drop_variables=[variable.get('name') for variable in
-                                                                                  excluded_variables])
-                    if var_names:
-                        remote_dataset = remote_dataset.drop([var_name for var_name in remote_dataset.data_vars.keys()
-                                                              if var_name not in var_names])
-
-                    if region:
-                        remote_dataset = normalize_impl(remote_dataset)
-                        remote_dataset = adjust_spatial_attrs_impl(subset_spatial_impl(remote_dataset, region),
-                                                                   allow_point=False)
-
-                        if do_update_of_region_meta_info_once:
-                            local_ds.meta_info['bbox_minx'] = remote_dataset.attrs['geospatial_lon_min']
-                            local_ds.meta_info['bbox_maxx'] = remote_dataset.attrs['geospatial_lon_max']
-                            local_ds.meta_info['bbox_maxy'] = remote_dataset.attrs['geospatial_lat_max']
-                            local_ds.meta_info['bbox_miny'] = remote_dataset.attrs['geospatial_lat_min']
-                            do_update_of_region_meta_info_once = False
-
-                    if compression_enabled:
-                        for sel_var_name in remote_dataset.variables.keys():
-                            remote_dataset.variables.get(sel_var_name).encoding.update(encoding_update)
-
-                    remote_dataset.to_netcdf(local_filepath)
-
-                    child_monitor.progress(work=1, msg=str(time_coverage_start))
-
-                    if do_update_of_variables_meta_info_once:
-                        variables_info = local_ds.meta_info.get('variables', [])
-                        local_ds.meta_info['variables'] = [var_info for var_info in variables_info
-                                                           if var_info.get('name')
-                                                           in remote_dataset.variables.keys() and
-                                                           var_info.get('name')
-                                                           not in remote_dataset.dims.keys()]
-                        do_update_of_variables_meta_info_once = False
-
-                    local_ds.add_dataset(os.path.join(local_id, file_name),
-                                         (time_coverage_start, time_coverage_end))
-
-                    if do_update_of_verified_time_coverage_start_once:
-                        verified_time_coverage_start = time_coverage_start
-                        do_update_of_verified_time_coverage_start_once = False
-                    verified_time_coverage_end = time_coverage_end
-                    child_monitor.done()
+                file_list = [(dataset_uri, os.path.basename(dataset_uri), file_rec[1], file_rec[2])
+                             for dataset_uri, file_rec in zip(files, selected_file_list)]
+                with monitor.starting('Sync ' + self.id, len(file_list)):
+                    verified_time_coverage = make_local_subsets(local_ds, file_list, region, var_names,
+                                                                drop_variables=[variable.get('name') for variable
+                                                                                in excluded_variables],
+                                                                monitor=monitor)
+                verified_time_coverage_start, verified_time_coverage_end = verified_time_coverage
             else:
                 outdated_file_list = []
                 for file_rec in selected_file_list:
-                    filename, _, _, file_size, url = file_rec
+                    filename, file_size = file_rec[0], file_rec[3]
                     dataset_file = os.path.join(local_path, filename)
-                    # todo (forman, 20160915): must perform better checks on dataset_file if it is...
-                    # ... outdated or incomplete or corrupted.
-                    # JSON also includes "checksum" and "checksum_type" fields.
-                    if not os.path.isfile(dataset_file) or (file_size and os.path.getsize(dataset_file) != file_size):
+                    # Downloaded files only replace their incomplete versions once their checksum has been
+                    # verified, so we just need to check the size of existing files.
+                    if not verify_file(dataset_file, file_size):
                         outdated_file_list.append(file_rec)
 
                 if outdated_file_list:
-                    with monitor.starting('Sync ' + self.id, len(outdated_file_list)):
-                        bytes_to_download = sum([file_rec[3] for file_rec in outdated_file_list])
-                        dl_stat = _DownloadStatistics(bytes_to_download)
-
-                        file_number = 1
-
-                        for filename, coverage_from, coverage_to, file_size, url in outdated_file_list:
-                            dataset_file = os.path.join(local_path, filename)
-                            sub_monitor = monitor.child(work=1.0)
-
-                            # noinspection PyUnusedLocal
-                            def reporthook(block_number, read_size, total_file_size):
-                                dl_stat.handle_chunk(read_size)
-                                sub_monitor.progress(work=read_size, msg=str(dl_stat))
-
-                            sub_monitor_msg = "file %d of %d" % (file_number, len(outdated_file_list))
-                            with sub_monitor.starting(sub_monitor_msg, file_size):
-                                urllib.request.urlretrieve(url[protocol], filename=dataset_file, reporthook=reporthook)
-                            file_number += 1
-                            local_ds.add_dataset(os.path.join(local_id, filename), (coverage_from, coverage_to))
-
-                            if do_update_of_verified_time_coverage_start_once:
-                                verified_time_coverage_start = coverage_from
-                                do_update_of_verified_time_coverage_start_once = False
-                            verified_time_coverage_end = coverage_to
+                    num_workers = get_config_value('download_workers', DOWNLOAD_WORKERS)
+                    verified_time_coverage = self._download_files(local_ds, local_path, outdated_file_list,
+                                                                  protocol, num_workers, monitor)
+                    verified_time_coverage_start, verified_time_coverage_end = verified_time_coverage
         except (OSError, ValueError) as e:
             raise DataAccessError("Copying remote data source failed: {}".format(e), source=self) from e
         local_ds.meta_info['temporal_coverage_start'] = TimeLike.format(verified_time_coverage_start)
@@ -827,6 +774,64 @@ class EsaCciOdpDataSource(DataSource):
         local_ds.meta_info['exclude_variables'] = excluded_variables
         local_ds.save(True)
 
+    def _download_files(self,
+                        local_ds: LocalDataSource,
+                        local_path: str,
+                        file_list,
+                        protocol: str,
+                        num_workers: int,
+                        monitor: Monitor) -> Tuple[Any, Any]:
+        """
+        Download the files in *file_list* concurrently using up to *num_workers* threads
+        and add them to *local_ds* as they are completed.
+
+        :return: The start of the first and the end of the last file downloaded.
+        """
+        local_id = local_ds.id
+        bytes_to_download = sum([max(file_rec[3] or 0, 0) for file_rec in file_list])
+        dl_stat = _DownloadStatistics(bytes_to_download)
+        progress_lock = threading.Lock()
+        stop_event = threading.Event()
+
+        def on_bytes_read(num_bytes: int):
+            # Called from the download threads
+            if stop_event.is_set():
+                raise Cancellation()
+            with progress_lock:
+                monitor.check_for_cancellation()
+                dl_stat.handle_chunk(num_bytes)
+                monitor.progress(work=num_bytes, msg=str(dl_stat))
+
+        def download(file_rec):
+            filename, _, _, file_size, url = file_rec[:5]
+            checksum, checksum_type = _get_file_checksum(file_rec)
+            download_file(url[protocol], os.path.join(local_path, filename),
+                          file_size=file_size,
+                          checksum=checksum,
+                          checksum_type=checksum_type,
+                          on_bytes_read=on_bytes_read)
+
+        completed_indexes = []
+        with monitor.starting('Sync ' + self.id, bytes_to_download):
+            with ThreadPoolExecutor(max_workers=max(num_workers, 1)) as executor:
+                future_to_index = {executor.submit(download, file_rec): index
+                                   for index, file_rec in enumerate(file_list)}
+                try:
+                    for future in as_completed(future_to_index):
+                        future.result()
+                        index = future_to_index[future]
+                        filename, coverage_from, coverage_to = file_list[index][:3]
+                        local_ds.add_dataset(os.path.join(local_id, filename), (coverage_from, coverage_to))
+                        completed_indexes.append(index)
+                except BaseException:
+                    # Stop pending downloads, running ones stop with their next chunk
+                    stop_event.set()
+                    for future in future_to_index:
+                        future.cancel()
+                    raise
+
+        return file_list[min(completed_indexes)][1], file_list[max(completed_indexes)][2]
+
     def make_local(self,
                    local_name: str,
                    local_id: str = None,
@@ -916,10 +921,11 @@ class EsaCciOdpDataSource(DataSource):
 
         data_source_start_date = datetime(3000, 1, 1)
         data_source_end_date = datetime(1000, 1, 1)
+        file_index = IntervalIndex()
         # Convert file_start_date from string to datetime object
         # Compute file_end_date from 'time_frequency' field
         # Compute the data source's temporal coverage
-        for file_rec in file_list:
+        for index, file_rec in enumerate(file_list):
             if file_rec[1]:
                 file_start_date = datetime.strptime(file_rec[1], _TIMESTAMP_FORMAT)
                 file_end_date = file_start_date + time_delta
@@ -927,7 +933,9 @@ class EsaCciOdpDataSource(DataSource):
                 data_source_end_date = max(data_source_end_date, file_end_date)
                 file_rec[1] = file_start_date
                 file_rec[2] = file_end_date
+                file_index.add(index, file_start_date, file_end_date)
         self._temporal_coverage = data_source_start_date, data_source_end_date
+        self._file_index = file_index
         self._file_list = file_list
 
     def __str__(self):
@@ -940,6 +948,14 @@ class EsaCciOdpDataSource(DataSource):
         return self.id
 
 
+def _get_file_checksum(file_rec) -> Tuple[Optional[str], Optional[str]]:
+    """Get the checksum and checksum type of a file record, if any."""
+    if len(file_rec) < 7:
+        # File lists cached by former versions do not have checksums
+        return None, None
+    return file_rec[5] or None, file_rec[6] or None
+
+
 class _DownloadStatistics:
     def __init__(self, bytes_total):
         self.bytes_total = bytes_total
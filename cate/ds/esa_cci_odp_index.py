@@ -0,0 +1,253 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+A local metadata index of the data sources of the ESA CCI Open Data Portal.
+
+The index is a SQLite database which holds one row per data source, keyed by its ESGF ``instance_id``.
+Each row stores the Solr document of the data source joined with its CSW catalogue item, and a
+lower-case text made of the data source's identifier and title, which is used to answer queries
+as :py:meth:`cate.core.ds.DataSource.matches` does. If SQLite provides the FTS5 ``trigram`` tokenizer,
+this text is additionally held in a full-text table, so that substring queries do not need to scan all rows.
+
+The index is updated incrementally: only rows whose content has changed are rewritten.
+
+Components
+==========
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS data_source (
+    instance_id TEXT PRIMARY KEY,
+    ds_id TEXT,
+    position INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    search_text TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    catalogue_item TEXT
+);
+CREATE INDEX IF NOT EXISTS data_source_ds_id ON data_source (ds_id COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS index_info (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS data_source_fts USING fts5(instance_id UNINDEXED, search_text, tokenize='trigram');
+"""
+
+#: A data source entry given by the Solr document and the optional CSW catalogue item
+IndexEntry = Tuple[dict, Optional[dict]]
+
+
+def join_catalogue(docs: Sequence[dict], csw_data: Optional[dict]) -> List[IndexEntry]:
+    """
+    Join the Solr documents *docs* with the CSW catalogue items in *csw_data*.
+
+    If *csw_data* is given, the result comprises all documents referred to by a catalogue item in the order
+    of the catalogue, otherwise all documents without catalogue items.
+
+    :param docs: The Solr documents of the data sources.
+    :param csw_data: The CSW catalogue items, or ``None``.
+    :return: A list of tuples (doc, catalogue_item).
+    """
+    if not csw_data:
+        return [(doc, None) for doc in docs]
+
+    docs_by_instance_id = dict()
+    for doc in docs:
+        docs_by_instance_id.setdefault(doc.get('instance_id', None), doc)
+
+    entries = []
+    for catalogue_data in csw_data.values():
+        catalogue_item = catalogue_data.copy()
+        catalogue_item.pop('data_sources')
+        for ds_name in catalogue_data.get('data_sources'):
+            # Every document is joined with the first catalogue item referring to it
+            doc = docs_by_instance_id.pop(ds_name, None)
+            if doc is not None:
+                entries.append((doc, catalogue_item))
+    return entries
+
+
+class EsaCciOdpMetadataIndex:
+    """
+    A SQLite-based index of the data sources of the ESA CCI Open Data Portal.
+
+    :param path: Path of the index database file, or ``":memory:"`` for a non-persistent index.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+            try:
+                self._connection.executescript(_FTS_SCHEMA)
+                self._has_fts = True
+            except sqlite3.OperationalError:
+                # FTS5 or its trigram tokenizer are not available
+                self._has_fts = False
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def timestamp(self) -> Optional[datetime]:
+        """The time of the last update, or ``None`` if the index has never been updated."""
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM index_info WHERE name = 'timestamp'").fetchone()
+        return datetime.strptime(row[0], _TIMESTAMP_FORMAT) if row else None
+
+    @property
+    def size(self) -> int:
+        """The number of data sources in this index."""
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM data_source').fetchone()[0]
+
+    def update(self, docs: Sequence[dict], csw_data: Optional[dict] = None) -> None:
+        """
+        Update this index from the Solr documents *docs* and the CSW catalogue items *csw_data*.
+        Only rows that have changed are rewritten, rows of data sources that have vanished are removed.
+
+        :param docs: The Solr documents of the data sources.
+        :param csw_data: The CSW catalogue items, or ``None``.
+        """
+        entries = join_catalogue(docs, csw_data)
+        with self._lock, self._connection:
+            old_rows = {instance_id: (digest, position) for instance_id, digest, position
+                        in self._connection.execute('SELECT instance_id, digest, position FROM data_source')}
+            new_instance_ids = set()
+            for position, (doc, catalogue_item) in enumerate(entries):
+                instance_id = doc.get('instance_id', None)
+                if instance_id is None or instance_id in new_instance_ids:
+                    continue
+                new_instance_ids.add(instance_id)
+                doc_json = json.dumps(doc, sort_keys=True)
+                catalogue_item_json = json.dumps(catalogue_item, sort_keys=True) if catalogue_item else None
+                digest = _compute_digest(doc_json, catalogue_item_json)
+                old_digest, old_position = old_rows.get(instance_id, (None, None))
+                if old_digest == digest:
+                    if old_position != position:
+                        self._connection.execute('UPDATE data_source SET position = ? WHERE instance_id = ?',
+                                                 (position, instance_id))
+                    continue
+                ds_id = doc.get('master_id', None)
+                search_text = _get_search_text(ds_id, _get_title(doc, catalogue_item))
+                self._connection.execute('INSERT OR REPLACE INTO data_source '
+                                         '(instance_id, ds_id, position, digest, search_text, doc, catalogue_item) '
+                                         'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                         (instance_id, ds_id, position, digest, search_text,
+                                          doc_json, catalogue_item_json))
+                if self._has_fts:
+                    if old_digest is not None:
+                        self._connection.execute('DELETE FROM data_source_fts WHERE instance_id = ?',
+                                                 (instance_id,))
+                    self._connection.execute('INSERT INTO data_source_fts (instance_id, search_text) VALUES (?, ?)',
+                                             (instance_id, search_text))
+            for instance_id in old_rows.keys() - new_instance_ids:
+                self._connection.execute('DELETE FROM data_source WHERE instance_id = ?', (instance_id,))
+                if self._has_fts:
+                    self._connection.execute('DELETE FROM data_source_fts WHERE instance_id = ?', (instance_id,))
+            self._connection.execute("INSERT OR REPLACE INTO index_info (name, value) VALUES ('timestamp', ?)",
+                                     (datetime.utcnow().strftime(_TIMESTAMP_FORMAT),))
+
+    def query(self, ds_id: str = None, query_expr: str = None) -> List[Tuple[str, dict, Optional[dict]]]:
+        """
+        Find the data sources matching *ds_id* or *query_expr*, in the same way as
+        :py:meth:`cate.core.ds.DataSource.matches` does. If neither is given, all data sources are returned.
+
+        :param ds_id: A data source identifier.
+        :param query_expr: A query expression. Currently, only simple search strings are supported.
+        :return: A list of tuples (instance_id, doc, catalogue_item), ordered like the catalogue.
+        """
+        conditions = []
+        args = []
+        if ds_id:
+            conditions.append('ds_id = ? COLLATE NOCASE')
+            args.append(ds_id)
+        if query_expr:
+            pattern = '%' + _escape_like(query_expr.lower()) + '%'
+            if self._has_fts:
+                conditions.append("instance_id IN (SELECT instance_id FROM data_source_fts "
+                                  "WHERE search_text LIKE ? ESCAPE '\\')")
+            else:
+                conditions.append("search_text LIKE ? ESCAPE '\\'")
+            args.append(pattern)
+        sql = 'SELECT instance_id, doc, catalogue_item FROM data_source'
+        if conditions:
+            sql += ' WHERE ' + ' OR '.join(conditions)
+        sql += ' ORDER BY position'
+        with self._lock:
+            rows = self._connection.execute(sql, args).fetchall()
+        return [(instance_id, json.loads(doc), json.loads(catalogue_item) if catalogue_item else None)
+                for instance_id, doc, catalogue_item in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def _compute_digest(doc_json: str, catalogue_item_json: Optional[str]) -> str:
+    hash_obj = hashlib.sha1()
+    hash_obj.update(doc_json.encode('utf-8'))
+    if catalogue_item_json:
+        hash_obj.update(catalogue_item_json.encode('utf-8'))
+    return hash_obj.hexdigest()
+
+
+def _get_title(doc: dict, catalogue_item: Optional[dict]) -> Any:
+    # Same as EsaCciOdpDataSource.meta_info['title']
+    if catalogue_item and 'title' in catalogue_item:
+        return catalogue_item['title']
+    title = doc.get('title', None)
+    if isinstance(title, list) and len(title) == 1:
+        title = title[0]
+    return title
+
+
+def _get_search_text(ds_id: Optional[str], title: Any) -> str:
+    # The newline separates identifier and title, so that no query spans both
+    return '%s\n%s' % ((ds_id or '').lower(), title.lower() if isinstance(title, str) else '')
+
+
+def _escape_like(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
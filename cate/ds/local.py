@@ -41,26 +41,34 @@ import json
 import os
 import re
 import shutil
+import threading
+import time
 import uuid
 import warnings
+import zlib
 from collections import OrderedDict
 from datetime import datetime
 from glob import glob
 from typing import Optional, Sequence, Union, Any, Tuple
 
+import numpy as np
 import psutil
 import shapely.geometry
 import xarray as xr
 from dateutil import parser
 
 from cate.conf import get_config_value, get_data_stores_path
-from cate.conf.defaults import NETCDF_COMPRESSION_LEVEL
+from cate.conf.defaults import NETCDF_COMPRESSION_LEVEL, DOWNLOAD_WORKERS, USE_DATASET_METADATA_CACHE
 from cate.core.ds import DATA_STORE_REGISTRY, DataAccessError, DataAccessWarning, DataSourceStatus, DataStore, \
     DataSource, \
     open_xarray_dataset
+from cate.core.dsmetacache import DatasetMetadataIndex
 from cate.core.opimpl import subset_spatial_impl, normalize_impl, adjust_spatial_attrs_impl
 from cate.core.types import PolygonLike, TimeRange, TimeRangeLike, VarNames, VarNamesLike
+from cate.util.filecopy import copy_files
+from cate.util.intervalindex import IntervalIndex
 from cate.util.monitor import Monitor
+from cate.util.pipeline import run_pipeline
 
 __author__ = "Norman Fomferra (Brockmann Consult GmbH), " \
              "Marco Zühlke (Brockmann Consult GmbH), " \
@@ -70,6 +78,20 @@ _REFERENCE_DATA_SOURCE_TYPE = "FILE_PATTERN"
 
 _NAMESPACE = uuid.UUID(bytes=b"1234567890123456", version=3)
 
+# Name of the file in the store directory which summarizes all data sources of a LocalDataStore
+_SUMMARY_INDEX_FILE_NAME = '.data_sources.index'
+# Bump this, if the structure of the summary index changes
+_SUMMARY_INDEX_VERSION = 1
+
+# Size in bytes of the data sample used to choose the compression of a variable
+_COMPRESSION_SAMPLE_SIZE = 1024 * 1024
+# Candidate zlib compression levels, the configured compression level is the maximum
+_COMPRESSION_LEVELS = (1, 3, 6, 9)
+# A faster compression is preferred, if its output is at most this fraction larger than the smallest one
+_COMPRESSION_SIZE_TOLERANCE = 0.05
+# Variables are not compressed, if the smallest output is larger than this fraction of the input
+_MAX_COMPRESSION_RATIO = 0.95
+
 
 def get_data_store_path():
     return os.environ.get('CATE_LOCAL_DATA_STORE_PATH',
@@ -81,12 +103,175 @@ def add_to_data_store_registry():
     DATA_STORE_REGISTRY.add_data_store(data_store)
 
 
+def make_local_subsets(local_ds: 'LocalDataSource',
+                       file_list: Sequence[Tuple[str, str, Any, Any]],
+                       region: PolygonLike.TYPE = None,
+                       var_names: VarNamesLike.TYPE = None,
+                       drop_variables: Sequence[str] = None,
+                       monitor: Monitor = Monitor.NONE) -> Tuple[Any, Any]:
+    """
+    Write the spatial and variable subsets of the datasets given by *file_list* into the directory
+    of *local_ds* and add them to *local_ds*.
+
+    The files pass a pipeline of three stages connected by bounded queues: datasets are opened by one thread,
+    subsets are normalised and cut out by a pool of worker threads, and the compressed NetCDF files are written
+    by another thread. The writer reads the subsets variable by variable, so that whole subsets are never held
+    in memory. Note that the netCDF4/HDF5 library serialises all reads and writes under a global lock, so only
+    opening, normalising and cutting out subsets overlaps with writing former subsets.
+
+    :param local_ds: The local data source.
+    :param file_list: A sequence of tuples (source, file_name, time_coverage_start, time_coverage_end),
+           where *source* is the path or OPeNDAP URL of a dataset and *file_name* the name of its local copy.
+    :param region: An optional region to be cut out.
+    :param var_names: Optional names of the variables to be copied.
+    :param drop_variables: Optional names of variables which are dropped when opening the datasets.
+    :param monitor: A progress monitor which is advanced by one unit of work for every file written.
+    :return: A tuple (time_coverage_start, time_coverage_end) given by the start of the first and the end
+             of the last file written, according to the order of *file_list*.
+    """
+    local_id = local_ds.id
+    local_path = os.path.join(local_ds.data_store.data_store_path, local_id)
+    num_workers = get_config_value('download_workers', DOWNLOAD_WORKERS)
+
+    compression_level = get_config_value('NETCDF_COMPRESSION_LEVEL', NETCDF_COMPRESSION_LEVEL)
+    # The compression chosen for a variable of the first subset is used for all subsets
+    compression_encodings = dict()
+    compression_encodings_lock = threading.Lock()
+
+    def get_compression_encoding(var_name: str, variable: xr.Variable) -> dict:
+        with compression_encodings_lock:
+            encoding = compression_encodings.get(var_name)
+        if encoding is None:
+            encoding = choose_compression_encoding(variable, compression_level)
+            with compression_encodings_lock:
+                encoding = compression_encodings.setdefault(var_name, encoding)
+        return encoding
+
+    def open_dataset(file_rec):
+        source, file_name = file_rec[:2]
+        dataset = xr.open_dataset(source, drop_variables=drop_variables)
+        if var_names:
+            dataset = dataset.drop([var_name for var_name in dataset.data_vars.keys()
+                                    if var_name not in var_names])
+        return file_name, dataset
+
+    def make_subset(entry):
+        file_name, dataset = entry
+        if region:
+            dataset = normalize_impl(dataset)
+            dataset = adjust_spatial_attrs_impl(subset_spatial_impl(dataset, region), allow_point=False)
+        if compression_level > 0:
+            for sel_var_name, variable in dataset.variables.items():
+                variable.encoding.update(get_compression_encoding(sel_var_name, variable))
+        return file_name, dataset
+
+    def write_subset(entry):
+        file_name, dataset = entry
+        dataset.to_netcdf(os.path.join(local_path, file_name))
+        dataset.close()
+        return dataset
+
+    do_update_of_variables_meta_info_once = True
+    do_update_of_region_meta_info_once = True
+    completed_indexes = []
+
+    for index, dataset in run_pipeline(file_list,
+                                       [(open_dataset, 1), (make_subset, num_workers), (write_subset, 1)],
+                                       monitor=monitor):
+        _, file_name, time_coverage_start, time_coverage_end = file_list[index]
+
+        if region and do_update_of_region_meta_info_once:
+            local_ds.meta_info['bbox_minx'] = dataset.attrs['geospatial_lon_min']
+            local_ds.meta_info['bbox_maxx'] = dataset.attrs['geospatial_lon_max']
+            local_ds.meta_info['bbox_maxy'] = dataset.attrs['geospatial_lat_max']
+            local_ds.meta_info['bbox_miny'] = dataset.attrs['geospatial_lat_min']
+            do_update_of_region_meta_info_once = False
+
+        if do_update_of_variables_meta_info_once:
+            variables_info = local_ds.meta_info.get('variables', [])
+            local_ds.meta_info['variables'] = [var_info for var_info in variables_info
+                                               if var_info.get('name')
+                                               in dataset.variables.keys() and
+                                               var_info.get('name')
+                                               not in dataset.dims.keys()]
+            do_update_of_variables_meta_info_once = False
+
+        local_ds.add_dataset(os.path.join(local_id, file_name), (time_coverage_start, time_coverage_end))
+        completed_indexes.append(index)
+        monitor.progress(work=1, msg=str(time_coverage_start))
+
+    if not completed_indexes:
+        return None, None
+    return file_list[min(completed_indexes)][2], file_list[max(completed_indexes)][3]
+
+
+def choose_compression_encoding(variable: xr.Variable, max_compression_level: int) -> dict:
+    """
+    Choose the zlib compression level and whether to use the shuffle filter for writing *variable*
+    to a NetCDF file.
+
+    A sample of the encoded data of *variable* is compressed with every candidate level up to
+    *max_compression_level*, with and without shuffling its bytes. The fastest candidate is chosen whose
+    output is almost as small as the smallest one. If no candidate compresses the data significantly,
+    compression is switched off.
+
+    :param variable: The variable.
+    :param max_compression_level: The maximum zlib compression level, 1 to 9.
+    :return: An update of the variable's encoding.
+    """
+    default_encoding = {'zlib': True, 'complevel': max_compression_level}
+    sample = _get_compression_sample(variable)
+    if sample is None:
+        return default_encoding
+
+    item_size = sample.dtype.itemsize
+    data = sample.tobytes()
+    shuffled_data = sample.view(np.uint8).reshape((-1, item_size)).T.tobytes() if item_size > 1 else None
+
+    levels = sorted(set([level for level in _COMPRESSION_LEVELS if level < max_compression_level] +
+                        [max_compression_level]))
+    candidates = []
+    for shuffle, candidate_data in ((False, data), (True, shuffled_data)):
+        if candidate_data is None:
+            continue
+        for level in levels:
+            t0 = time.perf_counter()
+            size = len(zlib.compress(candidate_data, level))
+            candidates.append((size, time.perf_counter() - t0, level, shuffle))
+
+    min_size = min(candidate[0] for candidate in candidates)
+    if min_size > _MAX_COMPRESSION_RATIO * len(data):
+        return {'zlib': False}
+    _, _, level, shuffle = min((candidate for candidate in candidates
+                                if candidate[0] <= (1 + _COMPRESSION_SIZE_TOLERANCE) * min_size),
+                               key=lambda candidate: candidate[1])
+    return {'zlib': True, 'complevel': level, 'shuffle': shuffle}
+
+
+def _get_compression_sample(variable: xr.Variable) -> Optional[np.ndarray]:
+    if variable.ndim == 0 or variable.size == 0:
+        return None
+    # Take the leading elements of variable, keeping its innermost dimensions complete as far as possible
+    num_items = max(1, _COMPRESSION_SAMPLE_SIZE // variable.dtype.itemsize)
+    key = []
+    inner_size = 1
+    for size in reversed(variable.shape):
+        count = min(size, max(1, num_items // inner_size))
+        key.insert(0, slice(0, count))
+        inner_size *= count
+    # Compress what is actually written, e.g. packed integers rather than floats
+    sample = xr.conventions.encode_cf_variable(variable[tuple(key)]).values
+    if sample.dtype.kind not in 'biufc':
+        return None
+    return np.ascontiguousarray(sample).reshape(-1)
+
+
 # TODO (kbernat): document this class
 class LocalDataSource(DataSource):
     """
     Local Data Source implementation provides access to locally stored data sets.
     :param ds_id: unique ID of data source
-    :param files:
+    :param files: the files, or ``None`` if they are loaded from the data store when first needed
     :param data_store:
     :param temporal_coverage:
     :param spatial_coverage:
@@ -96,7 +281,7 @@ class LocalDataSource(DataSource):
 
     def __init__(self,
                  ds_id: str,
-                 files: Union[Sequence[str], OrderedDict],
+                 files: Optional[Union[Sequence[str], OrderedDict]],
                  data_store: 'LocalDataStore',
                  temporal_coverage: TimeRangeLike.TYPE = None,
                  spatial_coverage: PolygonLike.TYPE = None,
@@ -104,14 +289,15 @@ class LocalDataSource(DataSource):
                  meta_info: dict = None,
                  status: DataSourceStatus = None):
         self._id = ds_id
-        if isinstance(files, Sequence):
-            self._files = OrderedDict.fromkeys(files)
-        else:
-            self._files = files
+        self._files = None  # type: Optional[OrderedDict]
+        self._file_index = None  # type: Optional[IntervalIndex]
+        if files is not None:
+            self._set_files(files)
         self._data_store = data_store
+        self._metadata_index = None
 
         initial_temporal_coverage = TimeRangeLike.convert(temporal_coverage) if temporal_coverage else None
-        if not initial_temporal_coverage:
+        if not initial_temporal_coverage and self._files is not None:
             files_number = len(self._files.items())
             if files_number > 0:
                 files_range = list(self._files.values())
@@ -139,9 +325,77 @@ class LocalDataSource(DataSource):
 
         self._status = status if status else DataSourceStatus.READY
 
+    def _get_files(self) -> OrderedDict:
+        """The files of this data source, loaded from the data store if they have not been given yet."""
+        if self._files is None:
+            self._set_files(self._data_store.load_data_source_files(self._id))
+        return self._files
+
+    def _set_files(self, files: Union[Sequence[str], OrderedDict]) -> None:
+        self._files = OrderedDict.fromkeys(files) if isinstance(files, Sequence) else files
+        self._file_index = IntervalIndex()
+        for file, time_coverage in self._files.items():
+            self._index_file(file, time_coverage)
+
+    def _index_file(self, file: str, time_coverage) -> None:
+        if isinstance(time_coverage, Tuple) \
+                and isinstance(time_coverage[0], datetime) and isinstance(time_coverage[1], datetime):
+            self._file_index.add(file, time_coverage[0], time_coverage[1])
+        elif isinstance(time_coverage, datetime):
+            self._file_index.add(file, time_coverage, time_coverage)
+        else:
+            self._file_index.remove(file)
+
     def _resolve_file_path(self, path) -> Sequence:
         return glob(os.path.join(self._data_store.data_store_path, path))
 
+    def _get_metadata_index(self) -> Optional[DatasetMetadataIndex]:
+        if not get_config_value('use_dataset_metadata_cache', USE_DATASET_METADATA_CACHE):
+            return None
+        if self._metadata_index is None:
+            self._metadata_index = DatasetMetadataIndex(self._data_store.get_metadata_index_path(self._id))
+        return self._metadata_index
+
+    def update_metadata_index(self) -> None:
+        """
+        Generate or update the index of the metadata of all files of this data source, which lets
+        :py:meth:`open_dataset` combine the files with a single read of the index instead of opening them.
+        """
+        metadata_index = self._get_metadata_index()
+        if metadata_index is None:
+            return
+        paths = {os.path.abspath(path) for file in self._get_files().keys() for path in self._resolve_file_path(file)}
+        for path in metadata_index.files:
+            if path not in paths:
+                metadata_index.remove(path)
+        for path in sorted(paths):
+            try:
+                metadata_index.add(path)
+            except (OSError, ValueError):
+                # Not a readable dataset, opening the data source will report it
+                pass
+        metadata_index.save()
+
+    def _update_metadata_index(self, file: str) -> None:
+        metadata_index = self._get_metadata_index()
+        if metadata_index is None:
+            return
+        for path in self._resolve_file_path(file):
+            try:
+                metadata_index.add(path)
+            except (OSError, ValueError):
+                # Not a readable dataset, opening the data source will report it
+                pass
+
+    def save_metadata_index(self) -> None:
+        """
+        Write the index of the metadata of the files of this data source, if files have been added since it was
+        last written. :py:meth:`add_dataset` only updates the index in memory, so that adding many files writes
+        the index file once.
+        """
+        if self._metadata_index is not None:
+            self._metadata_index.save()
+
     def open_dataset(self,
                      time_range: TimeRangeLike.TYPE = None,
                      region: PolygonLike.TYPE = None,
@@ -150,27 +404,26 @@ class LocalDataSource(DataSource):
         time_range = TimeRangeLike.convert(time_range) if time_range else None
         if var_names:
             var_names = VarNamesLike.convert(var_names)
+        files = self._get_files()
         paths = []
         if time_range:
-            time_series = list(self._files.values())
-            file_paths = list(self._files.keys())
-            for i in range(len(time_series)):
-                if time_series[i]:
-                    if isinstance(time_series[i], Tuple) and \
-                            time_series[i][0] >= time_range[0] and \
-                            time_series[i][1] <= time_range[1]:
-                        paths.extend(self._resolve_file_path(file_paths[i]))
-                    elif isinstance(time_series[i], datetime) and time_range[0] <= time_series[i] < time_range[1]:
-                        paths.extend(self._resolve_file_path(file_paths[i]))
+            # Only files starting within the time range are candidates
+            for file in self._file_index.find_starting_within(time_range[0], time_range[1]):
+                time_coverage = files[file]
+                if isinstance(time_coverage, Tuple) and time_coverage[1] <= time_range[1]:
+                    paths.extend(self._resolve_file_path(file))
+                elif isinstance(time_coverage, datetime) and time_coverage < time_range[1]:
+                    paths.extend(self._resolve_file_path(file))
         else:
-            for file in self._files.items():
+            for file in files.items():
                 paths.extend(self._resolve_file_path(file[0]))
         if paths:
             paths = sorted(set(paths))
             try:
                 excluded_variables = self._meta_info.get('exclude_variables', [])
-                ds = open_xarray_dataset(paths, drop_variables=[variable.get('name') for variable in
-                                                                excluded_variables])
+                ds = open_xarray_dataset(paths,
+                                         metadata_store=self._get_metadata_index(),
+                                         drop_variables=[variable.get('name') for variable in excluded_variables])
                 if region:
                     ds = normalize_impl(ds)
                     ds = subset_spatial_impl(ds, region)
@@ -212,85 +465,41 @@ class LocalDataSource(DataSource):
         time_range = TimeRangeLike.convert(time_range) if time_range else None
         var_names = VarNamesLike.convert(var_names) if var_names else None  # type: Sequence
 
-        compression_level = get_config_value('NETCDF_COMPRESSION_LEVEL', NETCDF_COMPRESSION_LEVEL)
-        compression_enabled = True if compression_level > 0 else False
-
-        encoding_update = dict()
-        if compression_enabled:
-            encoding_update.update({'zlib': True, 'complevel': compression_level})
-
         local_path = os.path.join(local_ds.data_store.data_store_path, local_id)
-        data_store_path = local_ds.data_store.data_store_path
         if not os.path.exists(local_path):
             os.makedirs(local_path)
 
-        monitor.start("Sync " + self.id, total_work=len(self._files.items()))
-        for remote_relative_filepath, coverage in self._files.items():
-            child_monitor = monitor.child(work=1)
-
-            file_name = os.path.basename(remote_relative_filepath)
-            local_relative_filepath = os.path.join(local_id, file_name)
-            local_absolute_filepath = os.path.join(data_store_path, local_relative_filepath)
-
-            remote_absolute_filepath = os.path.join(self._data_store.data_store_path, remote_relative_filepath)
-
+        selected_file_list = []
+        for remote_relative_filepath, coverage in self._get_files().items():
             if isinstance(coverage, Tuple):
-
                 time_coverage_start = coverage[0]
                 time_coverage_end = coverage[1]
-
                 if not time_range or time_coverage_start >= time_range[0] and time_coverage_end <= time_range[1]:
-                    if region or var_names:
-
-                        do_update_of_variables_meta_info_once = True
-                        do_update_of_region_meta_info_once = True
-
-                        try:
-                            remote_dataset = xr.open_dataset(remote_absolute_filepath)
-
-                            if var_names:
-                                remote_dataset = remote_dataset.drop(
-                                    [var_name for var_name in remote_dataset.data_vars.keys()
-                                     if var_name not in var_names])
-
-                            if region:
-                                remote_dataset = normalize_impl(remote_dataset)
-                                remote_dataset = adjust_spatial_attrs_impl(subset_spatial_impl(remote_dataset, region),
-                                                                           allow_point=False)
-
-                                if do_update_of_region_meta_info_once:
-                                    # subset_spatial_impl
-                                    local_ds.meta_info['bbox_maxx'] = remote_dataset.attrs['geospatial_lon_max']
-                                    local_ds.meta_info['bbox_minx'] = remote_dataset.attrs['geospatial_lon_min']
-                                    local_ds.meta_info['bbox_maxy'] = remote_dataset.attrs['geospatial_lat_max']
-                                    local_ds.meta_info['bbox_miny'] = remote_dataset.attrs['geospatial_lat_min']
-                                    do_update_of_region_meta_info_once = False
-
-                            if compression_enabled:
-                                for sel_var_name in remote_dataset.variables.keys():
-                                    remote_dataset.variables.get(sel_var_name).encoding.update(encoding_update)
-
-                            remote_dataset.to_netcdf(local_absolute_filepath)
-
-                            child_monitor.progress(work=1, msg=str(time_coverage_start))
-                        finally:
-                            if do_update_of_variables_meta_info_once:
-                                variables_info = local_ds.meta_info.get('variables', [])
-                                local_ds.meta_info['variables'] = [var_info for var_info in variables_info
-                                                                   if var_info.get('name')
-                                                                   in remote_dataset.variables.keys() and
-                                                                   var_info.get('name')
-                                                                   not in remote_dataset.dims.keys()]
-                                do_update_of_variables_meta_info_once = False
-
-                            local_ds.add_dataset(os.path.join(local_id, file_name),
-                                                 (time_coverage_start, time_coverage_end))
-
-                        child_monitor.done()
-                    else:
-                        shutil.copy(remote_absolute_filepath, local_absolute_filepath)
-                        local_ds.add_dataset(local_relative_filepath, (time_coverage_start, time_coverage_end))
-                        child_monitor.done()
+                    remote_absolute_filepath = os.path.join(self._data_store.data_store_path,
+                                                            remote_relative_filepath)
+                    selected_file_list.append((remote_absolute_filepath, os.path.basename(remote_relative_filepath),
+                                               time_coverage_start, time_coverage_end))
+
+        if region or var_names:
+            monitor.start("Sync " + self.id, total_work=len(selected_file_list))
+            make_local_subsets(local_ds, selected_file_list, region, var_names, monitor=monitor)
+            monitor.done()
+            return local_id
+
+        file_pairs = [(remote_absolute_filepath, os.path.join(local_path, file_name))
+                      for remote_absolute_filepath, file_name, _, _ in selected_file_list]
+        # Data files within the data store are never modified in place, so copies of them may be hard links.
+        # Files added from elsewhere, e.g. by add_pattern(), remain the user's and may change.
+        data_store_path = os.path.join(os.path.realpath(self._data_store.data_store_path), '')
+        allow_hard_link = all(os.path.realpath(source).startswith(data_store_path) for source, _ in file_pairs)
+        monitor.start("Sync " + self.id,
+                      total_work=sum(os.path.getsize(source) for source, _ in file_pairs))
+        for index in copy_files(file_pairs,
+                                num_workers=get_config_value('download_workers', DOWNLOAD_WORKERS),
+                                allow_hard_link=allow_hard_link,
+                                monitor=monitor):
+            _, file_name, time_coverage_start, time_coverage_end = selected_file_list[index]
+            local_ds.add_dataset(os.path.join(local_id, file_name), (time_coverage_start, time_coverage_end))
         monitor.done()
         return local_id
 
@@ -349,8 +558,10 @@ class LocalDataSource(DataSource):
 
     def add_dataset(self, file, time_coverage: TimeRangeLike.TYPE = None, update: bool = False,
                     extract_meta_info: bool = False):
-        if update or self._files.keys().isdisjoint([file]):
+        if update or self._get_files().keys().isdisjoint([file]):
             self._files[file] = time_coverage
+            self._index_file(file, time_coverage)
+            self._update_metadata_index(file)
             if time_coverage:
                 self._extend_temporal_coverage(time_coverage)
         self._files = OrderedDict(sorted(self._files.items(),
@@ -404,7 +615,7 @@ class LocalDataSource(DataSource):
     def reduce_temporal_coverage(self, time_coverage: TimeRangeLike.TYPE):
         files_to_remove = []
         time_range_to_be_removed = None
-        for file, time_range in self._files.items():
+        for file, time_range in self._get_files().items():
             if time_coverage[0] <= time_range[0] <= time_coverage[1] \
                     and time_coverage[0] <= time_range[1] <= time_coverage[1]:
                 files_to_remove.append(file)
@@ -416,9 +627,16 @@ class LocalDataSource(DataSource):
                 time_range_to_be_removed = (time_range_to_be_removed[0], time_range[0])
             elif time_coverage[0] <= time_range[1] <= time_coverage[1]:
                 time_range_to_be_removed = time_range[1], time_coverage[1]
+        metadata_index = self._get_metadata_index()
         for file in files_to_remove:
-            os.remove(os.path.join(self._data_store.data_store_path, file))
+            path = os.path.join(self._data_store.data_store_path, file)
+            os.remove(path)
             del self._files[file]
+            self._file_index.remove(file)
+            if metadata_index is not None:
+                metadata_index.remove(path)
+        if metadata_index is not None:
+            metadata_index.save()
         if time_range_to_be_removed:
             self._reduce_temporal_coverage(time_range_to_be_removed)
 
@@ -461,7 +679,7 @@ class LocalDataSource(DataSource):
 
     @property
     def info_string(self):
-        return 'Files: %s' % (' '.join(self._files))
+        return 'Files: %s' % (' '.join(self._get_files()))
 
     @property
     def is_complete(self) -> bool:
@@ -477,7 +695,7 @@ class LocalDataSource(DataSource):
         Check if DataSource is empty
 
         """
-        return not self._files or len(self._files) == 0
+        return not self._get_files() or len(self._files) == 0
 
     def set_completed(self, state: bool):
         """
@@ -493,7 +711,7 @@ class LocalDataSource(DataSource):
         return '<table style="border:0;">\n' \
                '<tr><td>Name</td><td><strong>%s</strong></td></tr>\n' \
                '<tr><td>Files</td><td><strong>%s</strong></td></tr>\n' \
-               '</table>\n' % (html.escape(self._id), html.escape(' '.join(self._files)))
+               '</table>\n' % (html.escape(self._id), html.escape(' '.join(self._get_files())))
 
     def to_json_dict(self):
         """
@@ -505,7 +723,8 @@ class LocalDataSource(DataSource):
         config = OrderedDict({
             'name': self._id,
             'meta_info': self._meta_info,
-            'files': [[item[0], item[1][0], item[1][1]] if item[1] else [item[0]] for item in self._files.items()]
+            'files': [[item[0], item[1][0], item[1][1]] if item[1] else [item[0]]
+                      for item in self._get_files().items()]
         })
         return config
 
@@ -515,7 +734,6 @@ class LocalDataSource(DataSource):
         Allows to deserialize (load from json) LocalDataSource object.
         """
         name = json_dict.get('name')
-        files = json_dict.get('files', None)
 
         variables = []
         temporal_coverage = None
@@ -538,6 +756,17 @@ class LocalDataSource(DataSource):
                 if temporal_coverage_start and temporal_coverage_end:
                     temporal_coverage = temporal_coverage_start, temporal_coverage_end
 
+        files_dict = cls.files_from_json_dict(json_dict)
+        return LocalDataSource(name, files_dict, data_store, temporal_coverage, spatial_coverage, variables,
+                               meta_info=meta_info)
+
+    @classmethod
+    def files_from_json_dict(cls, json_dict: dict) -> Union[Sequence[str], OrderedDict]:
+        """
+        Get the files of a LocalDataSource from its JSON representation.
+        """
+        name = json_dict.get('name')
+        files = json_dict.get('files', None)
         files_dict = OrderedDict()
         if name and isinstance(files, list):
             if len(files) > 0:
@@ -554,15 +783,32 @@ class LocalDataSource(DataSource):
                                                  if len(item) > 1 else (item[0], None) for item in files)
                 else:
                     files_dict = files
-        return LocalDataSource(name, files_dict, data_store, temporal_coverage, spatial_coverage, variables,
-                               meta_info=meta_info)
+        return files_dict
 
 
 class LocalDataStore(DataStore):
+    """
+    A data store whose data sources are described by JSON files ``<ds_id>.json`` in the store directory.
+
+    As parsing the JSON files, which list all files of a data source, is slow for large stores, the store
+    directory also holds a summary index with the identifier, metadata, and coverage of every data source.
+    Data sources are created from the summary index, and their files are only loaded when needed.
+    Entries of the summary index are valid as long as the size and modification time of their JSON file
+    do not change.
+
+    :param ds_id: the data store identifier
+    :param store_dir: the store directory
+    """
+
     def __init__(self, ds_id: str, store_dir: str):
         super().__init__(ds_id, title='Local Data Sources', is_local=True)
         self._store_dir = store_dir
         self._data_sources = None
+        # Maps names of JSON files to summaries of their data sources
+        self._summary_index = None  # type: Optional[dict]
+        self._summary_index_modified = False
+        # Maps data source identifiers to the paths of their JSON files
+        self._json_paths = dict()
 
     def add_pattern(self, data_source_id: str, files: Union[str, Sequence[str]] = None) -> 'DataSource':
         data_source = self.create_data_source(data_source_id)
@@ -593,6 +839,12 @@ class LocalDataStore(DataStore):
         lock_file = os.path.join(self._store_dir, data_source.id + '.lock')
         if os.path.isfile(lock_file):
             os.remove(lock_file)
+        metadata_index_file = self.get_metadata_index_path(data_source.id)
+        if os.path.isfile(metadata_index_file):
+            os.remove(metadata_index_file)
+        if self._get_summary_index().pop(data_source.id + '.json', None) is not None:
+            self._summary_index_modified = True
+            self._save_summary_index()
         if remove_files:
             data_source_path = os.path.join(self._store_dir, data_source.id)
             if os.path.isdir(data_source_path):
@@ -602,7 +854,9 @@ class LocalDataStore(DataStore):
 
     def register_ds(self, data_source: LocalDataSource):
         data_source.set_completed(True)
+        data_source.save_metadata_index()
         self._data_sources.append(data_source)
+        self._save_summary_index()
 
     @classmethod
     def generate_uuid(cls, ref_id: str,
@@ -697,6 +951,13 @@ class LocalDataStore(DataStore):
         """Path to directory that stores the local data source files."""
         return self._store_dir
 
+    def get_metadata_index_path(self, data_source_id: str) -> str:
+        """
+        Path to the file that indexes the metadata of all files of a data source,
+        see :py:class:`cate.core.dsmetacache.DatasetMetadataIndex`.
+        """
+        return os.path.join(self._store_dir, data_source_id + '.index')
+
     def query(self, ds_id: str = None, query_expr: str = None, monitor: Monitor = Monitor.NONE) \
             -> Sequence[LocalDataSource]:
         self._init_data_sources()
@@ -725,23 +986,52 @@ class LocalDataStore(DataStore):
         if self._data_sources:
             return
         os.makedirs(self._store_dir, exist_ok=True)
-        json_files = [f for f in os.listdir(self._store_dir)
-                      if os.path.isfile(os.path.join(self._store_dir, f)) and f.endswith('.json')]
-        unfinished_ds = [f for f in os.listdir(self._store_dir)
-                         if os.path.isfile(os.path.join(self._store_dir, f)) and f.endswith('.lock')]
+        json_stats = OrderedDict()
+        unfinished_ds = set()
+        for entry in sorted(os.scandir(self._store_dir), key=lambda e: e.name):
+            if entry.name.endswith('.json') and entry.is_file():
+                json_stats[entry.name] = entry.stat()
+            elif entry.name.endswith('.lock') and entry.is_file():
+                unfinished_ds.add(entry.name)
         if skip_broken:
-            json_files = [f for f in json_files if f.replace('.json', '.lock') not in unfinished_ds]
+            json_stats = OrderedDict((f, stat) for f, stat in json_stats.items()
+                                     if f.replace('.json', '.lock') not in unfinished_ds)
+        summary_index = self._get_summary_index()
+        for json_file in list(summary_index.keys()):
+            if json_file not in json_stats:
+                del summary_index[json_file]
+                self._summary_index_modified = True
         self._data_sources = []
-        for json_file in json_files:
+        for json_file, stat in json_stats.items():
+            json_path = os.path.join(self._store_dir, json_file)
+            summary = summary_index.get(json_file)
             try:
-                data_source = self._load_data_source(os.path.join(self._store_dir, json_file))
+                if summary and summary['mtime'] == stat.st_mtime_ns and summary['size'] == stat.st_size:
+                    data_source = self._new_data_source_from_summary(summary)
+                else:
+                    data_source = self._load_data_source(json_path)
+                    if data_source:
+                        summary_index[json_file] = self._new_summary(data_source, stat)
+                        self._summary_index_modified = True
                 if data_source:
+                    self._json_paths[data_source.id] = json_path
                     self._data_sources.append(data_source)
             except DataAccessError as e:
                 if skip_broken:
                     warnings.warn(str(e), DataAccessWarning, stacklevel=0)
                 else:
                     raise e
+        self._save_summary_index()
+
+    def load_data_source_files(self, data_source_id: str) -> OrderedDict:
+        """
+        Load the files of the data source with the given identifier from its JSON file.
+
+        :param data_source_id: the data source identifier
+        :return: the files, mapped to their time coverage
+        """
+        json_path = self._json_paths.get(data_source_id, os.path.join(self._store_dir, data_source_id + '.json'))
+        return LocalDataSource.files_from_json_dict(self._load_json_file(json_path))
 
     def save_data_source(self, data_source, unlock: bool = False):
         self._save_data_source(data_source)
@@ -752,14 +1042,78 @@ class LocalDataStore(DataStore):
 
     def _save_data_source(self, data_source):
         json_dict = data_source.to_json_dict()
-        dump_kwargs = dict(indent='  ', default=self._json_default_serializer)
         file_name = os.path.join(self._store_dir, data_source.id + '.json')
         try:
-            with open(file_name, 'w') as fp:
-                json.dump(json_dict, fp, **dump_kwargs)
+            self._write_json_file(file_name, json_dict, indent='  ')
         except EnvironmentError as e:
             raise DataAccessError("Couldn't save data source config file {}\n"
                                   "{}".format(file_name, e), source=self) from e
+        self._json_paths[data_source.id] = file_name
+        # The summary is renewed from the JSON file when the data sources are loaded next time, so that it
+        # always equals the data source loaded from the JSON file
+        if self._get_summary_index().pop(data_source.id + '.json', None) is not None:
+            self._summary_index_modified = True
+
+    def _get_summary_index(self) -> dict:
+        if self._summary_index is None:
+            self._summary_index = dict()
+            self._summary_index_modified = False
+            index_path = os.path.join(self._store_dir, _SUMMARY_INDEX_FILE_NAME)
+            # noinspection PyBroadException
+            try:
+                with open(index_path) as fp:
+                    index = json.load(fp)
+                if index.get('version') == _SUMMARY_INDEX_VERSION:
+                    self._summary_index = index['data_sources']
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                warnings.warn('Cannot load data sources summary from {}, rebuilding it: {}'.format(index_path, e),
+                              DataAccessWarning, stacklevel=0)
+        return self._summary_index
+
+    def _save_summary_index(self) -> None:
+        if not self._summary_index_modified:
+            return
+        index_path = os.path.join(self._store_dir, _SUMMARY_INDEX_FILE_NAME)
+        try:
+            self._write_json_file(index_path,
+                                  dict(version=_SUMMARY_INDEX_VERSION, data_sources=self._summary_index))
+            self._summary_index_modified = False
+        except EnvironmentError as e:
+            # The summary index is rebuilt from the JSON files next time
+            warnings.warn('Cannot save data sources summary to {}: {}'.format(index_path, e),
+                          DataAccessWarning, stacklevel=0)
+
+    @staticmethod
+    def _new_summary(data_source: LocalDataSource, json_stat: os.stat_result) -> dict:
+        temporal_coverage = data_source.temporal_coverage()
+        spatial_coverage = data_source.spatial_coverage()
+        return dict(mtime=json_stat.st_mtime_ns,
+                    size=json_stat.st_size,
+                    name=data_source.id,
+                    meta_info=OrderedDict(data_source.meta_info),
+                    temporal_coverage=list(temporal_coverage) if temporal_coverage else None,
+                    spatial_coverage=PolygonLike.format(spatial_coverage) if spatial_coverage else None)
+
+    def _new_data_source_from_summary(self, summary: dict) -> LocalDataSource:
+        temporal_coverage = summary.get('temporal_coverage')
+        # The files are loaded when first needed
+        return LocalDataSource(summary['name'], None, self,
+                               temporal_coverage=tuple(temporal_coverage) if temporal_coverage else None,
+                               spatial_coverage=summary.get('spatial_coverage'),
+                               meta_info=summary.get('meta_info') or OrderedDict())
+
+    def _write_json_file(self, path: str, json_dict: dict, indent: str = None) -> None:
+        # Write to a temporary file first, so that readers never see a partially written file
+        temp_path = '%s.%s.incomplete' % (path, uuid.uuid4().hex)
+        try:
+            with open(temp_path, 'w') as fp:
+                json.dump(json_dict, fp, indent=indent, default=self._json_default_serializer)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
 
     def _load_data_source(self, json_path):
         json_dict = self._load_json_file(json_path)
@@ -768,6 +1122,7 @@ class LocalDataStore(DataStore):
 
     def invalidate(self):
         self._data_sources = None
+        self._summary_index = None
         self._init_data_sources()
 
     @staticmethod
@@ -41,7 +41,7 @@ from cate.core.types import VarNamesLike, DatasetLike, ValidationError, DimNames
 from cate.ops.normalize import adjust_temporal_attrs
 
 
-@op(tags=['aggregate', 'temporal'], version='1.0')
+@op(tags=['aggregate', 'temporal'], version='1.0', disk_cache=True)
 @op_input('ds', data_type=DatasetLike)
 @op_input('var', value_set_source='ds', data_type=VarNamesLike)
 @op_return(add_history=True)
@@ -90,13 +90,10 @@ def long_term_average(ds: DatasetLike.TYPE,
     time_min = pd.Timestamp(ds.time.values[0])
     time_max = pd.Timestamp(ds.time.values[-1])
 
-    total_work = 100
-
-    with monitor.starting('LTA', total_work=total_work):
-        monitor.progress(work=0)
-        step = total_work / 12
-        kwargs = {'monitor': monitor, 'step': step}
-        retset = retset.groupby('time.month', squeeze=False).apply(_mean, **kwargs)
+    with monitor.starting('LTA', total_work=1):
+        months = ds['time.month'].values
+        retset = _monthly_mean(retset, months)
+        monitor.progress(work=1)
 
     # Make the return dataset CF compliant
     retset = retset.rename({'month': 'time'})
@@ -122,20 +119,42 @@ def long_term_average(ds: DatasetLike.TYPE,
     return retset
 
 
-def _mean(ds: xr.Dataset, monitor: Monitor, step: float):
+def _monthly_mean(ds: xr.Dataset, months: np.ndarray) -> xr.Dataset:
     """
-    Calculate mean of the given dataset and update the given monitor.
+    Calculate the mean of the values of every month of the given dataset.
 
-    :param ds: Dataset to take the mean of
-    :param monitor: Monitor to update
-    :param step: Work step
-    """
-    retset = ds.mean(dim='time', keep_attrs=True)
-    monitor.progress(work=step)
-    return retset
+    The means of all months are computed at once, as matrix product of the data
+    variables and a matrix of the weights of every time step in every month,
+    so that dask reduces the blocks of a variable in place rather than by month.
+    Missing values are skipped. Data variables without a time dimension are kept,
+    non-numeric ones are dropped.
 
-
-@op(tags=['aggregate', 'temporal'], version='1.5')
+    :param ds: Dataset to average
+    :param months: The month of every time step of *ds*
+    :return: Dataset with a 'month' dimension of size 12 instead of 'time'
+    """
+    in_month = xr.DataArray((months[:, np.newaxis] == np.arange(1, 13)).astype(np.float64),
+                            dims=['time', 'month'])
+    data_vars = dict()
+    for name, var in ds.data_vars.items():
+        if 'time' not in var.dims:
+            data_vars[name] = var
+            continue
+        if not np.issubdtype(var.dtype, np.number):
+            continue
+        sums = xr.dot(var.fillna(0), in_month, dims='time')
+        counts = xr.dot(var.notnull().astype(np.float64), in_month, dims='time')
+        mean = sums / counts.where(counts > 0)
+        if np.issubdtype(var.dtype, np.floating):
+            mean = mean.astype(var.dtype)
+        mean = mean.transpose(*[('month' if dim == 'time' else dim) for dim in var.dims])
+        mean.attrs = dict(var.attrs)
+        data_vars[name] = mean
+    coords = {name: coord for name, coord in ds.coords.items() if 'time' not in coord.dims}
+    return xr.Dataset(data_vars, coords=coords, attrs=dict(ds.attrs))
+
+
+@op(tags=['aggregate', 'temporal'], version='1.5', disk_cache=True)
 @op_input('ds', data_type=DatasetLike)
 @op_input('method', value_set=['mean', 'max', 'median', 'prod', 'sum', 'std',
                                'var', 'argmax', 'argmin', 'first', 'last'])
@@ -28,6 +28,10 @@ Anomaly calculation operations
 Functions
 =========
 """
+import functools
+import os
+
+import numpy as np
 import xarray as xr
 
 from cate.core.op import op, op_return, op_input
@@ -39,6 +43,9 @@ from cate.core.types import TimeRangeLike, PolygonLike, ValidationError
 
 _ALL_FILE_FILTER = dict(name='All Files', extensions=['*'])
 
+#: The maximum number of reference datasets kept in memory
+_REFERENCE_CACHE_SIZE = 4
+
 
 @op(tags=['anomaly'], version='1.0')
 @op_input('file', file_open_mode='r', file_filters=[dict(name='NetCDF', extensions=['nc']), _ALL_FILE_FILTER])
@@ -79,49 +86,74 @@ def anomaly_external(ds: xr.Dataset,
         raise ValidationError('The dataset provided for anomaly calculation'
                               ' is required to have a time coordinate.')
 
-    clim = xr.open_dataset(file)
+    clim = _open_reference(file)
+    if clim.sizes.get('time') != 12:
+        raise ValidationError('The reference dataset provided for anomaly calculation'
+                              ' is required to have a time dimension of 12 slices,'
+                              ' one for each month.')
+
     ret = ds.copy()
     if transform:
         ret = ds_arithmetics(ds, transform)
-    # Group by months, subtract the appropriate slice from the reference
-    # Note that this requires that 'time' coordinate labels are of type
-    # datetime64[ns]
-    total_work = 100
-    step = 100 / 12
-
-    with monitor.starting('Anomaly', total_work=total_work):
-        monitor.progress(work=0)
-        kwargs = {'ref': clim, 'monitor': monitor, 'step': step}
-        ret = ret.groupby(ds['time.month']).apply(_group_anomaly,
-                                                  **kwargs)
-
-    # Running groupby results in a redundant 'month' variable being added to
-    # the dataset
-    ret = ret.drop('month')
+
+    with monitor.starting('Anomaly', total_work=1):
+        # Index the reference by the month of every time step of the dataset,
+        # and subtract it. Note that this requires that 'time' coordinate
+        # labels are of type datetime64[ns]
+        ref = _get_monthly_reference(clim, ds['time.month'].values, ret)
+        ret = diff(ret, ref)
+        monitor.progress(work=1)
+
     return ret
 
 
-def _group_anomaly(group: xr.Dataset,
-                   ref: xr.Dataset,
-                   monitor: Monitor = Monitor.NONE,
-                   step: float = None):
+def _open_reference(file: str) -> xr.Dataset:
     """
-    Calculate anomaly for the given group.
-
-    :param group: Result of a groupby('time.month') operation
-    :param ref: Reference dataset
-    :param monitor: Monitor of the parent method
-    :param step: Step to add to monitor progress
-    :return: Group dataset with anomaly calculation applied
+    Open the reference dataset *file*. The dataset is loaded into memory,
+    so that its file is closed, and reused until the file is modified.
     """
-    # Retrieve the month of the current group
-    month = group['time.month'][0].values
-    ret = diff(group, ref.isel(time=month - 1))
-    monitor.progress(work=step)
-    return ret
+    stat = os.stat(file)
+    return _open_reference_cached(os.path.abspath(file), stat.st_mtime_ns, stat.st_size)
 
 
-@op(tags=['anomaly'], version='1.0')
+@functools.lru_cache(maxsize=_REFERENCE_CACHE_SIZE)
+def _open_reference_cached(path: str, mtime: int, size: int) -> xr.Dataset:
+    # A reference holds 12 slices only. Loading it keeps no file open for
+    # cached references, and lets evicted ones simply be garbage collected
+    with xr.open_dataset(path) as clim:
+        return clim.load()
+
+
+def _get_monthly_reference(clim: xr.Dataset,
+                           months: np.ndarray,
+                           ds: xr.Dataset) -> xr.Dataset:
+    """
+    Get the reference for every time step of *ds*.
+
+    :param clim: Reference dataset of 12 time slices, one for each month
+    :param months: The month of every time step of *ds*
+    :param ds: The dataset to calculate anomalies from
+    :return: A dataset with the time coordinate of *ds*, holding the slice of
+    *clim* for the month of every time step
+    """
+    if 'time' in clim.coords:
+        clim = clim.drop('time')
+    ref = clim.isel(time=months - 1)
+    for name in ref.data_vars:
+        if name not in ds.data_vars or ds[name].chunks is None or 'time' not in ref[name].dims:
+            continue
+        # Select the slices of the reference lazily, and align its blocks with
+        # the blocks of the dataset, so that every block of the anomaly only
+        # reads the slices it needs
+        ds_var = ds[name]
+        chunks = {dim: dim_chunks for dim, dim_chunks in zip(ds_var.dims, ds_var.chunks)
+                  if ref[name].sizes.get(dim) == ds_var.sizes[dim]}
+        ref[name] = clim[name].chunk({'time': 1}).isel(time=months - 1).chunk(chunks)
+    ref['time'] = ds['time']
+    return ref
+
+
+@op(tags=['anomaly'], version='1.0', disk_cache=True)
 @op_input('time_range', data_type=TimeRangeLike)
 @op_input('region', data_type=PolygonLike)
 @op_return(add_history=True)
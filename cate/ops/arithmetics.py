@@ -202,7 +202,8 @@ def compute(ds: DatasetLike.TYPE,
     """
 
     if _ctx is not None and 'value_cache' in _ctx:
-        orig_namespace = dict(_ctx['value_cache'])
+        # Copy items() rather than the cache itself, which would leave lazy values of a ValueCache unloaded
+        orig_namespace = dict(_ctx['value_cache'].items())
     else:
         orig_namespace = dict()
 
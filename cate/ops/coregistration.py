@@ -46,7 +46,8 @@ from cate.ops.normalize import adjust_spatial_attrs
 
 
 @op(tags=['geometric', 'coregistration'],
-    version='1.1')
+    version='1.1',
+    disk_cache=True)
 @op_input('method_us', value_set=['nearest', 'linear'])
 @op_input('method_ds', value_set=['first', 'last', 'mean', 'mode', 'var', 'std'])
 @op_return(add_history=True)
@@ -192,26 +193,26 @@ def _within_bounds(array: np.ndarray, low_bound) -> bool:
     return (array[0] >= low_bound and array[-1] <= abs(low_bound))
 
 
-def _resample_slice(arr_slice: xr.DataArray, w: int, h: int, ds_method: int, us_method: int, parent_monitor: Monitor) -> xr.DataArray:
+def _resample_block(block: np.ndarray, w: int, h: int, ds_method: int, us_method: int,
+                    result_dtype: np.dtype) -> np.ndarray:
     """
-    Resample a single time slice of a larger xr.DataArray
+    Resample all spatial slices of a single dask block, whose last two dimensions are lat and lon
 
-    :param arr_slice: xr.DataArray single slice
+    :param block: np.ndarray holding complete spatial slices
     :param w: The desired new width (amount of longitudes)
     :param h: The desired new height (amount of latitudes)
     :param ds_method: Downsampling method, see resampling.py
     :param us_method: Upsampling method, see resampling.py
-    :param parent_monitor: the parent progress monitor.
-    :return: resampled slice
+    :param result_dtype: The data type of the result
+    :return: resampled block, invalid values are NaN
     """
-    monitor = parent_monitor.child(1)
-    with monitor.observing("resample slice"):
-        result = resampling.resample_2d(np.ma.masked_invalid(arr_slice.values),
-                                        w,
-                                        h,
-                                        ds_method,
-                                        us_method)
-        return xr.DataArray(result)
+    # All spatial slices are resampled by a single call
+    resampled = resampling.resample_2d(np.ma.masked_invalid(block),
+                                       w,
+                                       h,
+                                       ds_method,
+                                       us_method)
+    return np.ma.filled(np.ma.asarray(resampled).astype(result_dtype), np.nan)
 
 
 def _resample_array(array: xr.DataArray, lon: xr.DataArray, lat: xr.DataArray, method_us: int,
@@ -219,6 +220,12 @@ def _resample_array(array: xr.DataArray, lon: xr.DataArray, lat: xr.DataArray, m
     """
     Resample the given xr.DataArray to a new grid defined by lat and lon
 
+    The result is a lazy, dask-backed array. Every dask block holds complete spatial
+    slices, so that blocks are resampled independently and in parallel when the
+    result is computed. Blocks are only split along the non-spatial dimensions,
+    following the chunks of the given array, or one slice per block if it is not
+    dask-backed.
+
     :param array: xr.DataArray with lat,lon and time coordinates
     :param lat: 'lat' xr.DataArray attribute for the new grid
     :param lon: 'lon' xr.DataArray attribute for the new grid
@@ -233,41 +240,37 @@ def _resample_array(array: xr.DataArray, lon: xr.DataArray, lat: xr.DataArray, m
 
     monitor = parent_monitor.child(1)
 
-    kwargs = {'w': width, 'h': height, 'ds_method': method_ds, 'us_method': method_us, 'parent_monitor': monitor}
-
-    groupby_list = list(array.dims)
-    for dim in ['lon', 'lat']:
-        groupby_list.remove(dim)
-
-    if 0 == len(groupby_list):
-        # a 2d dataset, can't do groupby => do a simple slice resample
-        with monitor.starting("coregister dataarray", total_work=1):
-            temp_array = _resample_slice(array, **kwargs)
-            coords = {'lat': lat, 'lon': lon}
-            return xr.DataArray(temp_array.values,
-                                name=array.name,
-                                dims=array.dims,
-                                coords=coords,
-                                attrs=array.attrs).chunk()
-
-    num_steps = 1
-    for dim in groupby_list:
-        num_steps = num_steps * len(array[dim])
-
-    with monitor.starting("coregister dataarray", total_work=num_steps):
-        temp_array = _nested_groupby_apply(array, groupby_list, _resample_slice, kwargs)
-        chunks = {'lat': height, 'lon': width}
-        coords = {'lat': lat, 'lon': lon}
-        for dim in groupby_list:
-            coords[dim] = array[dim]
+    with monitor.starting("coregister dataarray", total_work=1):
+        other_dims = [dim for dim in array.dims if dim not in ('lat', 'lon')]
+
+        chunks = {'lat': array.sizes['lat'], 'lon': array.sizes['lon']}
+        if array.chunks is None:
             # One spatial slice is one dask chunk, e.g. chunking is
             # (1,1,1..1,len(lat),len(lon))
-            chunks[dim] = 1
-        return xr.DataArray(temp_array.values,
-                            name=array.name,
-                            dims=array.dims,
-                            coords=coords,
-                            attrs=array.attrs).chunk(chunks=chunks)
+            chunks.update({dim: 1 for dim in other_dims})
+        source = array.transpose(*(other_dims + ['lat', 'lon'])).chunk(chunks=chunks).data
+
+        # Invalid values are represented by NaN, hence integer data becomes floating point
+        dtype = array.dtype if np.issubdtype(array.dtype, np.floating) else np.dtype(np.float64)
+        resampled = source.map_blocks(_resample_block,
+                                      w=width,
+                                      h=height,
+                                      ds_method=method_ds,
+                                      us_method=method_us,
+                                      result_dtype=dtype,
+                                      dtype=dtype,
+                                      chunks=source.chunks[:-2] + ((height,), (width,)))
+
+        coords = {'lat': lat, 'lon': lon}
+        for dim in other_dims:
+            coords[dim] = array[dim]
+        result = xr.DataArray(resampled,
+                              name=array.name,
+                              dims=other_dims + ['lat', 'lon'],
+                              coords=coords,
+                              attrs=array.attrs).transpose(*array.dims)
+        monitor.progress(1)
+        return result
 
 
 def _resample_dataset(ds_master: xr.Dataset, ds_slave: xr.Dataset, method_us: int, method_ds: int, monitor: Monitor) -> xr.Dataset:
@@ -369,25 +372,3 @@ def _find_intersection(first: np.ndarray,
                               ' coregistration on')
 
     return (minimum, maximum)
-
-
-def _nested_groupby_apply(array: xr.DataArray,
-                          groupby: list,
-                          apply_fn: object,
-                          kwargs: dict):
-    """
-    Perform a nested groupby over given dimensions and apply a function on the
-    last 'slice'
-
-    :param array: xr.DataArray to perform groupby on
-    :param groupby: a list of coordinate labels over which to perform groupby
-    :param apply_fn: The function to apply
-    :return: groupby-split-appy result
-    """
-    if len(groupby) == 1:
-        return array.groupby(groupby[0]).apply(apply_fn, **kwargs)
-    else:
-        return array.groupby(groupby[0]).apply(_nested_groupby_apply,
-                                               groupby=groupby[1:],
-                                               apply_fn=apply_fn,
-                                               kwargs=kwargs)
@@ -29,7 +29,7 @@ Functions
 =========
 """
 
-
+import dask.array as da
 import numpy as np
 import pandas as pd
 import xarray as xr
@@ -51,6 +51,14 @@ from cate.util.monitor import Monitor
 
 from cate.ops.normalize import adjust_spatial_attrs
 
+#: The maximum size in bytes of the blocks in which in-memory arrays are correlated
+_MAX_BLOCK_SIZE = 64 * 1024 * 1024
+
+#: Indices of the moments accumulated for every lon/lat point: the number of valid (x, y) pairs,
+#: the means of x and y, the sums of squared deviations of x and y from their means,
+#: and the sum of products of the deviations of x and y
+_N, _MEAN_X, _MEAN_Y, _M2_X, _M2_Y, _C_XY = range(6)
+
 
 @op(tags=['utility', 'correlation'])
 @op_input('ds_x', data_type=DatasetLike)
@@ -112,7 +120,7 @@ def pearson_correlation_scalar(ds_x: DatasetLike.TYPE,
     return pd.DataFrame({'corr_coef': [cc], 'p_value': [pv]})
 
 
-@op(tags=['utility', 'correlation'], version='1.0')
+@op(tags=['utility', 'correlation'], version='1.0', disk_cache=True)
 @op_input('ds_x', data_type=DatasetLike)
 @op_input('ds_y', data_type=DatasetLike)
 @op_input('var_x', value_set_source='ds_x', data_type=VarName)
@@ -172,7 +180,7 @@ def pearson_correlation(ds_x: DatasetLike.TYPE,
                                   ' of a 3D lon/lat/time dataset and a 1D timeseries'
                                   ' is provided.')
 
-        if array_x.values.shape != array_y.values.shape:
+        if array_x.shape != array_y.shape:
             raise ValidationError('The provided variables {} and {} do not have the'
                                   ' same shape, Pearson correlation can not be'
                                   ' performed. Please review operation'
@@ -231,6 +239,11 @@ def _pearsonr(x: xr.DataArray, y: xr.DataArray, monitor: Monitor) -> xr.Dataset:
     as the one computed from these datasets. The p-values are not entirely
     reliable but are probably reasonable for datasets larger than 500 or so.
 
+    The calculation is a dask reduction along the time dimension that reads x and y
+    once, block by block, and accumulates the moments of every lon/lat point.
+    Hence, memory use is bounded by the block size rather than the size of x and y.
+    Time steps where x or y is NaN are ignored.
+
     :param x: lon/lat/time xr.DataArray
     :param y: xr.DataArray of the same spatiotemporal extents and resolution as x.
     :param monitor: Monitor to use for monitoring the calculation
@@ -241,52 +254,121 @@ def _pearsonr(x: xr.DataArray, y: xr.DataArray, monitor: Monitor) -> xr.Dataset:
     ----------
     http://www.statsoft.com/textbook/glosp.html#Pearson%20Correlation
     """
-    with monitor.starting("Calculate Pearson correlation", total_work=6):
-        n = len(x['time'])
-
-        xm, ym = x - x.mean(dim='time'), y - y.mean(dim='time')
-        xm_ym = xm * ym
-        r_num = xm_ym.sum(dim='time')
-        xm_squared = xr.ufuncs.square(xm)
-        ym_squared = xr.ufuncs.square(ym)
-        r_den = xr.ufuncs.sqrt(xm_squared.sum(dim='time') *
-                               ym_squared.sum(dim='time'))
-        r_den = r_den.where(r_den != 0)
-        r = r_num / r_den
+    # The lon/lat grid is given by the 3D array, the other one may be a 1D timeseries
+    grid, other = (x, y) if len(x.dims) >= len(y.dims) else (y, x)
+    dims = [dim for dim in grid.dims if dim != 'time']
+    shape = (grid.sizes['time'],) + tuple(grid.sizes[dim] for dim in dims)
+
+    grid_data = _get_time_major_data(grid, dims, shape)
+    other_data = _get_time_major_data(other, dims, shape).rechunk(grid_data.chunks)
+    x_data, y_data = (grid_data, other_data) if grid is x else (other_data, grid_data)
+
+    # Stack x and y, so that every block holds the same time steps and lon/lat points of both
+    xy = da.stack([x_data, y_data]).rechunk({0: 2})
+    corr = da.reduction(xy, _moments_chunk, _pearsonr_aggregate, axis=1, combine=_moments_combine,
+                        dtype=np.float64)
+
+    with monitor.observing("Calculate Pearson correlation"):
+        r_values, prob_values = corr.compute()
+
+    coords = {name: coord for name, coord in grid.coords.items() if 'time' not in coord.dims}
+    r = xr.DataArray(r_values, dims=dims, coords=coords)
+    r.attrs = {'description': 'Correlation coefficients between'
+               ' {} and {}.'.format(x.name, y.name)}
+    prob = xr.DataArray(prob_values, dims=dims, coords=coords)
+    prob.attrs = {'description': 'Rough indicator of probability of an'
+                  ' uncorrelated system producing datasets that have a Pearson'
+                  ' correlation at least as extreme as the one computed from'
+                  ' these datsets. Not entirely reliable, but reasonable for'
+                  ' datasets larger than 500 or so.'}
+
+    retset = xr.Dataset({'corr_coef': r,
+                         'p_value': prob})
+    return retset
+
 
+def _get_time_major_data(array: xr.DataArray, dims, shape) -> da.Array:
+    """
+    Get the data of *array* as a dask array of the given *shape*, whose dimensions are time
+    followed by *dims*. A 1D timeseries is broadcast to *shape*.
+    """
+    if len(array.dims) == 1:
+        data = array.data.reshape((shape[0],) + (len(dims) * (1,)))
+    else:
+        data = array.transpose('time', *dims).data
+    if not isinstance(data, da.Array):
+        time_step_size = max(int(np.prod(data.shape[1:])) * data.dtype.itemsize, 1)
+        time_chunk_size = max(_MAX_BLOCK_SIZE // time_step_size, 1)
+        data = da.from_array(data, chunks=(time_chunk_size,) + data.shape[1:])
+    return da.broadcast_to(data, shape)
+
+
+def _moments_chunk(xy: np.ndarray, axis=None, keepdims=None, **kwargs) -> np.ndarray:
+    """
+    Compute the moments of a block of stacked x and y, whose time dimension is axis 1.
+    Returns the moments stacked along axis 0, in the order given by _N, ..., _C_XY.
+    """
+    x = xy[0:1]
+    y = xy[1:2]
+    valid = np.isfinite(x) & np.isfinite(y)
+    n = valid.sum(axis=1, keepdims=True).astype(np.float64)
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, y, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.where(n > 0, x.sum(axis=1, keepdims=True) / n, 0.0)
+        mean_y = np.where(n > 0, y.sum(axis=1, keepdims=True) / n, 0.0)
+    dx = np.where(valid, x - mean_x, 0.0)
+    dy = np.where(valid, y - mean_y, 0.0)
+    return np.concatenate([n,
+                           mean_x,
+                           mean_y,
+                           (dx * dx).sum(axis=1, keepdims=True),
+                           (dy * dy).sum(axis=1, keepdims=True),
+                           (dx * dy).sum(axis=1, keepdims=True)])
+
+
+def _moments_combine(moments: np.ndarray, axis=None, keepdims=None, **kwargs) -> np.ndarray:
+    """
+    Combine the moments of multiple blocks, concatenated along axis 1, into the moments of their union.
+    Deviations are accumulated relative to the combined means, which avoids the loss of precision of
+    accumulating raw sums of squares.
+    """
+    n_i = moments[_N:_N + 1]
+    n = n_i.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        w_i = np.where(n > 0, n_i / n, 0.0)
+    mean_x = (w_i * moments[_MEAN_X:_MEAN_X + 1]).sum(axis=1, keepdims=True)
+    mean_y = (w_i * moments[_MEAN_Y:_MEAN_Y + 1]).sum(axis=1, keepdims=True)
+    dmean_x = moments[_MEAN_X:_MEAN_X + 1] - mean_x
+    dmean_y = moments[_MEAN_Y:_MEAN_Y + 1] - mean_y
+    m2_x = (moments[_M2_X:_M2_X + 1] + n_i * dmean_x * dmean_x).sum(axis=1, keepdims=True)
+    m2_y = (moments[_M2_Y:_M2_Y + 1] + n_i * dmean_y * dmean_y).sum(axis=1, keepdims=True)
+    c_xy = (moments[_C_XY:_C_XY + 1] + n_i * dmean_x * dmean_y).sum(axis=1, keepdims=True)
+    return np.concatenate([n, mean_x, mean_y, m2_x, m2_y, c_xy])
+
+
+def _pearsonr_aggregate(moments: np.ndarray, axis=None, keepdims=None, **kwargs) -> np.ndarray:
+    """
+    Compute the correlation coefficients and p-values from the moments of multiple blocks,
+    concatenated along axis 1. Returns them stacked along axis 0.
+    """
+    moments = _moments_combine(moments)
+    # Drop the time dimension
+    moments = moments.reshape(moments.shape[:1] + moments.shape[2:])
+    n = moments[_N:_N + 1]
+
+    # Comparing with NaN produces warnings that can be safely ignored
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r_den = np.sqrt(moments[_M2_X:_M2_X + 1] * moments[_M2_Y:_M2_Y + 1])
+        r = np.where((r_den != 0) & (n >= 3), moments[_C_XY:_C_XY + 1] / r_den, np.nan)
         # Presumably, if abs(r) > 1, then it is only some small artifact of floating
         # point arithmetic.
-        # At this point r should be a lon/lat dataArray, so it should be safe to
-        # load it in memory explicitly. This may take time as it will kick-start
-        # deferred processing.
-        # Comparing with NaN produces warnings that can be safely ignored
-        default_warning_settings = np.seterr(invalid='ignore')
-        with monitor.child(1).observing("task 1"):
-            negativ_r = r.values < -1.0
-        with monitor.child(1).observing("task 2"):
-            r.values[negativ_r] = -1.0
-        with monitor.child(1).observing("task 3"):
-            positiv_r = r.values > 1.0
-        with monitor.child(1).observing("task 4"):
-            r.values[positiv_r] = 1.0
-        np.seterr(**default_warning_settings)
-        r.attrs = {'description': 'Correlation coefficients between'
-                   ' {} and {}.'.format(x.name, y.name)}
+        r = np.clip(r, -1.0, 1.0)
 
         df = n - 2
-        t_squared = xr.ufuncs.square(r) * (df / ((1.0 - r.where(r != 1)) *
-                                                 (1.0 + r.where(r != -1))))
-        prob = df / (df + t_squared)
-        with monitor.child(1).observing("task 5"):
-            prob_values_in = prob.values
-        with monitor.child(1).observing("task 6"):
-            prob.values = betainc(0.5 * df, 0.5, prob_values_in)
-        prob.attrs = {'description': 'Rough indicator of probability of an'
-                      ' uncorrelated system producing datasets that have a Pearson'
-                      ' correlation at least as extreme as the one computed from'
-                      ' these datsets. Not entirely reliable, but reasonable for'
-                      ' datasets larger than 500 or so.'}
-
-        retset = xr.Dataset({'corr_coef': r,
-                             'p_value': prob})
-    return retset
+        r_open = np.where(np.abs(r) == 1.0, np.nan, r)
+        t_squared = r * r * (df / ((1.0 - r_open) * (1.0 + r_open)))
+        prob = betainc(0.5 * df, 0.5, df / (df + t_squared))
+    prob = np.where(np.isfinite(r), prob, np.nan)
+
+    return np.concatenate([r, prob])
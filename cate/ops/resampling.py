@@ -25,14 +25,21 @@ Description
 
 Provides various resampling methods including up- and downsampling.
 
+All functions resample the last two dimensions of their source array, hence stacks of 2-D grids, e.g. the time
+steps of a variable, are resampled by a single call. The source grid cell indices and weights contributing to every
+target grid cell are computed once for a given pair of source and target grid and reused for all grids of a stack
+and all subsequent calls. The grids of a stack are resampled in parallel, row by row.
+
 Components
 ==========
 """
 # http://stackoverflow.com/questions/7075082/what-is-future-in-python-used-for-and-how-when-to-use-it-and-how-it-works
 from __future__ import division
 
+import functools
+
 import numpy as np
-from numba import jit
+from numba import jit, prange
 
 #: Interpolation method for upsampling: Take nearest source grid cell, even if it is invalid.
 US_NEAREST = 10
@@ -61,17 +68,20 @@ DS_VAR = 57
 #: (see https://en.wikipedia.org/wiki/Mean_square_weighted_deviation), with weights given by contribution area.
 DS_STD = 58
 
-#: Constant indicating an empty 2-D mask
-_NOMASK2D = np.ma.getmaskarray(np.ma.array([[0]], mask=[[0]]))
+#: Constant indicating an empty mask of a stack of 2-D grids
+_NOMASK3D = np.zeros((1, 1, 1), dtype=np.bool_)
+
+#: The maximum number of cached resampling plans of grid axes
+_PLAN_CACHE_SIZE = 64
 
 _EPS = 1e-10
 
 
 def resample_2d(src, w, h, ds_method=DS_MEAN, us_method=US_LINEAR, fill_value=None, mode_rank=1, out=None):
     """
-    Resample a 2-D grid to a new resolution.
+    Resample a 2-D grid, or a stack of 2-D grids, to a new resolution.
 
-    :param src: 2-D *ndarray*
+    :param src: N-D *ndarray* with N >= 2, the last two dimensions are resampled
     :param w: *int*
         New grid width
     :param h:  *int*
@@ -87,7 +97,7 @@ def resample_2d(src, w, h, ds_method=DS_MEAN, us_method=US_LINEAR, fill_value=No
     :param mode_rank: *scalar*, optional
         The rank of the frequency determined by the *ds_method* ``DS_MODE``. One (the default) means
         most frequent value, zwo means second most frequent value, and so forth.
-    :param out: 2-D *ndarray*, optional
+    :param out: N-D *ndarray*, optional
         Alternate output array in which to place the result. The default is *None*; if provided, it must have the same
         shape as the expected output.
     :return: An resampled version of the *src* array.
@@ -95,17 +105,18 @@ def resample_2d(src, w, h, ds_method=DS_MEAN, us_method=US_LINEAR, fill_value=No
     out = _get_out(out, src, (h, w))
     if out is None:
         return src
-    mask, use_mask = _get_mask(src)
+    src_3d, mask, use_mask = _get_src_and_mask(src)
     fill_value = _get_fill_value(fill_value, src, out)
-    return _mask_or_not(_resample_2d(src, mask, use_mask, ds_method, us_method, fill_value, mode_rank, out),
-                        src, fill_value)
+    out_3d = _get_out_3d(out)
+    _resample_2d(src_3d, mask, use_mask, ds_method, us_method, fill_value, mode_rank, out_3d)
+    return _mask_or_not(_set_out(out, out_3d), src, fill_value)
 
 
 def upsample_2d(src, w, h, method=US_LINEAR, fill_value=None, out=None):
     """
-    Upsample a 2-D grid to a higher resolution by interpolating original grid cells.
+    Upsample a 2-D grid, or a stack of 2-D grids, to a higher resolution by interpolating original grid cells.
 
-    :param src: 2-D *ndarray*
+    :param src: N-D *ndarray* with N >= 2, the last two dimensions are upsampled
     :param w: *int*
         Grid width, which must be greater than or equal to *src.shape[-1]*
     :param h:  *int*
@@ -116,7 +127,7 @@ def upsample_2d(src, w, h, method=US_LINEAR, fill_value=None, out=None):
         If ``None``, it is taken from **src** if it is a masked array,
         otherwise from *out* if it is a masked array,
         otherwise numpy's default value is used.
-    :param out: 2-D *ndarray*, optional
+    :param out: N-D *ndarray*, optional
         Alternate output array in which to place the result. The default is *None*; if provided, it must have the same
         shape as the expected output.
     :return: An upsampled version of the *src* array.
@@ -124,16 +135,18 @@ def upsample_2d(src, w, h, method=US_LINEAR, fill_value=None, out=None):
     out = _get_out(out, src, (h, w))
     if out is None:
         return src
-    mask, use_mask = _get_mask(src)
+    src_3d, mask, use_mask = _get_src_and_mask(src)
     fill_value = _get_fill_value(fill_value, src, out)
-    return _mask_or_not(_upsample_2d(src, mask, use_mask, method, fill_value, out), src, fill_value)
+    out_3d = _get_out_3d(out)
+    _upsample_2d(src_3d, mask, use_mask, method, fill_value, out_3d)
+    return _mask_or_not(_set_out(out, out_3d), src, fill_value)
 
 
 def downsample_2d(src, w, h, method=DS_MEAN, fill_value=None, mode_rank=1, out=None):
     """
-    Downsample a 2-D grid to a lower resolution by aggregating original grid cells.
+    Downsample a 2-D grid, or a stack of 2-D grids, to a lower resolution by aggregating original grid cells.
 
-    :param src: 2-D *ndarray*
+    :param src: N-D *ndarray* with N >= 2, the last two dimensions are downsampled
     :param w: *int*
         Grid width, which must be less than or equal to *src.shape[-1]*
     :param h:  *int*
@@ -147,7 +160,7 @@ def downsample_2d(src, w, h, method=DS_MEAN, fill_value=None, mode_rank=1, out=N
     :param mode_rank: *scalar*, optional
         The rank of the frequency determined by the *method* ``DS_MODE``. One (the default) means
         most frequent value, zwo means second most frequent value, and so forth.
-    :param out: 2-D *ndarray*, optional
+    :param out: N-D *ndarray*, optional
         Alternate output array in which to place the result. The default is *None*; if provided, it must have the same
         shape as the expected output.
     :return: A downsampled version of the *src* array.
@@ -157,28 +170,47 @@ def downsample_2d(src, w, h, method=DS_MEAN, fill_value=None, mode_rank=1, out=N
     out = _get_out(out, src, (h, w))
     if out is None:
         return src
-    mask, use_mask = _get_mask(src)
+    src_3d, mask, use_mask = _get_src_and_mask(src)
     fill_value = _get_fill_value(fill_value, src, out)
-    return _mask_or_not(_downsample_2d(src, mask, use_mask, method, fill_value, mode_rank, out), src, fill_value)
+    out_3d = _get_out_3d(out)
+    _downsample_2d(src_3d, mask, use_mask, method, fill_value, mode_rank, out_3d)
+    return _mask_or_not(_set_out(out, out_3d), src, fill_value)
 
 
 def _get_out(out, src, shape):
+    if src.ndim < 2:
+        raise ValueError("'src' must have at least two dimensions")
+    shape = src.shape[:-2] + shape
+    if out is not None and out.shape != shape:
+        raise ValueError("'shape' and 'out' are incompatible")
+    if shape == src.shape:
+        return None
     if out is None:
         return np.zeros(shape, dtype=src.dtype)
-    else:
-        if out.shape != shape:
-            raise ValueError("'shape' and 'out' are incompatible")
-        if out.shape == src.shape:
-            return None
-        return out
+    return out
 
 
-def _get_mask(src):
-    if isinstance(src, np.ma.MaskedArray):
-        mask = np.ma.getmask(src)
-        if mask is not np.ma.nomask:
-            return mask, True
-    return _NOMASK2D, False
+def _get_src_and_mask(src):
+    """Get the data and mask of *src* as stacks of 2-D grids, and whether the mask is used."""
+    data = np.ma.getdata(src)
+    data = data.reshape((-1,) + data.shape[-2:])
+    if isinstance(src, np.ma.MaskedArray) and np.ma.getmask(src) is not np.ma.nomask:
+        return data, np.ma.getmaskarray(src).reshape(data.shape), True
+    return data, _NOMASK3D, False
+
+
+def _get_out_3d(out):
+    """Get the data of *out* as a stack of 2-D grids, a view of *out* if possible."""
+    data = np.ma.getdata(out)
+    return data.reshape((-1,) + data.shape[-2:])
+
+
+def _set_out(out, out_3d):
+    """Copy *out_3d* into *out*, unless it is a view of *out*."""
+    data = np.ma.getdata(out)
+    if not np.may_share_memory(data, out_3d):
+        data[...] = out_3d.reshape(data.shape)
+    return out
 
 
 def _mask_or_not(out, src, fill_value):
@@ -205,96 +237,173 @@ def _get_fill_value(fill_value, src, out):
     return fill_value
 
 
-# This function will be JIT-compiled by Numba with nopython=True,
-# therefore all arg types must be either primitive scalars or numpy arrays.
-# Key-value args are not allowed.
-#
-@jit(nopython=True)
+@functools.lru_cache(maxsize=_PLAN_CACHE_SIZE)
+def _get_upsampling_plan(src_size, out_size, method):
+    """
+    Get the plan for upsampling a grid axis of *src_size* cells to *out_size* cells.
+
+    :return: a tuple (i0, i1, w) of arrays of size *out_size*: every target cell is interpolated
+             between the source cells i0 and i1 with weight w of source cell i1.
+    """
+    i0 = np.zeros(out_size, dtype=np.int64)
+    i1 = np.zeros(out_size, dtype=np.int64)
+    w = np.zeros(out_size, dtype=np.float64)
+    if method == US_NEAREST:
+        scale = src_size / out_size
+        for out_i in range(out_size):
+            i0[out_i] = i1[out_i] = int(scale * out_i)
+    else:
+        scale = (src_size - 1.0) / ((out_size - 1.0) if out_size > 1 else 1.0)
+        for out_i in range(out_size):
+            src_f = scale * out_i
+            src_i = int(src_f)
+            i0[out_i] = src_i
+            i1[out_i] = src_i + 1 if src_i + 1 < src_size else src_i
+            w[out_i] = src_f - src_i
+    return _read_only(i0, i1, w)
+
+
+@functools.lru_cache(maxsize=_PLAN_CACHE_SIZE)
+def _get_downsampling_plan(src_size, out_size, weighted):
+    """
+    Get the plan for downsampling a grid axis of *src_size* cells to *out_size* cells.
+
+    :return: a tuple (i0, i1, w0, w1) of arrays of size *out_size*: every target cell aggregates the source
+             cells i0 to i1 (inclusive). If *weighted* is true, the first and last of them contribute with
+             weights w0 and w1, all others with weight one.
+    """
+    i0 = np.zeros(out_size, dtype=np.int64)
+    i1 = np.zeros(out_size, dtype=np.int64)
+    w0 = np.ones(out_size, dtype=np.float64)
+    w1 = np.ones(out_size, dtype=np.float64)
+    scale = src_size / out_size
+    for out_i in range(out_size):
+        src_f0 = scale * out_i
+        src_f1 = src_f0 + scale
+        src_i0 = int(src_f0)
+        src_i1 = int(src_f1)
+        if weighted:
+            w0[out_i] = 1.0 - (src_f0 - src_i0)
+            w1[out_i] = src_f1 - src_i1
+            if w1[out_i] < _EPS:
+                w1[out_i] = 1.0
+                if src_i1 > src_i0:
+                    src_i1 -= 1
+        elif src_i1 == src_f1 and src_i1 > src_i0:
+            src_i1 -= 1
+        i0[out_i] = src_i0
+        i1[out_i] = src_i1
+    return _read_only(i0, i1, w0, w1)
+
+
+def _read_only(*arrays):
+    # Plans are shared by all callers
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays
+
+
 def _resample_2d(src, mask, use_mask, ds_method, us_method, fill_value, mode_rank, out):
     src_w = src.shape[-1]
     src_h = src.shape[-2]
     out_w = out.shape[-1]
     out_h = out.shape[-2]
 
-    if out_w < src_w and out_h < src_h:
+    if out_w <= src_w and out_h <= src_h:
         return _downsample_2d(src, mask, use_mask, ds_method, fill_value, mode_rank, out)
-    elif out_w < src_w:
-        if out_h > src_h:
-            temp = np.zeros((src_h, out_w), dtype=src.dtype)
-            temp = _downsample_2d(src, mask, use_mask, ds_method, fill_value, mode_rank, temp)
-            # todo - write test & fix: must use mask=np.ma.getmaskarray(temp) here if use_mask==True
-            return _upsample_2d(temp, mask, use_mask, us_method, fill_value, out)
-        else:
-            return _downsample_2d(src, mask, use_mask, ds_method, fill_value, mode_rank, out)
-    elif out_h < src_h:
-        if out_w > src_w:
-            temp = np.zeros((out_h, src_w), dtype=src.dtype)
-            temp = _downsample_2d(src, mask, use_mask, ds_method, fill_value, mode_rank, temp)
-            # todo - write test & fix: must use mask=np.ma.getmaskarray(temp) here if use_mask==True
-            return _upsample_2d(temp, mask, use_mask, us_method, fill_value, out)
-        else:
-            return _downsample_2d(src, mask, use_mask, ds_method, fill_value, mode_rank, out)
-    elif out_w > src_w or out_h > src_h:
+    if out_w >= src_w and out_h >= src_h:
         return _upsample_2d(src, mask, use_mask, us_method, fill_value, out)
-    return src
+
+    # Downsample along one axis, then upsample along the other one
+    temp = np.zeros((src.shape[0], min(src_h, out_h), min(src_w, out_w)), dtype=src.dtype)
+    temp = _downsample_2d(src, mask, use_mask, ds_method, fill_value, mode_rank, temp)
+    if use_mask and np.isfinite(fill_value):
+        # Target cells without any valid source cell have been set to fill_value
+        temp_mask, temp_use_mask = temp == fill_value, True
+    else:
+        temp_mask, temp_use_mask = _NOMASK3D, False
+    return _upsample_2d(temp, temp_mask, temp_use_mask, us_method, fill_value, out)
 
 
-# This function will be JIT-compiled by Numba with nopython=True,
-# therefore all arg types must be either primitive scalars or numpy arrays.
-# Key-value args are not allowed.
-#
-@jit(nopython=True)
 def _upsample_2d(src, mask, use_mask, method, fill_value, out):
     src_w = src.shape[-1]
     src_h = src.shape[-2]
     out_w = out.shape[-1]
     out_h = out.shape[-2]
 
-    if src_w == out_w and src_h == out_h:
-        return src
-
     if out_w < src_w or out_h < src_h:
         raise ValueError("invalid target size")
+    if method != US_NEAREST and method != US_LINEAR:
+        raise ValueError('invalid upsampling method')
+
+    src_y0, src_y1, wy = _get_upsampling_plan(src_h, out_h, method)
+    src_x0, src_x1, wx = _get_upsampling_plan(src_w, out_w, method)
+    return _upsample_kernel(src, mask, use_mask, method, fill_value, src_y0, src_y1, wy, src_x0, src_x1, wx, out)
+
+
+def _downsample_2d(src, mask, use_mask, method, fill_value, mode_rank, out):
+    src_w = src.shape[-1]
+    src_h = src.shape[-2]
+    out_w = out.shape[-1]
+    out_h = out.shape[-2]
+
+    if out_w > src_w or out_h > src_h:
+        raise ValueError("invalid target size")
+    if method not in (DS_FIRST, DS_LAST, DS_MODE, DS_MEAN, DS_VAR, DS_STD):
+        raise ValueError('invalid downsampling method')
+
+    weighted = method != DS_FIRST and method != DS_LAST
+    src_y0, src_y1, wy0, wy1 = _get_downsampling_plan(src_h, out_h, weighted)
+    src_x0, src_x1, wx0, wx1 = _get_downsampling_plan(src_w, out_w, weighted)
+    return _downsample_kernel(src, mask, use_mask, method, fill_value, mode_rank,
+                              src_y0, src_y1, wy0, wy1, src_x0, src_x1, wx0, wx1, out)
+
+
+# This function will be JIT-compiled by Numba with nopython=True,
+# therefore all arg types must be either primitive scalars or numpy arrays.
+# Key-value args are not allowed.
+#
+# src, mask, and out are stacks of 2-D grids, all rows of all grids are computed in parallel.
+#
+@jit(nopython=True, parallel=True)
+def _upsample_kernel(src, mask, use_mask, method, fill_value, src_y0s, src_y1s, wys, src_x0s, src_x1s, wxs, out):
+    num_rows = out.shape[0] * out.shape[-2]
+    out_w = out.shape[-1]
+    out_h = out.shape[-2]
 
     if method == US_NEAREST:
-        scale_x = src_w / out_w
-        scale_y = src_h / out_h
-        for out_y in range(out_h):
-            src_y = int(scale_y * out_y)
+        for row in prange(num_rows):
+            i = row // out_h
+            out_y = row % out_h
+            src_y = src_y0s[out_y]
             for out_x in range(out_w):
-                src_x = int(scale_x * out_x)
-                value = src[src_y, src_x]
-                if np.isfinite(value) and not (use_mask and mask[src_y, src_x]):
-                    out[out_y, out_x] = value
+                src_x = src_x0s[out_x]
+                value = src[i, src_y, src_x]
+                if np.isfinite(value) and not (use_mask and mask[i, src_y, src_x]):
+                    out[i, out_y, out_x] = value
                 else:
-                    out[out_y, out_x] = fill_value
-
-    elif method == US_LINEAR:
-        scale_x = (src_w - 1.0) / ((out_w - 1.0) if out_w > 1 else 1.0)
-        scale_y = (src_h - 1.0) / ((out_h - 1.0) if out_h > 1 else 1.0)
-        for out_y in range(out_h):
-            src_yf = scale_y * out_y
-            src_y0 = int(src_yf)
-            wy = src_yf - src_y0
-            src_y1 = src_y0 + 1
-            if src_y1 >= src_h:
-                src_y1 = src_y0
+                    out[i, out_y, out_x] = fill_value
+
+    else:
+        for row in prange(num_rows):
+            i = row // out_h
+            out_y = row % out_h
+            src_y0 = src_y0s[out_y]
+            src_y1 = src_y1s[out_y]
+            wy = wys[out_y]
             for out_x in range(out_w):
-                src_xf = scale_x * out_x
-                src_x0 = int(src_xf)
-                wx = src_xf - src_x0
-                src_x1 = src_x0 + 1
-                if src_x1 >= src_w:
-                    src_x1 = src_x0
-                v00 = src[src_y0, src_x0]
-                v01 = src[src_y0, src_x1]
-                v10 = src[src_y1, src_x0]
-                v11 = src[src_y1, src_x1]
+                src_x0 = src_x0s[out_x]
+                src_x1 = src_x1s[out_x]
+                wx = wxs[out_x]
+                v00 = src[i, src_y0, src_x0]
+                v01 = src[i, src_y0, src_x1]
+                v10 = src[i, src_y1, src_x0]
+                v11 = src[i, src_y1, src_x1]
                 if use_mask:
-                    v00_ok = np.isfinite(v00) and not mask[src_y0, src_x0]
-                    v01_ok = np.isfinite(v01) and not mask[src_y0, src_x1]
-                    v10_ok = np.isfinite(v10) and not mask[src_y1, src_x0]
-                    v11_ok = np.isfinite(v11) and not mask[src_y1, src_x1]
+                    v00_ok = np.isfinite(v00) and not mask[i, src_y0, src_x0]
+                    v01_ok = np.isfinite(v01) and not mask[i, src_y0, src_x1]
+                    v10_ok = np.isfinite(v10) and not mask[i, src_y1, src_x0]
+                    v11_ok = np.isfinite(v11) and not mask[i, src_y1, src_x1]
                 else:
                     v00_ok = np.isfinite(v00)
                     v01_ok = np.isfinite(v01)
@@ -322,12 +431,9 @@ def _upsample_2d(src, mask, use_mask, method, fill_value, out):
                         ok = v11_ok
                         value = v11
                 if ok:
-                    out[out_y, out_x] = value
+                    out[i, out_y, out_x] = value
                 else:
-                    out[out_y, out_x] = fill_value
-
-    else:
-        raise ValueError('invalid upsampling method')
+                    out[i, out_y, out_x] = fill_value
 
     return out
 
@@ -336,89 +442,68 @@ def _upsample_2d(src, mask, use_mask, method, fill_value, out):
 # therefore all arg types must be either primitive scalars or numpy arrays.
 # Key-value args are not allowed.
 #
-@jit(nopython=True)
-def _downsample_2d(src, mask, use_mask, method, fill_value, mode_rank, out):
+# src, mask, and out are stacks of 2-D grids, all rows of all grids are computed in parallel.
+#
+@jit(nopython=True, parallel=True)
+def _downsample_kernel(src, mask, use_mask, method, fill_value, mode_rank,
+                       src_y0s, src_y1s, wy0s, wy1s, src_x0s, src_x1s, wx0s, wx1s, out):
+    num_rows = out.shape[0] * out.shape[-2]
     src_w = src.shape[-1]
     src_h = src.shape[-2]
     out_w = out.shape[-1]
     out_h = out.shape[-2]
 
-    if src_w == out_w and src_h == out_h:
-        return src
-
-    if out_w > src_w or out_h > src_h:
-        raise ValueError("invalid target size")
-
-    scale_x = src_w / out_w
-    scale_y = src_h / out_h
-
     if method == DS_FIRST or method == DS_LAST:
-        for out_y in range(out_h):
-            src_yf0 = scale_y * out_y
-            src_yf1 = src_yf0 + scale_y
-            src_y0 = int(src_yf0)
-            src_y1 = int(src_yf1)
-            if src_y1 == src_yf1 and src_y1 > src_y0:
-                src_y1 -= 1
+        for row in prange(num_rows):
+            i = row // out_h
+            out_y = row % out_h
+            src_y0 = src_y0s[out_y]
+            src_y1 = src_y1s[out_y]
             for out_x in range(out_w):
-                src_xf0 = scale_x * out_x
-                src_xf1 = src_xf0 + scale_x
-                src_x0 = int(src_xf0)
-                src_x1 = int(src_xf1)
-                if src_x1 == src_xf1 and src_x1 > src_x0:
-                    src_x1 -= 1
+                src_x0 = src_x0s[out_x]
+                src_x1 = src_x1s[out_x]
                 done = False
                 value = fill_value
                 for src_y in range(src_y0, src_y1 + 1):
                     for src_x in range(src_x0, src_x1 + 1):
-                        v = src[src_y, src_x]
-                        if np.isfinite(v) and not (use_mask and mask[src_y, src_x]):
+                        v = src[i, src_y, src_x]
+                        if np.isfinite(v) and not (use_mask and mask[i, src_y, src_x]):
                             value = v
                             if method == DS_FIRST:
                                 done = True
                                 break
                     if done:
                         break
-                out[out_y, out_x] = value
+                out[i, out_y, out_x] = value
 
     elif method == DS_MODE:
-        max_value_count = int(scale_x + 1) * int(scale_y + 1)
-        values = np.zeros((max_value_count,), dtype=src.dtype)
-        frequencies = np.zeros((max_value_count,), dtype=np.uint32)
-        for out_y in range(out_h):
-            src_yf0 = scale_y * out_y
-            src_yf1 = src_yf0 + scale_y
-            src_y0 = int(src_yf0)
-            src_y1 = int(src_yf1)
-            wy0 = 1.0 - (src_yf0 - src_y0)
-            wy1 = src_yf1 - src_y1
-            if wy1 < _EPS:
-                wy1 = 1.0
-                if src_y1 > src_y0:
-                    src_y1 -= 1
+        max_value_count = int(src_w / out_w + 1) * int(src_h / out_h + 1)
+        for row in prange(num_rows):
+            i = row // out_h
+            out_y = row % out_h
+            src_y0 = src_y0s[out_y]
+            src_y1 = src_y1s[out_y]
+            wy0 = wy0s[out_y]
+            wy1 = wy1s[out_y]
+            values = np.zeros((max_value_count,), dtype=src.dtype)
+            frequencies = np.zeros((max_value_count,), dtype=np.uint32)
             for out_x in range(out_w):
-                src_xf0 = scale_x * out_x
-                src_xf1 = src_xf0 + scale_x
-                src_x0 = int(src_xf0)
-                src_x1 = int(src_xf1)
-                wx0 = 1.0 - (src_xf0 - src_x0)
-                wx1 = src_xf1 - src_x1
-                if wx1 < _EPS:
-                    wx1 = 1.0
-                    if src_x1 > src_x0:
-                        src_x1 -= 1
+                src_x0 = src_x0s[out_x]
+                src_x1 = src_x1s[out_x]
+                wx0 = wx0s[out_x]
+                wx1 = wx1s[out_x]
                 value_count = 0
                 for src_y in range(src_y0, src_y1 + 1):
                     wy = wy0 if (src_y == src_y0) else wy1 if (src_y == src_y1) else 1.0
                     for src_x in range(src_x0, src_x1 + 1):
                         wx = wx0 if (src_x == src_x0) else wx1 if (src_x == src_x1) else 1.0
-                        v = src[src_y, src_x]
-                        if np.isfinite(v) and not (use_mask and mask[src_y, src_x]):
+                        v = src[i, src_y, src_x]
+                        if np.isfinite(v) and not (use_mask and mask[i, src_y, src_x]):
                             w = wx * wy
                             found = False
-                            for i in range(value_count):
-                                if v == values[i]:
-                                    frequencies[i] += w
+                            for j in range(value_count):
+                                if v == values[j]:
+                                    frequencies[j] += w
                                     found = True
                                     break
                             if not found:
@@ -428,88 +513,68 @@ def _downsample_2d(src, mask, use_mask, method, fill_value, mode_rank, out):
                 w_max = -1.
                 value = fill_value
                 if mode_rank == 1:
-                    for i in range(value_count):
-                        w = frequencies[i]
+                    for j in range(value_count):
+                        w = frequencies[j]
                         if w > w_max:
                             w_max = w
-                            value = values[i]
+                            value = values[j]
                 elif mode_rank <= max_value_count:
                     max_frequencies = np.full(mode_rank, -1.0, dtype=np.float64)
                     indices = np.zeros(mode_rank, dtype=np.int64)
-                    for i in range(value_count):
-                        w = frequencies[i]
-                        for j in range(mode_rank):
-                            if w > max_frequencies[j]:
-                                max_frequencies[j] = w
-                                indices[j] = i
+                    for j in range(value_count):
+                        w = frequencies[j]
+                        for k in range(mode_rank):
+                            if w > max_frequencies[k]:
+                                max_frequencies[k] = w
+                                indices[k] = j
                                 break
                     value = values[indices[mode_rank - 1]]
 
-                out[out_y, out_x] = value
+                out[i, out_y, out_x] = value
 
     elif method == DS_MEAN:
-        for out_y in range(out_h):
-            src_yf0 = scale_y * out_y
-            src_yf1 = src_yf0 + scale_y
-            src_y0 = int(src_yf0)
-            src_y1 = int(src_yf1)
-            wy0 = 1.0 - (src_yf0 - src_y0)
-            wy1 = src_yf1 - src_y1
-            if wy1 < _EPS:
-                wy1 = 1.0
-                if src_y1 > src_y0:
-                    src_y1 -= 1
+        for row in prange(num_rows):
+            i = row // out_h
+            out_y = row % out_h
+            src_y0 = src_y0s[out_y]
+            src_y1 = src_y1s[out_y]
+            wy0 = wy0s[out_y]
+            wy1 = wy1s[out_y]
             for out_x in range(out_w):
-                src_xf0 = scale_x * out_x
-                src_xf1 = src_xf0 + scale_x
-                src_x0 = int(src_xf0)
-                src_x1 = int(src_xf1)
-                wx0 = 1.0 - (src_xf0 - src_x0)
-                wx1 = src_xf1 - src_x1
-                if wx1 < _EPS:
-                    wx1 = 1.0
-                    if src_x1 > src_x0:
-                        src_x1 -= 1
+                src_x0 = src_x0s[out_x]
+                src_x1 = src_x1s[out_x]
+                wx0 = wx0s[out_x]
+                wx1 = wx1s[out_x]
                 v_sum = 0.0
                 w_sum = 0.0
                 for src_y in range(src_y0, src_y1 + 1):
                     wy = wy0 if (src_y == src_y0) else wy1 if (src_y == src_y1) else 1.0
                     for src_x in range(src_x0, src_x1 + 1):
                         wx = wx0 if (src_x == src_x0) else wx1 if (src_x == src_x1) else 1.0
-                        v = src[src_y, src_x]
-                        if np.isfinite(v) and not (use_mask and mask[src_y, src_x]):
+                        v = src[i, src_y, src_x]
+                        if np.isfinite(v) and not (use_mask and mask[i, src_y, src_x]):
                             w = wx * wy
                             v_sum += w * v
                             w_sum += w
                 if w_sum < _EPS:
-                    out[out_y, out_x] = fill_value
+                    out[i, out_y, out_x] = fill_value
                 else:
-                    out[out_y, out_x] = v_sum / w_sum
-
-    elif method == DS_VAR or method == DS_STD:
-        for out_y in range(out_h):
-            src_yf0 = scale_y * out_y
-            src_yf1 = src_yf0 + scale_y
-            src_y0 = int(src_yf0)
-            src_y1 = int(src_yf1)
-            wy0 = 1.0 - (src_yf0 - src_y0)
-            wy1 = src_yf1 - src_y1
-            if wy1 < _EPS:
-                wy1 = 1.0
-                if src_y1 > src_y0:
-                    src_y1 -= 1
+                    out[i, out_y, out_x] = v_sum / w_sum
+
+    else:
+        # DS_VAR or DS_STD
+        for row in prange(num_rows):
+            i = row // out_h
+            out_y = row % out_h
+            src_y0 = src_y0s[out_y]
+            src_y1 = src_y1s[out_y]
+            wy0 = wy0s[out_y]
+            wy1 = wy1s[out_y]
             for out_x in range(out_w):
-                src_xf0 = scale_x * out_x
-                src_xf1 = src_xf0 + scale_x
-                src_x0 = int(src_xf0)
-                src_x1 = int(src_xf1)
-                wx0 = 1.0 - (src_xf0 - src_x0)
-                wx1 = src_xf1 - src_x1
-                if wx1 < _EPS:
-                    wx1 = 1.0
-                    if src_x1 > src_x0:
-                        src_x1 -= 1
-                v_sum = 0.0
+                src_x0 = src_x0s[out_x]
+                src_x1 = src_x1s[out_x]
+                wx0 = wx0s[out_x]
+                wx1 = wx1s[out_x]
                 w_sum = 0.0
                 wv_sum = 0.0
                 wvv_sum = 0.0
@@ -517,20 +582,18 @@ def _downsample_2d(src, mask, use_mask, method, fill_value, mode_rank, out):
                     wy = wy0 if (src_y == src_y0) else wy1 if (src_y == src_y1) else 1.0
                     for src_x in range(src_x0, src_x1 + 1):
                         wx = wx0 if (src_x == src_x0) else wx1 if (src_x == src_x1) else 1.0
-                        v = src[src_y, src_x]
-                        if np.isfinite(v) and not (use_mask and mask[src_y, src_x]):
+                        v = src[i, src_y, src_x]
+                        if np.isfinite(v) and not (use_mask and mask[i, src_y, src_x]):
                             w = wx * wy
-                            v_sum += v
                             w_sum += w
                             wv_sum += w * v
                             wvv_sum += w * v * v
                 if w_sum < _EPS:
-                    out[out_y, out_x] = fill_value
+                    value = fill_value
                 else:
-                    out[out_y, out_x] = (wvv_sum * w_sum - wv_sum * wv_sum) / w_sum / w_sum
-        if method == DS_STD:
-            out = np.sqrt(out)
-    else:
-        raise ValueError('invalid downsampling method')
+                    value = (wvv_sum * w_sum - wv_sum * wv_sum) / w_sum / w_sum
+                if method == DS_STD:
+                    value = np.sqrt(value)
+                out[i, out_y, out_x] = value
 
     return out
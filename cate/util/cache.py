@@ -48,11 +48,14 @@ Components
 ==========
 """
 
+import heapq
 import os
 import os.path
+import random
 import sys
 import time
 from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
 from threading import RLock
 
 __author__ = "Norman Fomferra (Brockmann Consult GmbH)"
@@ -227,10 +230,168 @@ POLICY_RR = _policy_rr
 _T0 = time.clock()
 
 
+class _ItemIndex(metaclass=ABCMeta):
+    """
+    Cache-private index over the items of a cache which determines the next item to be discarded.
+    """
+
+    @abstractmethod
+    def add(self, item) -> None:
+        """Add a new *item*."""
+
+    @abstractmethod
+    def remove(self, item) -> None:
+        """Remove an existing *item*."""
+
+    @abstractmethod
+    def touch(self, item) -> None:
+        """Notify that an existing *item* has been accessed."""
+
+    @abstractmethod
+    def next_victim(self):
+        """Return the item to be discarded next, or ``None`` if the index is empty."""
+
+
+class _RecencyItemIndex(_ItemIndex):
+    """
+    Items ordered by access time. O(1) for all operations.
+    """
+
+    def __init__(self, most_recent_first: bool):
+        self._items = OrderedDict()
+        self._most_recent_first = most_recent_first
+
+    def add(self, item) -> None:
+        self._items[item.key] = item
+
+    def remove(self, item) -> None:
+        del self._items[item.key]
+
+    def touch(self, item) -> None:
+        self._items.move_to_end(item.key)
+
+    def next_victim(self):
+        if not self._items:
+            return None
+        key = next(reversed(self._items)) if self._most_recent_first else next(iter(self._items))
+        return self._items[key]
+
+
+class _FrequencyItemIndex(_ItemIndex):
+    """
+    Items grouped into buckets of equal access count. Within a bucket, items are ordered by access time.
+    O(1) for adding, removing, and touching items, O(log n) for finding the next victim.
+    """
+
+    def __init__(self):
+        self._buckets = dict()
+        self._item_counts = dict()
+        # Min-heap of access counts with lazy deletion of counts whose bucket became empty
+        self._counts_heap = []
+
+    def add(self, item) -> None:
+        self._add(item, item.access_count)
+
+    def remove(self, item) -> None:
+        count = self._item_counts.pop(item.key)
+        bucket = self._buckets[count]
+        del bucket[item.key]
+        if not bucket:
+            del self._buckets[count]
+
+    def touch(self, item) -> None:
+        self.remove(item)
+        self._add(item, item.access_count)
+
+    def next_victim(self):
+        heap = self._counts_heap
+        while heap and heap[0] not in self._buckets:
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        return next(iter(self._buckets[heap[0]].values()))
+
+    def _add(self, item, count: int) -> None:
+        bucket = self._buckets.get(count)
+        if bucket is None:
+            bucket = OrderedDict()
+            self._buckets[count] = bucket
+            heapq.heappush(self._counts_heap, count)
+        bucket[item.key] = item
+        self._item_counts[item.key] = count
+
+
+class _RandomItemIndex(_ItemIndex):
+    """
+    Items stored in an array that is indexed by key. O(1) for all operations.
+    """
+
+    def __init__(self):
+        self._items = []
+        self._positions = dict()
+        self._random = random.Random()
+
+    def add(self, item) -> None:
+        self._positions[item.key] = len(self._items)
+        self._items.append(item)
+
+    def remove(self, item) -> None:
+        # Move last item into the position of the removed one
+        position = self._positions.pop(item.key)
+        last_item = self._items.pop()
+        if last_item is not item:
+            self._items[position] = last_item
+            self._positions[last_item.key] = position
+
+    def touch(self, item) -> None:
+        pass
+
+    def next_victim(self):
+        return self._items[self._random.randrange(len(self._items))] if self._items else None
+
+
+class _SortingItemIndex(_ItemIndex):
+    """
+    Items ranked by a user-defined policy function. O(n) for finding the next victim, O(1) otherwise.
+    """
+
+    def __init__(self, policy):
+        self._items = dict()
+        self._policy = policy
+
+    def add(self, item) -> None:
+        self._items[item.key] = item
+
+    def remove(self, item) -> None:
+        del self._items[item.key]
+
+    def touch(self, item) -> None:
+        pass
+
+    def next_victim(self):
+        return min(self._items.values(), key=self._policy) if self._items else None
+
+
+def _new_item_index(policy) -> _ItemIndex:
+    if policy is POLICY_LRU:
+        return _RecencyItemIndex(most_recent_first=False)
+    if policy is POLICY_MRU:
+        return _RecencyItemIndex(most_recent_first=True)
+    if policy is POLICY_LFU:
+        return _FrequencyItemIndex()
+    if policy is POLICY_RR:
+        return _RandomItemIndex()
+    return _SortingItemIndex(policy)
+
+
 class Cache:
     """
     An implementation of a cache.
     See https://en.wikipedia.org/wiki/Cache_algorithms
+
+    The predefined replacement policies are implemented using dedicated index structures, so that
+    accessing items and finding the next item to be discarded is O(1) (LRU, MRU, RR) or O(log n) (LFU).
+    Any other policy function is applied by searching all items for the next item to be discarded.
     """
 
     class Item:
@@ -301,7 +462,10 @@ class Cache:
         self._size = 0
         self._max_size = self._capacity * self._threshold
         self._item_dict = {}
-        self._item_list = []
+        self._item_index = _new_item_index(policy)
+        self._num_hits = 0
+        self._num_misses = 0
+        self._num_evictions = 0
         self._lock = RLock()
 
     @property
@@ -328,6 +492,33 @@ class Cache:
     def max_size(self):
         return self._max_size
 
+    @property
+    def num_items(self):
+        """The number of items in this cache."""
+        return len(self._item_dict)
+
+    @property
+    def num_hits(self):
+        """The number of calls to :py:meth:`get_value` that returned a cached value, including parent cache hits."""
+        return self._num_hits
+
+    @property
+    def num_misses(self):
+        """The number of calls to :py:meth:`get_value` that returned ``None``."""
+        return self._num_misses
+
+    @property
+    def num_evictions(self):
+        """The number of items discarded to keep the cache size below :py:attr:`max_size`."""
+        return self._num_evictions
+
+    def reset_stats(self):
+        """Reset the hit, miss, and eviction counters."""
+        with self._lock:
+            self._num_hits = 0
+            self._num_misses = 0
+            self._num_evictions = 0
+
     def get_value(self, key):
         self._lock.acquire()
         item = self._item_dict.get(key)
@@ -335,13 +526,13 @@ class Cache:
         restored = False
         if item:
             value = item.restore(self._store, key)
+            self._item_index.touch(item)
             restored = True
             if _DEBUG_CACHE:
                 _debug_print('restored value for key "%s" from cache' % key)
         elif self._parent_cache:
-            item = self._parent_cache.get_value(key)
-            if item:
-                value = item.restore(self._parent_cache.store, key)
+            value = self._parent_cache.get_value(key)
+            if value is not None:
                 restored = True
                 if _DEBUG_CACHE:
                     _debug_print('restored value for key "%s" from parent cache' % key)
@@ -350,8 +541,13 @@ class Cache:
             if item:
                 self._add_item(item)
                 value = item.restore(self._store, key)
+                self._item_index.touch(item)
                 if _DEBUG_CACHE:
                     _debug_print('restored value for key "%s" from cache' % key)
+        if value is not None:
+            self._num_hits += 1
+        else:
+            self._num_misses += 1
         self._lock.release()
         return value
 
@@ -387,42 +583,41 @@ class Cache:
         self._lock.release()
 
     def _add_item(self, item):
-        self._item_dict[item.key] = item
-        self._item_list.append(item)
+        # Trim before adding the item, so that it cannot become a victim itself
         if self._size + item.stored_size > self._max_size:
             self.trim(item.stored_size)
+        self._item_dict[item.key] = item
+        self._item_index.add(item)
         self._size += item.stored_size
 
     def _remove_item(self, item):
         self._item_dict.pop(item.key)
-        self._item_list.remove(item)
+        self._item_index.remove(item)
         self._size -= item.stored_size
 
     def trim(self, extra_size=0):
         if _DEBUG_CACHE:
             _debug_print('trimming...')
-        self._lock.acquire()
-        self._item_list.sort(key=self._policy)
-        keys = []
-        size = self._size
-        max_size = self._max_size
-        for item in self._item_list:
-            if size + extra_size > max_size:
-                keys.append(item.key)
-                size -= item.stored_size
-        self._lock.release()
-        # release lock to give another thread a chance then require lock again
-        self._lock.acquire()
-        for key in keys:
-            if self._parent_cache:
-                # Before discarding item fully, put its value into the parent cache
-                value = self.get_value(key)
-                self.remove_value(key)
-                if value:
-                    self._parent_cache.put_value(key, value)
-            else:
-                self.remove_value(key)
-        self._lock.release()
+        with self._lock:
+            while self._size + extra_size > self._max_size:
+                item = self._item_index.next_victim()
+                if item is None:
+                    break
+                self._evict_item(item)
+
+    def _evict_item(self, item):
+        key = item.key
+        value = None
+        if self._parent_cache:
+            # Before discarding item fully, put its value into the parent cache
+            value = self._store.restore_value(key, item.stored_value)
+        self._remove_item(item)
+        item.discard(self._store, key)
+        self._num_evictions += 1
+        if _DEBUG_CACHE:
+            _debug_print('evicted value for key "%s" from cache' % key)
+        if value is not None:
+            self._parent_cache.put_value(key, value)
 
     def clear(self, clear_parent=True):
         self._lock.acquire()
@@ -0,0 +1,168 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+Resumable downloads of single files from HTTP(S), FTP or file URLs.
+
+A file is downloaded into a companion file with the extension ``.incomplete`` which is renamed into the
+target file once the download has been completed and verified. If a download is interrupted, the next
+download of the same file continues where the former one stopped, using an HTTP ``Range`` request.
+
+Components
+==========
+"""
+
+import hashlib
+import os
+import urllib.error
+import urllib.request
+from typing import Callable, Optional
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+INCOMPLETE_FILE_EXT = '.incomplete'
+
+_BUFFER_SIZE = 64 * 1024
+
+
+class ChecksumError(IOError):
+    """Raised if the checksum of a downloaded file doesn't match the expected checksum."""
+
+
+def download_file(url: str,
+                  file: str,
+                  file_size: int = None,
+                  checksum: str = None,
+                  checksum_type: str = None,
+                  on_bytes_read: Callable[[int], None] = None,
+                  timeout: float = None) -> None:
+    """
+    Download the resource at *url* into *file*.
+
+    If an incomplete download of *file* exists, it is resumed if the server supports HTTP range requests,
+    otherwise it is restarted. Once downloaded, the file size and the checksum are verified, if given.
+
+    :param url: The URL.
+    :param file: The path of the target file.
+    :param file_size: The expected file size in bytes, if known.
+    :param checksum: The expected checksum as hexadecimal string, if known.
+    :param checksum_type: The name of the hash algorithm used to compute *checksum*, e.g. "MD5" or "SHA256".
+    :param on_bytes_read: A function that is called with the number of bytes obtained since its last call,
+           which is never negative. It is called with the size of the existing part of a resumed download
+           first, once the server has accepted to resume it. It may raise an exception, e.g. a ``Cancellation``,
+           to stop the download.
+    :param timeout: Timeout in seconds for blocking operations.
+    :raise ChecksumError: If the downloaded file has an unexpected checksum.
+    :raise IOError: If the download failed or the downloaded file has an unexpected size.
+    """
+    incomplete_file = file + INCOMPLETE_FILE_EXT
+    hash_obj = _new_hash(checksum_type) if checksum else None
+    on_bytes_read = on_bytes_read or (lambda num_bytes: None)
+
+    offset = os.path.getsize(incomplete_file) if os.path.isfile(incomplete_file) else 0
+    if file_size and file_size > 0 and offset > file_size:
+        os.remove(incomplete_file)
+        offset = 0
+
+    if not (file_size and offset == file_size):
+        request = urllib.request.Request(url)
+        if offset > 0:
+            request.add_header('Range', 'bytes=%d-' % offset)
+        try:
+            response = urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as error:
+            if error.code != 416 or offset == 0:
+                raise
+            # Range not satisfiable, start again
+            os.remove(incomplete_file)
+            offset = 0
+            response = urllib.request.urlopen(urllib.request.Request(url), timeout=timeout)
+
+        with response:
+            if offset > 0 and getattr(response, 'status', None) != 206:
+                # Server ignored the range request
+                offset = 0
+            if offset > 0:
+                on_bytes_read(offset)
+            with open(incomplete_file, 'ab' if offset > 0 else 'wb') as fp:
+                while True:
+                    data = response.read(_BUFFER_SIZE)
+                    if not data:
+                        break
+                    fp.write(data)
+                    on_bytes_read(len(data))
+    else:
+        on_bytes_read(offset)
+
+    actual_file_size = os.path.getsize(incomplete_file)
+    if file_size and file_size > 0 and actual_file_size != file_size:
+        os.remove(incomplete_file)
+        raise IOError('downloading %s failed: expected %d bytes, got %d' % (url, file_size, actual_file_size))
+
+    if hash_obj is not None:
+        _update_hash_from_file(hash_obj, incomplete_file)
+        if hash_obj.hexdigest().lower() != checksum.lower():
+            os.remove(incomplete_file)
+            raise ChecksumError('downloading %s failed: %s checksum mismatch' % (url, checksum_type))
+
+    os.replace(incomplete_file, file)
+
+
+def verify_file(file: str, file_size: int = None, checksum: str = None, checksum_type: str = None) -> bool:
+    """
+    Check whether *file* exists and has the given *file_size* and *checksum*, if given.
+
+    :param file: The path of the file.
+    :param file_size: The expected file size in bytes, if known.
+    :param checksum: The expected checksum as hexadecimal string, if known.
+    :param checksum_type: The name of the hash algorithm used to compute *checksum*.
+    :return: ``True``, if *file* is valid.
+    """
+    if not os.path.isfile(file):
+        return False
+    if file_size and file_size > 0 and os.path.getsize(file) != file_size:
+        return False
+    if checksum:
+        hash_obj = _new_hash(checksum_type)
+        _update_hash_from_file(hash_obj, file)
+        return hash_obj.hexdigest().lower() == checksum.lower()
+    return True
+
+
+def _new_hash(checksum_type: Optional[str]):
+    # Names used by ESGF are e.g. "MD5", "SHA256", or "SHA-256"
+    algorithm = (checksum_type or 'md5').lower().replace('-', '')
+    try:
+        return hashlib.new(algorithm)
+    except ValueError as error:
+        raise ValueError('unsupported checksum type: %s' % checksum_type) from error
+
+
+def _update_hash_from_file(hash_obj, file: str):
+    with open(file, 'rb') as fp:
+        while True:
+            data = fp.read(_BUFFER_SIZE)
+            if not data:
+                break
+            hash_obj.update(data)
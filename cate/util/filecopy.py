@@ -0,0 +1,197 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+Copying of files which avoids copying file contents where the file system allows it.
+
+A file is cloned, if the file system supports reflinks (copy-on-write clones, e.g. on Btrfs or XFS), otherwise it
+is hard-linked, if allowed and the target is on the same file system. Only if neither is possible, the file
+contents are copied in large blocks.
+
+Multiple files are copied concurrently by ``copy_files()``, which reports its progress in bytes.
+
+Components
+==========
+"""
+
+import concurrent.futures
+import os
+import shutil
+import sys
+import threading
+import uuid
+from typing import Callable, Iterator, Sequence, Tuple
+
+from .monitor import Cancellation, Monitor
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+COPY_METHOD_REFLINK = 'reflink'
+COPY_METHOD_HARD_LINK = 'hard_link'
+COPY_METHOD_COPY = 'copy'
+
+_BUFFER_SIZE = 1024 * 1024
+
+_POLL_PERIOD = 0.1
+
+# The FICLONE request of the Linux ioctl() system call
+_FICLONE = 0x40049409
+
+
+def copy_file(source: str,
+              target: str,
+              allow_hard_link: bool = False,
+              on_bytes_copied: Callable[[int], None] = None) -> str:
+    """
+    Copy the file *source* to *target*.
+
+    The file is written to a temporary file first which is renamed to *target* when complete,
+    so that *target* never refers to a partial copy.
+
+    :param source: The path of the source file.
+    :param target: The path of the target file. An existing file is replaced.
+    :param allow_hard_link: Whether *target* may become a hard link to *source*. Only allow this, if
+           the source file is never modified in place.
+    :param on_bytes_copied: A function that is called with the number of bytes copied since its previous call,
+           so callers must add the numbers up. It may raise an exception, e.g. a ``Cancellation``, to stop copying.
+    :return: The method used, one of ``COPY_METHOD_REFLINK``, ``COPY_METHOD_HARD_LINK``, or ``COPY_METHOD_COPY``.
+    """
+    file_size = os.path.getsize(source)
+    temp_target = '%s.%s.incomplete' % (target, uuid.uuid4().hex)
+    try:
+        if _reflink(source, temp_target):
+            method = COPY_METHOD_REFLINK
+        elif allow_hard_link and _hard_link(source, temp_target):
+            method = COPY_METHOD_HARD_LINK
+        else:
+            _copy_contents(source, temp_target, on_bytes_copied)
+            method = COPY_METHOD_COPY
+        if method != COPY_METHOD_HARD_LINK:
+            shutil.copystat(source, temp_target)
+        os.replace(temp_target, target)
+    except BaseException:
+        if os.path.exists(temp_target):
+            os.remove(temp_target)
+        raise
+    if method != COPY_METHOD_COPY and on_bytes_copied is not None:
+        on_bytes_copied(file_size)
+    return method
+
+
+def copy_files(file_pairs: Sequence[Tuple[str, str]],
+               num_workers: int = 4,
+               allow_hard_link: bool = False,
+               monitor: Monitor = Monitor.NONE) -> Iterator[int]:
+    """
+    Copy files concurrently using ``copy_file()``.
+
+    Returns a generator that yields the index of every pair in *file_pairs* as soon as its file has been copied.
+    Indexes are therefore yielded in the order of completion which may differ from the order of *file_pairs*.
+    The generator runs in the calling thread, so callers may safely record every copied file.
+
+    *monitor* is advanced by the number of bytes copied, hence callers will usually start it with a total work
+    given by the sum of the sizes of the source files. It is only called from the calling thread. If it is
+    cancelled, running copies stop with their next block and a ``Cancellation`` is raised.
+
+    :param file_pairs: A sequence of tuples (source, target) of file paths.
+    :param num_workers: The maximum number of files copied at the same time.
+    :param allow_hard_link: Whether targets may become hard links to their sources, see ``copy_file()``.
+    :param monitor: A progress monitor.
+    :return: A generator of indexes into *file_pairs*.
+    """
+    lock = threading.Lock()
+    stop_event = threading.Event()
+    num_bytes_copied = [0]
+
+    def on_bytes_copied(num_bytes: int):
+        if stop_event.is_set():
+            raise Cancellation()
+        with lock:
+            num_bytes_copied[0] += num_bytes
+
+    def report_progress():
+        with lock:
+            num_bytes, num_bytes_copied[0] = num_bytes_copied[0], 0
+        if num_bytes:
+            monitor.progress(work=num_bytes)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(num_workers, 1))
+    pending = {}
+    try:
+        pending = {executor.submit(copy_file, source, target, allow_hard_link, on_bytes_copied): index
+                   for index, (source, target) in enumerate(file_pairs)}
+        while pending:
+            monitor.check_for_cancellation()
+            done, _ = concurrent.futures.wait(pending, timeout=_POLL_PERIOD,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            report_progress()
+            for future in done:
+                index = pending.pop(future)
+                # Re-raises the error of a failed copy
+                future.result()
+                yield index
+    finally:
+        stop_event.set()
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+    report_progress()
+
+
+def _reflink(source: str, target: str) -> bool:
+    if not sys.platform.startswith('linux'):
+        return False
+    import fcntl
+    with open(source, 'rb') as source_fp:
+        target_fp = open(target, 'wb')
+        try:
+            fcntl.ioctl(target_fp.fileno(), _FICLONE, source_fp.fileno())
+            return True
+        except OSError:
+            # Not supported by the file system, or source and target are on different file systems
+            return False
+        finally:
+            target_fp.close()
+
+
+def _hard_link(source: str, target: str) -> bool:
+    if os.path.exists(target):
+        os.remove(target)
+    try:
+        os.link(source, target)
+        return True
+    except (OSError, AttributeError):
+        # Not supported by the file system, or source and target are on different file systems
+        return False
+
+
+def _copy_contents(source: str, target: str, on_bytes_copied: Callable[[int], None] = None) -> None:
+    with open(source, 'rb') as source_fp, open(target, 'wb') as target_fp:
+        while True:
+            block = source_fp.read(_BUFFER_SIZE)
+            if not block:
+                break
+            target_fp.write(block)
+            if on_bytes_copied is not None:
+                on_bytes_copied(len(block))
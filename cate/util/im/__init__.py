@@ -49,6 +49,8 @@ Components
 from .cmaps import get_cmaps
 from .geoextent import GeoExtent
 from .image import *
+from .overview import NdarrayOverviewStore
+from .tilefetcher import TileFetcher
 from .tilingscheme import TilingScheme
 from .utils import *
 
@@ -31,6 +31,7 @@ from PIL import Image
 
 from .cmaps import ensure_cmaps_loaded
 from .geoextent import GeoExtent
+from .overview import NdarrayOverviewStore
 from .tilingscheme import TilingScheme
 from .utils import downsample_ndarray, aggregate_ndarray_first
 from ..cache import Cache, MemoryCacheStore
@@ -658,6 +659,11 @@ class FastNdarrayDownsamplingImage(OpImage):
         # We do the resampling to lower resolution after loading the data, which is MUCH faster, see note above.
         tile = tile[..., ::s, ::s]
 
+        # Tiles read from memory-mapped overview levels (see NdarrayOverviewStore) are read-only,
+        # so we copy them into memory, because subsequent tile transformations may work in-place.
+        if isinstance(tile, np.memmap):
+            tile = np.array(tile)
+
         # ensure that our tile size is w x h: resize and fill in background value.
         return self.pad_tile(tile, self.tile_size)
 
@@ -730,6 +736,7 @@ class ImagePyramid:
                           array: np.ndarray,
                           tiling_scheme: TilingScheme,
                           level_image_id_factory: LevelImageIdFactory = None,
+                          overview_store: NdarrayOverviewStore = None,
                           **kwargs) -> 'ImagePyramid':
 
         """
@@ -738,10 +745,15 @@ class ImagePyramid:
         For example, if array is a H5Py dataset object, the created pyramid will take advantage of
         the HDF-5 libraries's slicing.
 
+        If an *overview_store* is given, the lower resolution levels are read from the store's
+        precomputed overview levels rather than from the full resolution *array*, so that the time
+        to read a tile depends on the tile size only.
+
         :param array: numpy-like array that supports stepping in it's subscript operator, e.g.
                       array[..., y::step, x:step]
         :param tiling_scheme:the tiling scheme
         :param level_image_id_factory: a factory function for unique image identifiers
+        :param overview_store: optional store providing precomputed overview levels of *array*
         :param kwargs: keyword arguments passed to FastNdarrayDownsamplingImage constructor
         :return: a new ImagePyramid instance
         """
@@ -752,10 +764,17 @@ class ImagePyramid:
         for i in range(0, num_levels):
             z_index = z_index_max - i
             image_id = level_image_id_factory(z_index) if level_image_id_factory else None
-            level_images[z_index] = FastNdarrayDownsamplingImage(array,
-                                                                 tile_size,
-                                                                 i,
-                                                                 image_id=image_id, **kwargs)
+            level_array = overview_store.get_level_array(i) if overview_store is not None else None
+            if level_array is not None:
+                level_images[z_index] = FastNdarrayDownsamplingImage(level_array,
+                                                                     tile_size,
+                                                                     0,
+                                                                     image_id=image_id, **kwargs)
+            else:
+                level_images[z_index] = FastNdarrayDownsamplingImage(array,
+                                                                     tile_size,
+                                                                     i,
+                                                                     image_id=image_id, **kwargs)
         return ImagePyramid(tiling_scheme, level_images)
 
     def __init__(self,
@@ -0,0 +1,246 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+import json
+import os
+import os.path
+import shutil
+import threading
+from typing import Optional, Tuple, Any
+
+import numpy as np
+
+from .utils import downsample_ndarray, aggregate_ndarray_first, aggregate_ndarray_nanmean
+
+_META_FILE_NAME = 'overview.json'
+
+_BUILD_LOCKS = dict()
+_BUILD_LOCKS_LOCK = threading.Lock()
+
+
+class NdarrayOverviewStore:
+    """
+    A persistent store for the down-sampled overview levels of a numpy-like, N-D source array.
+
+    Overview level *i* has the size of the source array's last two dimensions divided by ``2 ** i``.
+    Level 0 is the source array itself and is never stored. Levels are computed once, level by level,
+    each from the next higher resolution level, and are stored as ``.npy`` files in *store_dir*.
+    They are opened memory-mapped so that reading a tile only reads the tile's pixels.
+
+    Floating point arrays are aggregated using a NaN-aware block mean, all other types (e.g. class labels,
+    flags) are aggregated by picking the first pixel of each block.
+
+    :param store_dir: The directory in which the overview levels are stored.
+    :param signature: An optional string that identifies the source array's contents. If a store exists
+           in *store_dir* with a different signature, it is considered invalid.
+    """
+
+    def __init__(self, store_dir: str, signature: str = None):
+        self._store_dir = store_dir
+        self._signature = signature
+        self._meta_info = None
+        self._level_arrays = dict()
+
+    @classmethod
+    def open_or_build(cls,
+                      store_dir: str,
+                      array: Any,
+                      num_levels: int,
+                      signature: str = None,
+                      stripe_height: int = 256) -> 'NdarrayOverviewStore':
+        """
+        Open the overview store in *store_dir* or (re-)build it from *array*, if it does not exist yet or
+        if it has been built from an array with a different signature, shape, or data type.
+
+        :param store_dir: The directory in which the overview levels are stored.
+        :param array: numpy-like source array, e.g. a numpy ndarray or an xarray DataArray.
+        :param num_levels: The total number of levels including the source array, e.g. a tiling scheme's
+               ``num_levels``.
+        :param signature: An optional string that identifies the source array's contents.
+        :param stripe_height: Number of target rows computed at once. Limits memory consumption while building.
+        :return: a new, valid overview store
+        """
+        with _get_build_lock(store_dir):
+            store = NdarrayOverviewStore(store_dir, signature=signature)
+            if not store.is_valid_for(array, num_levels):
+                store.build(array, num_levels, stripe_height=stripe_height)
+            return store
+
+    @property
+    def store_dir(self) -> str:
+        return self._store_dir
+
+    @property
+    def signature(self) -> Optional[str]:
+        return self._signature
+
+    @property
+    def num_levels(self) -> int:
+        """The number of levels including level zero, or zero if this store has not been built."""
+        meta_info = self._get_meta_info()
+        return meta_info['num_levels'] if meta_info else 0
+
+    @property
+    def value_range(self) -> Optional[Tuple[float, float]]:
+        """
+        The (min, max) value range of the source array ignoring NaNs, as computed while building this store,
+        or ``None`` if this store has not been built or if the source array contains no valid values.
+        """
+        meta_info = self._get_meta_info()
+        value_range = meta_info.get('value_range') if meta_info else None
+        return tuple(value_range) if value_range else None
+
+    def is_valid_for(self, array: Any, num_levels: int) -> bool:
+        """
+        Test whether this store has been built from the given *array* with at least *num_levels* levels.
+
+        :param array: numpy-like source array.
+        :param num_levels: The total number of levels including the source array.
+        :return: True, if so
+        """
+        meta_info = self._get_meta_info()
+        return meta_info is not None \
+            and meta_info.get('signature') == self._signature \
+            and meta_info.get('shape') == list(array.shape) \
+            and meta_info.get('dtype') == str(array.dtype) \
+            and meta_info.get('num_levels', 0) >= num_levels
+
+    def get_level_array(self, level: int) -> Optional[np.ndarray]:
+        """
+        Get the read-only, memory-mapped array for the given overview *level*.
+
+        :param level: The overview level, must be greater than zero.
+        :return: The level's array or ``None`` if this store does not provide the level.
+        """
+        if level <= 0 or level >= self.num_levels:
+            return None
+        level_array = self._level_arrays.get(level)
+        if level_array is None:
+            level_array = np.load(self._get_level_file(level), mmap_mode='r')
+            self._level_arrays[level] = level_array
+        return level_array
+
+    def build(self, array: Any, num_levels: int, stripe_height: int = 256) -> None:
+        """
+        Build this store from the given source *array*. Any existing levels will be replaced.
+
+        :param array: numpy-like source array, e.g. a numpy ndarray or an xarray DataArray.
+        :param num_levels: The total number of levels including the source array.
+        :param stripe_height: Number of target rows computed at once. Limits memory consumption while building.
+        """
+        self.clear()
+        os.makedirs(self._store_dir, exist_ok=True)
+
+        if np.issubdtype(array.dtype, np.floating):
+            aggregator = aggregate_ndarray_nanmean
+        else:
+            aggregator = aggregate_ndarray_first
+
+        value_range = None
+        source_array = array
+        num_levels_built = 1
+        for level in range(1, num_levels):
+            height, width = source_array.shape[-2] // 2, source_array.shape[-1] // 2
+            if height == 0 or width == 0:
+                break
+            level_file = self._get_level_file(level)
+            temp_file = level_file + '.incomplete'
+            level_array = np.lib.format.open_memmap(temp_file,
+                                                    mode='w+',
+                                                    dtype=array.dtype,
+                                                    shape=tuple(source_array.shape[:-2]) + (height, width))
+            for y in range(0, height, stripe_height):
+                h = min(stripe_height, height - y)
+                stripe = _load_ndarray(source_array[..., 2 * y: 2 * (y + h), 0: 2 * width])
+                if level == 1:
+                    value_range = _update_value_range(value_range, stripe)
+                level_array[..., y: y + h, :] = downsample_ndarray(stripe, aggregator=aggregator)
+            level_array.flush()
+            del level_array
+            os.replace(temp_file, level_file)
+            source_array = np.load(level_file, mmap_mode='r')
+            num_levels_built = level + 1
+
+        # Write meta-info last, so that its existence indicates a successfully built store
+        meta_info = dict(signature=self._signature,
+                         shape=list(array.shape),
+                         dtype=str(array.dtype),
+                         num_levels=num_levels_built,
+                         value_range=value_range)
+        meta_file = os.path.join(self._store_dir, _META_FILE_NAME)
+        with open(meta_file + '.incomplete', 'w') as fp:
+            json.dump(meta_info, fp)
+        os.replace(meta_file + '.incomplete', meta_file)
+        self._meta_info = meta_info
+
+    def clear(self) -> None:
+        """Remove all stored levels."""
+        self._meta_info = None
+        self._level_arrays = dict()
+        if os.path.isdir(self._store_dir):
+            shutil.rmtree(self._store_dir, ignore_errors=True)
+
+    def _get_meta_info(self) -> Optional[dict]:
+        if self._meta_info is None:
+            meta_file = os.path.join(self._store_dir, _META_FILE_NAME)
+            if os.path.isfile(meta_file):
+                # noinspection PyBroadException
+                try:
+                    with open(meta_file) as fp:
+                        self._meta_info = json.load(fp)
+                except Exception:
+                    self._meta_info = None
+        return self._meta_info
+
+    def _get_level_file(self, level: int) -> str:
+        return os.path.join(self._store_dir, '%d.npy' % level)
+
+
+def _get_build_lock(store_dir: str) -> threading.Lock:
+    with _BUILD_LOCKS_LOCK:
+        lock = _BUILD_LOCKS.get(store_dir)
+        if lock is None:
+            lock = threading.Lock()
+            _BUILD_LOCKS[store_dir] = lock
+        return lock
+
+
+def _load_ndarray(array) -> np.ndarray:
+    if hasattr(array, 'load'):
+        # An xarray DataArray, possibly backed by dask
+        array = array.load()
+    return np.asarray(array)
+
+
+def _update_value_range(value_range, array: np.ndarray):
+    if array.size == 0:
+        return value_range
+    if np.issubdtype(array.dtype, np.floating):
+        if np.all(np.isnan(array)):
+            return value_range
+        array_min, array_max = float(np.nanmin(array)), float(np.nanmax(array))
+    else:
+        array_min, array_max = float(np.min(array)), float(np.max(array))
+    if value_range is None:
+        return array_min, array_max
+    return min(value_range[0], array_min), max(value_range[1], array_max)
@@ -0,0 +1,182 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, List, Tuple
+
+from .image import ImagePyramid
+
+TileCoords = Tuple[int, int, int]
+
+
+class TileFetcher:
+    """
+    Fetches tiles from image pyramids asynchronously.
+
+    Requested tiles are computed by a bounded pool of worker threads. Concurrent requests for the same tile
+    of the same pyramid share a single computation.
+
+    If *prefetch* is True, the neighbouring tiles, the parent tile, and the child tiles of each requested tile
+    are computed in advance by a separate, smaller pool of worker threads. Prefetching is only effective,
+    if the pyramid's level images use tile caches, because prefetched tiles are not kept by the fetcher itself.
+    Prefetch tasks are dropped, if more than *max_prefetch_queue_size* of them are pending.
+
+    :param max_workers: The maximum number of threads computing requested tiles.
+    :param prefetch: Whether to prefetch neighbouring, parent, and child tiles of requested tiles.
+    :param max_prefetch_workers: The maximum number of threads computing prefetched tiles.
+    :param max_prefetch_queue_size: The maximum number of pending prefetch tasks.
+    :param max_prefetch_history_size: The maximum number of recently fetched tiles that will not be prefetched again.
+    """
+
+    def __init__(self,
+                 max_workers: int = 4,
+                 prefetch: bool = False,
+                 max_prefetch_workers: int = 1,
+                 max_prefetch_queue_size: int = 64,
+                 max_prefetch_history_size: int = 4096):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._prefetch = prefetch
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=max_prefetch_workers) if prefetch else None
+        self._max_prefetch_queue_size = max_prefetch_queue_size
+        self._max_prefetch_history_size = max_prefetch_history_size
+        # Maps tile key to (future, is_prefetch) for all tiles currently being computed
+        self._futures = dict()
+        # Keys of recently fetched tiles, least recently fetched first
+        self._history = OrderedDict()
+        self._num_pending_prefetches = 0
+        self._lock = threading.RLock()
+
+    @property
+    def prefetch(self) -> bool:
+        return self._prefetch
+
+    @property
+    def num_pending_prefetches(self) -> int:
+        return self._num_pending_prefetches
+
+    def fetch_tile(self, pyramid_id: str, pyramid: ImagePyramid, tile_x: int, tile_y: int, z_index: int) -> Future:
+        """
+        Fetch a tile asynchronously.
+
+        :param pyramid_id: A unique identifier for *pyramid*.
+        :param pyramid: The image pyramid.
+        :param tile_x: The tile's x coordinate.
+        :param tile_y: The tile's y coordinate.
+        :param z_index: The tile's level index.
+        :return: A future whose result is the tile.
+        """
+        tile_key = pyramid_id, tile_x, tile_y, z_index
+        with self._lock:
+            future, is_prefetch = self._futures.get(tile_key, (None, False))
+            if future is not None and is_prefetch and future.cancel():
+                # The tile is queued for prefetching, but it is requested now, so don't let it wait.
+                future = None
+            if future is None:
+                future = self._submit(tile_key, pyramid, False)
+            self._touch(tile_key)
+        if self._prefetch:
+            for prefetch_x, prefetch_y, prefetch_z in self.get_prefetch_tile_coords(pyramid, tile_x, tile_y, z_index):
+                self._prefetch_tile((pyramid_id, prefetch_x, prefetch_y, prefetch_z), pyramid)
+        return future
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shut down the worker threads.
+
+        :param wait: Whether to wait until all pending tiles have been computed.
+        """
+        if self._prefetch_executor is not None:
+            self._prefetch_executor.shutdown(wait=wait)
+        self._executor.shutdown(wait=wait)
+
+    @classmethod
+    def get_prefetch_tile_coords(cls, pyramid: ImagePyramid, tile_x: int, tile_y: int,
+                                 z_index: int) -> List[TileCoords]:
+        """
+        Get the coordinates of the tiles to be prefetched for a given tile, namely the eight neighbouring tiles
+        at the same level, the parent tile at the next lower level, and the four child tiles at the next higher level.
+
+        :param pyramid: The image pyramid.
+        :param tile_x: The tile's x coordinate.
+        :param tile_y: The tile's y coordinate.
+        :param z_index: The tile's level index.
+        :return: A list of (tile_x, tile_y, z_index) tuples.
+        """
+        tile_coords = []
+        num_tiles_x, num_tiles_y = pyramid.get_level_image(z_index).num_tiles
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                if dx == 0 and dy == 0:
+                    continue
+                # Wrap around in x-direction, as tiles usually cover the globe
+                x, y = (tile_x + dx) % num_tiles_x, tile_y + dy
+                if 0 <= y < num_tiles_y and (x, y) != (tile_x, tile_y) and (x, y, z_index) not in tile_coords:
+                    tile_coords.append((x, y, z_index))
+        if z_index > 0:
+            tile_coords.append((tile_x // 2, tile_y // 2, z_index - 1))
+        if z_index < pyramid.num_levels - 1:
+            num_tiles_x, num_tiles_y = pyramid.get_level_image(z_index + 1).num_tiles
+            for dy in (0, 1):
+                for dx in (0, 1):
+                    x, y = 2 * tile_x + dx, 2 * tile_y + dy
+                    if x < num_tiles_x and y < num_tiles_y:
+                        tile_coords.append((x, y, z_index + 1))
+        return tile_coords
+
+    def _prefetch_tile(self, tile_key, pyramid: ImagePyramid) -> None:
+        with self._lock:
+            if tile_key in self._futures or tile_key in self._history:
+                return
+            if self._num_pending_prefetches >= self._max_prefetch_queue_size:
+                return
+            self._submit(tile_key, pyramid, True)
+            self._touch(tile_key)
+
+    def _submit(self, tile_key, pyramid: ImagePyramid, is_prefetch: bool) -> Future:
+        _, tile_x, tile_y, z_index = tile_key
+        executor = self._prefetch_executor if is_prefetch else self._executor
+        future = executor.submit(pyramid.get_tile, tile_x, tile_y, z_index)
+        self._futures[tile_key] = future, is_prefetch
+        if is_prefetch:
+            self._num_pending_prefetches += 1
+
+        def _on_done(done_future: Future):
+            with self._lock:
+                if is_prefetch:
+                    self._num_pending_prefetches -= 1
+                if self._futures.get(tile_key, (None, False))[0] is done_future:
+                    del self._futures[tile_key]
+                if done_future.cancelled() or done_future.exception() is not None:
+                    self._history.pop(tile_key, None)
+
+        future.add_done_callback(_on_done)
+        return future
+
+    def _touch(self, tile_key: Any) -> None:
+        history = self._history
+        history.pop(tile_key, None)
+        history[tile_key] = True
+        while len(history) > self._max_prefetch_history_size:
+            history.popitem(last=False)
@@ -21,6 +21,8 @@
 
 __author__ = "Norman Fomferra (Brockmann Consult GmbH)"
 
+import warnings
+
 import numpy as np
 
 
@@ -50,6 +52,13 @@ def aggregate_ndarray_mean(a1, a2, a3, a4):
     return (a1 + a2 + a3 + a4) / 4.
 
 
+def aggregate_ndarray_nanmean(a1, a2, a3, a4):
+    with warnings.catch_warnings():
+        # Blocks that are all-NaN yield NaN, which is what we want, so suppress the "Mean of empty slice" warning
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return np.nanmean(np.stack((a1, a2, a3, a4)), axis=0)
+
+
 def downsample_ndarray(a, aggregator=aggregate_ndarray_mean):
     if aggregator is aggregate_ndarray_first:
         # Optimization
@@ -0,0 +1,103 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+An index of keyed intervals, e.g. the time coverages of the files of a data source, sorted by interval start.
+
+Lookups of the intervals starting within a given range use binary search and cost O(log n + k),
+where k is the number of intervals starting within the range.
+
+Components
+==========
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Hashable, Iterable, List, Tuple
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+
+class IntervalIndex:
+    """
+    An index of keyed intervals sorted by their start.
+    Intervals with equal start keep the order in which they have been added.
+
+    :param intervals: Optional tuples (key, start, end) to be added.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[Hashable, Any, Any]] = None):
+        self._starts = []  # type: List[Any]
+        self._entries = []  # type: List[Tuple[Any, Any, Hashable]]
+        self._intervals = dict()  # type: Dict[Hashable, Tuple[Any, Any]]
+        if intervals:
+            for key, start, end in intervals:
+                self.add(key, start, end)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._intervals
+
+    def add(self, key: Hashable, start: Any, end: Any) -> None:
+        """
+        Add the interval [*start*, *end*] for *key*, replacing a former interval of *key*.
+        """
+        if key in self._intervals:
+            self.remove(key)
+        index = bisect_right(self._starts, start)
+        self._starts.insert(index, start)
+        self._entries.insert(index, (start, end, key))
+        self._intervals[key] = start, end
+
+    def remove(self, key: Hashable) -> None:
+        """
+        Remove the interval of *key*, if any.
+        """
+        interval = self._intervals.pop(key, None)
+        if interval is None:
+            return
+        start = interval[0]
+        index = bisect_left(self._starts, start)
+        while self._entries[index][2] != key:
+            index += 1
+        del self._starts[index]
+        del self._entries[index]
+
+    def clear(self) -> None:
+        self._starts.clear()
+        self._entries.clear()
+        self._intervals.clear()
+
+    def find_starting_within(self, start: Any = None, end: Any = None) -> List[Hashable]:
+        """
+        Find the keys of all intervals whose start lies within [*start*, *end*].
+
+        :param start: The lower bound, or ``None`` for no lower bound.
+        :param end: The upper bound, or ``None`` for no upper bound.
+        :return: The keys in the order of their interval starts.
+        """
+        index1 = bisect_left(self._starts, start) if start is not None else 0
+        index2 = bisect_right(self._starts, end) if end is not None else len(self._starts)
+        return [entry[2] for entry in self._entries[index1:index2]]
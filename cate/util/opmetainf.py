@@ -137,6 +137,13 @@ class OpMetaInfo:
     def can_cache(self) -> bool:
         return not self._header.get('no_cache', False)
 
+    @property
+    def can_disk_cache(self) -> bool:
+        """
+        :return: ``True`` if results of the operation may be cached on disk, see :py:mod:`cate.core.opcache`.
+        """
+        return self.can_cache and bool(self._header.get('disk_cache', False))
+
     def to_json_dict(self, data_type_to_json=None) -> Dict[str, Any]:
         """
         Return a JSON-serializable dictionary representation of this object. E.g. values of the `data_type``
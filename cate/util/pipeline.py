@@ -0,0 +1,173 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+A simple multi-threaded pipeline whose stages are connected by bounded queues.
+
+Each stage is a function applied to the outputs of the previous stage by a given number of worker threads.
+As the queues between the stages are bounded, a slow stage holds back the faster ones, so that
+I/O-bound stages (e.g. reading remote data) and CPU-bound stages (e.g. compressing data) overlap without
+piling up intermediate results in memory.
+
+Components
+==========
+"""
+
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Sequence, Tuple
+
+from .monitor import Monitor
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+#: A pipeline stage given by a function and the number of worker threads that call it
+PipelineStage = Tuple[Callable[[Any], Any], int]
+
+_END = object()
+
+_POLL_PERIOD = 0.1
+
+
+def run_pipeline(items: Iterable,
+                 stages: Sequence[PipelineStage],
+                 queue_size: int = None,
+                 monitor: Monitor = Monitor.NONE) -> Iterator[Tuple[int, Any]]:
+    """
+    Pass *items* through the given pipeline *stages*.
+
+    Returns a generator that yields a tuple (index, result) for every item as soon as it has passed the
+    last stage, where *index* is the index of the item in *items*. Results are therefore yielded in the
+    order of their completion which may differ from the order of *items*.
+
+    If a stage function raises an exception, the pipeline is stopped and the exception is re-raised by
+    the generator. If the generator is closed before all results have been yielded, the pipeline is
+    stopped too. Items that are currently processed by a stage function are completed first.
+
+    :param items: The items to be processed.
+    :param stages: The pipeline stages, a sequence of tuples (function, num_workers).
+    :param queue_size: The maximum number of results buffered between two stages.
+           Defaults to the maximum number of workers of any stage.
+    :param monitor: A monitor which is checked for cancellation while waiting for results.
+    :return: A generator of (index, result) tuples.
+    """
+    stages = [(function, max(num_workers, 1)) for function, num_workers in stages]
+    if queue_size is None:
+        queue_size = max([num_workers for _, num_workers in stages] or [1])
+
+    # queues[i] is consumed by stage i, the last queue is consumed by the generator
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    num_consumers = [num_workers for _, num_workers in stages] + [1]
+    num_producers = [1] + [num_workers for _, num_workers in stages]
+    lock = threading.Lock()
+    stop_event = threading.Event()
+    errors = []  # type: List[BaseException]
+
+    def put(queue_index: int, entry) -> bool:
+        while not stop_event.is_set():
+            try:
+                queues[queue_index].put(entry, timeout=_POLL_PERIOD)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(queue_index: int):
+        while not stop_event.is_set():
+            try:
+                return queues[queue_index].get(timeout=_POLL_PERIOD)
+            except queue.Empty:
+                pass
+        return None
+
+    def stop(error: BaseException):
+        with lock:
+            errors.append(error)
+        stop_event.set()
+
+    def end(queue_index: int):
+        # The last producer of a queue tells all its consumers to end
+        with lock:
+            num_producers[queue_index] -= 1
+            is_last_producer = num_producers[queue_index] == 0
+        if is_last_producer:
+            for _ in range(num_consumers[queue_index]):
+                put(queue_index, _END)
+
+    def feed():
+        try:
+            for entry in enumerate(items):
+                if not put(0, entry):
+                    return
+        except BaseException as error:
+            stop(error)
+            return
+        end(0)
+
+    def work(stage_index: int):
+        function = stages[stage_index][0]
+        try:
+            while True:
+                entry = get(stage_index)
+                if entry is None:
+                    return
+                if entry is _END:
+                    break
+                index, value = entry
+                if not put(stage_index + 1, (index, function(value))):
+                    return
+        except BaseException as error:
+            stop(error)
+            return
+        end(stage_index + 1)
+
+    threads = [threading.Thread(target=feed, name='cate-pipeline-feed', daemon=True)]
+    for stage_index, (_, num_workers) in enumerate(stages):
+        for worker_index in range(num_workers):
+            threads.append(threading.Thread(target=work,
+                                            args=(stage_index,),
+                                            name='cate-pipeline-%d-%d' % (stage_index, worker_index),
+                                            daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            monitor.check_for_cancellation()
+            try:
+                entry = queues[-1].get(timeout=_POLL_PERIOD)
+            except queue.Empty:
+                if stop_event.is_set():
+                    break
+                continue
+            if entry is _END:
+                break
+            yield entry
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
@@ -24,9 +24,14 @@ __author__ = "Norman Fomferra (Brockmann Consult GmbH), " \
 
 import concurrent.futures
 import datetime
+import hashlib
+import json
 import os.path
 import sys
+import threading
 import time
+from collections import OrderedDict
+from typing import Optional
 
 import fiona
 import geopandas as gpd
@@ -41,31 +46,34 @@ from ..conf.defaults import \
     WEBAPI_WORKSPACE_FILE_TILE_CACHE_CAPACITY, \
     WEBAPI_WORKSPACE_MEM_TILE_CACHE_CAPACITY, \
     WEBAPI_ON_ALL_CLOSED_AUTO_STOP_AFTER, \
-    WEBAPI_USE_WORKSPACE_IMAGERY_CACHE
+    WEBAPI_USE_WORKSPACE_IMAGERY_CACHE, \
+    WEBAPI_USE_WORKSPACE_OVERVIEW_CACHE, \
+    WEBAPI_TILE_WORKERS, \
+    WEBAPI_USE_TILE_PREFETCHING, \
+    WEBAPI_WORKSPACE_MAX_NUM_PYRAMIDS
 from ..core.cdm import get_tiling_scheme
-from ..core.types import GeoDataFrame
+from ..core.types import GeoDataFrame, ValidationError
 from ..util.cache import Cache, MemoryCacheStore, FileCacheStore
-from ..util.im import ImagePyramid, TransformArrayImage, ColorMappedRgbaImage
+from ..util.im import ImagePyramid, TransformArrayImage, ColorMappedRgbaImage, NdarrayOverviewStore, TileFetcher
 from ..util.im.ds import NaturalEarth2Image
 from ..util.misc import cwd
 from ..util.monitor import Monitor, ConsoleMonitor
 from ..util.web.webapi import WebAPIRequestHandler, check_for_auto_stop
 from ..version import __version__
 
-# TODO (forman): We must keep a MemoryCacheStore Cache for each workspace.
-#                We can use the Workspace.user_data dict for this purpose.
-#                However, a global cache is fine as long as we have just one workspace open at a time.
-#
-MEM_TILE_CACHE = Cache(MemoryCacheStore(),
-                       capacity=WEBAPI_WORKSPACE_MEM_TILE_CACHE_CAPACITY,
-                       threshold=0.75)
-
 USE_WORKSPACE_IMAGERY_CACHE = get_config().get('use_workspace_imagery_cache', WEBAPI_USE_WORKSPACE_IMAGERY_CACHE)
 
+USE_WORKSPACE_OVERVIEW_CACHE = get_config().get('use_workspace_overview_cache', WEBAPI_USE_WORKSPACE_OVERVIEW_CACHE)
+
 TRACE_PERF = False
 
 THREAD_POOL = concurrent.futures.ThreadPoolExecutor()
 
+TILE_FETCHER = TileFetcher(max_workers=get_config().get('tile_workers', WEBAPI_TILE_WORKERS),
+                           prefetch=get_config().get('use_tile_prefetching', WEBAPI_USE_TILE_PREFETCHING))
+
+MAX_NUM_WORKSPACE_PYRAMIDS = get_config().get('max_num_workspace_pyramids', WEBAPI_WORKSPACE_MAX_NUM_PYRAMIDS)
+
 _NUM_GEOM_SIMP_LEVELS = 8
 
 # Explicitly load Cate-internal plugins.
@@ -95,135 +103,264 @@ class WorkspaceResourceHandler(WebAPIRequestHandler):
         return workspace, res_id, res_name, resource
 
 
+class WorkspaceImagery:
+    """
+    The image pyramids and the in-memory tile cache of a single workspace.
+
+    Pyramids are registered together with the ID and update count of the resource they have been created from.
+    Pyramids of resources that have been changed, renamed, or deleted since are dropped by :py:meth:`prune`.
+    At most *max_num_pyramids* pyramids are kept, the least recently used ones are dropped first.
+    Dropped pyramids are disposed, which also removes their tiles from the tile caches.
+
+    Use :py:meth:`get` to obtain the instance for a given workspace. It is stored in the workspace's ``user_data``
+    and is closed when the workspace is closed.
+
+    :param max_num_pyramids: maximum number of pyramids kept
+    :param mem_tile_cache_capacity: capacity of the in-memory tile cache in bytes
+    """
+
+    USER_DATA_KEY = 'imagery'
+
+    _LOCK = threading.Lock()
+
+    def __init__(self, max_num_pyramids: int, mem_tile_cache_capacity: int):
+        self._max_num_pyramids = max_num_pyramids
+        self._mem_tile_cache = Cache(MemoryCacheStore(), capacity=mem_tile_cache_capacity, threshold=0.75)
+        # Maps pyramid ID to (res_name, res_id, res_update_count, pyramid), least recently used first
+        self._pyramids = OrderedDict()
+        self._lock = threading.RLock()
+
+    @classmethod
+    def get(cls, workspace) -> 'WorkspaceImagery':
+        with cls._LOCK:
+            imagery = workspace.user_data.get(cls.USER_DATA_KEY)
+            if imagery is None:
+                imagery = WorkspaceImagery(MAX_NUM_WORKSPACE_PYRAMIDS, WEBAPI_WORKSPACE_MEM_TILE_CACHE_CAPACITY)
+                workspace.user_data[cls.USER_DATA_KEY] = imagery
+            return imagery
+
+    @property
+    def mem_tile_cache(self) -> Cache:
+        return self._mem_tile_cache
+
+    @property
+    def num_pyramids(self) -> int:
+        return len(self._pyramids)
+
+    def get_pyramid(self, pyramid_id: str) -> Optional[ImagePyramid]:
+        with self._lock:
+            entry = self._pyramids.get(pyramid_id)
+            if entry is None:
+                return None
+            self._pyramids.move_to_end(pyramid_id)
+            return entry[3]
+
+    def put_pyramid(self, pyramid_id: str, res_name: str, res_id: int, res_update_count: int,
+                    pyramid: ImagePyramid) -> ImagePyramid:
+        """
+        Register a new pyramid, unless another one has already been registered for *pyramid_id*.
+
+        :return: the registered pyramid
+        """
+        with self._lock:
+            entry = self._pyramids.get(pyramid_id)
+            if entry is not None:
+                self._pyramids.move_to_end(pyramid_id)
+                return entry[3]
+            self._pyramids[pyramid_id] = res_name, res_id, res_update_count, pyramid
+            while len(self._pyramids) > self._max_num_pyramids:
+                _, entry = self._pyramids.popitem(last=False)
+                _dispose_pyramid(entry[3])
+            return pyramid
+
+    def prune(self, resource_cache) -> None:
+        """
+        Drop all pyramids whose resources have been changed, renamed, or deleted.
+
+        :param resource_cache: the workspace's resource cache, a ``ValueCache``
+        """
+        with self._lock:
+            for pyramid_id, (res_name, res_id, res_update_count, pyramid) in list(self._pyramids.items()):
+                if resource_cache.get_id(res_name) != res_id \
+                        or resource_cache.get_update_count(res_name) != res_update_count:
+                    del self._pyramids[pyramid_id]
+                    _dispose_pyramid(pyramid)
+
+    def close(self) -> None:
+        with self._lock:
+            pyramids = [entry[3] for entry in self._pyramids.values()]
+            self._pyramids.clear()
+            for pyramid in pyramids:
+                _dispose_pyramid(pyramid)
+            self._mem_tile_cache.clear()
+
+
+def _dispose_pyramid(pyramid: ImagePyramid) -> None:
+    # Level images of our pyramids are chains of decorator images, dispose all of them.
+    for z_index in range(pyramid.num_levels):
+        image = pyramid.get_level_image(z_index)
+        while image is not None:
+            image.dispose()
+            image = getattr(image, 'source_image', None)
+
+
 # noinspection PyAbstractClass,PyBroadException
 class ResVarTileHandler(WorkspaceResourceHandler):
-    PYRAMIDS = None
 
+    @tornado.web.asynchronous
+    @tornado.gen.coroutine
     def get(self, base_dir, res_id, z, y, x):
         try:
             workspace, res_id, res_name, dataset = self.get_workspace_resource(base_dir, res_id)
 
-            # GLOBAL_LOCK.acquire()
-
-            if not isinstance(dataset, xr.Dataset):
-                self.write_status_error(message='Resource "%s" must be a Dataset' % res_name)
-                return
-
             var_name = self.get_query_argument('var')
             var_index = self.get_query_argument_int_tuple('index', ())
             cmap_name = self.get_query_argument('cmap', default='jet')
             cmap_min = self.get_query_argument_float('min', default=float('nan'))
             cmap_max = self.get_query_argument_float('max', default=float('nan'))
 
-            if ResVarTileHandler.PYRAMIDS is None:
-                ResVarTileHandler.PYRAMIDS = dict()
-
-            array_id = '%s-%s-%s' % (res_name,
-                                     var_name,
-                                     ','.join(map(str, var_index)))
-            image_id = '%s-%s-%s-%s' % (array_id,
-                                        cmap_name,
-                                        cmap_min,
-                                        cmap_max)
-
-            pyramid_id = '%s-%s' % (base_dir, image_id)
-
-            if pyramid_id in ResVarTileHandler.PYRAMIDS:
-                pyramid = ResVarTileHandler.PYRAMIDS[pyramid_id]
-            else:
-                variable = dataset[var_name]
-                no_data_value = variable.attrs.get('_FillValue')
-                valid_range = variable.attrs.get('valid_range')
-                if valid_range is None:
-                    valid_min = variable.attrs.get('valid_min')
-                    valid_max = variable.attrs.get('valid_max')
-                    if valid_min is not None and valid_max is not None:
-                        valid_range = [valid_min, valid_max]
-
-                # Make sure we work with 2D image arrays only
-                if variable.ndim == 2:
-                    array = variable
-                elif variable.ndim > 2:
-                    if not var_index or len(var_index) != variable.ndim - 2:
-                        var_index = (0,) * (variable.ndim - 2)
-
-                    # noinspection PyTypeChecker
-                    var_index += (slice(None), slice(None),)
-
-                    # print('var_index =', var_index)
-                    array = variable[var_index]
-                else:
-                    self.write_status_error(message='Variable must be an N-D Dataset with N >= 2, '
-                                                    'but "%s" is only %d-D' % (var_name, variable.ndim))
-                    return
-
-                cmap_min = np.nanmin(array.values) if np.isnan(cmap_min) else cmap_min
-                cmap_max = np.nanmax(array.values) if np.isnan(cmap_max) else cmap_max
-                # print('cmap_min =', cmap_min)
-                # print('cmap_max =', cmap_max)
-
-                if USE_WORKSPACE_IMAGERY_CACHE:
-                    mem_tile_cache = MEM_TILE_CACHE
-                    rgb_tile_cache_dir = os.path.join(base_dir, WORKSPACE_CACHE_DIR_NAME, 'v%s' % __version__, 'tiles')
-                    rgb_tile_cache = Cache(FileCacheStore(rgb_tile_cache_dir, ".png"),
-                                           capacity=WEBAPI_WORKSPACE_FILE_TILE_CACHE_CAPACITY,
-                                           threshold=0.75)
-                else:
-                    mem_tile_cache = MEM_TILE_CACHE
-                    rgb_tile_cache = None
-
-                def array_image_id_factory(level):
-                    return 'arr-%s/%s' % (array_id, level)
-
-                tiling_scheme = get_tiling_scheme(variable)
-                if tiling_scheme is None:
-                    self.write_status_error(
-                        message='Internal error: failed to compute tiling scheme for array_id="%s"' % array_id)
-                    return
-
-                # print('tiling_scheme =', repr(tiling_scheme))
-                pyramid = ImagePyramid.create_from_array(array, tiling_scheme,
-                                                         level_image_id_factory=array_image_id_factory)
-                pyramid = pyramid.apply(lambda image, level:
-                                        TransformArrayImage(image,
-                                                            image_id='tra-%s/%d' % (array_id, level),
-                                                            flip_y=tiling_scheme.geo_extent.inv_y,
-                                                            force_masked=True,
-                                                            no_data_value=no_data_value,
-                                                            valid_range=valid_range,
-                                                            tile_cache=mem_tile_cache))
-                pyramid = pyramid.apply(lambda image, level:
-                                        ColorMappedRgbaImage(image,
-                                                             image_id='rgb-%s/%d' % (image_id, level),
-                                                             value_range=(cmap_min, cmap_max),
-                                                             cmap_name=cmap_name,
-                                                             encode=True,
-                                                             format='PNG',
-                                                             tile_cache=rgb_tile_cache))
-                ResVarTileHandler.PYRAMIDS[pyramid_id] = pyramid
-                if TRACE_PERF:
-                    print('Created pyramid "%s":' % pyramid_id)
-                    print('  tile_size:', pyramid.tile_size)
-                    print('  num_level_zero_tiles:', pyramid.num_level_zero_tiles)
-                    print('  num_levels:', pyramid.num_levels)
+            # Pyramid creation may be expensive, as it may require computing overviews or the variable's value range,
+            # so we don't do it on the IOLoop thread.
+            pyramid_id, pyramid = yield THREAD_POOL.submit(_get_or_create_pyramid,
+                                                           workspace, res_name, dataset,
+                                                           var_name, var_index,
+                                                           cmap_name, cmap_min, cmap_max)
 
             if TRACE_PERF:
-                print('PERF: >>> Tile:', image_id, z, y, x)
+                print('PERF: >>> Tile:', pyramid_id, z, y, x)
 
             t1 = time.clock()
-            tile = pyramid.get_tile(int(x), int(y), int(z))
+            tile = yield TILE_FETCHER.fetch_tile(pyramid_id, pyramid, int(x), int(y), int(z))
             t2 = time.clock()
 
             self.set_header('Content-Type', 'image/png')
             self.write(tile)
 
             if TRACE_PERF:
-                print('PERF: <<< Tile:', image_id, z, y, x, 'took', t2 - t1, 'seconds')
-
-            # GLOBAL_LOCK.release()
-
+                print('PERF: <<< Tile:', pyramid_id, z, y, x, 'took', t2 - t1, 'seconds')
         except Exception:
             self.write_status_error(exc_info=sys.exc_info())
+        self.finish()
+
+
+def _get_or_create_pyramid(workspace, res_name: str, dataset, var_name: str, var_index,
+                           cmap_name: str, cmap_min: float, cmap_max: float):
+    if not isinstance(dataset, xr.Dataset):
+        raise ValidationError('Resource "%s" must be a Dataset' % res_name)
+
+    base_dir = workspace.base_dir
+
+    imagery = WorkspaceImagery.get(workspace)
+    imagery.prune(workspace.resource_cache)
+
+    res_id = workspace.resource_cache.get_id(res_name)
+    res_update_count = workspace.resource_cache.get_update_count(res_name)
+
+    array_id = '%s-%s-%s' % (res_name,
+                             var_name,
+                             ','.join(map(str, var_index)))
+    # Tile identifiers include the resource's ID and update count, so that tiles of an outdated resource
+    # that are still being computed cannot be confused with tiles of the current one
+    versioned_array_id = '%s-%s-%s' % (array_id, res_id, res_update_count)
+    image_id = '%s-%s-%s-%s' % (versioned_array_id,
+                                cmap_name,
+                                cmap_min,
+                                cmap_max)
+
+    pyramid_id = '%s-%s' % (base_dir, image_id)
+
+    pyramid = imagery.get_pyramid(pyramid_id)
+    if pyramid is not None:
+        return pyramid_id, pyramid
+
+    variable = dataset[var_name]
+    no_data_value = variable.attrs.get('_FillValue')
+    valid_range = variable.attrs.get('valid_range')
+    if valid_range is None:
+        valid_min = variable.attrs.get('valid_min')
+        valid_max = variable.attrs.get('valid_max')
+        if valid_min is not None and valid_max is not None:
+            valid_range = [valid_min, valid_max]
+
+    # Make sure we work with 2D image arrays only
+    if variable.ndim == 2:
+        array = variable
+    elif variable.ndim > 2:
+        if not var_index or len(var_index) != variable.ndim - 2:
+            var_index = (0,) * (variable.ndim - 2)
+
+        # noinspection PyTypeChecker
+        var_index += (slice(None), slice(None),)
+
+        # print('var_index =', var_index)
+        array = variable[var_index]
+    else:
+        raise ValidationError('Variable must be an N-D Dataset with N >= 2, '
+                              'but "%s" is only %d-D' % (var_name, variable.ndim))
+
+    tiling_scheme = get_tiling_scheme(variable)
+    if tiling_scheme is None:
+        raise ValueError('Internal error: failed to compute tiling scheme for array_id="%s"' % array_id)
+
+    overview_store = None
+    if USE_WORKSPACE_OVERVIEW_CACHE and tiling_scheme.num_levels > 1:
+        overview_dir = os.path.join(base_dir, WORKSPACE_CACHE_DIR_NAME, 'v%s' % __version__,
+                                    'overviews', array_id)
+        overview_store = NdarrayOverviewStore.open_or_build(overview_dir, array,
+                                                            tiling_scheme.num_levels,
+                                                            signature=_get_resource_signature(workspace, res_name))
+
+    if np.isnan(cmap_min) or np.isnan(cmap_max):
+        value_range = overview_store.value_range if overview_store is not None else None
+        if value_range is None:
+            value_range = np.nanmin(array.values), np.nanmax(array.values)
+        cmap_min = value_range[0] if np.isnan(cmap_min) else cmap_min
+        cmap_max = value_range[1] if np.isnan(cmap_max) else cmap_max
+    # print('cmap_min =', cmap_min)
+    # print('cmap_max =', cmap_max)
+
+    mem_tile_cache = imagery.mem_tile_cache
+    if USE_WORKSPACE_IMAGERY_CACHE:
+        rgb_tile_cache_dir = os.path.join(base_dir, WORKSPACE_CACHE_DIR_NAME, 'v%s' % __version__, 'tiles')
+        rgb_tile_cache = Cache(FileCacheStore(rgb_tile_cache_dir, ".png"),
+                               capacity=WEBAPI_WORKSPACE_FILE_TILE_CACHE_CAPACITY,
+                               threshold=0.75)
+    else:
+        # Keep encoded tiles in memory too, so that tiles computed by TILE_FETCHER in advance can be reused.
+        rgb_tile_cache = mem_tile_cache
+
+    def array_image_id_factory(level):
+        return 'arr-%s/%s' % (versioned_array_id, level)
+
+    # print('tiling_scheme =', repr(tiling_scheme))
+    pyramid = ImagePyramid.create_from_array(array, tiling_scheme,
+                                             level_image_id_factory=array_image_id_factory,
+                                             overview_store=overview_store)
+    pyramid = pyramid.apply(lambda image, level:
+                            TransformArrayImage(image,
+                                                image_id='tra-%s/%d' % (versioned_array_id, level),
+                                                flip_y=tiling_scheme.geo_extent.inv_y,
+                                                force_masked=True,
+                                                no_data_value=no_data_value,
+                                                valid_range=valid_range,
+                                                tile_cache=mem_tile_cache))
+    pyramid = pyramid.apply(lambda image, level:
+                            ColorMappedRgbaImage(image,
+                                                 image_id='rgb-%s/%d' % (image_id, level),
+                                                 value_range=(cmap_min, cmap_max),
+                                                 cmap_name=cmap_name,
+                                                 encode=True,
+                                                 format='PNG',
+                                                 tile_cache=rgb_tile_cache))
+    # Another thread may have created the same pyramid in the meantime
+    pyramid = imagery.put_pyramid(pyramid_id, res_name, res_id, res_update_count, pyramid)
+    if TRACE_PERF:
+        print('Created pyramid "%s":' % pyramid_id)
+        print('  tile_size:', pyramid.tile_size)
+        print('  num_level_zero_tiles:', pyramid.num_level_zero_tiles)
+        print('  num_levels:', pyramid.num_levels)
+
+    return pyramid_id, pyramid
 
 
 # noinspection PyAbstractClass,PyBroadException
@@ -448,6 +585,19 @@ class ResVarHtmlHandler(WorkspaceResourceHandler):
         self.finish()
 
 
+def _get_resource_signature(workspace, res_name: str) -> str:
+    """
+    Compute a signature for the resource *res_name* from the JSON representations of the workflow steps
+    required to compute it. The signature changes whenever the resource's step or any of its upstream steps change.
+    """
+    workflow = workspace.workflow
+    if workflow.find_node(res_name) is None:
+        return res_name
+    steps = workflow.find_steps_to_compute(res_name)
+    steps_json = json.dumps([step.to_json_dict() for step in steps], sort_keys=True, default=str)
+    return hashlib.sha1(steps_json.encode('utf-8')).hexdigest()
+
+
 def _new_monitor() -> Monitor:
     return ConsoleMonitor(stay_in_line=True, progress_bar_size=30)
 
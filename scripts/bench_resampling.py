@@ -0,0 +1,66 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Benchmark resampling a stack of 2-D grids by a single call of cate.ops.resampling functions,
+compared to resampling it slice by slice.
+
+Usage: python bench_resampling.py [<num_slices>]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+import cate.ops.resampling as rs
+
+
+def _measure(func, repeat=3):
+    # The first call compiles the kernels
+    func()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main(num_slices=100):
+    src = np.ma.masked_invalid(np.random.RandomState(0).random_sample((num_slices, 180, 360)))
+    src[:, 10:20, 10:20] = np.ma.masked
+
+    cases = [('downsample_2d, DS_MEAN', lambda a: rs.downsample_2d(a, 144, 72, method=rs.DS_MEAN)),
+             ('downsample_2d, DS_MODE', lambda a: rs.downsample_2d(a, 144, 72, method=rs.DS_MODE)),
+             ('upsample_2d, US_LINEAR', lambda a: rs.upsample_2d(a, 720, 360, method=rs.US_LINEAR)),
+             ('resample_2d, mixed', lambda a: rs.resample_2d(a, 720, 90))]
+
+    print('%d slices of shape %s' % (num_slices, src.shape[1:]))
+    for name, resample in cases:
+        per_slice = _measure(lambda: [resample(src[i]) for i in range(num_slices)])
+        stacked = _measure(lambda: resample(src))
+        print('%-24s per slice: %8.3f s  stacked: %8.3f s  speed-up: %5.1fx'
+              % (name, per_slice, stacked, per_slice / stacked))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
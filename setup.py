@@ -46,6 +46,7 @@ requirements = [
     'shapely',
     'tornado',
     'xarray',
+    'zarr',
 ]
 
 on_rtd = os.environ.get('READTHEDOCS') == 'True'
@@ -4,6 +4,7 @@ import os.path as op
 import os
 import unittest
 
+import numpy as np
 import xarray as xr
 
 import cate.core.ds as ds
@@ -245,13 +246,48 @@ class IOTest(TestCase):
         path_large = op.join(_TEST_DATA_PATH, 'large', '*.nc')
         path_small = op.join(_TEST_DATA_PATH, 'small', '*.nc')
 
-        ds_large = ds.open_xarray_dataset(path_large)
-        ds_small = ds.open_xarray_dataset(path_small)
-        large_expected = {'lat': (1800, 1800), 'time': (1,), 'bnds': (2,),
-                          'lon': (3600, 3600)}
+        chunk_size = 64 * 1024 * 1024
+        ds_large = ds.open_xarray_dataset(path_large, chunk_size=chunk_size)
+        ds_small = ds.open_xarray_dataset(path_small, chunk_size=chunk_size)
         small_expected = {'lat': (720,), 'time': (1,), 'lon': (1440,)}
         self.assertEqual(ds_small.chunks, small_expected)
-        self.assertEqual(ds_large.chunks, large_expected)
+        self.assertTrue(len(ds_large.chunks['lat']) > 1)
+        for var in ds_large.data_vars.values():
+            self.assertTrue(var.data.chunksize is None or
+                            np.prod(var.data.chunksize) * var.dtype.itemsize <= chunk_size)
+
+
+class GetDatasetChunksTest(TestCase):
+    @staticmethod
+    def _new_dataset(shape, storage_chunks=None):
+        dataset = xr.Dataset({'sst': (('time', 'lat', 'lon'), np.zeros(shape, dtype=np.float32)),
+                              'sst_mask': (('lat', 'lon'), np.zeros(shape[1:], dtype=np.uint8))})
+        if storage_chunks:
+            dataset.sst.encoding['chunksizes'] = storage_chunks
+        return dataset
+
+    def test_small_dataset_is_not_chunked(self):
+        dataset = self._new_dataset((1, 720, 1440))
+        self.assertIsNone(ds.get_dataset_chunks(dataset, 64 * 1024 * 1024))
+
+    def test_chunks_are_aligned_to_storage(self):
+        dataset = self._new_dataset((1, 1800, 3600), storage_chunks=(1, 256, 512))
+        # One row of storage chunks is 3.5 MiB
+        self.assertEqual(ds.get_dataset_chunks(dataset, 8 * 1024 * 1024), {'lat': 512})
+        self.assertEqual(ds.get_dataset_chunks(dataset, 4 * 1024 * 1024), {'lat': 256})
+        self.assertEqual(ds.get_dataset_chunks(dataset, 2 * 1024 * 1024), {'lat': 256, 'lon': 2048})
+        # Chunks are never smaller than the storage chunks
+        self.assertEqual(ds.get_dataset_chunks(dataset, 1024), {'lat': 256, 'lon': 512})
+
+    def test_outer_dimensions_are_split_first(self):
+        dataset = self._new_dataset((12, 720, 1440), storage_chunks=(1, 720, 1440))
+        self.assertEqual(ds.get_dataset_chunks(dataset, 16 * 1024 * 1024), {'time': 4})
+
+    def test_odd_grid(self):
+        dataset = self._new_dataset((1, 1801, 3601))
+        chunks = ds.get_dataset_chunks(dataset, 4 * 1024 * 1024)
+        self.assertEqual(chunks, {'lat': 291})
+        self.assertLessEqual(chunks['lat'] * 3601 * 4, 4 * 1024 * 1024)
 
 
 class DataAccessErrorTest(unittest.TestCase):
@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+import xarray as xr
+
+from cate.core.dschunkcache import DatasetChunkCache, is_remote_path
+from cate.core.dsmetacache import DatasetMetadataCache, open_mfdataset_from_metadata
+from .test_dsmetacache import _new_dataset
+
+
+def _wait_for_read_ahead(cache: DatasetChunkCache):
+    for _ in range(100):
+        # noinspection PyProtectedMember
+        if not cache._pending:
+            return
+        time.sleep(0.05)
+
+
+class DatasetChunkCacheTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = DatasetChunkCache(os.path.join(self.tmp_dir, 'cache'), 10000)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_read(self):
+        index = ((0, 1), (0, 10))
+        chunk = self.cache.read('http://host/file.nc', 'sst', index, {}, lambda: np.ones((1, 10)))
+        np.testing.assert_array_equal(chunk, np.ones((1, 10)))
+        chunk = self.cache.read('http://host/file.nc', 'sst', index, {}, lambda: self.fail('chunk not cached'))
+        np.testing.assert_array_equal(chunk, np.ones((1, 10)))
+        # Other open arguments yield other chunks
+        chunk = self.cache.read('http://host/file.nc', 'sst', index, dict(decode_cf=False), lambda: np.zeros((1, 10)))
+        np.testing.assert_array_equal(chunk, np.zeros((1, 10)))
+
+    def test_read_ahead(self):
+        self.cache.read_ahead_chunks([('http://host/file.nc', 'sst', ((i, i + 1),), {}, lambda i=i: np.array([i]))
+                                      for i in range(3)])
+        _wait_for_read_ahead(self.cache)
+        for i in range(3):
+            key = self.cache.get_chunk_key('http://host/file.nc', 'sst', ((i, i + 1),), {})
+            np.testing.assert_array_equal(self.cache.load(key), [i])
+
+    def test_trim(self):
+        for i in range(3):
+            self.cache.store('key-%d' % i, np.zeros(400))
+            os.utime(os.path.join(self.cache.cache_dir, 'ke', 'key-%d.npy' % i), (i, i))
+        self.assertLessEqual(self.cache.size, self.cache.capacity)
+        self.cache.store('key-3', np.zeros(400))
+        self.assertLessEqual(self.cache.size, 0.75 * self.cache.capacity)
+        # Least recently used chunks are removed first
+        self.assertEqual([self.cache.load('key-%d' % i) is not None for i in range(4)], [False, False, True, True])
+        self.cache.clear()
+        self.assertEqual(self.cache.size, 0)
+
+    def test_is_remote_path(self):
+        self.assertTrue(is_remote_path('http://data.cci.ceda.ac.uk/thredds/dodsC/esacci/sst/file.nc'))
+        self.assertTrue(is_remote_path('https://host/file.nc'))
+        self.assertFalse(is_remote_path('/data/file.nc'))
+        self.assertFalse(is_remote_path('C:\\data\\file.nc'))
+
+
+class OpenMfdatasetWithChunkCacheTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.files = []
+        for day in range(1, 5):
+            file = os.path.join(self.tmp_dir, 'file-%d.nc' % day)
+            _new_dataset(day, num_times=2).to_netcdf(file)
+            self.files.append(file)
+        self.metadata_list = DatasetMetadataCache(os.path.join(self.tmp_dir, 'metadata')).get_metadata_list(self.files)
+        self.chunk_cache = DatasetChunkCache(os.path.join(self.tmp_dir, 'chunks'), 1024 * 1024, read_ahead=3)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _open(self) -> xr.Dataset:
+        return open_mfdataset_from_metadata(self.files, self.metadata_list, chunks=dict(time=1),
+                                            chunk_cache=self.chunk_cache)
+
+    def test_chunks_are_cached_and_read_ahead(self):
+        with patch('xarray.open_dataset', side_effect=xr.open_dataset) as open_dataset_mock:
+            self._open().sst.isel(time=1).values
+            _wait_for_read_ahead(self.chunk_cache)
+            # The chunk itself and the next three chunks along the time dimension
+            self.assertEqual(open_dataset_mock.call_count, 4)
+            self.assertEqual([call[0][0] for call in open_dataset_mock.call_args_list].count(self.files[1]), 2)
+
+            open_dataset_mock.reset_mock()
+            # Chunks are shared by datasets opened again, only chunks after time=4 are read ahead
+            values = self._open().sst.isel(time=slice(1, 5)).values
+            _wait_for_read_ahead(self.chunk_cache)
+            self.assertEqual({call[0][0] for call in open_dataset_mock.call_args_list}, set(self.files[2:]))
+
+        expected = xr.concat([xr.open_dataset(file) for file in self.files], dim='time')
+        np.testing.assert_array_equal(values, expected.sst.isel(time=slice(1, 5)).values)
+        np.testing.assert_array_equal(self._open().sst.values, expected.sst.values)
@@ -0,0 +1,160 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from cate.core.dsmetacache import DatasetMetadataCache, DatasetMetadataIndex, open_mfdataset_from_metadata, \
+    read_metadata
+
+
+def _new_dataset(day: int, num_times: int = 1, lat=None) -> xr.Dataset:
+    lat = np.array([10., 20., 30.]) if lat is None else lat
+    lon = np.array([1., 2., 3., 4.])
+    time = pd.date_range('2017-01-%02d' % day, periods=num_times)
+    sst = np.arange(num_times * lat.size * lon.size, dtype=np.float32).reshape((num_times, lat.size, lon.size))
+    return xr.Dataset({'sst': (('time', 'lat', 'lon'), sst + day, dict(units='K')),
+                       'sst_mask': (('lat', 'lon'), np.full((lat.size, lon.size), day, dtype=np.int16))},
+                      coords=dict(time=time, lat=lat, lon=lon),
+                      attrs=dict(title='Day %d' % day))
+
+
+class DatasetMetadataCacheTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = DatasetMetadataCache(os.path.join(self.tmp_dir, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write_files(self, *datasets) -> list:
+        files = []
+        for i, dataset in enumerate(datasets):
+            file = os.path.join(self.tmp_dir, 'file-%d.nc' % i)
+            dataset.to_netcdf(file)
+            files.append(file)
+        return files
+
+    def test_entries_are_reused(self):
+        file, = self._write_files(_new_dataset(1))
+        metadata = self.cache.get_metadata(file)
+        self.assertEqual(metadata['coord_names'], ['time', 'lat', 'lon'])
+        self.assertEqual(metadata['variables']['sst']['shape'], (1, 3, 4))
+        self.assertEqual(metadata['variables']['sst']['attrs'], dict(units='K'))
+        self.assertNotIn('values', metadata['variables']['sst'])
+
+        with patch('cate.core.dsmetacache.read_metadata', side_effect=read_metadata) as read_metadata_mock:
+            self.cache.get_metadata(file)
+            self.assertEqual(read_metadata_mock.call_count, 0)
+            # Other keyword arguments yield other entries
+            self.cache.get_metadata(file, drop_variables=['sst_mask'])
+            self.assertEqual(read_metadata_mock.call_count, 1)
+
+    def test_entries_are_renewed(self):
+        file, = self._write_files(_new_dataset(1))
+        self.cache.get_metadata(file)
+        _new_dataset(1, lat=np.array([10., 20.])).to_netcdf(file)
+        stat = os.stat(file)
+        os.utime(file, (stat.st_atime, stat.st_mtime + 10))
+        metadata = self.cache.get_metadata(file)
+        self.assertEqual(metadata['dims']['lat'], 2)
+
+    def test_open_mfdataset(self):
+        datasets = [_new_dataset(1), _new_dataset(2, num_times=2), _new_dataset(4)]
+        files = self._write_files(*datasets)
+        metadata_list = [self.cache.get_metadata(file) for file in files]
+
+        with patch('xarray.open_dataset', side_effect=xr.open_dataset) as open_dataset_mock:
+            dataset = open_mfdataset_from_metadata(files, metadata_list, chunks=dict(lat=2))
+            self.assertEqual(open_dataset_mock.call_count, 0)
+            # Only the file holding the selected chunk is opened
+            dataset.sst.isel(time=1, lat=0).values
+            self.assertEqual(open_dataset_mock.call_count, 1)
+            self.assertEqual(open_dataset_mock.call_args[0][0], files[1])
+
+        self.assertEqual(dataset.attrs['title'], 'Day 1')
+        self.assertEqual(dataset.sst.chunks, ((1, 2, 1), (2, 1), (4,)))
+        self.assertEqual(dataset.sst.attrs, dict(units='K'))
+        # Data variables without the concatenation dimension are concatenated too, like xr.open_mfdataset() does
+        self.assertEqual(dataset.sst_mask.dims, ('time', 'lat', 'lon'))
+        expected = xr.concat(datasets, dim='time', data_vars='all')
+        self.assertTrue(dataset.load().identical(expected))
+
+    def test_open_mfdataset_stacked(self):
+        datasets = [_new_dataset(1).isel(time=0, drop=True), _new_dataset(2).isel(time=0, drop=True)]
+        files = self._write_files(*datasets)
+        metadata_list = [self.cache.get_metadata(file) for file in files]
+        dataset = open_mfdataset_from_metadata(files, metadata_list)
+        self.assertEqual(dataset.sst.dims, ('time', 'lat', 'lon'))
+        self.assertEqual(dataset.sst.shape, (2, 3, 4))
+        np.testing.assert_array_equal(dataset.sst_mask.values[:, 0, 0], [1, 2])
+
+    def test_open_mfdataset_fails_for_different_coords(self):
+        files = self._write_files(_new_dataset(1), _new_dataset(2, lat=np.array([10., 20., 40.])))
+        metadata_list = [self.cache.get_metadata(file) for file in files]
+        self.assertIsNone(open_mfdataset_from_metadata(files, metadata_list))
+
+    def test_open_mfdataset_fails_for_different_variables(self):
+        files = self._write_files(_new_dataset(1), _new_dataset(2).drop('sst_mask'))
+        metadata_list = [self.cache.get_metadata(file) for file in files]
+        self.assertIsNone(open_mfdataset_from_metadata(files, metadata_list))
+
+    def test_can_open(self):
+        self.assertTrue(DatasetMetadataCache.can_open())
+        self.assertTrue(DatasetMetadataCache.can_open(drop_variables=['sst_mask'], decode_times=False))
+        self.assertFalse(DatasetMetadataCache.can_open(preprocess=lambda ds: ds))
+
+
+class DatasetMetadataIndexTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.files = []
+        for day in range(1, 4):
+            file = os.path.join(self.tmp_dir, 'file-%d.nc' % day)
+            _new_dataset(day).to_netcdf(file)
+            self.files.append(file)
+        self.index_path = os.path.join(self.tmp_dir, 'ds.index')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_add_remove_and_reopen(self):
+        index = DatasetMetadataIndex(self.index_path)
+        self.assertEqual(index.files, [])
+        index.save()
+        self.assertFalse(os.path.exists(self.index_path))
+
+        index.add(self.files[0])
+        index.add(self.files[1])
+        index.save()
+        index.add(self.files[2])
+        index.remove(self.files[0])
+        index.save()
+
+        index = DatasetMetadataIndex(self.index_path)
+        self.assertEqual(index.files, self.files[1:])
+        with patch('cate.core.dsmetacache.read_metadata', side_effect=read_metadata) as read_metadata_mock:
+            metadata_list = index.get_metadata_list(self.files[1:])
+            self.assertEqual(read_metadata_mock.call_count, 0)
+        self.assertEqual([metadata['attrs']['title'] for metadata in metadata_list], ['Day 2', 'Day 3'])
+        # Equal coordinates are shared
+        self.assertIs(metadata_list[0]['variables']['lat']['values'], metadata_list[1]['variables']['lat']['values'])
+
+    def test_get_metadata_list_with_drop_variables(self):
+        index = DatasetMetadataIndex(self.index_path)
+        self.assertTrue(index.can_open(drop_variables=['sst_mask']))
+        self.assertFalse(index.can_open(decode_times=False))
+        metadata_list = index.get_metadata_list(self.files, drop_variables=['sst_mask'])
+        # Getting metadata never writes the index file
+        self.assertFalse(os.path.exists(self.index_path))
+        self.assertEqual(list(metadata_list[0]['variables'].keys()), ['sst', 'time', 'lat', 'lon'])
+        # The index itself keeps all variables
+        self.assertIn('sst_mask', index.get_metadata_list(self.files[:1])[0]['variables'])
+
+        dataset = open_mfdataset_from_metadata(self.files, metadata_list, drop_variables=['sst_mask'])
+        self.assertEqual(list(dataset.data_vars.keys()), ['sst'])
+        np.testing.assert_array_equal(dataset.sst.values[:, 0, 0], [1., 2., 3.])
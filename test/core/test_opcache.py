@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+import xarray as xr
+
+from cate.core.op import op, op_input
+from cate.core.opcache import OpResultCache
+from cate.core.workflow import OpStep, Workflow
+from cate.util.opmetainf import OpMetaInfo
+from cate.util.undefined import UNDEFINED
+
+_CALL_COUNTS = dict(make_ds=0, scale_ds=0)
+
+
+@op(disk_cache=True)
+@op_input('size')
+def make_ds(size: int) -> xr.Dataset:
+    _CALL_COUNTS['make_ds'] += 1
+    return xr.Dataset(dict(a=(('y', 'x'), np.arange(size * size, dtype=np.float64).reshape((size, size)))))
+
+
+@op(version='1.0', disk_cache=True)
+@op_input('ds')
+@op_input('factor')
+def scale_ds(ds: xr.Dataset, factor: float) -> xr.Dataset:
+    _CALL_COUNTS['scale_ds'] += 1
+    return ds * factor
+
+
+def _new_workflow(size, factor):
+    step1 = OpStep(make_ds, node_id='step1')
+    step2 = OpStep(scale_ds, node_id='step2')
+    step1.inputs.size.value = size
+    step2.inputs.ds.source = step1.outputs['return']
+    step2.inputs.factor.value = factor
+    workflow = Workflow(OpMetaInfo('workflow', outputs=OrderedDict([('return', {})])))
+    workflow.add_steps(step1, step2)
+    return workflow
+
+
+class OpResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp(prefix='cate-test-opcache-')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_get_step_key(self):
+        cache = OpResultCache(self.cache_dir, 1024 * 1024)
+
+        workflow = _new_workflow(4, 2.0)
+        step1, step2 = workflow.steps
+        key1 = cache.get_step_key(step1)
+        key2 = cache.get_step_key(step2)
+        self.assertIsNotNone(key1)
+        self.assertIsNotNone(key2)
+        self.assertNotEqual(key1, key2)
+
+        # Same invocations have the same keys
+        self.assertEqual(cache.get_step_key(_new_workflow(4, 2.0).steps[1]), key2)
+        # Changed inputs, also of upstream steps, change the keys
+        self.assertNotEqual(cache.get_step_key(_new_workflow(4, 3.0).steps[1]), key2)
+        self.assertNotEqual(cache.get_step_key(_new_workflow(5, 2.0).steps[1]), key2)
+
+        # Input values that are not JSON-serializable prevent caching
+        step2.inputs.factor.value = np.float32(2.0)
+        self.assertIsNone(cache.get_step_key(step2))
+
+    def test_invoke_steps(self):
+        cache = OpResultCache(self.cache_dir, 1024 * 1024)
+        _CALL_COUNTS.update(make_ds=0, scale_ds=0)
+
+        workflow = _new_workflow(4, 2.0)
+        workflow.invoke_steps(workflow.sorted_steps, context=dict(op_result_cache=cache))
+        self.assertEqual(_CALL_COUNTS, dict(make_ds=1, scale_ds=1))
+        expected = 2.0 * np.arange(16, dtype=np.float64).reshape((4, 4))
+        np.testing.assert_equal(workflow.steps[1].outputs['return'].value.a.values, expected)
+
+        # Another workflow with the same steps is served from the cache
+        workflow = _new_workflow(4, 2.0)
+        workflow.invoke_steps(workflow.sorted_steps, context=dict(op_result_cache=cache))
+        self.assertEqual(_CALL_COUNTS, dict(make_ds=1, scale_ds=1))
+        np.testing.assert_equal(workflow.steps[1].outputs['return'].value.a.values, expected)
+
+        workflow = _new_workflow(4, 3.0)
+        workflow.invoke_steps(workflow.sorted_steps, context=dict(op_result_cache=cache))
+        self.assertEqual(_CALL_COUNTS, dict(make_ds=1, scale_ds=2))
+
+    def test_store_and_load(self):
+        cache = OpResultCache(self.cache_dir, 1024 * 1024)
+
+        self.assertIs(cache.load('ab12'), UNDEFINED)
+        self.assertEqual(cache.store('ab12', 'no xarray'), 'no xarray')
+        self.assertIs(cache.load('ab12'), UNDEFINED)
+
+        ds = xr.Dataset(dict(a=(('y', 'x'), np.ones((8, 8))))).chunk(dict(y=4, x=4))
+        stored_ds = cache.store('ab12', ds)
+        self.assertIsInstance(stored_ds, xr.Dataset)
+        self.assertEqual(stored_ds.a.chunks, ((4, 4), (4, 4)))
+        np.testing.assert_equal(stored_ds.a.values, ds.a.values)
+        stored_ds.close()
+
+        da = xr.DataArray(np.zeros((3, 2)), dims=('y', 'x'), name='b')
+        stored_da = cache.store('cd34', da)
+        self.assertIsInstance(stored_da, xr.DataArray)
+        self.assertEqual(stored_da.name, 'b')
+        np.testing.assert_equal(stored_da.values, da.values)
+        stored_da.close()
+
+        self.assertTrue(os.path.isdir(os.path.join(self.cache_dir, 'ab', 'ab12')))
+        self.assertTrue(os.path.isdir(os.path.join(self.cache_dir, 'cd', 'cd34')))
+        cache.clear()
+        self.assertEqual(cache.size, 0)
+
+    def test_trim(self):
+        ds = xr.Dataset(dict(a=(('y', 'x'), np.ones((64, 64)))))
+        cache = OpResultCache(self.cache_dir, 1024 * 1024)
+        cache.store('0001', ds).close()
+        entry_size = cache.size
+        self.assertGreater(entry_size, 64 * 64 * 8)
+
+        cache = OpResultCache(self.cache_dir, int(2.5 * entry_size), threshold=0.5)
+        cache.store('0002', ds).close()
+        # Make '0001' the most recently used
+        os.utime(os.path.join(self.cache_dir, '00', '0002', 'result.json'), (0, 0))
+        cache.load('0001').close()
+        cache.store('0003', ds).close()
+
+        self.assertIs(cache.load('0002'), UNDEFINED)
+        self.assertIsNot(cache.load('0003'), UNDEFINED)
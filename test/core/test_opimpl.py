@@ -0,0 +1,64 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+from shapely.geometry import MultiPolygon, Polygon, box
+
+from cate.core.opimpl import get_polygon_mask, rasterize_polygon
+
+
+class RasterizePolygonTest(TestCase):
+    def test_polygon(self):
+        triangle = Polygon([(0., 0.), (4., 0.), (0., 4.)])
+        mask = rasterize_polygon(triangle, np.arange(0.5, 5.), np.arange(0.5, 5.))
+        np.testing.assert_array_equal(mask, [[1, 1, 1, 1, 0],
+                                             [1, 1, 1, 0, 0],
+                                             [1, 1, 0, 0, 0],
+                                             [1, 0, 0, 0, 0],
+                                             [0, 0, 0, 0, 0]])
+
+    def test_holes(self):
+        square_with_hole = Polygon(box(0., 0., 5., 5.).exterior.coords, [box(1., 1., 4., 4.).exterior.coords])
+        mask = rasterize_polygon(square_with_hole, np.arange(0.5, 5.), np.arange(0.5, 5.))
+        np.testing.assert_array_equal(mask, [[1, 1, 1, 1, 1],
+                                             [1, 0, 0, 0, 1],
+                                             [1, 0, 0, 0, 1],
+                                             [1, 0, 0, 0, 1],
+                                             [1, 1, 1, 1, 1]])
+
+    def test_multi_polygon(self):
+        boxes = MultiPolygon([box(0., 0., 2., 2.), box(3., 3., 5., 5.)])
+        # Descending coordinates
+        mask = rasterize_polygon(boxes, np.arange(4.5, 0., -1.), np.arange(4.5, 0., -1.))
+        np.testing.assert_array_equal(mask, [[1, 1, 0, 0, 0],
+                                             [1, 1, 0, 0, 0],
+                                             [0, 0, 0, 0, 0],
+                                             [0, 0, 0, 1, 1],
+                                             [0, 0, 0, 1, 1]])
+
+    def test_chunks(self):
+        polygon = Polygon([(-170., -80.), (170., -70.), (160., 85.), (0., 10.), (-160., 80.)])
+        x = np.linspace(-179.5, 179.5, 360)
+        y = np.linspace(-89.5, 89.5, 180)
+        expected = rasterize_polygon(polygon, x, y)
+        with patch('cate.core.opimpl._RASTERIZE_CHUNK_SIZE', 7):
+            np.testing.assert_array_equal(rasterize_polygon(polygon, x, y), expected)
+        self.assertTrue(expected[90, 90])
+        self.assertFalse(expected[150, 180])
+
+
+class GetPolygonMaskTest(TestCase):
+    def test_masks_are_reused(self):
+        polygon = Polygon([(10., 10.), (30., 12.), (20., 40.)])
+        x = np.linspace(0., 50., 51)
+        y = np.linspace(0., 50., 51)
+        with patch('cate.core.opimpl.rasterize_polygon', side_effect=rasterize_polygon) as rasterize_mock:
+            mask = get_polygon_mask(polygon, x, y)
+            self.assertIs(get_polygon_mask(Polygon(polygon.exterior.coords), x.copy(), y.copy()), mask)
+            self.assertEqual(rasterize_mock.call_count, 1)
+            # Other grids yield other masks
+            get_polygon_mask(polygon, x[:-1], y)
+            self.assertEqual(rasterize_mock.call_count, 2)
+        self.assertEqual(mask.shape, (51, 51))
+        self.assertFalse(mask.flags.writeable)
+        np.testing.assert_array_equal(mask, rasterize_polygon(polygon, x, y))
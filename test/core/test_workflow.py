@@ -1,11 +1,13 @@
 import json
 import os.path
+import threading
 from collections import OrderedDict
 from unittest import TestCase
 
 from cate.core.op import op_input, op_output, Operation
 from cate.core.workflow import OpStep, Workflow, WorkflowStep, NodePort, ExpressionStep, NoOpStep, SubProcessStep, ValueCache, \
     SourceRef, new_workflow_op
+from cate.util.monitor import Monitor, Cancellation
 from cate.util.undefined import UNDEFINED
 from cate.util.misc import object_to_qualified_name
 from cate.util.opmetainf import OpMetaInfo
@@ -30,6 +32,23 @@ def op3(u, v, c=0):
     return {'w': 2 * u + 3 * v + c}
 
 
+_BRANCH_BARRIER = threading.Barrier(2, timeout=10)
+
+
+@op_input('x')
+@op_output('y')
+def op_wait_for_other_branch(x):
+    # Only returns if another step waits at the barrier at the same time
+    _BRANCH_BARRIER.wait()
+    return {'y': x + 1}
+
+
+@op_input('x')
+@op_output('y')
+def op_fail(x):
+    raise ValueError('op_fail failed')
+
+
 def get_resource(rel_path):
     return os.path.join(os.path.dirname(__file__), rel_path).replace('\\', '/')
 
@@ -75,6 +94,38 @@ class WorkflowTest(TestCase):
         self.assertEqual(workflow.find_steps_to_compute('op2'), [step1, step2])
         self.assertEqual(workflow.find_steps_to_compute('op3'), [step1, step2, step3])
 
+    def test_find_dependent_steps(self):
+        step1, step2, step3, workflow = self.create_example_3_steps_workflow()
+        self.assertEqual(workflow.find_dependent_steps('op1'), [step2, step3])
+        self.assertEqual(workflow.find_dependent_steps('op2'), [step3])
+        self.assertEqual(workflow.find_dependent_steps('op3'), [])
+        with self.assertRaises(ValueError):
+            workflow.find_dependent_steps('op4')
+
+    def test_step_graph_follows_changes(self):
+        step1, step2, step3, workflow = self.create_example_3_steps_workflow()
+        self.assertEqual(workflow.sorted_steps, [step1, step2, step3])
+        self.assertEqual(workflow.find_steps_to_compute('op2'), [step1, step2])
+
+        # Reverse dependency between op1 and op2
+        step2.inputs.a.source = workflow.inputs.p
+        step1.inputs.x.source = step2.outputs.b
+        self.assertEqual(workflow.sorted_steps, [step2, step1, step3])
+        self.assertEqual(workflow.find_steps_to_compute('op2'), [step2])
+        self.assertEqual(workflow.find_dependent_steps('op2'), [step1, step3])
+
+        step4 = OpStep(op2, node_id='op4')
+        step4.inputs.a.source = step3.outputs.w
+        workflow.add_step(step4)
+        self.assertEqual(workflow.find_dependent_steps('op3'), [step4])
+
+        workflow.remove_step(step4)
+        self.assertEqual(workflow.find_dependent_steps('op3'), [])
+
+        step3.inputs.u.value = 1
+        step3.inputs.v.value = 2
+        self.assertEqual(workflow.find_dependent_steps('op2'), [step1])
+
     def test_requires(self):
         step1, step2, step3, workflow = self.create_example_3_steps_workflow()
         self.assertFalse(step1.requires(step2))
@@ -153,6 +204,64 @@ class WorkflowTest(TestCase):
         self.assertEqual(output_value, 2 * (3 + 1) + 3 * (2 * (3 + 1)))
         self.assertEqual(value_cache, dict(op1={'y': 4}, op2={'b': 8}, op3={'w': 32}))
 
+    def test_invoke_steps_concurrently(self):
+        step1 = OpStep(op1, node_id='op1')
+        step2 = OpStep(op_wait_for_other_branch, node_id='op2')
+        step3 = OpStep(op_wait_for_other_branch, node_id='op3')
+        step4 = OpStep(op3, node_id='op4')
+        workflow = Workflow(OpMetaInfo('myWorkflow', inputs=OrderedDict(p={}), outputs=OrderedDict(q={})))
+        workflow.add_steps(step1, step2, step3, step4)
+        step1.inputs.x.source = workflow.inputs.p
+        step2.inputs.x.source = step1.outputs.y
+        step3.inputs.x.source = step1.outputs.y
+        step4.inputs.u.source = step2.outputs.y
+        step4.inputs.v.source = step3.outputs.y
+        workflow.inputs.p.value = 3
+
+        _BRANCH_BARRIER.reset()
+        value_cache = ValueCache()
+        workflow.invoke_steps(workflow.sorted_steps, context=dict(value_cache=value_cache), max_workers=4)
+        self.assertEqual(step4.outputs.w.value, 2 * 5 + 3 * 5)
+        self.assertEqual(set(value_cache.keys()), {'op1', 'op2', 'op3', 'op4'})
+
+    def test_invoke_steps_concurrently_with_failure(self):
+        step1 = OpStep(op1, node_id='op1')
+        step2 = OpStep(op_fail, node_id='op2')
+        step3 = OpStep(op2, node_id='op3')
+        workflow = Workflow(OpMetaInfo('myWorkflow', inputs=OrderedDict(p={}), outputs=OrderedDict(q={})))
+        workflow.add_steps(step1, step2, step3)
+        step1.inputs.x.source = workflow.inputs.p
+        step2.inputs.x.source = workflow.inputs.p
+        step3.inputs.a.source = step2.outputs.y
+        workflow.inputs.p.value = 3
+
+        with self.assertRaises(ValueError) as cm:
+            workflow.invoke_steps(workflow.sorted_steps, max_workers=4)
+        self.assertEqual(str(cm.exception), 'op_fail failed')
+        self.assertEqual(step1.outputs.y.value, 4)
+        self.assertIsNone(step3.outputs.b.value)
+
+    def test_invoke_steps_concurrently_cancelled(self):
+        class CancelledMonitor(Monitor):
+            def start(self, label: str, total_work: float = None):
+                pass
+
+            def progress(self, work: float = None, msg: str = None):
+                pass
+
+            def done(self):
+                pass
+
+            def is_cancelled(self) -> bool:
+                return True
+
+        step1, step2, step3, workflow = self.create_example_3_steps_workflow()
+        workflow.inputs.p.value = 3
+        with self.assertRaises(Cancellation):
+            workflow.invoke_steps(workflow.sorted_steps, monitor=CancelledMonitor(), max_workers=4)
+        self.assertIsNone(step1.outputs.y.value)
+        self.assertIsNone(step3.outputs.w.value)
+
     def test_invoke_with_context_inputs(self):
         def some_op(context, workflow, workflow_id, step, step_id, invalid):
             return dict(context=context,
@@ -1158,6 +1267,49 @@ class ValueCacheTest(TestCase):
         self.assertTrue(bibo2.closed)
         self.assertTrue(bibo3.closed)
 
+    def test_set_lazy(self):
+        loaded = []
+
+        def load_bibo():
+            bibo = ValueCacheTest.ClosableBibo()
+            loaded.append(bibo)
+            return bibo
+
+        vc = ValueCache()
+        vc.set_lazy('bibo', load_bibo)
+        self.assertTrue(vc.is_lazy('bibo'))
+        self.assertIn('bibo', vc)
+        bibo_id = vc.get_id('bibo')
+        self.assertEqual(loaded, [])
+
+        bibo = vc['bibo']
+        self.assertIsInstance(bibo, ValueCacheTest.ClosableBibo)
+        self.assertFalse(vc.is_lazy('bibo'))
+        self.assertIs(vc.get('bibo'), bibo)
+        self.assertEqual(loaded, [bibo])
+        self.assertEqual(vc.get_id('bibo'), bibo_id)
+        self.assertEqual(vc.get_update_count('bibo'), 0)
+
+        vc.set_lazy('bibo2', load_bibo)
+        vc.close()
+        self.assertTrue(bibo.closed)
+        # Values never loaded are not loaded for closing them
+        self.assertEqual(len(loaded), 1)
+
+    def test_views_load_lazy_values(self):
+        vc = ValueCache()
+        vc['a'] = 1
+        vc.set_lazy('b', lambda: 2)
+        values = vc.values()
+        items = vc.items()
+        self.assertEqual(list(values), [1, 2])
+        self.assertFalse(vc.is_lazy('b'))
+        vc.set_lazy('c', lambda: 3)
+        # Views reflect later changes
+        self.assertEqual(list(items), [('a', 1), ('b', 2), ('c', 3)])
+        self.assertIn(('c', 3), items)
+        self.assertEqual(len(values), 3)
+
     def test_close_with_child(self):
         bibo1 = ValueCacheTest.ClosableBibo()
         bibo2 = ValueCacheTest.ClosableBibo()
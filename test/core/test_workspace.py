@@ -1,5 +1,8 @@
 import json
 import os
+import shutil
+import tempfile
+import threading
 import unittest
 from collections import OrderedDict
 
@@ -7,15 +10,27 @@ import numpy as np
 import pandas as pd
 import xarray as xr
 
+from cate.core.op import OP_REGISTRY
 from cate.core.types import ValidationError
 from cate.core.workflow import Workflow, OpStep
 from cate.core.workspace import Workspace, mk_op_arg, mk_op_args, mk_op_kwargs
+from cate.util.misc import object_to_qualified_name
+from cate.util.monitor import Cancellation
 from cate.util.opmetainf import OpMetaInfo
 from cate.util.undefined import UNDEFINED
 
 NETCDF_TEST_FILE_1 = os.path.join(os.path.dirname(__file__), '..', 'data', 'precip_and_temp.nc')
 NETCDF_TEST_FILE_2 = os.path.join(os.path.dirname(__file__), '..', 'data', 'precip_and_temp_2.nc')
 
+_STEP_STARTED = threading.Event()
+_STEP_RELEASED = threading.Event()
+
+
+def _wait_and_increment(x: int) -> int:
+    _STEP_STARTED.set()
+    _STEP_RELEASED.wait(timeout=60)
+    return x + 1
+
 
 class WorkspaceTest(unittest.TestCase):
     def test_utilities(self):
@@ -194,6 +209,119 @@ class WorkspaceTest(unittest.TestCase):
             OP_REGISTRY.remove_op(int_op)
             OP_REGISTRY.remove_op(str_op)
 
+    def test_close_closes_user_data(self):
+        class Closable:
+            closed = False
+
+            def close(self):
+                self.closed = True
+
+        ws = Workspace('/path', Workflow(OpMetaInfo('workspace_workflow', header=dict(description='Test!'))))
+        closable = Closable()
+        ws.user_data['closable'] = closable
+        ws.user_data['other'] = dict(a=1)
+        ws.close()
+        self.assertTrue(closable.closed)
+        self.assertEqual(ws.user_data, {})
+
+    def test_save_and_open_persistent_resources(self):
+        base_dir = tempfile.mkdtemp(prefix='cate-test-workspace-')
+        try:
+            ws = Workspace(base_dir, Workspace.new_workflow())
+            ws.set_resource('cate.ops.io.read_netcdf', mk_op_kwargs(file=NETCDF_TEST_FILE_1), res_name='X')
+            ws.set_resource('cate.ops.select.select_var', mk_op_kwargs(ds="@X", var="precipitation"), res_name='Y')
+            ws.set_resource_persistence('Y', True)
+            ws.execute_workflow('Y')
+            ws.save()
+
+            res_file = os.path.join(ws.workspace_dir, 'Y.zarr')
+            self.assertTrue(os.path.isdir(res_file))
+            res_file_ino = os.stat(res_file).st_ino
+
+            # Unchanged resources are not written again
+            ws.save()
+            self.assertEqual(os.stat(res_file).st_ino, res_file_ino)
+            # Changed resources are written again
+            ws.set_resource('cate.ops.select.select_var', mk_op_kwargs(ds="@X", var="temperature"), res_name='Y',
+                            overwrite=True)
+            ws.set_resource_persistence('Y', True)
+            ws.execute_workflow('Y')
+            ws.save()
+            self.assertNotEqual(os.stat(res_file).st_ino, res_file_ino)
+            ws.close()
+
+            ws = Workspace.open(base_dir)
+            # Resources are read on first access
+            self.assertTrue(ws.resource_cache.is_lazy('Y'))
+            self.assertEqual([], ws.to_json_dict()['resources'])
+            ds = ws.resource_cache['Y']
+            self.assertFalse(ws.resource_cache.is_lazy('Y'))
+            self.assertIsInstance(ds, xr.Dataset)
+            self.assertIn('temperature', ds)
+            self.assertIsNotNone(ds.temperature.chunks)
+            self.assertNotIn('X', ws.resource_cache)
+            ws.close()
+
+            ws = Workspace.open(base_dir)
+            ws.execute_workflow_in_background().result(timeout=60)
+            self.assertIn('X', ws.resource_cache)
+            self.assertIn('temperature', ws.resource_cache['Y'])
+            self.assertEqual(['X', 'Y'], [resource['name'] for resource in ws.to_json_dict()['resources']])
+            ws.close()
+        finally:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    def test_background_execution_is_paused_and_cancelled(self):
+        op_name = object_to_qualified_name(_wait_and_increment)
+        OP_REGISTRY.add_op(_wait_and_increment, fail_if_exists=False)
+        _STEP_STARTED.clear()
+        _STEP_RELEASED.clear()
+        try:
+            ws = Workspace('/path', Workspace.new_workflow())
+            ws.set_resource(op_name, mk_op_kwargs(x=1), res_name='A')
+            ws.set_resource(op_name, mk_op_kwargs(x='@A'), res_name='B')
+
+            future = ws.execute_workflow_in_background()
+            self.assertTrue(_STEP_STARTED.wait(timeout=60))
+
+            # Changing resources waits for the running step
+            setter = threading.Thread(target=ws.set_resource, args=(op_name, mk_op_kwargs(x=10)),
+                                      kwargs=dict(res_name='C'))
+            setter.start()
+            setter.join(timeout=0.2)
+            self.assertTrue(setter.is_alive())
+            _STEP_RELEASED.set()
+            setter.join(timeout=60)
+            self.assertFalse(setter.is_alive())
+
+            # The execution has been cancelled before step 'B' and is resumed after the change
+            self.assertIsInstance(future.exception(), Cancellation)
+            self.assertIsNot(ws.background_execution, future)
+            ws.background_execution.result(timeout=60)
+            self.assertEqual(ws.resource_cache['A'], 2)
+            self.assertEqual(ws.resource_cache['B'], 3)
+            self.assertEqual(ws.resource_cache['C'], 11)
+
+            _STEP_STARTED.clear()
+            _STEP_RELEASED.clear()
+            ws.set_resource(op_name, mk_op_kwargs(x='@C'), res_name='D')
+            future = ws.execute_workflow_in_background()
+            self.assertTrue(_STEP_STARTED.wait(timeout=60))
+
+            # Closing waits for the running step
+            closer = threading.Thread(target=ws.close)
+            closer.start()
+            closer.join(timeout=0.2)
+            self.assertTrue(closer.is_alive())
+            _STEP_RELEASED.set()
+            closer.join(timeout=60)
+            self.assertFalse(closer.is_alive())
+            self.assertTrue(future.done())
+            self.assertIs(ws.background_execution, future)
+        finally:
+            _STEP_RELEASED.set()
+            OP_REGISTRY.remove_op(_wait_and_increment)
+
     def test_execute_empty_workflow(self):
         ws = Workspace('/path', Workflow(OpMetaInfo('workspace_workflow', header=dict(description='Test!'))))
         ws.execute_workflow()
@@ -211,8 +211,8 @@ class WorkspaceManagerTestMixin:
         self.assertEqual(len(workspace1.workflow.steps), 2)
         self.assertFalse(workspace1.workflow.find_node('ds').persistent)
         self.assertFalse(workspace1.workflow.find_node('ts').persistent)
-        ts_file_path = os.path.abspath(os.path.join('TESTOMAT', '.cate-workspace', 'ts.nc'))
-        self.assertFalse(os.path.isfile(ts_file_path))
+        ts_file_path = os.path.abspath(os.path.join('TESTOMAT', '.cate-workspace', 'ts.zarr'))
+        self.assertFalse(os.path.isdir(ts_file_path))
 
         workspace3 = workspace_manager.set_workspace_resource_persistence(base_dir, 'ts', True)
         self.assertFalse(workspace3.workflow.find_node('ds').persistent)
@@ -222,18 +222,18 @@ class WorkspaceManagerTestMixin:
         self.assertTrue(workspace4.workflow.find_node('ts').persistent)
 
         workspace_manager.save_workspace(base_dir)
-        self.assertTrue(os.path.isfile(ts_file_path))
+        self.assertTrue(os.path.isdir(ts_file_path))
 
         workspace_manager.close_workspace(base_dir)
         self.assertEqual(len(workspace_manager.get_open_workspaces()), 0)
-        self.assertTrue(os.path.isfile(ts_file_path))
+        self.assertTrue(os.path.isdir(ts_file_path))
 
         workspace5 = workspace_manager.open_workspace(base_dir)
         self.assertEqual(workspace4.workflow.to_json_dict(), workspace5.workflow.to_json_dict())
         workspace_manager.set_workspace_resource_persistence(base_dir, 'ts', False)
         workspace_manager.close_workspace(base_dir)
         workspace_manager.close_workspace(base_dir)  # closing a 2nd time should give no error
-        self.assertFalse(os.path.isfile(ts_file_path))
+        self.assertFalse(os.path.isdir(ts_file_path))
 
         self.del_base_dir(base_dir)
 
@@ -241,3 +241,29 @@ class WorkspaceManagerTestMixin:
 class FSWorkspaceManagerTest(WorkspaceManagerTestMixin, unittest.TestCase):
     def new_workspace_manager(self):
         return FSWorkspaceManager()
+
+    def test_open_workspace_progress(self):
+        base_dir = self.new_base_dir('TESTOMAT')
+
+        workspace_manager = self.new_workspace_manager()
+        workspace_manager.new_workspace(base_dir)
+        workspace_manager.set_workspace_resource(base_dir,
+                                                 'cate.ops.utility.no_op',
+                                                 dict(num_steps=dict(value=10)),
+                                                 res_name='noop')
+        workspace_manager.save_workspace(base_dir)
+        workspace_manager.close_workspace(base_dir)
+
+        rm = RecordingMonitor()
+        workspace = workspace_manager.open_workspace(base_dir, monitor=rm)
+        workspace.background_execution.result(timeout=60)
+        # Waits for the background execution to finish the monitor
+        workspace_manager.close_workspace(base_dir)
+
+        # The background execution reports its progress through the monitor of open_workspace()
+        self.assertEqual(('start', 'Opening workspace', 100), rm.records[0])
+        self.assertIn(('progress', 9.0, 'Computing nothing: Step 10 of 10 doing nothing', 90), rm.records)
+        self.assertEqual(('done',), rm.records[-1])
+        self.assertEqual(1, rm.records.count(('done',)))
+
+        self.del_base_dir(base_dir)
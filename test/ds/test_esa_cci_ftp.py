@@ -1,13 +1,23 @@
 import os
 import os.path
+import shutil
+import tempfile
+import threading
 from datetime import datetime
-from unittest import TestCase
+from unittest import TestCase, skipIf
 
 import cate.core.ds as io
 from cate.conf import get_data_stores_path
 from cate.core.ds import DATA_STORE_REGISTRY
 from cate.ds.esa_cci_ftp import FileSetDataStore, set_default_data_store
 
+try:
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import ThreadedFTPServer
+except ImportError:
+    ThreadedFTPServer = None
+
 
 class EsaCciFtpTest(TestCase):
     def test_set_default_data_store(self):
@@ -186,3 +196,106 @@ class FileSetDataStoreTest(TestCase):
 
         # dataset = result[0].open_dataset()
         # self.assertIsNotNone(dataset)
+
+
+@skipIf(ThreadedFTPServer is None, 'pyftpdlib is not installed')
+class FileSetDataSourceSyncTest(TestCase):
+    JSON = '''{
+     "remote_url": "ftp://127.0.0.1:%d/esacci",
+     "data_sources": [
+     {
+        "name":"sst/L4/DAILY",
+        "base_dir":"sst/data/L4/DAILY",
+        "start_date":"2010-01-30",
+        "end_date":"2010-02-02",
+        "num_files":3,
+        "size_mb":1,
+        "file_pattern":"{YYYY}/{MM}/{YYYY}{MM}{DD}-SST-L4.nc"
+      }
+     ]}'''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.remote_dir = os.path.join(self.tmp_dir, 'remote')
+        self.root_dir = os.path.join(self.tmp_dir, 'local')
+
+        self.remote_files = dict()
+        # 2010-02-01 is not available remotely
+        for day in ['2010/01/20100130', '2010/01/20100131', '2010/02/20100202']:
+            path = 'sst/data/L4/DAILY/%s-SST-L4.nc' % day
+            remote_file = os.path.join(self.remote_dir, 'esacci', path)
+            os.makedirs(os.path.dirname(remote_file), exist_ok=True)
+            with open(remote_file, 'wb') as fp:
+                fp.write(os.urandom(300 * 1024))
+            os.utime(remote_file, (1500000000, 1500000000))
+            self.remote_files[path] = remote_file
+
+        authorizer = DummyAuthorizer()
+        authorizer.add_anonymous(self.remote_dir)
+        handler = type('TestFTPHandler', (FTPHandler,), dict(authorizer=authorizer))
+        self.server = ThreadedFTPServer(('127.0.0.1', 0), handler)
+        self.server_stopped = threading.Event()
+
+        def serve():
+            while not self.server_stopped.is_set():
+                self.server.serve_forever(timeout=0.01, blocking=False)
+            self.server.close_all()
+
+        self.server_thread = threading.Thread(target=serve)
+        self.server_thread.start()
+
+        json = self.JSON % self.server.address[1]
+        self.data_source = FileSetDataStore.from_json('test', self.root_dir, json).query()[0]
+
+    def tearDown(self):
+        self.server_stopped.set()
+        self.server_thread.join()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _read_local_file(self, path: str) -> bytes:
+        with open(os.path.join(self.root_dir, path), 'rb') as fp:
+            return fp.read()
+
+    def _read_remote_file(self, path: str) -> bytes:
+        with open(self.remote_files[path], 'rb') as fp:
+            return fp.read()
+
+    def test_sync(self):
+        self.assertEqual(self.data_source.sync(num_connections=2), (3, 4))
+        for path, remote_file in self.remote_files.items():
+            self.assertEqual(self._read_local_file(path), self._read_remote_file(path))
+            self.assertEqual(os.path.getmtime(os.path.join(self.root_dir, path)), 1500000000)
+
+        # Local files are up-to-date
+        self.assertEqual(self.data_source.sync(num_connections=2), (0, 4))
+
+        # Remote file has been modified
+        path = 'sst/data/L4/DAILY/2010/01/20100131-SST-L4.nc'
+        os.utime(self.remote_files[path], (1600000000, 1600000000))
+        self.assertEqual(self.data_source.sync(time_range=('2010-01-31', '2010-02-01')), (1, 2))
+        self.assertEqual(os.path.getmtime(os.path.join(self.root_dir, path)), 1600000000)
+
+    def test_sync_resumes_incomplete_files(self):
+        path = 'sst/data/L4/DAILY/2010/01/20100130-SST-L4.nc'
+        incomplete_file = os.path.join(self.root_dir, path + '.incomplete')
+        os.makedirs(os.path.dirname(incomplete_file))
+        # Not the remote content, so that we can tell that it is kept
+        with open(incomplete_file, 'wb') as fp:
+            fp.write(bytes(100 * 1024))
+        os.utime(incomplete_file, (1500000000, 1500000000))
+
+        self.assertEqual(self.data_source.sync(time_range=('2010-01-30', '2010-01-30')), (1, 1))
+        self.assertFalse(os.path.exists(incomplete_file))
+        content = self._read_local_file(path)
+        self.assertEqual(content[:100 * 1024], bytes(100 * 1024))
+        self.assertEqual(content[100 * 1024:], self._read_remote_file(path)[100 * 1024:])
+
+    def test_sync_restarts_outdated_incomplete_files(self):
+        path = 'sst/data/L4/DAILY/2010/01/20100130-SST-L4.nc'
+        incomplete_file = os.path.join(self.root_dir, path + '.incomplete')
+        os.makedirs(os.path.dirname(incomplete_file))
+        with open(incomplete_file, 'wb') as fp:
+            fp.write(bytes(100 * 1024))
+
+        self.assertEqual(self.data_source.sync(time_range=('2010-01-30', '2010-01-30')), (1, 1))
+        self.assertEqual(self._read_local_file(path), self._read_remote_file(path))
@@ -94,17 +94,17 @@ class EsaCciOdpDataSourceTest(unittest.TestCase):
                 'ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781114000000-fv02.2.nc': {
                     'date_from': datetime.datetime(1978, 11, 14, 0, 0),
                     'date_to': datetime.datetime(1978, 11, 14, 23, 59),
-                    'size': 21511378
+                    'size': 315114
                 },
                 'ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781115000000-fv02.2.nc': {
                     'date_from': datetime.datetime(1978, 11, 15, 0, 0),
                     'date_to': datetime.datetime(1978, 11, 15, 23, 59),
-                    'size': 21511378
+                    'size': 314821
                 },
                 'ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781116000000-fv02.2.nc': {
                     'date_from': datetime.datetime(1978, 11, 16, 0, 0),
                     'date_to': datetime.datetime(1978, 11, 16, 23, 59),
-                    'size': 21511378
+                    'size': 286109
                 }
             }
 
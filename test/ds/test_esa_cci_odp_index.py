@@ -0,0 +1,99 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from cate.ds.esa_cci_odp_index import EsaCciOdpMetadataIndex, join_catalogue
+
+
+def _read_test_docs():
+    with open(os.path.join(os.path.dirname(__file__), 'esgf-index-cache.json')) as fp:
+        return json.load(fp)['response']['docs']
+
+
+def _doc(instance_id: str, title: str):
+    master_id = instance_id.rsplit('.', 1)[0]
+    return dict(instance_id=instance_id, master_id=master_id, title=title)
+
+
+class JoinCatalogueTest(unittest.TestCase):
+    def test_without_catalogue(self):
+        docs = [_doc('a.v1', 'A'), _doc('b.v1', 'B')]
+        self.assertEqual(join_catalogue(docs, None), [(docs[0], None), (docs[1], None)])
+
+    def test_with_catalogue(self):
+        docs = [_doc('a.v1', 'A'), _doc('b.v1', 'B'), _doc('c.v1', 'C')]
+        csw_data = {'uuid1': dict(title='Cat 1', data_sources=['c.v1', 'x.v1']),
+                    'uuid2': dict(title='Cat 2', data_sources=['a.v1', 'c.v1'])}
+        self.assertEqual(join_catalogue(docs, csw_data), [(docs[2], dict(title='Cat 1')),
+                                                          (docs[0], dict(title='Cat 2'))])
+
+
+class EsaCciOdpMetadataIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.docs = _read_test_docs()
+        self.index = EsaCciOdpMetadataIndex()
+        self.index.update(self.docs)
+
+    def tearDown(self):
+        self.index.close()
+
+    def test_query(self):
+        self.assertEqual(self.index.size, 61)
+        results = self.index.query()
+        self.assertEqual(len(results), 61)
+        self.assertEqual([doc['instance_id'] for _, doc, _ in results],
+                         [doc['instance_id'] for doc in self.docs])
+
+    def test_query_with_string(self):
+        results = self.index.query(query_expr='OC')
+        self.assertEqual(len(results), 20)
+        self.assertEqual(len(self.index.query(query_expr='oc')), 20)
+        self.assertEqual(self.index.query(query_expr='%'), [])
+
+    def test_query_with_id(self):
+        ds_id = self.docs[3]['master_id']
+        results = self.index.query(ds_id=ds_id.upper())
+        self.assertEqual(len(results), 1)
+        instance_id, doc, catalogue_item = results[0]
+        self.assertEqual(instance_id, self.docs[3]['instance_id'])
+        self.assertEqual(doc, self.docs[3])
+        self.assertIsNone(catalogue_item)
+
+    def test_incremental_update(self):
+        docs = self.docs[5:]
+        docs[0] = dict(docs[0], title='Changed title')
+        self.index.update(docs)
+        self.assertEqual(self.index.size, 56)
+        self.assertEqual([doc for _, doc, _ in self.index.query()], docs)
+        self.assertEqual(len(self.index.query(query_expr='changed title')), 1)
+
+    def test_catalogue_title_is_searched(self):
+        instance_id = self.docs[0]['instance_id']
+        self.index.update(self.docs, {'uuid': dict(title='Sea Surface Salinity', data_sources=[instance_id])})
+        self.assertEqual(self.index.size, 1)
+        results = self.index.query(query_expr='salinity')
+        self.assertEqual([(result[0], result[2]) for result in results],
+                         [(instance_id, dict(title='Sea Surface Salinity'))])
+
+
+class PersistentEsaCciOdpMetadataIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_reopen(self):
+        path = os.path.join(self.tmp_dir, 'index', 'metadata-index.sqlite')
+        index = EsaCciOdpMetadataIndex(path)
+        self.assertIsNone(index.timestamp)
+        index.update(_read_test_docs())
+        index.close()
+
+        index = EsaCciOdpMetadataIndex(path)
+        self.assertIsNotNone(index.timestamp)
+        self.assertEqual(index.size, 61)
+        self.assertEqual(len(index.query(query_expr='OC')), 20)
+        index.close()
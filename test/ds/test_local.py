@@ -6,9 +6,12 @@ import unittest.mock
 import datetime
 import shutil
 import json
+import numpy as np
+import xarray as xr
 from cate.core.ds import DATA_STORE_REGISTRY, DataAccessError
+from cate.core.dsmetacache import DatasetMetadataIndex
 from cate.core.types import PolygonLike, TimeRangeLike, VarNamesLike
-from cate.ds.local import LocalDataStore, LocalDataSource
+from cate.ds.local import LocalDataStore, LocalDataSource, choose_compression_encoding
 from cate.ds.esa_cci_odp import EsaCciOdpDataStore
 from collections import OrderedDict
 
@@ -77,8 +80,10 @@ class LocalDataStoreTest(unittest.TestCase):
         # self.assertEqual(len(data_sources), 2)
 
     def test_query(self):
-        local_data_store = LocalDataStore('test', os.path.join(os.path.dirname(__file__),
-                                                               'resources/datasources/local/'))
+        # Work on a copy, as querying data sources writes the store's summary index
+        local_data_store_path = os.path.join(self.tmp_dir, 'resources')
+        shutil.copytree(os.path.join(os.path.dirname(__file__), 'resources/datasources/local/'), local_data_store_path)
+        local_data_store = LocalDataStore('test', local_data_store_path)
         data_sources = local_data_store.query()
         self.assertEqual(len(data_sources), 2)
 
@@ -212,14 +217,56 @@ class LocalDataStoreTest(unittest.TestCase):
         ds_asynch = self.data_store.query('test.asynch')
         self.assertEqual(len(ds_asynch), 1)
 
+    def test_summary_index(self):
+        data_source = self.data_store.query('test.aerosol')[0]
+        data_source.meta_info['temporal_coverage_start'] = '2001-01-01T00:00:00'
+        data_source.meta_info['temporal_coverage_end'] = '2001-12-31T00:00:00'
+        data_source.save()
+        # Renews the summary of the changed data source
+        LocalDataStore('test', self.tmp_dir).query()
+
+        data_store = LocalDataStore('test', self.tmp_dir)
+        with unittest.mock.patch.object(LocalDataStore, '_load_json_file',
+                                        side_effect=LocalDataStore._load_json_file) as load_json_file_mock:
+            data_sources = data_store.query()
+            self.assertEqual(load_json_file_mock.call_count, 0)
+            self.assertEqual([ds.id for ds in data_sources], ['test.aerosol', 'test.ozone'])
+            data_source = data_store.query('test.aerosol')[0]
+            self.assertEqual(data_source.temporal_coverage(),
+                             (datetime.datetime(2001, 1, 1), datetime.datetime(2001, 12, 31)))
+            self.assertEqual(load_json_file_mock.call_count, 0)
+            # Files are loaded when needed
+            self.assertEqual(data_source.info_string,
+                             'Files: /DATA/aerosol/*/*/AERO_V1*.nc /DATA/aerosol/*/*/AERO_V2*.nc')
+            self.assertEqual(load_json_file_mock.call_count, 1)
+
+    def test_summary_index_is_renewed(self):
+        LocalDataStore('test', self.tmp_dir).query()
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp_dir, '.data_sources.index')))
+        json_file = os.path.join(self.tmp_dir, 'test.ozone.json')
+        with open(json_file) as fp:
+            json_dict = json.load(fp)
+        json_dict['meta_info']['title'] = 'Ozone changed by another process'
+        with open(json_file, 'w') as fp:
+            json.dump(json_dict, fp)
+
+        data_source = LocalDataStore('test', self.tmp_dir).query('test.ozone')[0]
+        self.assertEqual(data_source.title, 'Ozone changed by another process')
+        with open(os.path.join(self.tmp_dir, '.data_sources.index')) as fp:
+            summary_index = json.load(fp)
+        self.assertEqual(summary_index['data_sources']['test.ozone.json']['meta_info']['title'],
+                         'Ozone changed by another process')
+
 
 class LocalDataSourceTest(unittest.TestCase):
     def setUp(self):
         self.tmp_dir = tempfile.mkdtemp()
         self._dummy_store = LocalDataStore('dummy', 'dummy')
 
-        self._local_data_store = LocalDataStore('test', os.path.join(os.path.dirname(__file__),
-                                                                     'resources/datasources/local/'))
+        # Work on a copy, as loading the data sources writes the summary index of the data store
+        local_data_store_path = os.path.join(self.tmp_dir, 'resources')
+        shutil.copytree(os.path.join(os.path.dirname(__file__), 'resources/datasources/local/'), local_data_store_path)
+        self._local_data_store = LocalDataStore('test', local_data_store_path)
 
         self.ds1 = LocalDataSource("ozone",
                                    ["/DATA/ozone/*/*.nc"],
@@ -369,6 +416,39 @@ class LocalDataSourceTest(unittest.TestCase):
             ds.open_dataset(time_range=(datetime.datetime(1978, 11, 20),
                                         datetime.datetime(1978, 11, 21)))
 
+    def test_metadata_index(self):
+        ds = self._local_data_store.query('local_w_temporal')[0]
+        index_path = self._local_data_store.get_metadata_index_path(ds.id)
+        self.assertFalse(os.path.exists(index_path))
+
+        # Opening indexes the files in memory only
+        ds.open_dataset(time_range=(datetime.datetime(1978, 11, 14), datetime.datetime(1978, 11, 15)))
+        self.assertFalse(os.path.exists(index_path))
+
+        ds.update_metadata_index()
+        self.assertEqual(len(DatasetMetadataIndex(index_path).files), 3)
+
+        ds = LocalDataStore('test', self._local_data_store.data_store_path).query('local_w_temporal')[0]
+        with unittest.mock.patch('cate.core.dsmetacache.read_metadata') as read_metadata_mock:
+            dataset = ds.open_dataset()
+            self.assertEqual(read_metadata_mock.call_count, 0)
+        self.assertEqual(dataset.sizes.get('time'), 3)
+
+        self._local_data_store.remove_data_source(ds, remove_files=False)
+        self.assertFalse(os.path.exists(index_path))
+
+    def test_add_dataset_updates_metadata_index(self):
+        files_path = os.path.join(self._local_data_store.data_store_path, 'files')
+        ds = self._local_data_store.create_data_source('indexed')
+        index_path = self._local_data_store.get_metadata_index_path(ds.id)
+        ds.add_dataset(os.path.join(files_path, 'ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781114000000-fv02.2.nc'))
+        ds.add_dataset(os.path.join(files_path, 'ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781115000000-fv02.2.nc'))
+        self.assertFalse(os.path.exists(index_path))
+
+        # The index file is written once all files have been added
+        self._local_data_store.register_ds(ds)
+        self.assertEqual(len(DatasetMetadataIndex(index_path).files), 2)
+
     def test_make_local(self):
         data_source = self._local_data_store.query('local_w_temporal')[0]
 
@@ -418,6 +498,27 @@ class LocalDataSourceTest(unittest.TestCase):
                                                          datetime.datetime(2020, 11, 15, 23, 59)))
             self.assertIsNone(no_data)
 
+    def test_make_local_copies_files_from_outside_the_data_store(self):
+        file_name = 'ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781114000000-fv02.2.nc'
+        source_path = os.path.join(self.tmp_dir, 'external', file_name)
+        os.makedirs(os.path.dirname(source_path))
+        shutil.copy(os.path.join(self._local_data_store.data_store_path, 'files', file_name), source_path)
+        data_source = self._local_data_store.create_data_source('external')
+        data_source.add_dataset(source_path, (datetime.datetime(1978, 11, 14), datetime.datetime(1978, 11, 14, 23, 59)))
+        self._local_data_store.register_ds(data_source)
+
+        with unittest.mock.patch.object(EsaCciOdpDataStore, 'query', return_value=[]):
+            new_ds = data_source.make_local('from_external')
+        copy_path = os.path.join(new_ds.data_store.data_store_path, new_ds.id, file_name)
+        with open(copy_path, 'rb') as fp:
+            content = fp.read()
+
+        # Changing the source file leaves its copy unchanged
+        with open(source_path, 'ab') as fp:
+            fp.write(b'changed')
+        with open(copy_path, 'rb') as fp:
+            self.assertEqual(fp.read(), content)
+
     def test_remove_data_source_by_id(self):
         data_sources = self._local_data_store.query('local_w_temporal')
         data_sources_len_before_remove = len(data_sources)
@@ -439,3 +540,21 @@ class LocalDataSourceTest(unittest.TestCase):
         data_sources = self._local_data_store.query('local_w_temporal')
         data_sources_len_after_remove = len(data_sources)
         self.assertGreater(data_sources_len_before_remove, data_sources_len_after_remove)
+
+
+class ChooseCompressionEncodingTest(unittest.TestCase):
+    def test_compressible_data(self):
+        data = np.repeat(np.linspace(270., 280., 100, dtype=np.float32), 100).reshape((100, 100))
+        encoding = choose_compression_encoding(xr.Variable(('lat', 'lon'), data), 9)
+        self.assertTrue(encoding['zlib'])
+        self.assertIn(encoding['complevel'], (1, 3, 6, 9))
+        self.assertIn(encoding['shuffle'], (True, False))
+        encoding = choose_compression_encoding(xr.Variable(('lat', 'lon'), data), 2)
+        self.assertIn(encoding['complevel'], (1, 2))
+
+    def test_incompressible_data(self):
+        data = np.random.RandomState(0).randint(0, 256, size=(100, 100), dtype=np.uint8)
+        self.assertEqual(choose_compression_encoding(xr.Variable(('lat', 'lon'), data), 9), {'zlib': False})
+
+    def test_scalar_data(self):
+        self.assertEqual(choose_compression_encoding(xr.Variable((), 1.), 6), {'zlib': True, 'complevel': 6})
@@ -96,6 +96,33 @@ class TestLTA(TestCase):
             long_term_average(ds)
         self.assertIn('temporal aggregation', str(err.exception))
 
+    def test_monthly_means(self):
+        """
+        Test the means of every month, skipping missing values, of a dataset
+        with dask as the backend
+        """
+        first = np.arange(30 * 4 * 8, dtype=np.float32).reshape([30, 4, 8])
+        first[3, 0, 0] = np.nan
+        ds = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], first),
+            'mask': (['lat', 'lon'], np.ones([4, 8])),
+            'lat': np.linspace(-67.5, 67.5, 4),
+            'lon': np.linspace(-157.5, 157.5, 8),
+            'time': pd.date_range('2000-01-01', freq='MS', periods=30).values.astype('datetime64[ns]')})
+        ds = adjust_temporal_attrs(ds).chunk(chunks={'time': 7, 'lat': 2})
+
+        actual = long_term_average(ds)
+        self.assertEqual(actual['first'].dims, ('time', 'lat', 'lon'))
+        self.assertEqual(actual['first'].chunks, ((12,), (2, 2), (8,)))
+        self.assertEqual(actual['first'].dtype, np.float32)
+        self.assertEqual(actual['mask'].dims, ('lat', 'lon'))
+
+        # January and April of 2000, 2001, and 2002, where April 2000 is missing once, December of 2000 and 2001
+        np.testing.assert_almost_equal(actual['first'].values[0], (first[0] + first[12] + first[24]) / 3)
+        np.testing.assert_almost_equal(actual['first'].values[3, 0, 0], (first[15, 0, 0] + first[27, 0, 0]) / 2)
+        np.testing.assert_almost_equal(actual['first'].values[3, 1], (first[3, 1] + first[15, 1] + first[27, 1]) / 3)
+        np.testing.assert_almost_equal(actual['first'].values[11], (first[11] + first[23]) / 2)
+
 
 class TestTemporalAggregation(TestCase):
     """
@@ -13,6 +13,7 @@ import tempfile
 import shutil
 from contextlib import contextmanager
 import itertools
+from unittest.mock import patch
 
 from cate.ops import anomaly
 from cate.ops import subset_spatial
@@ -234,6 +235,58 @@ class TestExternal(TestCase):
                 # Test that actual is also a dask array, based on ds
                 self.assertEqual(actual.chunks, ds.chunks)
 
+    def test_monthly_blocks(self):
+        """
+        Test that every time step is compared against the reference of its month,
+        block by block, and that the reference dataset is opened once.
+        """
+        ref = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], np.arange(12.).reshape([12, 1, 1]) * np.ones([12, 4, 8])),
+            'lat': np.linspace(-67.5, 67.5, 4),
+            'lon': np.linspace(-157.5, 157.5, 8)})
+
+        # 18 months, starting in July
+        time = np.array([datetime(2000 + (x // 12), x % 12 + 1, 1) for x in range(6, 24)], dtype='datetime64[ns]')
+        months = np.array([x % 12 for x in range(6, 24)], dtype=np.float64)
+        ds = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], (months + 10.).reshape([18, 1, 1]) * np.ones([18, 4, 8])),
+            'lat': np.linspace(-67.5, 67.5, 4),
+            'lon': np.linspace(-157.5, 157.5, 8),
+            'time': time}).chunk(chunks={'time': 5, 'lat': 2})
+
+        with create_tmp_file() as tmp_file:
+            ref.to_netcdf(tmp_file, 'w')
+            actual = anomaly.anomaly_external(ds, tmp_file)
+            self.assertEqual(actual.chunks, ds.chunks)
+            np.testing.assert_array_equal(actual['first'].values, np.full([18, 4, 8], 10.))
+
+            with patch('xarray.open_dataset', side_effect=xr.open_dataset) as open_dataset_mock:
+                anomaly.anomaly_external(ds, tmp_file)
+                self.assertEqual(open_dataset_mock.call_count, 0)
+
+    def test_reference_is_loaded(self):
+        """
+        Test that the reference dataset is read into memory and its file
+        closed, and that it is read again once its file has changed.
+        """
+        ref = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], np.ones([12, 4, 8])),
+            'lat': np.linspace(-67.5, 67.5, 4),
+            'lon': np.linspace(-157.5, 157.5, 8)})
+
+        with create_tmp_file() as tmp_file:
+            ref.to_netcdf(tmp_file, 'w')
+            with patch('xarray.Dataset.close', autospec=True, side_effect=xr.Dataset.close) as close_mock:
+                clim = anomaly._open_reference(tmp_file)
+                self.assertEqual(close_mock.call_count, 1)
+            self.assertIsNone(clim['first'].chunks)
+            self.assertIs(anomaly._open_reference(tmp_file), clim)
+
+            changed_ref = ref + 1
+            changed_ref.attrs['title'] = 'changed'
+            changed_ref.to_netcdf(tmp_file, 'w')
+            np.testing.assert_array_equal(anomaly._open_reference(tmp_file)['first'].values, np.full([12, 4, 8], 2.))
+
     def test_registered(self):
         """
         Test the operation when it is invoked through the operation registry
@@ -10,6 +10,7 @@ from datetime import datetime
 
 from cate.ops import arithmetics
 from cate.core.op import OP_REGISTRY
+from cate.core.workflow import ValueCache
 from cate.util.misc import object_to_qualified_name
 
 
@@ -296,6 +297,29 @@ class ComputeTest(TestCase):
             'lon': lon})
         assert_dataset_equal(expected, actual)
 
+    def test_plain_compute_with_lazy_context(self):
+        first = np.ones([45, 90, 3])
+        lon = np.linspace(-178, 178, 90)
+        lat = np.linspace(-88, 88, 45)
+
+        res_1 = xr.Dataset({
+            'first': (['lat', 'lon', 'time'], first),
+            'lat': lat,
+            'lon': lon
+        })
+
+        # Resources of opened workspaces are loaded on first access
+        value_cache = ValueCache()
+        value_cache.set_lazy('res_1', lambda: res_1)
+        actual = arithmetics.compute(ds=None,
+                                     script="third = 6 * res_1.first",
+                                     _ctx=dict(value_cache=value_cache))
+        expected = xr.Dataset({
+            'third': (['lat', 'lon', 'time'], 6 * first),
+            'lat': lat,
+            'lon': lon})
+        assert_dataset_equal(expected, actual)
+
     def test_registered_compute_with_context(self):
         reg_op = OP_REGISTRY.get_op(object_to_qualified_name(arithmetics.compute))
         first = np.ones([45, 90, 3])
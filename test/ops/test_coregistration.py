@@ -48,32 +48,10 @@ class TestCoregistration(TestCase):
         ds_coarse_resampled = coregister(ds_fine, ds_coarse, monitor=rm)
         self.assertEqual([('start', 'coregister dataset', 2),
                           ('progress', 0.0, 'coregister dataarray', 0),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 0),
-                          ('progress', 0.125, None, 6),
-                          ('progress', 0.125, None, 13),
-                          ('progress', 0.125, None, 19),
-                          ('progress', 0.125, None, 25),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 25),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 25),
-                          ('progress', 0.125, None, 31),
-                          ('progress', 0.125, None, 38),
-                          ('progress', 0.125, None, 44),
-                          ('progress', 0.125, None, 50),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 50),
+                          ('progress', 1.0, None, 50),
                           ('progress', 0.0, 'coregister dataarray', 50),
                           ('progress', 0.0, 'coregister dataarray', 50),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 50),
-                          ('progress', 0.125, None, 56),
-                          ('progress', 0.125, None, 63),
-                          ('progress', 0.125, None, 69),
-                          ('progress', 0.125, None, 75),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 75),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 75),
-                          ('progress', 0.125, None, 81),
-                          ('progress', 0.125, None, 88),
-                          ('progress', 0.125, None, 94),
-                          ('progress', 0.125, None, 100),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 100),
+                          ('progress', 1.0, None, 100),
                           ('progress', 0.0, 'coregister dataarray', 100),
                           ('done',)], rm.records)
 
@@ -127,6 +105,30 @@ class TestCoregistration(TestCase):
 
         assert_almost_equal(ds_fine_resampled['first'].values, expected['first'].values)
 
+    def test_lazy(self):
+        """
+        Test that coregistration is lazy and chunked along non-spatial dimensions only
+        """
+        ds_fine = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], np.array([np.eye(4, 8), np.eye(4, 8), np.eye(4, 8)])),
+            'lat': np.linspace(-67.5, 67.5, 4),
+            'lon': np.linspace(-157.5, 157.5, 8),
+            'time': np.array([1, 2, 3])})
+
+        ds_coarse = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], np.array([np.eye(3, 6), np.eye(3, 6), np.eye(3, 6)])),
+            'lat': np.linspace(-60, 60, 3),
+            'lon': np.linspace(-150, 150, 6),
+            'time': np.array([1, 2, 3])}).chunk(chunks={'time': 2, 'lat': 2, 'lon': 3})
+
+        ds_coarse_resampled = coregister(ds_fine, ds_coarse)
+        self.assertEqual(ds_coarse_resampled['first'].chunks, ((2, 1), (4,), (8,)))
+        self.assertEqual(ds_coarse_resampled['first'].dims, ('time', 'lat', 'lon'))
+
+        # Arrays that are not dask-backed are resampled slice by slice
+        ds_fine_resampled = coregister(ds_coarse, ds_fine)
+        self.assertEqual(ds_fine_resampled['first'].chunks, ((1, 1, 1), (3,), (6,)))
+
     def test_registered(self):
         """
         Test registered operation execution execution
@@ -447,104 +449,10 @@ class TestCoregistration(TestCase):
 
         self.assertEqual([('start', 'coregister dataset', 2),
                           ('progress', 0.0, 'coregister dataarray', 0),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 0),
-                          ('progress', 0.03125, None, 2),
-                          ('progress', 0.03125, None, 3),
-                          ('progress', 0.03125, None, 5),
-                          ('progress', 0.03125, None, 6),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 6),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 6),
-                          ('progress', 0.03125, None, 8),
-                          ('progress', 0.03125, None, 9),
-                          ('progress', 0.03125, None, 11),
-                          ('progress', 0.03125, None, 13),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 13),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 13),
-                          ('progress', 0.03125, None, 14),
-                          ('progress', 0.03125, None, 16),
-                          ('progress', 0.03125, None, 17),
-                          ('progress', 0.03125, None, 19),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 19),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 19),
-                          ('progress', 0.03125, None, 20),
-                          ('progress', 0.03125, None, 22),
-                          ('progress', 0.03125, None, 23),
-                          ('progress', 0.03125, None, 25),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 25),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 25),
-                          ('progress', 0.03125, None, 27),
-                          ('progress', 0.03125, None, 28),
-                          ('progress', 0.03125, None, 30),
-                          ('progress', 0.03125, None, 31),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 31),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 31),
-                          ('progress', 0.03125, None, 33),
-                          ('progress', 0.03125, None, 34),
-                          ('progress', 0.03125, None, 36),
-                          ('progress', 0.03125, None, 38),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 38),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 38),
-                          ('progress', 0.03125, None, 39),
-                          ('progress', 0.03125, None, 41),
-                          ('progress', 0.03125, None, 42),
-                          ('progress', 0.03125, None, 44),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 44),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 44),
-                          ('progress', 0.03125, None, 45),
-                          ('progress', 0.03125, None, 47),
-                          ('progress', 0.03125, None, 48),
-                          ('progress', 0.03125, None, 50),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 50),
+                          ('progress', 1.0, None, 50),
                           ('progress', 0.0, 'coregister dataarray', 50),
                           ('progress', 0.0, 'coregister dataarray', 50),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 50),
-                          ('progress', 0.03125, None, 52),
-                          ('progress', 0.03125, None, 53),
-                          ('progress', 0.03125, None, 55),
-                          ('progress', 0.03125, None, 56),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 56),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 56),
-                          ('progress', 0.03125, None, 58),
-                          ('progress', 0.03125, None, 59),
-                          ('progress', 0.03125, None, 61),
-                          ('progress', 0.03125, None, 63),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 63),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 63),
-                          ('progress', 0.03125, None, 64),
-                          ('progress', 0.03125, None, 66),
-                          ('progress', 0.03125, None, 67),
-                          ('progress', 0.03125, None, 69),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 69),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 69),
-                          ('progress', 0.03125, None, 70),
-                          ('progress', 0.03125, None, 72),
-                          ('progress', 0.03125, None, 73),
-                          ('progress', 0.03125, None, 75),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 75),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 75),
-                          ('progress', 0.03125, None, 77),
-                          ('progress', 0.03125, None, 78),
-                          ('progress', 0.03125, None, 80),
-                          ('progress', 0.03125, None, 81),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 81),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 81),
-                          ('progress', 0.03125, None, 83),
-                          ('progress', 0.03125, None, 84),
-                          ('progress', 0.03125, None, 86),
-                          ('progress', 0.03125, None, 88),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 88),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 88),
-                          ('progress', 0.03125, None, 89),
-                          ('progress', 0.03125, None, 91),
-                          ('progress', 0.03125, None, 92),
-                          ('progress', 0.03125, None, 94),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 94),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 94),
-                          ('progress', 0.03125, None, 95),
-                          ('progress', 0.03125, None, 97),
-                          ('progress', 0.03125, None, 98),
-                          ('progress', 0.03125, None, 100),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 100),
+                          ('progress', 1.0, None, 100),
                           ('progress', 0.0, 'coregister dataarray', 100),
                           ('done',)], rm.records)
 
@@ -197,6 +197,43 @@ class TestPearson(TestCase):
         self.assertTrue(np.all(np.isclose(correlation['p_value'].values,
                                           pv_sp)))
 
+    def test_time_chunks(self):
+        """
+        Test that correlating time chunks one by one yields the same results as scipy,
+        ignoring time steps with missing values
+        """
+        random = np.random.RandomState(1)
+        x_3d = random.random_sample((30, 3, 4))
+        y_3d = x_3d * 0.5 + random.random_sample((30, 3, 4))
+        x_3d[::4, 0, 0] = np.nan
+        y_3d[1::5, 1, 0] = np.nan
+        # Large offsets, that make accumulating raw sums of squares lose precision
+        x_3d[:, 2, :] += 1e8
+
+        ds1 = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], x_3d),
+            'lat': np.linspace(-45., 45., 3),
+            'lon': np.linspace(-135., 135., 4),
+            'time': np.arange(30)}).chunk(chunks={'time': 7, 'lat': 2})
+
+        ds2 = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], y_3d),
+            'lat': np.linspace(-45., 45., 3),
+            'lon': np.linspace(-135., 135., 4),
+            'time': np.arange(30)}).chunk(chunks={'time': 10})
+
+        correlation = pearson_correlation(ds1, ds2, 'first', 'first')
+        self.assertEqual(correlation['corr_coef'].dims, ('lat', 'lon'))
+        np.testing.assert_array_equal(correlation['lon'].values, np.linspace(-135., 135., 4))
+        for lat in range(3):
+            for lon in range(4):
+                x = x_3d[:, lat, lon]
+                y = y_3d[:, lat, lon]
+                valid = np.isfinite(x) & np.isfinite(y)
+                cc_sp, pv_sp = pearsonr(x[valid], y[valid])
+                self.assertTrue(np.isclose(correlation['corr_coef'].values[lat, lon], cc_sp))
+                self.assertTrue(np.isclose(correlation['p_value'].values[lat, lon], pv_sp))
+
     def test_error(self):
         """
         Test error conditions
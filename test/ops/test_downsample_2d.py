@@ -181,3 +181,16 @@ class Downsample2dTest(unittest.TestCase):
                                  2, 2, rs.DS_STD, -1,
                                  [[0.36055513, 1.24721913],
                                   [0., 0.82192187]])
+
+    def test_stack(self):
+        src = np.array([[[0.9, 0.5, 3.0, 4.0],
+                         [1.1, 1.5, 1.0, NAN],
+                         [NAN, 2.1, 3.0, 5.0],
+                         [NAN, NAN, 4.2, NAN]]] * 2)
+        src[1] *= 2.
+        for method in (rs.DS_FIRST, rs.DS_LAST, rs.DS_MODE, rs.DS_MEAN, rs.DS_VAR, rs.DS_STD):
+            actual = rs.downsample_2d(src, 3, 2, method=method, fill_value=-1.)
+            self.assertEqual(actual.shape, (2, 2, 3))
+            for i in range(2):
+                desired = rs.downsample_2d(src[i], 3, 2, method=method, fill_value=-1.)
+                np.testing.assert_almost_equal(actual[i], desired)
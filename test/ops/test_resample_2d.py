@@ -82,3 +82,34 @@ class Resample2dTest(unittest.TestCase):
                           8, 2, rs.DS_MEAN, rs.US_NEAREST,
                           [[1., 1., 1., 1., 2., 2., 3., 3.],
                            [3.5, 3.5, 3.5, 3.5, 3., 3., 3., 3.]])
+
+    def test_stack(self):
+        src = np.array([SRC, np.array(SRC) * 2., np.array(SRC) + 1.]).reshape((3, 1, 4, 4))
+        for w, h in ((2, 2), (8, 8), (8, 2), (2, 8)):
+            actual = rs.resample_2d(src, w, h, ds_method=rs.DS_MEAN, us_method=rs.US_LINEAR)
+            self.assertEqual(actual.shape, (3, 1, h, w))
+            for i in range(3):
+                desired = rs.resample_2d(src[i, 0], w, h, ds_method=rs.DS_MEAN, us_method=rs.US_LINEAR)
+                assert_almost_equal(actual[i, 0], desired)
+
+    def test_stack_masked(self):
+        src = np.ma.array([SRC, SRC], mask=[np.eye(4), np.zeros((4, 4))])
+        actual = rs.resample_2d(src, 8, 2, ds_method=rs.DS_MEAN, us_method=rs.US_NEAREST, fill_value=-1.)
+        self.assertIsInstance(actual, np.ma.MaskedArray)
+        assert_almost_equal(actual[1], [[1., 1., 1., 1., 2., 2., 3., 3.],
+                                        [3.5, 3.5, 3.5, 3.5, 3., 3., 3., 3.]])
+        desired = rs.resample_2d(src[0], 8, 2, ds_method=rs.DS_MEAN, us_method=rs.US_NEAREST, fill_value=-1.)
+        assert_almost_equal(actual[0], desired)
+        np.testing.assert_equal(np.ma.getmaskarray(actual[0]), np.ma.getmaskarray(desired))
+
+    def test_out(self):
+        out = np.zeros((2, 2, 2))
+        actual = rs.resample_2d(np.array([SRC, SRC]), 2, 2, ds_method=rs.DS_FIRST, out=out)
+        self.assertIs(actual, out)
+        assert_almost_equal(out[1], [[0.9, 3.0], [4.0, 3.0]])
+        # Output arrays which cannot be viewed as stacks of 2-D grids are written too
+        out = np.zeros((2, 4, 2, 2))[:, ::2]
+        rs.resample_2d(np.array([[SRC, SRC], [SRC, SRC]]), 2, 2, ds_method=rs.DS_FIRST, out=out)
+        assert_almost_equal(out[1, 1], [[0.9, 3.0], [4.0, 3.0]])
+        with self.assertRaises(ValueError):
+            rs.resample_2d(np.array([SRC, SRC]), 2, 2, out=np.zeros((2, 2)))
@@ -80,6 +80,22 @@ class TestSubsetSpatial(TestCase):
         # Africa
         self.assertTrue(1 == actual.sel(method='nearest', **{'lon': 20.7, 'lat': 6.15}))
 
+    def test_generic_masked_with_hole(self):
+        """
+        Test using a generic Polygon with a hole and masking
+        """
+        a = 'POLYGON((-20 -20,20 -20,0 20,-20 -20),(-5 -5,5 -5,0 5,-5 -5))'
+
+        dataset = xr.Dataset({
+            'first': (['lat', 'lon', 'time'], np.ones([180, 360, 6])),
+            'lat': np.linspace(-89.5, 89.5, 180),
+            'lon': np.linspace(-179.5, 179.5, 360)})
+        actual = subset.subset_spatial(dataset, a)
+        # Hole
+        self.assertTrue(np.isnan(actual.sel(method='nearest', **{'lon': 0.5, 'lat': -2.5})['first']).all())
+        # Polygon
+        self.assertTrue((actual.sel(method='nearest', **{'lon': 0.5, 'lat': -12.5})['first'] == 1).all())
+
     def test_generic_masked_inverted(self):
         """
         Test using a generic Polygon and masking
@@ -152,3 +152,13 @@ class Upsample2dTest(unittest.TestCase):
                                                  [0, 0, 0, 0, 0],
                                                  [0, 0, 0, 0, 0],
                                                  [0, 0, 0, 0, 1]]))
+
+    def test_stack(self):
+        src = np.ma.array([[[1., 2.], [3., 4.]], [[5., 6.], [NAN, 8.]]], mask=[[[0, 0], [0, 1]], [[0, 0], [0, 0]]])
+        for method in (rs.US_NEAREST, rs.US_LINEAR):
+            actual = rs.upsample_2d(src, 4, 3, method=method, fill_value=-1.)
+            self.assertEqual(actual.shape, (2, 3, 4))
+            for i in range(2):
+                desired = rs.upsample_2d(src[i], 4, 3, method=method, fill_value=-1.)
+                np.testing.assert_almost_equal(actual[i], desired)
+                np.testing.assert_equal(np.ma.getmaskarray(actual[i]), np.ma.getmaskarray(desired))
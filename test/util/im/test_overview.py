@@ -0,0 +1,84 @@
+import os.path
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from cate.util.im import TilingScheme, GeoExtent
+from cate.util.im.image import ImagePyramid
+from cate.util.im.overview import NdarrayOverviewStore
+
+
+class NdarrayOverviewStoreTest(TestCase):
+    def setUp(self):
+        self.store_dir = os.path.join(tempfile.mkdtemp(), 'overviews')
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.store_dir), ignore_errors=True)
+
+    def test_build_float(self):
+        array = np.zeros((8, 12), dtype=np.float32)
+        array[0::2, 0::2] = 1.
+        array[0::2, 1::2] = 2.
+        array[1::2, 0::2] = 3.
+        array[1::2, 1::2] = np.nan
+
+        store = NdarrayOverviewStore.open_or_build(self.store_dir, array, 3, signature='a')
+        self.assertEqual(3, store.num_levels)
+        self.assertEqual((1., 3.), store.value_range)
+        self.assertIsNone(store.get_level_array(0))
+        self.assertIsNone(store.get_level_array(3))
+
+        level_1 = store.get_level_array(1)
+        self.assertEqual((4, 6), level_1.shape)
+        self.assertEqual(np.float32, level_1.dtype)
+        np.testing.assert_almost_equal(level_1, np.full((4, 6), 2.))
+
+        level_2 = store.get_level_array(2)
+        self.assertEqual((2, 3), level_2.shape)
+        np.testing.assert_almost_equal(level_2, np.full((2, 3), 2.))
+
+    def test_build_int_picks_first(self):
+        array = np.arange(0, 4 * 8, dtype=np.int32).reshape((1, 4, 8))
+
+        store = NdarrayOverviewStore.open_or_build(self.store_dir, array, 2)
+        level_1 = store.get_level_array(1)
+        self.assertEqual((1, 2, 4), level_1.shape)
+        self.assertEqual([[[0, 2, 4, 6], [16, 18, 20, 22]]], level_1.tolist())
+        self.assertEqual((0, 31), store.value_range)
+
+    def test_reuse_and_rebuild(self):
+        array = np.ones((4, 4))
+        NdarrayOverviewStore.open_or_build(self.store_dir, array, 2, signature='a')
+
+        store = NdarrayOverviewStore(self.store_dir, signature='a')
+        self.assertTrue(store.is_valid_for(array, 2))
+        self.assertFalse(store.is_valid_for(np.ones((4, 8)), 2))
+        self.assertFalse(store.is_valid_for(array, 3))
+
+        store = NdarrayOverviewStore(self.store_dir, signature='b')
+        self.assertFalse(store.is_valid_for(array, 2))
+
+        store = NdarrayOverviewStore.open_or_build(self.store_dir, 2 * array, 2, signature='b')
+        self.assertEqual((2., 2.), store.value_range)
+        np.testing.assert_almost_equal(store.get_level_array(1), np.full((2, 2), 2.))
+
+    def test_pyramid_uses_overviews(self):
+        width = 1440
+        height = 720
+        array = np.random.random((height, width))
+        tiling_scheme = TilingScheme.create(width, height, 180, 180, geo_extent=GeoExtent())
+
+        store = NdarrayOverviewStore.open_or_build(self.store_dir, array, tiling_scheme.num_levels)
+        pyramid = ImagePyramid.create_from_array(array, tiling_scheme, overview_store=store)
+        self.assertEqual(3, pyramid.num_levels)
+
+        for z_index in range(pyramid.num_levels):
+            expected_size = width >> (pyramid.num_levels - 1 - z_index), height >> (pyramid.num_levels - 1 - z_index)
+            self.assertEqual(expected_size, pyramid.get_level_image(z_index).size)
+
+        tile = pyramid.get_level_image(0).get_tile(0, 0)
+        self.assertEqual((180, 180), tile.shape)
+        self.assertNotIsInstance(tile, np.memmap)
+        self.assertAlmostEqual(float(np.mean(array[0:4, 0:4])), float(tile[0, 0]))
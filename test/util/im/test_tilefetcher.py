@@ -0,0 +1,74 @@
+import threading
+from unittest import TestCase
+
+import numpy as np
+
+from cate.util.im import TilingScheme, GeoExtent
+from cate.util.im.image import ImagePyramid, OpImage
+from cate.util.im.tilefetcher import TileFetcher
+
+
+class CountingImage(OpImage):
+    def __init__(self, size, tile_size, event=None):
+        super().__init__(size, tile_size, (size[0] // tile_size[0], size[1] // tile_size[1]),
+                         mode='float32', format='ndarray', tile_cache=None)
+        self.event = event
+        self.counts = dict()
+        self.lock = threading.Lock()
+
+    def compute_tile(self, tile_x, tile_y, rectangle):
+        if self.event is not None:
+            self.event.wait(5)
+        with self.lock:
+            self.counts[(tile_x, tile_y)] = self.counts.get((tile_x, tile_y), 0) + 1
+        return np.full((rectangle[3], rectangle[2]), tile_x + 10 * tile_y, dtype=np.float32)
+
+
+def _new_pyramid(event=None):
+    tiling_scheme = TilingScheme(3, 2, 1, 4, 4, GeoExtent())
+    level_images = [CountingImage(tiling_scheme.size(z_index), (4, 4), event=event)
+                    for z_index in range(tiling_scheme.num_levels)]
+    return ImagePyramid(tiling_scheme, level_images)
+
+
+class TileFetcherTest(TestCase):
+    def test_fetch_tile(self):
+        fetcher = TileFetcher(max_workers=2)
+        pyramid = _new_pyramid()
+        tile = fetcher.fetch_tile('p', pyramid, 3, 1, 2).result(5)
+        self.assertEqual((4, 4), tile.shape)
+        self.assertEqual(13, tile[0, 0])
+        fetcher.shutdown()
+
+    def test_concurrent_requests_share_computation(self):
+        event = threading.Event()
+        fetcher = TileFetcher(max_workers=4)
+        pyramid = _new_pyramid(event=event)
+        futures = [fetcher.fetch_tile('p', pyramid, 1, 0, 1) for _ in range(5)]
+        self.assertTrue(all(future is futures[0] for future in futures))
+        event.set()
+        for future in futures:
+            self.assertEqual(1, future.result(5)[0, 0])
+        self.assertEqual({(1, 0): 1}, pyramid.get_level_image(1).counts)
+        fetcher.shutdown()
+
+    def test_prefetch(self):
+        fetcher = TileFetcher(max_workers=2, prefetch=True)
+        pyramid = _new_pyramid()
+        fetcher.fetch_tile('p', pyramid, 1, 1, 1).result(5)
+        fetcher.shutdown(wait=True)
+        self.assertEqual({(0, 0): 1}, pyramid.get_level_image(0).counts)
+        self.assertEqual({(0, 0): 1, (1, 0): 1, (2, 0): 1,
+                          (0, 1): 1, (1, 1): 1, (2, 1): 1}, pyramid.get_level_image(1).counts)
+        self.assertEqual({(2, 2): 1, (3, 2): 1, (2, 3): 1, (3, 3): 1}, pyramid.get_level_image(2).counts)
+        self.assertEqual(0, fetcher.num_pending_prefetches)
+
+    def test_get_prefetch_tile_coords(self):
+        pyramid = _new_pyramid()
+        self.assertEqual([(1, 0, 0), (0, 0, 1), (1, 0, 1), (0, 1, 1), (1, 1, 1)],
+                         TileFetcher.get_prefetch_tile_coords(pyramid, 0, 0, 0))
+        self.assertEqual([(6, 1, 2), (7, 1, 2), (0, 1, 2),
+                          (6, 2, 2), (0, 2, 2),
+                          (6, 3, 2), (7, 3, 2), (0, 3, 2),
+                          (3, 1, 1)],
+                         TileFetcher.get_prefetch_tile_coords(pyramid, 7, 2, 2))
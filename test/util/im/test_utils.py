@@ -39,6 +39,13 @@ class ArrayTest(TestCase):
                                              [1.1, 1.1, 1.1],
                                              [1.1, 1.1, nan]]))
 
+        b = utils.downsample_ndarray(a, aggregator=utils.aggregate_ndarray_nanmean)
+        self.assertEqual(b.shape, (4, 3))
+        np.testing.assert_almost_equal(b, np.array([[2.75, 2.75, 2.75],
+                                                    [2.75, 2.75, 2.75],
+                                                    [2.75, 2.75, 2.75],
+                                                    [2.75, 2.75, (2.2 + 3.3 + 4.4) / 3]]))
+
 
 class GetChunkSizeTest(TestCase):
     def test_any_obj(self):
@@ -2,7 +2,8 @@ import os
 import shutil
 from unittest import TestCase
 
-from cate.util.cache import CacheStore, Cache, MemoryCacheStore, FileCacheStore
+from cate.util.cache import CacheStore, Cache, MemoryCacheStore, FileCacheStore, \
+    POLICY_LRU, POLICY_MRU, POLICY_LFU, POLICY_RR
 
 
 class MemoryCacheStoreTest(TestCase):
@@ -188,3 +189,67 @@ class CacheTest(TestCase):
         self.assertEqual(cache.get_value('k5'), 'yyyy')
         self.assertEqual(cache.size, 600)
         self.assertEqual(cache_store.trace, 'can_load_from_key(k5);load_from_key(k5);restore(k5, S/yyyy);')
+
+    def test_policies(self):
+        def new_cache(policy):
+            cache = Cache(store=TracingCacheStore(), capacity=400, threshold=1.0, policy=policy)
+            cache.put_value('k1', 'x')
+            cache.put_value('k2', 'x')
+            cache.put_value('k3', 'x')
+            cache.put_value('k4', 'x')
+            cache.get_value('k1')
+            cache.get_value('k1')
+            cache.get_value('k3')
+            cache.put_value('k5', 'x')
+            return cache
+
+        cache = new_cache(POLICY_LRU)
+        self.assertEqual({'k1', 'k3', 'k4', 'k5'}, set(cache._item_dict.keys()))
+
+        cache = new_cache(POLICY_MRU)
+        self.assertEqual({'k1', 'k2', 'k4', 'k5'}, set(cache._item_dict.keys()))
+
+        cache = new_cache(POLICY_LFU)
+        self.assertEqual({'k1', 'k3', 'k4', 'k5'}, set(cache._item_dict.keys()))
+        cache.get_value('k5')
+        cache.get_value('k5')
+        cache.put_value('k6', 'x')
+        self.assertEqual({'k1', 'k3', 'k5', 'k6'}, set(cache._item_dict.keys()))
+
+        cache = new_cache(POLICY_RR)
+        self.assertEqual(4, cache.num_items)
+        self.assertIn('k5', cache._item_dict)
+        for i in range(100):
+            cache.put_value('r%s' % i, 'x')
+        self.assertEqual(4, cache.num_items)
+        self.assertEqual(400, cache.size)
+
+        cache = new_cache(lambda item: 0 if item.key == 'k2' else 1)
+        self.assertEqual({'k1', 'k3', 'k4', 'k5'}, set(cache._item_dict.keys()))
+
+    def test_stats(self):
+        cache = Cache(store=TracingCacheStore(), capacity=200, threshold=1.0)
+        cache.put_value('k1', 'x')
+        cache.put_value('k2', 'x')
+        self.assertEqual('x', cache.get_value('k1'))
+        self.assertEqual(None, cache.get_value('k3'))
+        cache.put_value('k3', 'x')
+        self.assertEqual(1, cache.num_hits)
+        self.assertEqual(1, cache.num_misses)
+        self.assertEqual(1, cache.num_evictions)
+        self.assertEqual(2, cache.num_items)
+        cache.reset_stats()
+        self.assertEqual(0, cache.num_hits)
+        self.assertEqual(0, cache.num_misses)
+        self.assertEqual(0, cache.num_evictions)
+
+    def test_parent_cache(self):
+        parent_cache = Cache(store=TracingCacheStore(), capacity=1000, threshold=1.0)
+        cache = Cache(store=TracingCacheStore(), capacity=200, threshold=1.0, parent_cache=parent_cache)
+        cache.put_value('k1', 'x')
+        cache.put_value('k2', 'x')
+        cache.put_value('k3', 'x')
+        self.assertEqual({'k2', 'k3'}, set(cache._item_dict.keys()))
+        self.assertEqual({'k1'}, set(parent_cache._item_dict.keys()))
+        self.assertEqual('x', cache.get_value('k1'))
+        self.assertEqual(1, cache.num_hits)
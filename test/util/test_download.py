@@ -0,0 +1,143 @@
+import hashlib
+import os
+import os.path
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import TestCase
+
+from cate.util.download import download_file, verify_file, ChecksumError, INCOMPLETE_FILE_EXT
+
+DATA = bytes(range(256)) * 1024
+DATA_MD5 = hashlib.md5(DATA).hexdigest()
+DATA_SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+class _RangeRequestHandler(BaseHTTPRequestHandler):
+    # Set by the test
+    support_ranges = True
+    requested_ranges = []
+
+    # noinspection PyPep8Naming
+    def do_GET(self):
+        range_header = self.headers.get('Range')
+        _RangeRequestHandler.requested_ranges.append(range_header)
+        if range_header and _RangeRequestHandler.support_ranges:
+            offset = int(range_header[len('bytes='):-1])
+            data = DATA[offset:]
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (offset, len(DATA) - 1, len(DATA)))
+        else:
+            data = DATA
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class DownloadFileTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('localhost', 0), _RangeRequestHandler)
+        cls.url = 'http://localhost:%d/data.bin' % cls.server.server_port
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _RangeRequestHandler.support_ranges = True
+        _RangeRequestHandler.requested_ranges = []
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.tmp_dir, 'data.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _read_file(self):
+        with open(self.file, 'rb') as fp:
+            return fp.read()
+
+    def _write_incomplete_file(self, data):
+        with open(self.file + INCOMPLETE_FILE_EXT, 'wb') as fp:
+            fp.write(data)
+
+    def test_download(self):
+        bytes_read = []
+        download_file(self.url, self.file, file_size=len(DATA), checksum=DATA_MD5, checksum_type='MD5',
+                      on_bytes_read=bytes_read.append)
+        self.assertEqual(self._read_file(), DATA)
+        self.assertEqual(sum(bytes_read), len(DATA))
+        self.assertFalse(os.path.exists(self.file + INCOMPLETE_FILE_EXT))
+        self.assertEqual(_RangeRequestHandler.requested_ranges, [None])
+        self.assertTrue(verify_file(self.file, len(DATA), DATA_SHA256, 'SHA-256'))
+
+    def test_download_is_resumed(self):
+        self._write_incomplete_file(DATA[:1000])
+        bytes_read = []
+        download_file(self.url, self.file, file_size=len(DATA), checksum=DATA_SHA256, checksum_type='SHA256',
+                      on_bytes_read=bytes_read.append)
+        self.assertEqual(self._read_file(), DATA)
+        self.assertEqual(bytes_read[0], 1000)
+        self.assertEqual(sum(bytes_read), len(DATA))
+        self.assertEqual(_RangeRequestHandler.requested_ranges, ['bytes=1000-'])
+
+    def test_download_is_resumed_after_size_mismatch(self):
+        # Data for a longer file
+        self._write_incomplete_file(DATA + b'garbage')
+        bytes_read = []
+        download_file(self.url, self.file, file_size=len(DATA), on_bytes_read=bytes_read.append)
+        self.assertEqual(self._read_file(), DATA)
+        self.assertTrue(all(num_bytes >= 0 for num_bytes in bytes_read))
+        self.assertEqual(sum(bytes_read), len(DATA))
+
+    def test_download_is_restarted_if_ranges_are_not_supported(self):
+        _RangeRequestHandler.support_ranges = False
+        self._write_incomplete_file(b'garbage')
+        bytes_read = []
+        download_file(self.url, self.file, file_size=len(DATA), on_bytes_read=bytes_read.append)
+        self.assertEqual(self._read_file(), DATA)
+        self.assertEqual(sum(bytes_read), len(DATA))
+
+    def test_checksum_mismatch(self):
+        bytes_read = []
+        with self.assertRaises(ChecksumError):
+            download_file(self.url, self.file, checksum='0' * 32, checksum_type='MD5',
+                          on_bytes_read=bytes_read.append)
+        self.assertFalse(os.path.exists(self.file))
+        self.assertFalse(os.path.exists(self.file + INCOMPLETE_FILE_EXT))
+        # Progress is never reported backwards
+        self.assertTrue(all(num_bytes >= 0 for num_bytes in bytes_read))
+        self.assertEqual(sum(bytes_read), len(DATA))
+
+    def test_size_mismatch(self):
+        with self.assertRaises(IOError):
+            download_file(self.url, self.file, file_size=len(DATA) + 1)
+        self.assertFalse(os.path.exists(self.file))
+
+    def test_download_is_stopped(self):
+        def on_bytes_read(num_bytes):
+            raise KeyboardInterrupt()
+
+        with self.assertRaises(KeyboardInterrupt):
+            download_file(self.url, self.file, on_bytes_read=on_bytes_read)
+        self.assertFalse(os.path.exists(self.file))
+        # The incomplete file is resumed next time
+        self.assertTrue(os.path.exists(self.file + INCOMPLETE_FILE_EXT))
+
+    def test_verify_file(self):
+        self.assertFalse(verify_file(self.file))
+        with open(self.file, 'wb') as fp:
+            fp.write(DATA)
+        self.assertTrue(verify_file(self.file))
+        self.assertTrue(verify_file(self.file, len(DATA)))
+        self.assertFalse(verify_file(self.file, len(DATA) - 1))
+        self.assertTrue(verify_file(self.file, len(DATA), DATA_MD5.upper(), 'md5'))
+        self.assertFalse(verify_file(self.file, len(DATA), DATA_SHA256, 'md5'))
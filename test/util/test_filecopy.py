@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from cate.util.filecopy import COPY_METHOD_COPY, COPY_METHOD_HARD_LINK, copy_file, copy_files
+from cate.util.monitor import Cancellation
+from .test_monitor import RecordingMonitor
+
+
+class CopyFileTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp_dir, 'source.nc')
+        with open(self.source, 'wb') as fp:
+            fp.write(os.urandom(3 * 1024 * 1024 + 17))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _read(self, path: str) -> bytes:
+        with open(path, 'rb') as fp:
+            return fp.read()
+
+    def test_copy(self):
+        target = os.path.join(self.tmp_dir, 'target.nc')
+        num_bytes = []
+        with patch('cate.util.filecopy._reflink', return_value=False):
+            method = copy_file(self.source, target, on_bytes_copied=num_bytes.append)
+        self.assertEqual(method, COPY_METHOD_COPY)
+        self.assertEqual(self._read(target), self._read(self.source))
+        self.assertEqual(sum(num_bytes), os.path.getsize(self.source))
+        self.assertEqual(len(num_bytes), 4)
+        self.assertEqual(os.path.getmtime(target), os.path.getmtime(self.source))
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['source.nc', 'target.nc'])
+
+    def test_hard_link(self):
+        target = os.path.join(self.tmp_dir, 'target.nc')
+        num_bytes = []
+        with patch('cate.util.filecopy._reflink', return_value=False):
+            method = copy_file(self.source, target, allow_hard_link=True, on_bytes_copied=num_bytes.append)
+        self.assertEqual(method, COPY_METHOD_HARD_LINK)
+        self.assertTrue(os.path.samefile(self.source, target))
+        self.assertEqual(num_bytes, [os.path.getsize(self.source)])
+
+    def test_cancelled_copy_leaves_no_file(self):
+        target = os.path.join(self.tmp_dir, 'target.nc')
+
+        def on_bytes_copied(num_bytes: int):
+            raise Cancellation()
+
+        with patch('cate.util.filecopy._reflink', return_value=False):
+            with self.assertRaises(Cancellation):
+                copy_file(self.source, target, on_bytes_copied=on_bytes_copied)
+        self.assertEqual(os.listdir(self.tmp_dir), ['source.nc'])
+
+
+class CopyFilesTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_pairs = []
+        for i in range(5):
+            source = os.path.join(self.tmp_dir, 'source-%d.nc' % i)
+            with open(source, 'wb') as fp:
+                fp.write(os.urandom(1000 * (i + 1)))
+            self.file_pairs.append((source, os.path.join(self.tmp_dir, 'target-%d.nc' % i)))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_copy_files(self):
+        total_size = sum(os.path.getsize(source) for source, _ in self.file_pairs)
+        monitor = RecordingMonitor()
+        monitor.start('copy', total_work=total_size)
+        with patch('cate.util.filecopy._reflink', return_value=False):
+            indexes = list(copy_files(self.file_pairs, num_workers=3, monitor=monitor))
+        self.assertEqual(sorted(indexes), [0, 1, 2, 3, 4])
+        self.assertEqual(sum(record[1] for record in monitor.records if record[0] == 'progress'), total_size)
+        self.assertEqual(monitor.records[-1][3], 100)
+        for source, target in self.file_pairs:
+            self.assertTrue(os.path.isfile(target))
+            self.assertFalse(os.path.samefile(source, target))
+
+    def test_copy_files_fails(self):
+        os.remove(self.file_pairs[2][0])
+        with self.assertRaises(OSError):
+            list(copy_files(self.file_pairs, num_workers=2))
@@ -0,0 +1,50 @@
+from datetime import datetime
+from unittest import TestCase
+
+from cate.util.intervalindex import IntervalIndex
+
+
+def _day(day: int) -> datetime:
+    return datetime(2017, 1, day)
+
+
+class IntervalIndexTest(TestCase):
+    def setUp(self):
+        # Added in random order
+        self.index = IntervalIndex([('f5', _day(5), _day(6)),
+                                    ('f1', _day(1), _day(2)),
+                                    ('f3', _day(3), _day(4)),
+                                    ('f2', _day(2), _day(3)),
+                                    ('f4', _day(4), _day(5))])
+
+    def test_len_and_contains(self):
+        self.assertEqual(len(self.index), 5)
+        self.assertIn('f3', self.index)
+        self.assertNotIn('f6', self.index)
+
+    def test_find_starting_within(self):
+        self.assertEqual(self.index.find_starting_within(), ['f1', 'f2', 'f3', 'f4', 'f5'])
+        self.assertEqual(self.index.find_starting_within(_day(2), _day(4)), ['f2', 'f3', 'f4'])
+        self.assertEqual(self.index.find_starting_within(start=_day(4)), ['f4', 'f5'])
+        self.assertEqual(self.index.find_starting_within(end=_day(1)), ['f1'])
+        self.assertEqual(self.index.find_starting_within(_day(7), _day(9)), [])
+
+    def test_equal_starts_keep_order(self):
+        self.index.add('g2', _day(2), _day(2))
+        self.index.add('g1', _day(2), _day(2))
+        self.assertEqual(self.index.find_starting_within(_day(2), _day(2)), ['f2', 'g2', 'g1'])
+        self.index.remove('g2')
+        self.assertEqual(self.index.find_starting_within(_day(2), _day(2)), ['f2', 'g1'])
+
+    def test_add_replaces(self):
+        self.index.add('f1', _day(8), _day(9))
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.find_starting_within(), ['f2', 'f3', 'f4', 'f5', 'f1'])
+
+    def test_remove_and_clear(self):
+        self.index.remove('f3')
+        self.index.remove('f6')
+        self.assertEqual(self.index.find_starting_within(), ['f1', 'f2', 'f4', 'f5'])
+        self.index.clear()
+        self.assertEqual(len(self.index), 0)
+        self.assertEqual(self.index.find_starting_within(), [])
@@ -0,0 +1,75 @@
+import threading
+import time
+from unittest import TestCase
+
+from cate.util.monitor import Cancellation
+from cate.util.pipeline import run_pipeline
+from .test_monitor import RecordingMonitor
+
+
+class RunPipelineTest(TestCase):
+    def test_results(self):
+        results = dict(run_pipeline(range(20), [(lambda x: x + 1, 1),
+                                                (lambda x: x * 10, 4),
+                                                (lambda x: -x, 1)]))
+        self.assertEqual(results, {i: -(i + 1) * 10 for i in range(20)})
+
+    def test_without_items_and_stages(self):
+        self.assertEqual(list(run_pipeline([], [(lambda x: x, 2)])), [])
+        self.assertEqual(list(run_pipeline(['a', 'b'], [])), [(0, 'a'), (1, 'b')])
+
+    def test_stages_run_concurrently(self):
+        lock = threading.Lock()
+        active = [0, 0]
+
+        def sleep(x):
+            with lock:
+                active[0] += 1
+                active[1] = max(active[0], active[1])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return x
+
+        results = list(run_pipeline(range(8), [(sleep, 4)]))
+        self.assertEqual(sorted(results), [(i, i) for i in range(8)])
+        self.assertGreater(active[1], 1)
+        self.assertLessEqual(active[1], 4)
+
+    def test_queues_are_bounded(self):
+        fed = []
+
+        def items():
+            for i in range(100):
+                fed.append(i)
+                yield i
+
+        results = run_pipeline(items(), [(lambda x: x, 1), (lambda x: x, 1)], queue_size=2)
+        next(results)
+        time.sleep(0.2)
+        # 3 queues of size 2 plus at most one item per worker and the feeder
+        self.assertLess(len(fed), 12)
+        results.close()
+
+    def test_error_stops_pipeline(self):
+        def fail(x):
+            if x == 3:
+                raise ValueError('3 is bad')
+            return x
+
+        with self.assertRaises(ValueError) as cm:
+            list(run_pipeline(range(100), [(fail, 2), (lambda x: x, 1)]))
+        self.assertEqual(str(cm.exception), '3 is bad')
+
+    def test_cancellation(self):
+        monitor = RecordingMonitor()
+
+        def sleep(x):
+            time.sleep(0.05)
+            return x
+
+        results = run_pipeline(range(100), [(sleep, 1)], monitor=monitor)
+        next(results)
+        monitor.cancel()
+        with self.assertRaises(Cancellation):
+            list(results)
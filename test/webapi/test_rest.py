@@ -0,0 +1,84 @@
+from unittest import TestCase
+
+from cate.core.workflow import ValueCache
+from cate.webapi.rest import WorkspaceImagery
+
+
+class _Image:
+    def __init__(self):
+        self.disposed = False
+
+    def dispose(self):
+        self.disposed = True
+
+
+class _Pyramid:
+    num_levels = 2
+
+    def __init__(self):
+        self.images = [_Image(), _Image()]
+
+    def get_level_image(self, z_index):
+        return self.images[z_index]
+
+    @property
+    def disposed(self):
+        return all(image.disposed for image in self.images)
+
+
+class WorkspaceImageryTest(TestCase):
+    def test_max_num_pyramids(self):
+        imagery = WorkspaceImagery(max_num_pyramids=2, mem_tile_cache_capacity=1000)
+        pyramids = [_Pyramid() for _ in range(4)]
+
+        self.assertIs(imagery.put_pyramid('p0', 'res_0', 0, 0, pyramids[0]), pyramids[0])
+        imagery.put_pyramid('p1', 'res_0', 0, 0, pyramids[1])
+        # Accessing p0 makes p1 the least recently used pyramid
+        self.assertIs(imagery.get_pyramid('p0'), pyramids[0])
+        imagery.put_pyramid('p2', 'res_0', 0, 0, pyramids[2])
+
+        self.assertEqual(imagery.num_pyramids, 2)
+        self.assertIsNone(imagery.get_pyramid('p1'))
+        self.assertTrue(pyramids[1].disposed)
+        self.assertFalse(pyramids[0].disposed)
+        self.assertFalse(pyramids[2].disposed)
+
+        imagery.put_pyramid('p3', 'res_0', 0, 0, pyramids[3])
+        self.assertEqual(imagery.num_pyramids, 2)
+        self.assertIsNone(imagery.get_pyramid('p0'))
+        self.assertTrue(pyramids[0].disposed)
+        self.assertIs(imagery.get_pyramid('p2'), pyramids[2])
+        self.assertIs(imagery.get_pyramid('p3'), pyramids[3])
+
+        # Registering an existing pyramid ID keeps the registered pyramid
+        self.assertIs(imagery.put_pyramid('p3', 'res_0', 0, 0, _Pyramid()), pyramids[3])
+        self.assertEqual(imagery.num_pyramids, 2)
+
+        imagery.close()
+        self.assertEqual(imagery.num_pyramids, 0)
+        self.assertTrue(pyramids[2].disposed)
+        self.assertTrue(pyramids[3].disposed)
+
+    def test_prune(self):
+        resource_cache = ValueCache()
+        resource_cache['res_1'] = 1
+        resource_cache['res_2'] = 2
+        resource_cache['res_3'] = 3
+        imagery = WorkspaceImagery(max_num_pyramids=10, mem_tile_cache_capacity=1000)
+        pyramids = dict()
+        for res_name in ['res_1', 'res_2', 'res_3']:
+            pyramids[res_name] = _Pyramid()
+            imagery.put_pyramid(res_name, res_name, resource_cache.get_id(res_name),
+                                resource_cache.get_update_count(res_name), pyramids[res_name])
+
+        imagery.prune(resource_cache)
+        self.assertEqual(imagery.num_pyramids, 3)
+
+        # Changed, renamed, and deleted resources
+        resource_cache['res_1'] = 10
+        resource_cache.rename_key('res_2', 'res_4')
+        del resource_cache['res_3']
+        imagery.prune(resource_cache)
+
+        self.assertEqual(imagery.num_pyramids, 0)
+        self.assertTrue(all(pyramid.disposed for pyramid in pyramids.values()))